@@ -7,7 +7,6 @@ This tutorial teaches
 from pathlib import Path
 import pandas as pd
 from PySide6.QtWidgets import QFileDialog, QMessageBox
-from pasta_eln.backendWorker.sqlite import MAIN_ORDER
 from pasta_eln.backendWorker.worker import Task
 
 # The following two variables are mandatory
@@ -40,7 +39,7 @@ def main(comm, hierStack, widget, parameter={}):
         res = parameter['fileNames']
     df = pd.read_csv(res[0])
 
-    # verify the columns are correct
+    # verify the columns are correct: the backend verifies them against the data schema
     colNames = list(df.columns)
     if 'type' not in colNames or 'name' not in colNames:
         QMessageBox.critical(widget, 'Error', 'You have to have columns named "type" and "name"', 'Critical')
@@ -52,18 +51,7 @@ def main(comm, hierStack, widget, parameter={}):
     if docType not in comm.docTypesTitles:
         QMessageBox.critical(widget, 'Error', 'The type does not exist in PASTA database', 'Critical')
         return False
-    # columns that are in the Pasta-ELN
-    colPasta = [f'{i["class"]}.{i["name"]}' for i in comm.dataHierarchyNodes[docType]]
-    colPasta = [i[1:] if i[1:] in MAIN_ORDER+['tags','qrCodes'] else i for i in colPasta] + ['type']
-    if set(colNames).difference(colPasta):
-        QMessageBox.critical(widget, 'Error', f'All columns must exist in the data schema. Offending: {set(colNames).difference(colPasta)}', 'Critical')
-        return False
-
-    # Loop all rows
-    for _, row in df.iterrows():
-        data = row.to_dict()
-        del data['type']
-        comm.uiRequestTask.emit(Task.ADD_DOC, {'hierStack':hierStack.split('/'), 'docType':docType, 'doc':data})
 
-    comm.uiRequestHierarchy.emit(widget.projID, widget.showAll)                    # update with new hierarchy
+    # Add all rows at once: the report of the backend shows success or offending columns
+    comm.uiRequestTask.emit(Task.BULK_ADD_DOCS, {'hierStack':hierStack.split('/'), 'docType':docType, 'table':df})
     return True
@@ -1,13 +1,16 @@
 """ Displays a scrollable grid of images (PNG, JPG, SVG) """
+import itertools
 import logging
-from typing import Any
-from PySide6.QtCore import QByteArray, Qt, Signal, Slot
-from PySide6.QtGui import QIcon, QImage, QMouseEvent, QPixmap, QStandardItemModel
-from PySide6.QtSvgWidgets import QSvgWidget
+from PySide6.QtCore import Qt, QThreadPool, Signal, Slot
+from PySide6.QtGui import QIcon, QImage, QMouseEvent, QPixmap, QResizeEvent, QShowEvent
 from PySide6.QtWidgets import QCheckBox, QGridLayout, QPushButton, QScrollArea, QVBoxLayout, QWidget
 from .guiCommunicate import Communicate
+from .tableModel import TableModel
+from .thumbnails import DecoderSignals, DecodeTask, ThumbnailCache
 
-IMG_SIZE = 300
+IMG_SIZE   = 300
+COLUMNS    = 4
+BATCH_SIZE = 16                                                   #images per request: visible cells of grid
 
 class ClickableFrame(QPushButton):
   """
@@ -67,18 +70,27 @@ class ImageGallery(QWidget):
     """
     super().__init__()
     self.comm = comm
-    self.comm.backendThread.worker.beSendDoc.connect(self.onGetData)
+    self.comm.backendThread.worker.beSendThumbnails.connect(self.onGetThumbnails)
     self.data:dict[str,tuple[int,int]] = {}
-    self.model:QStandardItemModel | None = None
+    self.buttons:dict[str,ClickableFrame] = {}
+    self.missing:dict[str,None] = {}                                   #docIDs without image, in order of grid
+    self.waiting:set[str] = set()                                      #docIDs requested from backend or decoding
+    self.keys:dict[str,str] = {}                                       #docID -> key of its image in cache
+    self.thumbnails = ThumbnailCache()
+    self.decoder = DecoderSignals()
+    self.decoder.decoded.connect(self.onDecoded)
+    self.pool = QThreadPool(self)
+    self.model:TableModel | None = None
     self.docRows:dict[str,int] = {}
     self.checkboxes:dict[str,QCheckBox] = {}
     layout = QVBoxLayout(self)
-    scrollArea = QScrollArea(self)
-    scrollArea.setWidgetResizable(True)
+    self.scrollArea = QScrollArea(self)
+    self.scrollArea.setWidgetResizable(True)
+    self.scrollArea.verticalScrollBar().valueChanged.connect(self.requestThumbnails)
     scrollContent = QWidget()
     self.gridL = QGridLayout(scrollContent)
-    scrollArea.setWidget(scrollContent)
-    layout.addWidget(scrollArea)
+    self.scrollArea.setWidget(scrollContent)
+    layout.addWidget(self.scrollArea)
 
 
   def isDocSelected(self, docID:str) -> bool:
@@ -90,8 +102,7 @@ class ImageGallery(QWidget):
     """
     if not self.model or docID not in self.docRows:
       return False
-    item = self.model.item(self.docRows[docID], 0)
-    return False if item is None else item.checkState() == Qt.CheckState.Checked
+    return self.model.isChecked(self.docRows[docID])
 
 
   def toggleSelection(self) -> None:
@@ -122,115 +133,146 @@ class ImageGallery(QWidget):
   def _onCheckboxStateChanged(self, docID:str, state:int) -> None:
     if not self.model or docID not in self.docRows:
       return
-    item = self.model.item(self.docRows[docID], 0)
-    if item is None:
-      return
-    desiredState = Qt.CheckState.Unchecked if state == Qt.CheckState.Unchecked else Qt.CheckState.Checked
-    if item.checkState() != desiredState:
-      item.setCheckState(desiredState)
+    desiredState = state != Qt.CheckState.Unchecked.value
+    if self.model.isChecked(self.docRows[docID]) != desiredState:
+      self.model.setChecked(self.docRows[docID], desiredState)
 
 
-  def updateGrid(self, model:QStandardItemModel) -> None:
+  def updateGrid(self, model:TableModel) -> None:
     """
+    Create a frame for each image and request the images, starting with the visible ones
+    - images in the cache are shown immediately
+
     Args:
       model: The data model containing information about the images to display
-             The first column of each row is expected to have an 'accessibleText'
+             The document id of each row is used to request its image
     """
+    # Clear existing widgets from the grid
+    while self.gridL.count():
+      child = self.gridL.takeAt(0)
+      if child.widget():
+        child.widget().deleteLater()
     self.data = {}
     self.docRows.clear()
     self.checkboxes.clear()
+    self.buttons.clear()
+    self.missing.clear()
+    self.waiting.clear()
     self.model = model
-    row, col = 0, 0
-
     for idx in range(self.model.rowCount()):
-      docID = model.itemFromIndex(model.index(idx,0)).accessibleText()
-      self.comm.uiRequestDoc.emit(docID)
-      self.data[docID] = (row, col)
+      docID = model.docID(idx)
+      self.data[docID] = (idx//COLUMNS, idx%COLUMNS)
       self.docRows[docID] = idx
-      col += 1
-      if col >= 4:                                                                        # Assuming 4 columns
-        col = 0
-        row += 1
-    # Clear existing widgets from the grid
-    while self.gridL.count():
-      child = self.gridL.takeAt(0)
-      if child.widget():
-        child.widget().deleteLater()
+      button = ClickableFrame(docID)
+      button.clicked.connect(self.imageClicked)
+      button.doubleClicked.connect(self.image2Clicked)
+      self._attachCheckbox(button, docID)
+      self.gridL.addWidget(button, *self.data[docID])
+      self.buttons[docID] = button
+      if docID in self.keys and (pixmap := self.thumbnails.get(self.keys[docID])) is not None:
+        self._setPixmap(docID, pixmap)
+      else:
+        self.missing[docID] = None
+    self.requestThumbnails()
+    return
+
+
+  def invalidate(self, docIDs:list[str]) -> None:
+    """ Remove images from cache, e.g. if extractors change them
+
+    Args:
+      docIDs (list): document ids
+    """
+    for docID in docIDs:
+      if docID in self.keys:
+        self.thumbnails.remove(self.keys.pop(docID))
     return
 
 
-  @Slot(dict)
-  def onGetData(self, doc:dict[str,Any]) -> None:
+  @Slot()
+  def requestThumbnails(self) -> None:
+    """ Request the next batch of images: images of visible cells first, then the others in order of the grid
+    - only one batch at a time: the answer of each request is decoded before the next request
     """
-    Populates or updates the image grid based on the provided model
+    if self.waiting or not self.missing:
+      return
+    rowHeight = IMG_SIZE + max(self.gridL.verticalSpacing(), 0)
+    firstRow = self.scrollArea.verticalScrollBar().value() // rowHeight
+    lastRow = (self.scrollArea.verticalScrollBar().value() + self.scrollArea.viewport().height()) // rowHeight
+    visible = [i for i in itertools.islice(self.data, firstRow*COLUMNS, (lastRow+1)*COLUMNS) if i in self.missing]
+    batch = visible or list(itertools.islice(self.missing, BATCH_SIZE))
+    for docID in batch:
+      del self.missing[docID]
+    self.waiting = set(batch)
+    self.comm.uiRequestThumbnails.emit(batch)
+    return
+
 
-    Clears the existing grid and then iterates through the model to fetch
-    and display images. It handles both SVG and raster image formats (like PNG, JPG)
+  @Slot(list, list)
+  def onGetThumbnails(self, docIDs:list[str], thumbnails:list[tuple[str,str,str,bytes]]) -> None:
+    """
+    Decode the raw images of one request in the thread pool; images in cache are shown immediately
 
     Args:
-      doc (dict[str, Any]): A dictionary containing the document data.
+      docIDs (list): requested document ids
+      thumbnails (list): docID, key of image, format, raw bytes
     """
-    if 'id' in doc and doc['id'] in self.data:
-      if not doc or 'image' not in doc:
-        # Handle cases where image data might be missing or malformed
-        logging.warning('Image data not found or malformed for docID: %s', doc['id'])
-        return
-      image = doc['image']
-      row, col = self.data[doc['id']]
-
-      if image.startswith('<?xml version="1.0"'):
-        # Wrap QSvgWidget in a Clickable subclass of QPushButton
-        button = ClickableFrame(doc['id'])
-        button.setFixedSize(IMG_SIZE, IMG_SIZE)
-        svgWidget = QSvgWidget()
-        svgWidget.renderer().load(bytearray(image, encoding='utf-8'))
-        # Calculate aspect ratio for SVG
-        svg_width = svgWidget.renderer().defaultSize().width()
-        svg_height = svgWidget.renderer().defaultSize().height()
-
-        if svg_width == 0 or svg_height == 0:                                         # Avoid division by zero
-          new_width, new_height = IMG_SIZE -4, IMG_SIZE -4
-        elif svg_height > svg_width:
-          new_width = int(float(svg_width) / float(svg_height) * (IMG_SIZE - 4))
-          new_height = IMG_SIZE - 4
-        else:
-          new_width = IMG_SIZE - 4
-          new_height = int(float(svg_height) / float(svg_width) * (IMG_SIZE - 4))
-        svgWidget.setMaximumSize(new_width, new_height)
-
-        layout = QVBoxLayout(button)
-        layout.addWidget(svgWidget)
-        layout.setAlignment(Qt.AlignCenter)                                       # type: ignore[attr-defined]
-        button.clicked.connect(lambda checked=False, docID=doc['id']: self.imageClicked(docID))
-        button.doubleClicked.connect(self.image2Clicked)
-        self._attachCheckbox(button, doc['id'])
-        self.gridL.addWidget(button, row, col)
-      elif 'base64,' in image:                                               # Basic check for base64 data URI
-        try:
-          header, base64_data = image.split(',', 1)
-          # Extract image type from header (e.g., "data:image/png;base64")
-          img_type_part = header.split(';')[0].split('/')[-1]
-          imageType = img_type_part.upper()
-
-          byteArr = QByteArray.fromBase64(bytearray(base64_data, encoding='utf-8'))
-          imageW = QImage()
-          # Ensure format string is clean (e.g. PNG, JPEG)
-          fmt = imageType.replace(';', '')
-          if imageW.loadFromData(byteArr, format=fmt):
-            pixmap = QPixmap.fromImage(imageW).scaled(IMG_SIZE,IMG_SIZE,Qt.KeepAspectRatio,Qt.SmoothTransformation)# type: ignore[attr-defined]
-            button = ClickableFrame(doc['id'])
-            button.setIcon(QIcon(pixmap))
-            button.setIconSize(pixmap.size())
-            button.clicked.connect(self.imageClicked)
-            button.doubleClicked.connect(self.image2Clicked)
-            self._attachCheckbox(button, doc['id'])
-            self.gridL.addWidget(button, row, col)
-          else:
-            logging.warning('Could not load image data for docID: %s with format %s', doc['id'], fmt)
-        except Exception as e:
-          logging.warning('Error processing image for docID %s: %s', doc['id'], e)
+    self.waiting.difference_update(docIDs)
+    for docID, key, imageFormat, data in thumbnails:
+      self.keys[docID] = key
+      if (pixmap := self.thumbnails.get(key)) is not None:
+        self._setPixmap(docID, pixmap)
       else:
-        logging.warning('Image for docID is not in expected base64 format. %s', doc['id'])
+        self.waiting.add(docID)
+        self.pool.start(DecodeTask(self.decoder, docID, key, imageFormat, data, IMG_SIZE))
+    self.requestThumbnails()
+    return
+
+
+  @Slot(str, str, QImage)
+  def onDecoded(self, docID:str, key:str, image:QImage) -> None:
+    """
+    Convert decoded image into pixmap in GUI thread, add it to cache and show it
+
+    Args:
+      docID (str): document id
+      key (str): key of image in cache
+      image (QImage): decoded and scaled image; null if image could not be decoded
+    """
+    self.waiting.discard(docID)
+    if image.isNull():
+      logging.warning('Could not load image data for docID: %s', docID)
+    else:
+      pixmap = QPixmap.fromImage(image)
+      self.thumbnails.put(key, pixmap)
+      self._setPixmap(docID, pixmap)
+    self.requestThumbnails()
+    return
+
+
+  def _setPixmap(self, docID:str, pixmap:QPixmap) -> None:
+    """ Show image in its frame, if the frame is still in the grid
+    Args:
+      docID (str): document id
+      pixmap (QPixmap): image
+    """
+    if button := self.buttons.get(docID):
+      button.setIcon(QIcon(pixmap))
+      button.setIconSize(pixmap.size())
+    return
+
+
+  def showEvent(self, event:QShowEvent) -> None:
+    """ Request images of cells that became visible """
+    super().showEvent(event)
+    self.requestThumbnails()
+    return
+
+
+  def resizeEvent(self, event:QResizeEvent) -> None:
+    """ Request images of cells that became visible """
+    super().resizeEvent(event)
+    self.requestThumbnails()
     return
 
 
@@ -33,8 +33,13 @@ class Communicate(QObject):
   commSendConfiguration = Signal(dict, str)     # send configuration and project-group-name to backend
   uiRequestDataHierarchy= Signal(str)           # get all entries in the data hierarchy for this docType
   uiRequestTable        = Signal(str, str, bool)# table: send docType, projectID, showAll to backend to get table
+  uiRequestTablePage    = Signal(str, str, bool, dict)# window of table: docType, projectID, showAll, query
+  uiRequestSearch       = Signal(str, list, str)# full-text search: send query, docTypes, projectID to backend
   uiRequestHierarchy    = Signal(str, bool)     # send project ID to backend
+  uiRequestHierarchyDelta = Signal(str, bool, object)# project ID, showAll, shown hierarchy: get changes of it
   uiRequestDoc          = Signal(str)           # request doc
+  uiRequestDocs         = Signal(list)          # request many docs at once
+  uiRequestThumbnails   = Signal(list)          # request raw images of many docs, e.g. for gallery
   uiRequestTask         = Signal(Task, dict)    # request to execute a task
   uiSendSQL             = Signal(list)          # request to execute SQL commands directly
   # signals that are emitted from this comm that data changed
@@ -68,10 +73,20 @@ class Communicate(QObject):
       # connect backend worker to configuration signals: send GUI->backend
       #   has to be here, else worker needs comm which has to be passed through thread, is uninitialized, ...)
       # connect backend worker SLOTS to GUI signals: group B
+      self.commSendConfiguration.connect(self.backendThread.worker.writes.request)
       self.commSendConfiguration.connect(self.backendThread.worker.initialize)
-      self.uiRequestTable.connect(self.backendThread.worker.returnTable)
-      self.uiRequestHierarchy.connect(self.backendThread.worker.returnHierarchy)
-      self.uiRequestDoc.connect(self.backendThread.worker.returnDoc)
+      #   reads are answered by the reader thread, writes by the backend worker
+      self.uiRequestTable.connect(self.backendThread.reader.returnTable)
+      self.uiRequestTablePage.connect(self.backendThread.reader.returnTablePage)
+      self.uiRequestSearch.connect(self.backendThread.reader.returnSearch)
+      self.uiRequestHierarchy.connect(self.backendThread.reader.returnHierarchy)
+      self.uiRequestHierarchyDelta.connect(self.backendThread.reader.returnHierarchyDelta)
+      self.uiRequestDoc.connect(self.backendThread.reader.returnDoc)
+      self.uiRequestDocs.connect(self.backendThread.reader.returnDocs)
+      self.uiRequestThumbnails.connect(self.backendThread.reader.returnThumbnails)
+      #   count writes before they are sent to the backend worker: readers wait for them
+      self.uiRequestTask.connect(self.backendThread.worker.writes.requestTask)
+      self.uiSendSQL.connect(self.backendThread.worker.writes.request)
       self.uiRequestTask.connect(self.backendThread.worker.returnTaskReport)
       self.uiSendSQL.connect(self.backendThread.worker.executeSQL)
 
@@ -82,6 +97,7 @@ class Communicate(QObject):
       # connect waiting dialog
       self.uiRequestTask.connect(self.progressWindow)
       self.backendThread.worker.beSendTaskReport.connect(self.waitDialog.hide)
+      self.backendThread.worker.beSendProgress.connect(self.waitDialog.updateProgressBar)
 
       # start thread now that everything is linked up
       self.backendThread.start()
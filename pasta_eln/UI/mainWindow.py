@@ -262,7 +262,11 @@ class MainWindow(QMainWindow):
     if task is Task.OPEN_EXTERNAL and path:
       QDesktopServices.openUrl(QUrl.fromLocalFile(path))
       return
-    if task in (Task.SCAN, Task.DROP_EXTERNAL):
+    if task is Task.WATCH_SCAN:                                             #in background: no message
+      if self.comm.projectID:
+        self.comm.changeProject.emit(self.comm.projectID, '')
+      return
+    if task in (Task.SCAN, Task.DROP_EXTERNAL, Task.BULK_ADD_DOCS):
       self.comm.changeProject.emit(self.comm.projectID, '')
     elif task is Task.CHECK_DB:
       regexStr = r'<font color="magenta">image does not exist m-[0-9a-f]+ image: comment:<\/font><br>'
@@ -1,6 +1,7 @@
 """ Widget that shows the content of project in a electronic labnotebook """
 import logging
 import os
+from bisect import bisect_left
 from enum import Enum
 from typing import Any, Optional
 from anytree import Node, PreOrderIter
@@ -15,6 +16,7 @@ from ..textTools.stringChanges import createDirName
 from .guiCommunicate import Communicate
 from .guiStyle import Action, Label, TextButton, widgetAndLayout
 from .messageDialog import showMessage
+from .projectLeafRenderer import ProjectLeafRenderer
 from .projectTreeView import TreeView
 
 
@@ -25,6 +27,7 @@ class Project(QWidget):
     self.comm = comm
     self.comm.changeProject.connect(self.change)
     self.comm.backendThread.worker.beSendHierarchy.connect(self.onGetData)
+    self.comm.backendThread.worker.beSendHierarchyDelta.connect(self.onGetDelta)
     self.hierarchy = Node('__none__')
     self.docProj:dict[str,Any] = {}
     self.projID = ''
@@ -34,6 +37,7 @@ class Project(QWidget):
     self.mainL = QVBoxLayout()
     self.setLayout(self.mainL)
     self.tree :Optional[TreeView]            = None
+    self.renderer                            = ProjectLeafRenderer(self.comm)
     self.model:Optional[QStandardItemModel]  = None
     self.allDetails                          = QTextEdit()
     self.actHideDetail                       = QAction()
@@ -45,6 +49,7 @@ class Project(QWidget):
     self.btnVisibility:Optional[TextButton]   = None
     self.lineSep = 20
     self.META_ROLE = Qt.ItemDataRole.UserRole + 1
+    self.patching  = False                                             #model is changed by delta, not by user
 
 
   @Slot(Node, dict)
@@ -62,14 +67,51 @@ class Project(QWidget):
     self.paint()
 
 
+  @Slot(Node, dict, list)
+  def onGetDelta(self, hierarchy:Node, doc:dict[str,Any], operations:list[tuple[Any, ...]]) -> None:
+    """
+    Callback function to handle the changes of the hierarchy: patch the tree instead of painting it again
+
+    Args:
+      hierarchy (Node): current hierarchy of the project
+      doc (dict): project document
+      operations (list): operations that change the shown hierarchy into the current one, see hierarchyDelta
+    """
+    if self.model is None or self.tree is None or hierarchy.id != getattr(self.hierarchy, 'id', ''):
+      self.onGetData(hierarchy, doc)
+      return
+    self.hierarchy = hierarchy
+    if doc and doc != self.docProj:
+      self.docProj = doc
+      self.projHeader()
+      self.mainL.addWidget(self.tree)
+    try:
+      self.applyDelta(operations)
+    except (AttributeError, KeyError, TypeError, ValueError):          #tree changed by user meanwhile: repaint
+      logging.warning('Project view: could not apply changes of hierarchy, paint again')
+      self.paint()
+      return
+    if self.btnAddSubfolder is not None:
+      self.btnAddSubfolder.setVisible(not self.hierarchy.children)
+    if self.docIDHighlight:
+      self.tree.scrollToDoc(self.docIDHighlight)
+      self.docIDHighlight = ''
+    return
+
+
   @Slot(str, str)
   def change(self, projID:str, docID:str) -> None:
     """ Change project to projID and docID
+    - same project: request only the changes of the hierarchy compared to the shown one
+
     Args:
       projID (str): project ID
       docID (str): document ID
     """
     self.docIDHighlight = docID
+    if projID and projID == self.projID and self.tree is not None and getattr(self.hierarchy, 'id', '') == projID:
+      self.comm.uiRequestHierarchyDelta.emit(projID, self.showAll, self.hierarchy)
+      return
     self.projID = projID
     self.comm.uiRequestHierarchy.emit(projID, self.showAll)
 
@@ -167,7 +209,8 @@ class Project(QWidget):
     logging.debug('ProjectView elements at 1: %i',self.mainL.count())
     selectedIndex = None
     self.model = QStandardItemModel()
-    self.tree = TreeView(self, self.comm, self.model)
+    self.renderer.reset()
+    self.tree = TreeView(self, self.comm, self.model, self.renderer)
     # self.tree.setSelectionBehavior(QAbstractItemView.SelectRows)
     # self.tree.setSelectionMode(QAbstractItemView.SingleSelection)
     self.model.itemChanged.connect(self.modelChanged)
@@ -183,7 +226,7 @@ class Project(QWidget):
         else:
           rootItem.appendRow(self.iterateTree(node))
     except AttributeError:
-      self.tree = TreeView(self, self.comm, QStandardItemModel())    # if hierarchy is None, create empty tree
+      self.tree = TreeView(self, self.comm, QStandardItemModel(), self.renderer)   # if hierarchy is None: empty tree
     # collapse / expand depending on stored value
     # by iterating each leaf, and converting item and index
     root = self.model.invisibleRootItem()
@@ -203,6 +246,124 @@ class Project(QWidget):
     return
 
 
+  def itemAt(self, key:str) -> QStandardItem:
+    """ Find the item of a key: follow the docIDs of the stack from the root
+
+    Args:
+      key (str): stack of docIDs incl. own docID, starting with project id
+
+    Returns:
+      QStandardItem: item; invisible root item for the project
+    """
+    item = self.model.invisibleRootItem()                                          # type: ignore[union-attr]
+    for docID in key.split('/')[1:]:
+      item = next(child for row in range(item.rowCount()) if (child := item.child(row)) is not None and
+                  isinstance(meta := child.data(self.META_ROLE), dict) and meta['hierStack'].split('/')[-1] == docID)
+    return item
+
+
+  def applyDelta(self, operations:list[tuple[Any, ...]]) -> None:
+    """ Patch the tree by the operations of hierarchyDelta: costs O(changed nodes), not O(project)
+
+    Args:
+      operations (list): operations
+    """
+    def reStack(item:QStandardItem, hierStack:str) -> None:
+      """ Set the stack of a moved item and its subtree """
+      item.setData(item.data(self.META_ROLE) | {'hierStack':hierStack}, self.META_ROLE)
+      for row in range(item.rowCount()):
+        reStack(item.child(row), f'{hierStack}/{item.child(row).data(self.META_ROLE)["hierStack"].split("/")[-1]}')
+
+    def parentOf(item:QStandardItem) -> QStandardItem:
+      return item.parent() or self.model.invisibleRootItem()                    # type: ignore[union-attr]
+
+    changed:list[str] = []                                      #docIDs whose leaves are rendered again
+    self.patching = True
+    try:
+      for operation in operations:
+        if operation[0] == 'remove':
+          item = self.itemAt(operation[1])
+          parentOf(item).removeRow(item.row())
+        elif operation[0] == 'move':
+          try:
+            item = self.itemAt(operation[1])
+          except StopIteration:                                         #already moved by drag-drop in this view
+            item = self.itemAt(operation[2])
+          parent = self.itemAt(operation[2].rpartition('/')[0])
+          if parentOf(item) is not parent:
+            parent.appendRow(parentOf(item).takeRow(item.row()))
+          reStack(item, operation[2])
+          self.expand(item)
+        elif operation[0] == 'insert':
+          item = self.iterateTree(operation[2])
+          self.itemAt(operation[1].rpartition('/')[0]).appendRow(item)
+          self.expand(item)
+          changed += [operation[2].id] + [i.id for i in operation[2].descendants]
+        elif operation[0] == 'update':
+          item = self.itemAt(operation[1])
+          attributes = dict(operation[2])
+          item.setText(attributes.pop('name'))
+          item.setData(item.data(self.META_ROLE) | attributes, self.META_ROLE)
+          changed.append(operation[1].split('/')[-1])
+          if operation[1].split('/')[-1][0] == 'x':
+            self.tree.setExpanded(item.index(), attributes['gui'][1])            # type: ignore[union-attr]
+        elif operation[0] == 'order':
+          self.reorder(self.itemAt(operation[1]), operation[2])
+    except StopIteration as error:
+      raise KeyError('item of hierarchy not found') from error
+    finally:
+      self.patching = False
+    self.renderer.invalidate(changed)
+    return
+
+
+  def reorder(self, parent:QStandardItem, docIDs:list[str]) -> None:
+    """ Sort the children of an item: only the items outside the longest run of correctly ordered items are moved,
+    since moved items lose their expanded state
+
+    Args:
+      parent (QStandardItem): item
+      docIDs (list): docIDs of children in new order
+    """
+    position = {docID:idx for idx, docID in enumerate(docIDs)}
+    rows = [position[parent.child(row).data(self.META_ROLE)['hierStack'].split('/')[-1]]
+            for row in range(parent.rowCount())]
+    # longest increasing subsequence of the positions: these rows stay
+    tails:list[int] = []
+    tailRows:list[int] = []
+    previous = [-1]*len(rows)
+    for row, pos in enumerate(rows):
+      idx = bisect_left(tails, pos)
+      previous[row] = tailRows[idx-1] if idx else -1
+      if idx == len(tails):
+        tails.append(pos)
+        tailRows.append(row)
+      else:
+        tails[idx], tailRows[idx] = pos, row
+    stay = set()
+    row = tailRows[-1] if tailRows else -1
+    while row >= 0:
+      stay.add(rows[row])
+      row = previous[row]
+    moved = {rows[row]:parent.takeRow(row) for row in reversed(range(len(rows))) if rows[row] not in stay}
+    for pos in sorted(moved):
+      parent.insertRow(pos, moved[pos])
+      self.expand(moved[pos][0])
+    return
+
+
+  def expand(self, item:QStandardItem) -> None:
+    """ Set the expanded state of an item and its subtree
+
+    Args:
+      item (QStandardItem): item
+    """
+    if self.tree is not None and item.data(self.META_ROLE)['hierStack'].split('/')[-1][0]=='x':
+      self.tree.setExpanded(item.index(), item.data(self.META_ROLE)['gui'][1])
+    self.setExpandedState(item)
+    return
+
+
   def setExpandedState(self, node:QStandardItem) -> None:
     """ Recursive function to set the expanded state of nodes
 
@@ -279,7 +440,7 @@ class Project(QWidget):
         self.actHideDetail.setText('Show project details')
     elif command[0] is Command.HIDE:
       self.comm.uiRequestTask.emit(Task.HIDE_SHOW, {'docID':self.projID})
-      self.comm.uiRequestHierarchy.emit(self.projID, self.showAll)
+      self.change(self.projID, '')
       self.comm.changeSidebar.emit('')
     elif command[0] is Command.SHOW_DETAILS and self.tree is not None:
       def recursiveRowIteration(index:QModelIndex) -> None:
@@ -306,7 +467,7 @@ class Project(QWidget):
       self.change('','')
     elif command[0] is Command.ADD_CHILD:
       self.comm.uiRequestTask.emit(Task.ADD_DOC, {'hierStack':[self.projID], 'docType':'x1', 'doc':{'name':'new item'}})
-      self.comm.uiRequestHierarchy.emit(self.projID, self.showAll)
+      self.change(self.projID, '')
 
     elif command[0] is Command.SHOW_TABLE:
       self.comm.changeTable.emit(command[1], self.projID)
@@ -326,7 +487,7 @@ class Project(QWidget):
       item (QStandardItem): item changed, new location
     """
     meta = item.data(self.META_ROLE)
-    if not isinstance(meta, dict):
+    if not isinstance(meta, dict) or self.patching:
       return
     # gather old information
     stackOld = meta['hierStack'].split('/')[:-1]
@@ -350,6 +511,7 @@ class Project(QWidget):
     self.comm.uiRequestTask.emit(Task.MOVE_LEAVES, {'docID':docID, 'stackOld':stackOld, 'stackNew':stackNew,
                                                     'childOld':childOld, 'childNew':childNew})
     item.setData(item.data() | {'hierStack': '/'.join(stackNew+[docID]), 'childNum':childNew})
+    self.change(self.projID, '')                                            #child numbers of siblings changed
     return
 
 
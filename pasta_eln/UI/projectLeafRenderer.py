@@ -1,22 +1,31 @@
 """ renders each leaf of project tree using QPaint """
 import base64
 import logging
-from typing import Any
-from PySide6.QtCore import QMargins, QModelIndex, QPoint, QRectF, QSize, Qt, Slot
+from collections import OrderedDict
+from typing import Any, Optional
+from PySide6.QtCore import QMargins, QModelIndex, QPersistentModelIndex, QPoint, QRectF, QSize, Qt, QTimer, Slot
 from PySide6.QtGui import QColor, QPainter, QPen, QPixmap, QStaticText, QTextDocument
 from PySide6.QtSvg import QSvgRenderer
-from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionViewItem
+from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionViewItem, QTreeView
 from ..fixedStringsJson import DO_NOT_RENDER, defaultDataHierarchyNode
 from ..textTools.handleDictionaries import doc2markdown
 from ..textTools.stringChanges import markdownEqualizer
 from .guiCommunicate import Communicate
 
+PREFETCH     = 20                                   #leaves above and below the painted ones that are requested too
+MAX_RENDERED = 200                                  #leaves whose markdown, layout and image are kept
+
 
 class ProjectLeafRenderer(QStyledItemDelegate):
-  """ ONE Renderer for all leafs of project tree using QPaint """
+  """ ONE Renderer for all leafs of project tree using QPaint
+  - documents are requested only for leaves that are painted, i.e. visible, and their neighbors
+  - until then, sizeHint returns the size of a placeholder
+  - markdown, layout and image of a leaf are cached, until the dateModified of the document changes
+  """
   def __init__(self, comm:Communicate) -> None:
     super().__init__()
     self.comm               = comm
+    self.comm.backendThread.worker.beSendDocs.connect(self.onGetDocs)
     self.comm.backendThread.worker.beSendDoc.connect(self.onGetDoc)
     self.debugMode          = logging.root.level<logging.INFO
     self.widthImage         = self.comm.configuration['GUI']['imageWidthProject']
@@ -29,7 +38,31 @@ class ProjectLeafRenderer(QStyledItemDelegate):
     self.penHighlight       = QPen(QColor(self.comm.palette.primary))
     self.penHighlight.setWidth(2)
     self.leafWidth          = -1
-    self.docs:dict[str,Any] = {}   # docID: {'size':QSize, 'markdown':str, 'hidden':bool, 'index':QModelIndex}
+    self.docs:dict[str,Any] = {}   # leaves of current tree; docID: {'index':QPersistentModelIndex, 'requested':bool}
+    self.rendered:OrderedDict[str,dict[str,Any]] = OrderedDict()  # docID: {'dateModified':str, 'size':QSize, ...}
+    self.pending:dict[str,None] = {}                                             # docIDs for next request
+    self.requestTimer       = QTimer()                                           # one request per paint event
+    self.requestTimer.setSingleShot(True)
+    self.requestTimer.timeout.connect(self.requestDocs)
+
+
+  def reset(self) -> None:
+    """ New tree: forget its leaves; keep the rendered leaves, which are reused if documents did not change """
+    self.docs.clear()
+    self.pending.clear()
+    return
+
+
+  def invalidate(self, docIDs:list[str]) -> None:
+    """ Documents changed: forget their leaves, which are requested and rendered again when painted
+
+    Args:
+      docIDs (list): document ids
+    """
+    for docID in docIDs:
+      self.docs.pop(docID, None)
+      self.rendered.pop(docID, None)
+    return
 
 
   def paint(self, painter:QPainter, option:QStyleOptionViewItem, index:QModelIndex) -> None:    # type: ignore
@@ -47,12 +80,17 @@ class ProjectLeafRenderer(QStyledItemDelegate):
     if not data or data['hierStack'] is None or self.comm is None:
       return
     docID   = data['hierStack'].split('/')[-1]
-    name = self.docs.get(docID, {}).get('name','') or index.data(Qt.ItemDataRole.DisplayRole)
-    docType = self.docs.get(docID, {}).get('type',[]) or data['docType']
+    if data['gui'][0] and not self.docs.setdefault(docID, {'index':QPersistentModelIndex(index)}).get('requested'):
+      self.leafWidth = min(self.widthContent,
+                           int((option.rect.bottomRight()-option.rect.topLeft()).toTuple()[0]/2) )# type: ignore[attr-defined]
+      self.request(index, option.widget)                                          # type: ignore[attr-defined]
+    leaf    = self.rendered.get(docID, {})
+    if leaf:
+      self.rendered.move_to_end(docID)                                            #least recently painted is evicted
+    name    = leaf.get('name','') or index.data(Qt.ItemDataRole.DisplayRole)
+    docType = leaf.get('type',[]) or data['docType']
     painter.setPen(self.penDefault)
     x0, y0 = option.rect.topLeft().toTuple()                                      # type: ignore[attr-defined]
-    widthContent = min(self.widthContent,  \
-                       int((option.rect.bottomRight()-option.rect.topLeft()).toTuple()[0]/2) )# type: ignore[attr-defined]
     docTypeOffset = min(self.docTypeOffset, \
                         int((option.rect.bottomRight()-option.rect.topLeft()).toTuple()[0]/3.5) )# type: ignore[attr-defined]
     bottomRight2nd = option.rect.bottomRight()- QPoint(self.frameSize+1,self.frameSize)# type: ignore[attr-defined]
@@ -74,7 +112,7 @@ class ProjectLeafRenderer(QStyledItemDelegate):
       painter.drawStaticText(x0, y0+y, staticText)
       painter.drawStaticText(x0+docTypeOffset, y0+y, QStaticText(docTypeText))
       return
-    hiddenText = '     \U0001F441' if self.docs.get(docID, {}).get('hidden', False) else ''
+    hiddenText = '     \U0001F441' if leaf.get('hidden', False) else ''
     staticText = QStaticText(f'<strong>{nameText} {hiddenText}</strong>')
     staticText.setTextWidth(docTypeOffset)
     secondaryText = docTypeText
@@ -82,32 +120,25 @@ class ProjectLeafRenderer(QStyledItemDelegate):
                      f" | ...{data['hierStack'][-76:]}" if self.debugMode else ''
     painter.drawStaticText(x0, y0+y, staticText)
     painter.drawStaticText(x0+docTypeOffset, y0+y, QStaticText(secondaryText))
-    textDoc = QTextDocument()
-    textDoc.setMarkdown(self.docs.get(docID, {}).get('markdown',''))
+    if not leaf:                                                                   #placeholder until doc arrives
+      return
     painter.translate(QPoint(x0-3, y0+y+15))
-    self.drawTextDocument(painter, textDoc, int(self.maxHeight-6*self.frameSize))
+    self.drawTextDocument(painter, leaf['markdown'], int(self.maxHeight-6*self.frameSize))
     painter.translate(-QPoint(x0-3, y0+y+15))
     # right side
-    if self.docs.get(docID, {}).get('content','') and not self.docs.get(docID, {}).get('image',''):
-      textDoc = QTextDocument()
-      textDoc.setMarkdown(self.docs.get(docID, {}).get('content',''))
-      textDoc.setTextWidth(widthContent)
-      width:int = textDoc.size().toTuple()[0]                                                   # type: ignore
+    if leaf['content'] is not None:
+      width:int = leaf['content'].size().toTuple()[0]
       topLeftContent = option.rect.topRight() - QPoint(width+self.frameSize-2,-self.frameSize)# type: ignore[attr-defined]
       painter.translate(topLeftContent)
-      self.drawTextDocument(painter, textDoc, int(self.maxHeight-3*self.frameSize))
-      topLeftContent = option.rect.topRight() - QPoint(width+self.frameSize-2,-self.frameSize)# type: ignore[attr-defined]
+      self.drawTextDocument(painter, leaf['content'], int(self.maxHeight-3*self.frameSize))
       painter.translate(-topLeftContent)
-    if self.docs.get(docID, {}).get('image',''):
-      if self.docs.get(docID, {}).get('image','').startswith('data:image/'):
-        pixmap = self.imageFromDoc({'image':self.docs.get(docID, {}).get('image','')})
-        width2nd = min(self.widthImage, pixmap.width()+self.frameSize)
-        topLeft2nd     = option.rect.topRight()   - QPoint(width2nd+self.frameSize+1,-self.frameSize)# type: ignore[attr-defined]
-        painter.drawPixmap(topLeft2nd, pixmap)
-      elif self.docs.get(docID, {}).get('image','').startswith('<?xml'):
-        topLeft2nd     = option.rect.topRight()   - QPoint(self.widthImage+self.frameSize+1,-self.frameSize)# type: ignore[attr-defined]
-        image = QSvgRenderer(bytearray(self.docs.get(docID, {}).get('image',''), encoding='utf-8'))
-        image.render(painter,    QRectF(topLeft2nd, bottomRight2nd))
+    if leaf['pixmap'] is not None:
+      width2nd = min(self.widthImage, leaf['pixmap'].width()+self.frameSize)
+      topLeft2nd     = option.rect.topRight()   - QPoint(width2nd+self.frameSize+1,-self.frameSize)# type: ignore[attr-defined]
+      painter.drawPixmap(topLeft2nd, leaf['pixmap'])
+    elif leaf['svg'] is not None:
+      topLeft2nd     = option.rect.topRight()   - QPoint(self.widthImage+self.frameSize+1,-self.frameSize)# type: ignore[attr-defined]
+      leaf['svg'].render(painter,    QRectF(topLeft2nd, bottomRight2nd))
     return
 
 
@@ -123,52 +154,144 @@ class ProjectLeafRenderer(QStyledItemDelegate):
     if not index.data(Qt.ItemDataRole.UserRole+1)['gui'][0]:              # only show the headline, no details
       return QSize(400, self.lineSep*2)
     docID   = hierStack.split('/')[-1]
-    if docID not in self.docs:
-      self.leafWidth = min(self.widthContent,
-                           int((option.rect.bottomRight()-option.rect.topLeft()).toTuple()[0]/2) )# type: ignore[attr-defined]
-      self.docs[docID] = {'size':QSize(400, 30), 'markdown':'', 'hidden':False, 'index':index}
-      self.comm.uiRequestDoc.emit(docID)
-    return self.docs[docID].get('size', QSize(400,self.maxHeight))
+    self.docs.setdefault(docID, {'index':QPersistentModelIndex(index)})
+    if docID in self.rendered:                                    #also if not verified yet: best guess of size
+      return self.rendered[docID]['size']
+    return QSize(400, self.lineSep*2)
+
+
+  def request(self, index:QModelIndex, view:Optional[QTreeView]) -> None:
+    """ Request documents of this leaf and its neighbors in the view; all requests of one paint event in one
+
+    Args:
+      index (QModelIndex): index of painted leaf
+      view (QTreeView): view of the tree
+    """
+    indices = [index]
+    if isinstance(view, QTreeView):
+      for step in (view.indexBelow, view.indexAbove):
+        neighbor = index
+        for _ in range(PREFETCH):
+          neighbor = step(neighbor)
+          if not neighbor.isValid():
+            break
+          indices.append(neighbor)
+    for idx in indices:
+      data = idx.data(Qt.ItemDataRole.UserRole+1)
+      if not data or data['hierStack'] is None or not data['gui'][0]:
+        continue
+      leaf = self.docs.setdefault(data['hierStack'].split('/')[-1], {'index':QPersistentModelIndex(idx)})
+      if not leaf.get('requested'):
+        leaf['requested'] = True
+        self.pending[data['hierStack'].split('/')[-1]] = None
+    if self.pending and not self.requestTimer.isActive():
+      self.requestTimer.start(0)
+    return
+
+
+  @Slot()
+  def requestDocs(self) -> None:
+    """ Request the pending documents from backend in one request """
+    if self.pending:
+      self.comm.uiRequestDocs.emit(list(self.pending))
+      self.pending.clear()
+    return
+
+
+  @Slot(list)
+  def onGetDocs(self, docs:list[dict[str,Any]]) -> None:
+    """ Slot to handle the documents received from backend: render those that changed
+    Args:
+      docs (list): documents
+    """
+    for doc in docs:
+      if not doc or doc['id'] not in self.docs:
+        continue
+      leaf = self.rendered.get(doc['id'])
+      hidden = any(b for b in doc['branch'] if False in b['show'])
+      if leaf is not None and leaf['dateModified']==doc.get('dateModified'):
+        self.rendered.move_to_end(doc['id'])
+        if leaf['width'] == self.leafWidth and leaf['hidden'] == hidden and leaf['name'] == doc['name']:
+          continue                                                                       #nothing to paint again
+        leaf |= {'hidden':hidden, 'name':doc['name']}
+        self.layout(leaf)
+      else:
+        self.rendered[doc['id']] = self.render(doc) | {'hidden':hidden}
+        while len(self.rendered) > MAX_RENDERED:
+          evicted, _ = self.rendered.popitem(last=False)
+          self.docs.get(evicted, {}).pop('requested', None)                     #request again when painted
+      index = self.docs[doc['id']]['index']
+      if index.isValid():
+        self.sizeHintChanged.emit(index.sibling(index.row(), index.column()))
+    return
 
 
-  @Slot(str)
+  @Slot(dict)
   def onGetDoc(self, doc:dict[str,Any]) -> None:
-    """ Slot to handle the document received from backend
+    """ Slot to handle a document that was edited: render it again if it is a leaf of the current tree
     Args:
       doc (dict): document
     """
+    if doc.get('id') in self.docs and 'branch' in doc:
+      self.onGetDocs([doc])
+    return
+
+
+  def render(self, doc:dict[str,Any]) -> dict[str,Any]:
+    """ Convert document into markdown, lay it out and decode its image
+
+    Args:
+      doc (dict): document
+
+    Returns:
+      dict: rendered leaf
+    """
     guiStyle = self.comm.configuration['GUI']
-    if not doc or doc['id'] not in self.docs:
-      return
-    logging.debug('Renderer: onGetDoc %s %s %s', doc['id'], doc.get('type',[]), doc.get('hierStack',''))
+    logging.debug('Renderer: render %s %s', doc['id'], doc.get('type',[]))
     # ... after deleting project, its items cannot be found and it would give many false negatives
     if doc['type'][0] not in self.comm.docTypesTitles:
       dataHierarchyNode = defaultDataHierarchyNode
     else:
       dataHierarchyNode = self.comm.dataHierarchyNodes[doc['type'][0]]
-    textDoc = QTextDocument()
-    markdownStr = doc2markdown(doc, DO_NOT_RENDER, dataHierarchyNode, self)
-    textDoc.setMarkdown(markdownStr)
-    textDoc.setTextWidth(self.leafWidth)
-    heightDetails = int(textDoc.size().toTuple()[1])+guiStyle['frameSize']+20# type: ignore
+    leaf:dict[str,Any] = {'dateModified':doc.get('dateModified'), 'width':self.leafWidth, 'name':doc['name'],
+                          'type':doc['type'], 'content':None, 'pixmap':None, 'svg':None}
+    leaf['markdown'] = QTextDocument()
+    leaf['markdown'].setMarkdown(doc2markdown(doc, DO_NOT_RENDER, dataHierarchyNode, self))
     heightRightSide = -1
+    image = doc.get('image','') or ''
+    if image.startswith('data:image/'):
+      leaf['pixmap'] = self.imageFromDoc(doc)
+    elif image.startswith('<?xml'):
+      leaf['svg'] = QSvgRenderer(bytearray(image, encoding='utf-8'))
     if 'content' in doc:
+      textDoc = QTextDocument()
       textDoc.setMarkdown(doc['content'])
       heightRightSide = int(textDoc.size().toTuple()[1])                                        # type: ignore
-    elif 'image' in doc and doc['image']:
-      if doc['image'].startswith('data:image/'):
-        pixmap = self.imageFromDoc(doc)
-        heightRightSide = pixmap.height()+2*guiStyle['frameSize']
-      else:
-        heightRightSide = int(guiStyle['imageWidthProject']*3/4+2*guiStyle['frameSize'])
-    self.docs[doc['id']]['size']    = QSize(400, min(max(heightDetails,heightRightSide), guiStyle['maxProjectLeafHeight']))
-    self.docs[doc['id']]['hidden']  = any(b for b in doc['branch'] if False in b['show'])
-    self.docs[doc['id']]['markdown']= markdownStr
-    self.docs[doc['id']]['name']    = doc['name']
-    self.docs[doc['id']]['type'] = doc['type']
-    self.docs[doc['id']]['content'] = markdownEqualizer(doc['content']) if 'content' in doc else ''
-    self.docs[doc['id']]['image']   = doc.get('image','')
-    self.sizeHintChanged.emit(self.docs[doc['id']]['index'])
+      if doc['content'] and not image:
+        textDoc.setMarkdown(markdownEqualizer(doc['content']))
+        textDoc.setTextWidth(self.widthContent)
+        leaf['content'] = textDoc
+    elif leaf['pixmap'] is not None:
+      heightRightSide = leaf['pixmap'].height()+2*guiStyle['frameSize']
+    elif image:
+      heightRightSide = int(guiStyle['imageWidthProject']*3/4+2*guiStyle['frameSize'])
+    leaf['heightRightSide'] = heightRightSide
+    self.layout(leaf)
+    return leaf
+
+
+  def layout(self, leaf:dict[str,Any]) -> None:
+    """ Lay out the markdown of a rendered leaf for the current width and determine its size
+    - cheap compared to render: markdown is not created and parsed again
+
+    Args:
+      leaf (dict): rendered leaf
+    """
+    leaf['width'] = self.leafWidth
+    leaf['markdown'].setTextWidth(self.leafWidth)
+    heightDetails = int(leaf['markdown'].size().toTuple()[1])+self.frameSize+20
+    leaf['size'] = QSize(400, min(max(heightDetails,leaf['heightRightSide']), self.maxHeight))
+    return
 
 
   def drawTextDocument(self, painter:QPainter, textDoc:QTextDocument, yMax:int) -> None:
@@ -16,7 +16,8 @@ from .projectLeafRenderer import ProjectLeafRenderer
 
 class TreeView(QTreeView):
   """ Custom tree view on data model """
-  def __init__(self, parent:QWidget, comm:Communicate, model:QStandardItemModel):
+  def __init__(self, parent:QWidget, comm:Communicate, model:QStandardItemModel,
+               renderer:ProjectLeafRenderer|None=None):
     super().__init__(parent)
     self.aParentWidget = parent
     self.comm = comm
@@ -24,7 +25,7 @@ class TreeView(QTreeView):
     self.setHeaderHidden(True)
     self.setStyleSheet('QTreeView::branch {border-image: none;}')
     self.setIndentation(40)
-    self.renderer = ProjectLeafRenderer(self.comm)
+    self.renderer = renderer or ProjectLeafRenderer(self.comm)             #shared renderer keeps its rendered leaves
     self.setItemDelegate(self.renderer)
     self.setExpandsOnDoubleClick(False)
     self.setAcceptDrops(True)
@@ -131,7 +132,7 @@ class TreeView(QTreeView):
       callAddOn(command[1], self.comm, item.data()['hierStack'], self)
     else:
       logging.error('Unknown context menu %s', command, exc_info=True)
-    self.comm.uiRequestHierarchy.emit(self.parent().projID, self.parent().showAll)# type: ignore[attr-defined]
+    self.aParentWidget.change(self.aParentWidget.projID, '')                   # type: ignore[attr-defined]
     return
 
 
@@ -1,5 +1,4 @@
 """ widget that shows the table of the items """
-import itertools
 import logging
 import re
 from enum import Enum
@@ -7,16 +6,16 @@ from pathlib import Path
 from typing import Any
 import pandas as pd
 from PySide6.QtCore import QModelIndex, Qt, Slot
-from PySide6.QtGui import QStandardItem, QStandardItemModel
 from PySide6.QtWidgets import (QApplication, QComboBox, QFileDialog, QHeaderView, QMenu, QMessageBox, QTableView,
                                QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget)
 from ..backendWorker.worker import Task
-from ..miscTools import callAddOn, isDocID
+from ..miscTools import callAddOn
 from .gallery import ImageGallery
 from .guiCommunicate import Communicate
 from .guiStyle import Action, Label, TextButton, space, widgetAndLayout, widgetAndLayoutGrid
 from .tableFilterManager import FilterCommand, FilterManager
 from .tableHeader import TableHeader
+from .tableModel import PagedTableModel, TableModel
 
 
 #Scan button to more button
@@ -32,12 +31,14 @@ class Table(QWidget):
     super().__init__()
     self.comm = comm
     self.comm.backendThread.worker.beSendTable.connect(self.onGetData)
+    self.comm.backendThread.worker.beSendTablePage.connect(self.onGetPage)
     self.comm.changeTable.connect(self.changeTable)
     self.comm.stopSequentialEdit.connect(self.stopSequentialEditFunction)
     self.stopSequentialEdit = False
     self.data         :pd.DataFrame = pd.DataFrame()
-    self.baseModel   :QStandardItemModel = QStandardItemModel()
-    self.filterManager:FilterManager = FilterManager(self.baseModel)
+    self.model        :PagedTableModel = PagedTableModel([], False, self.requestPage)
+    self.galleryModel :TableModel = TableModel(pd.DataFrame(), [], False)
+    self.filterManager:FilterManager = FilterManager()
     self.filterHeader:list[str] = []
     self.lastClickedRow = -1
     self.flagGallery = False
@@ -140,8 +141,24 @@ class Table(QWidget):
       self.comm.projectID  = projID
     if self.docType == 'x0':
       self.comm.projectID = ''
+    if 'measurement' not in self.docType:
+      self.flagGallery = False
     logging.debug('request table for %s, %s %s', self.docType, self.comm.projectID, self.showAll)
-    self.comm.uiRequestTable.emit(self.docType, self.comm.projectID, self.showAll)
+    if self.docType=='_tags_' or self.flagGallery:                    #all rows: tree of tags, gallery of images
+      self.comm.uiRequestTable.emit(self.docType, self.comm.projectID, self.showAll)
+    else:                                                               #first page: the model requests the others
+      self.requestPage({'sort':0, 'ascending':True, 'filters':[], 'generation':0, 'offset':0,
+                        'limit':PagedTableModel.PAGE_SIZE, 'purpose':'table'})
+
+
+  def requestPage(self, query:dict[str,Any]) -> None:
+    """ Request a window of the table from the backend
+
+    Args:
+      query (dict): query of the window, see ReaderWorker.returnTablePage; the answer goes to onGetPage
+    """
+    query = query if 'purpose' in query else query|{'purpose':'page'}
+    self.comm.uiRequestTablePage.emit(self.docType, self.comm.projectID, self.showAll, query)
 
 
   @Slot(pd.DataFrame, str)
@@ -154,11 +171,56 @@ class Table(QWidget):
       docType (str): document type
     """
     logging.debug('got table data %s', docType)
-    if docType == self.docType:
+    if docType != self.docType:
+      return
+    if self.docType=='_tags_' or self.flagGallery:
       self.data = data
       if self.detailsDocID and self.detailsDocID not in data.id.values:
         self.comm.changeDetails.emit('')
       self.paint()
+    else:                                                      #data changed while table shows pages: request them
+      self.changeTable('', '')
+
+
+  @Slot(pd.DataFrame, str, dict)
+  def onGetPage(self, data:pd.DataFrame, docType:str, query:dict[str,Any]) -> None:
+    """
+    Callback function to handle a received window of the table
+
+    Args:
+      data (pd.DataFrame): DataFrame containing the rows of the window
+      docType (str): document type
+      query (dict): query of the window with the number of all rows as 'total'
+    """
+    logging.debug('got table page %s %s', docType, query)
+    if docType != self.docType or self.docType=='_tags_' or self.flagGallery:
+      return
+    purpose = query.get('purpose', '')
+    if purpose=='table':
+      self.data = data
+      self.model = PagedTableModel([i.replace('metaUser.','u.') for i in data.columns][:-2], self.docType[0] != 'x',
+                                   self.requestPage)
+      self.model.addPage(data, query)
+      self.paint()
+    elif purpose=='page':
+      self.model.addPage(data, query)
+    elif purpose=='toggle':
+      self.model.toggleChecked(list(data['id']))
+    elif purpose=='export':
+      model = TableModel(data, self.filterHeader, False)
+      with open(query['fileName'],'w', encoding='utf-8') as fOut:
+        header = [f'"{i}"' for i in self.filterHeader]
+        fOut.write(','.join(header)+'\n')
+        for row in range(model.rowCount()):
+          rowContent = [f'"{model.text(row, col)}"' for col in range(model.columnCount())]
+          fOut.write(','.join(rowContent)+'\n')
+    elif purpose=='addOn':                                        # if some are checked, only use those; else all
+      model = TableModel(data, self.filterHeader, False)
+      rows = [row for row in range(model.rowCount()) if not self.model.checked or model.docID(row) in self.model.checked]
+      dataAddOn = [[model.docID(row)]+[model.text(row, col) for col in range(model.columnCount())] for row in rows]
+      df = pd.DataFrame(dataAddOn, columns=['docID']+self.filterHeader)
+      callAddOn(query['addOn'], self.comm, df, self)
+    return
 
 
   @Slot()
@@ -218,44 +280,9 @@ class Table(QWidget):
     columnNames = [i.replace('metaUser.','u.') for i in self.data.columns]
     self.filterHeader = list(columnNames)[:-2]
     self.headerW.show()
-    nRows, nCols = self.data.shape
-    model = QStandardItemModel(nRows, nCols-2)
-    model.setHorizontalHeaderLabels(self.filterHeader)
-    for i, j in itertools.product(range(nRows), range(nCols-2)):
-      value = self.data.iloc[i,j]
-      if value in ('None','','nan'):                                                             # None, False
-        item = QStandardItem('-')
-      elif value=='True':                                                                               # True
-        item = QStandardItem('Y')
-      elif isinstance(value, str) and isDocID(value):                                                   # Link
-        item = QStandardItem('oo')
-      else:
-        if self.filterHeader[j]=='tags':
-          tags = [i.strip() for i in value.split(',')]
-          if elementStar:=list(filter(re.compile(r'^_\d$').match, tags)):
-            tags.remove(elementStar[0])
-            tags = ['\u2605'*int(elementStar[0][1])]+tags
-          text = ' '.join(tags)
-        else:
-          text = value
-        item = QStandardItem(text)
-      if j==0:
-        if 'F' in self.data['show'][i]:
-          item.setText(f'{item.text()}  \U0001F441')
-        item.setAccessibleText(self.data['id'][i])
-        if self.docType[0] != 'x':
-          item.setFlags(Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable)
-          item.setCheckState(Qt.CheckState.Unchecked)
-      else:
-        item.setFlags(Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable)
-      model.setItem(i, j, item)
-
-    # Update the filter manager with the new base model
-    self.baseModel = model
-    self.filterManager.setBaseModel(model)
-
     if self.flagGallery:
-      self.gallery.updateGrid(model)
+      self.galleryModel = TableModel(self.data, self.filterHeader, self.docType[0] != 'x')
+      self.gallery.updateGrid(self.galleryModel)
       self.gallery.setVisible(True)
       self.table.setVisible(False)
       self.tagWidget.setVisible(False)
@@ -292,7 +319,7 @@ class Table(QWidget):
       self.btnMore.hide()
       self.addFilterActn.setDisabled(True)
     else:
-      self.table.setModel(self.filterManager.getFinalModel())
+      self.table.setModel(self.model)
       self.table.horizontalHeader().resizeSections(QHeaderView.ResizeMode.ResizeToContents)
       self.table.horizontalHeader().setStretchLastSection(True)
       self.table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
@@ -321,97 +348,53 @@ class Table(QWidget):
         self.comm.changeSidebar.emit('redraw')
 
     elif command[0] is Command.GROUP_EDIT:
-      docIDs = []
-      finalModel = self.filterManager.getFinalModel()
-      for row in range(finalModel.rowCount()):
-        item, docID = self.itemFromRow(row)
-        if (self.flagGallery and self.gallery.isDocSelected(docID)) or \
-           (not self.flagGallery and item.checkState() == Qt.CheckState.Checked):
-          docIDs.append(docID)
-      if docIDs:
+      if docIDs := self.selectedDocIDs():
         self.comm.formDoc.emit({'type':[self.docType], '_ids':docIDs})
         self.changeTable(self.docType, self.comm.projectID)
 
     elif command[0] is Command.SEQUENTIAL_EDIT:
       self.stopSequentialEdit = False
-      finalModel = self.filterManager.getFinalModel()
-      for row in range(finalModel.rowCount()):
-        item, docID = self.itemFromRow(row)
-        if (self.flagGallery and self.gallery.isDocSelected(docID)) or \
-           (not self.flagGallery and item.checkState() == Qt.CheckState.Checked):
-          self.comm.formDoc.emit({'id':docID})
+      for docID in self.selectedDocIDs():
+        self.comm.formDoc.emit({'id':docID})
         if self.stopSequentialEdit:
           break
       self.comm.changeTable.emit(self.docType, self.comm.projectID)
 
     elif command[0] is Command.DELETE:
       ret = None
-      finalModel = self.filterManager.getFinalModel()
-      for row in range(finalModel.rowCount()):
-        item, docID = self.itemFromRow(row)
-        if (self.flagGallery and self.gallery.isDocSelected(docID)) or \
-           (not self.flagGallery and item.checkState() == Qt.CheckState.Checked):
-          if ret is None:
-            ret = QMessageBox.critical(self, 'Warning', 'Are you sure you want to delete the data?',
-                QMessageBox.StandardButton.Yes, QMessageBox.StandardButton.No)
-          if ret==QMessageBox.StandardButton.Yes:
-            self.comm.uiRequestTask.emit(Task.DELETE_DOC, {'docID':docID, 'stack':''})
+      for docID in self.selectedDocIDs():
+        if ret is None:
+          ret = QMessageBox.critical(self, 'Warning', 'Are you sure you want to delete the data?',
+              QMessageBox.StandardButton.Yes, QMessageBox.StandardButton.No)
+        if ret==QMessageBox.StandardButton.Yes:
+          self.comm.uiRequestTask.emit(Task.DELETE_DOC, {'docID':docID, 'stack':''})
       self.comm.changeTable.emit(self.docType, self.comm.projectID)
 
     elif command[0] is Command.CHANGE_COLUMNS:
       dialog = TableHeader(self.comm, self.docType)
       dialog.exec()
-      self.comm.uiRequestTable.emit(self.docType, self.comm.projectID, self.showAll)
+      self.changeTable('', '')
 
     elif command[0] is Command.EXPORT:
       fileName = QFileDialog.getSaveFileName(self,'Export to ..',str(Path.home()),'*.csv')[0]
       if not fileName.endswith('.csv'):
         fileName += '.csv'
-      finalModel = self.filterManager.getFinalModel()
-      with open(fileName,'w', encoding='utf-8') as fOut:
-        header = [f'"{i}"' for i in self.filterHeader]
-        fOut.write(','.join(header)+'\n')
-        for row in range(finalModel.rowCount()):
-          rowContent = []
-          for col in range(finalModel.columnCount()):
-            value = finalModel.index( row, col, QModelIndex()).data(Qt.ItemDataRole.DisplayRole)
-            rowContent.append(f'"{value}"')
-          fOut.write(','.join(rowContent)+'\n')
+      self.requestPage(self.model.query|{'offset':0, 'limit':-1, 'purpose':'export', 'fileName':fileName})
 
     elif command[0] is Command.ADD_ON:
       # check if one is selected, if yes, only export selected; otherwise use All
       if self.flagGallery:
         QMessageBox.information(self, 'Information', 'You can only use the table add-ons in table mode, not in gallery mode.')
         return
-      finalModel = self.filterManager.getFinalModel()
-      useAll = True
-      for row in range(finalModel.rowCount()):
-        item, _ = self.itemFromRow(row)
-        if item.checkState() == Qt.CheckState.Checked:
-          useAll = False
-          break
-      data   = []
-      for row in range(finalModel.rowCount()):
-        item, docID = self.itemFromRow(row)
-        if useAll or  item.checkState() == Qt.CheckState.Checked:
-          dataRow = [docID]
-          for col in range(finalModel.columnCount()):
-            value = finalModel.index(row, col).data(Qt.ItemDataRole.DisplayRole)
-            dataRow.append(value)
-          data.append(dataRow)
-      df = pd.DataFrame(data, columns=['docID']+self.filterHeader)
-      callAddOn(command[1], self.comm, df, self)
+      self.requestPage(self.model.query|{'offset':0, 'limit':-1, 'purpose':'addOn', 'addOn':command[1]})
 
     elif command[0] is Command.TOGGLE_HIDE:
       changeFlag = False
-      finalModel = self.filterManager.getFinalModel()
-      for row in range(finalModel.rowCount()):
-        item, docID = self.itemFromRow(row)
-        if item.checkState() == Qt.CheckState.Checked:
-          self.comm.uiRequestTask.emit(Task.HIDE_SHOW, {'docID':docID})
-          changeFlag = True
+      for docID in self.selectedDocIDs():
+        self.comm.uiRequestTask.emit(Task.HIDE_SHOW, {'docID':docID})
+        changeFlag = True
       if changeFlag:
-        self.comm.uiRequestTable.emit(self.docType, self.comm.projectID, self.showAll)
+        self.changeTable('', '')
       if self.docType=='x0':
         self.comm.changeSidebar.emit('redraw')
       self.paint()
@@ -419,33 +402,21 @@ class Table(QWidget):
     elif command[0] is Command.TOGGLE_SELECTION:
       if self.flagGallery:
         self.gallery.toggleSelection()
-      else:
-        finalModel = self.filterManager.getFinalModel()
-        for row in range(finalModel.rowCount()):
-          item,_ = self.itemFromRow(row)
-          if item.checkState() == Qt.CheckState.Checked:
-            item.setCheckState(Qt.CheckState.Unchecked)
-          else:
-            item.setCheckState(Qt.CheckState.Checked)
+      else:                                                    # all rows that pass the filters: ask for their ids
+        self.requestPage(self.model.query|{'offset':0, 'limit':-1, 'purpose':'toggle', 'idsOnly':True})
 
     elif command[0] is Command.SHOW_ALL:
       self.showAll = not self.showAll
-      self.comm.uiRequestTable.emit(self.docType, self.comm.projectID, self.showAll)
+      self.changeTable('', '')
 
     elif command[0] is Command.RERUN_EXTRACTORS:
-      docIDs = []
-      finalModel = self.filterManager.getFinalModel()
-      for row in range(finalModel.rowCount()):
-        item, docID = self.itemFromRow(row)
-        if (self.flagGallery and self.gallery.isDocSelected(docID)) or \
-           (not self.flagGallery and item.checkState() == Qt.CheckState.Checked):
-          docIDs.append(docID)
-      self.comm.uiRequestTask.emit(Task.EXTRACTOR_RERUN, {'docIDs':docIDs,'recipe':''})
-      self.comm.uiRequestTable.emit(self.docType, self.comm.projectID, self.showAll)
+      self.gallery.invalidate(self.selectedDocIDs())                             #new images with same shasum
+      self.comm.uiRequestTask.emit(Task.EXTRACTOR_RERUN, {'docIDs':self.selectedDocIDs(),'recipe':''})
+      self.changeTable('', '')
 
     elif command[0] is Command.TOGGLE_GALLERY:
       self.flagGallery = not self.flagGallery
-      self.paint()
+      self.changeTable('', '')
 
     elif command[0] is FilterCommand.ADD_FILTER:
       # Create new filter using FilterManager
@@ -462,9 +433,6 @@ class Table(QWidget):
       filterItem.select.currentIndexChanged.connect(lambda idx: self.filterChoice(idx, filterItem.id))
       filterItem.text.textChanged.connect(lambda text: self.filterTextChanged(text, filterItem.id))
 
-      # Update table model
-      self.table.setModel(self.filterManager.getFinalModel())
-
     elif command[0] is FilterCommand.DELETE_FILTER:
       filterID = command[1]
 
@@ -483,11 +451,9 @@ class Table(QWidget):
                 widget.setParent(None)
                 break
 
-      # Remove filter from manager
+      # Remove filter from manager and query
       self.filterManager.removeFilter(filterID)
-
-      # Update table model
-      self.table.setModel(self.filterManager.getFinalModel())
+      self.model.setQuery(filters=self.filterManager.queryFilters())
 
     elif command[0] is FilterCommand.SET_FILTER:
       filterID = command[1]
@@ -517,7 +483,8 @@ class Table(QWidget):
       projID  = self.tagWidget.currentItem().text(4).split('/')[0]
     else:
       row = index.row()
-      _, docID = self.itemFromRow(row)
+      if not (docID := self.model.docID(row)):
+        return
       docType = self.docType
       projID  = self.comm.projectID
 
@@ -526,11 +493,9 @@ class Table(QWidget):
       if modifiers == Qt.ShiftModifier and self.lastClickedRow > -1:              # type: ignore[attr-defined]
         start = min(self.lastClickedRow, row)
         end = max(self.lastClickedRow, row)
-        target_state = Qt.CheckState.Checked if self.itemFromRow(row)[0].checkState() == Qt.CheckState.Checked \
-                        else Qt.CheckState.Unchecked
-        for r in range(start, end + 1):
-          item, _ = self.itemFromRow(r)
-          item.setCheckState(target_state)
+        targetState = self.model.isChecked(row)
+        for r in range(start, end + 1):                                          # rows of pages that are loaded
+          self.model.setChecked(r, targetState)
       else:                                           # No need to toggle only the clicked row, just record it
         self.lastClickedRow = row
 
@@ -561,8 +526,8 @@ class Table(QWidget):
         return
       docType = self.tagWidget.currentItem().text(3)
     else:
-      row = index.row()
-      _, docID = self.itemFromRow(row)
+      if not (docID := self.model.docID(index.row())):
+        return
       docType = self.docType
 
     if docType=='x0':
@@ -582,25 +547,16 @@ class Table(QWidget):
     return
 
 
-  def itemFromRow(self, row:int) -> tuple[QStandardItem, str]:
+  def selectedDocIDs(self) -> list[str]:
     """
-    get item from row by iterating through the proxyModels
-
-    Args:
-      row (int): row number
+    Documents that the user selected: checked in the table or selected in the gallery
 
     Returns:
-      QItem, str: the item and docID
+      list: docIDs
     """
-    finalModel = self.filterManager.getFinalModel()
-    index = finalModel.index(row, 0)
-    # Map through all proxy models back to base model
-    currentModel = finalModel
-    while hasattr(currentModel, 'mapToSource') and currentModel != self.baseModel:
-      index = currentModel.mapToSource(index)
-      currentModel = currentModel.sourceModel()                                                 # type: ignore
-    item = self.baseModel.itemFromIndex(index)
-    return item, item.accessibleText()
+    if self.flagGallery:
+      return [docID for docID in self.gallery.docRows if self.gallery.isDocSelected(docID)]
+    return list(self.model.checked)
 
 
   def filterChoice(self, item:int, filterID:int) -> None:
@@ -616,7 +572,7 @@ class Table(QWidget):
       return
     if item == len(self.filterHeader):                                                               # ratings
       item = self.filterHeader.index('tag')
-    filterItem.model.setFilterKeyColumn(item)
+    filterItem.column = item
     filterItem.text.setText('')
     return
 
@@ -633,15 +589,11 @@ class Table(QWidget):
       return
 
     regexStr = text
-    if '*' in regexStr:
-      regexStr = regexStr.replace('*','\u2605')
-      if filterItem.inverse.isChecked():
-        regexStr = f'((?!((?<!\u2605){regexStr}(?!\u2605))).)*'
-      else:
-        regexStr = f'(?<!\u2605){regexStr}(?!\u2605)'
-    elif filterItem.inverse.isChecked():
-      regexStr = f'^((?!{regexStr}).)*$'
-    filterItem.model.setFilterRegularExpression(regexStr)
+    if '*' in regexStr:                                  # ratings are the tags _1, _2, ... which are shown as stars
+      regexStr = re.sub(r'\*+', lambda stars: f'_{len(stars.group())}', regexStr)
+      regexStr = rf'(?<![^\s,]){regexStr}(?![^\s,])'
+    filterItem.regex = regexStr                                      # the backend inverts it, if inverse is checked
+    self.model.setQuery(filters=self.filterManager.queryFilters())
     return
 
 
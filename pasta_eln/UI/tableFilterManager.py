@@ -1,13 +1,11 @@
 """ filter manager for table models in pasta_eln UI"""
 from enum import Enum
-from PySide6.QtCore import QSortFilterProxyModel, Qt
-from PySide6.QtGui import QStandardItemModel
 from PySide6.QtWidgets import QComboBox, QLineEdit, QWidget
 from .guiStyle import IconButton
 
 
 class FilterItem:
-  """Represents a single filter with its model and associated widgets"""
+  """Represents a single filter with its query and associated widgets"""
 
   def __init__(self, filterID: int, headerOptions: list[str], parentWidget:QWidget):
     """ Initialize
@@ -18,9 +16,8 @@ class FilterItem:
       parentWidget: Parent widget for GUI elements
     """
     self.id = filterID
-    self.model = QSortFilterProxyModel()
-    self.model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-    self.model.setFilterKeyColumn(0)
+    self.column = 0                                                               # index of column to filter
+    self.regex  = ''                                                    # case-insensitive regular expression
 
     # Create widgets
     self.select = QComboBox()
@@ -34,54 +31,29 @@ class FilterItem:
 
 
 class FilterManager:
-  """Manages the chain of filters applied to a table model"""
+  """Manages the filters of a table: the backend applies them when it sends the rows"""
 
-  def __init__(self, baseModel: QStandardItemModel):
-    """ Initialize the FilterManager
-    Args:
-      baseModel (QStandardItemModel): The initial model to apply filters to
-    """
-    self.baseModel = baseModel
+  def __init__(self) -> None:
+    """ Initialize the FilterManager """
     self.filters: dict[int, FilterItem] = {}
     self.nextID = 1
-    self.modelChain: list[QStandardItemModel | QSortFilterProxyModel] = [baseModel]
 
 
   def addFilter(self, headerOptions: list[str], parentWidget:QWidget) -> FilterItem:
-    """Add a new filter to the chain"""
+    """Add a new filter"""
     filterID = self.nextID
     self.nextID += 1
     filterItem = FilterItem(filterID, headerOptions, parentWidget)
     self.filters[filterID] = filterItem
-    # Link to the current end of the chain
-    filterItem.model.setSourceModel(self.modelChain[-1])
-    self.modelChain.append(filterItem.model)
     return filterItem
 
 
   def removeFilter(self, filterID: int) -> None:
-    """Remove a filter and rebuild the chain"""
-    if filterID not in self.filters:
-      return
-    del self.filters[filterID]
-    self.rebuildChain()
+    """Remove a filter"""
+    self.filters.pop(filterID, None)
     return
 
 
-  def rebuildChain(self) -> None:
-    """Rebuild the model chain after filter removal"""
-    self.modelChain = [self.baseModel]
-    for filterID in sorted(self.filters.keys()):
-      filterItem = self.filters[filterID]
-      filterItem.model.setSourceModel(self.modelChain[-1])
-      self.modelChain.append(filterItem.model)
-
-
-  def getFinalModel(self) -> QStandardItemModel | QSortFilterProxyModel:
-    """Get the final model in the chain (for table display)"""
-    return self.modelChain[-1]
-
-
   def getFilter(self, filterID: int) -> FilterItem | None:
     """Get a specific filter by ID"""
     return self.filters.get(filterID)
@@ -90,14 +62,11 @@ class FilterManager:
   def clearAll(self) -> None:
     """Remove all filters"""
     self.filters.clear()
-    self.modelChain = [self.baseModel]
 
 
-  def setBaseModel(self, newBaseModel: QStandardItemModel) -> None:
-    """Update the base model and rebuild chain"""
-    self.baseModel = newBaseModel
-    self.modelChain[0] = newBaseModel
-    self.rebuildChain()
+  def queryFilters(self) -> list[tuple[int, str, bool]]:
+    """Filters for the query of the backend: column index, regular expression, inverse"""
+    return [(i.column, i.regex, i.inverse.isChecked()) for _, i in sorted(self.filters.items()) if i.regex]
 
 
 class FilterCommand(Enum):
@@ -0,0 +1,384 @@
+""" model of the table of items: cells are formatted when the view asks for them """
+import re
+from collections import OrderedDict
+from typing import Any, Callable
+import numpy as np
+import pandas as pd
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QPersistentModelIndex, Qt
+from ..miscTools import isDocID
+
+ModelIndex = QModelIndex | QPersistentModelIndex
+RATING = re.compile(r'^_\d$')
+
+
+def formatCell(value:Any, tags:bool=False) -> str:
+  """ Text of a cell as shown in the table
+
+  Args:
+    value (Any): value in the table data
+    tags (bool): value is the comma-separated list of tags
+
+  Returns:
+    str: text to show
+  """
+  if value in ('None','','nan'):                                                                 # None, False
+    return '-'
+  if value=='True':                                                                                     # True
+    return 'Y'
+  if isinstance(value, str) and isDocID(value):                                                         # Link
+    return 'oo'
+  if tags:
+    tagList = [i.strip() for i in value.split(',')]
+    if elementStar:=list(filter(RATING.match, tagList)):
+      tagList.remove(elementStar[0])
+      tagList = ['\u2605'*int(elementStar[0][1])]+tagList
+    return ' '.join(tagList)
+  return str(value)
+
+
+class TableModel(QAbstractTableModel):
+  """
+  Model of the table of items, backed by the column arrays of the table data
+  - cells are formatted in data(), i.e. only for the rows that the view paints
+  - the check state of the first column is kept in a boolean array, not in items
+  - sorting permutes the row order instead of moving cells
+  """
+  def __init__(self, data:pd.DataFrame, header:list[str], checkable:bool) -> None:
+    """
+    Args:
+      data (pd.DataFrame): table data; the last two columns are 'id' and 'show'
+      header (list): labels of the shown columns
+      checkable (bool): the first column has a checkbox
+    """
+    super().__init__()
+    self.header    = header
+    self.checkable = checkable
+    self.columns   = [data.iloc[:,j].to_numpy(dtype=object) for j in range(len(header))]
+    self.ids       = data['id'].to_numpy(dtype=object) if 'id' in data else np.array([], dtype=object)
+    self.hidden    = data['show'].astype(str).str.contains('F').to_numpy() if 'show' in data else \
+                     np.zeros(len(self.ids), dtype=bool)
+    self.checked   = np.zeros(len(self.ids), dtype=bool)                             #indexed by row in data
+    self.order     = np.arange(len(self.ids))                                        #row in view -> row in data
+    self.tagsColumn= header.index('tags') if 'tags' in header else -1
+
+
+  def rowCount(self, parent:ModelIndex=QModelIndex()) -> int:
+    """ Number of rows """
+    return 0 if parent.isValid() else len(self.order)
+
+
+  def columnCount(self, parent:ModelIndex=QModelIndex()) -> int:
+    """ Number of columns """
+    return 0 if parent.isValid() else len(self.header)
+
+
+  def headerData(self, section:int, orientation:Qt.Orientation, role:int=Qt.ItemDataRole.DisplayRole) -> Any:
+    """ Labels of the columns """
+    if role==Qt.ItemDataRole.DisplayRole and orientation==Qt.Orientation.Horizontal and section<len(self.header):
+      return self.header[section]
+    return None
+
+
+  def flags(self, index:ModelIndex) -> Qt.ItemFlag:
+    """ All cells are selectable, the first one of each row might be checkable """
+    if not index.isValid():
+      return Qt.ItemFlag.NoItemFlags
+    if index.column()==0 and self.checkable:
+      return Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+    return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+
+  def data(self, index:ModelIndex, role:int=Qt.ItemDataRole.DisplayRole) -> Any:
+    """ Format the cell for the role that the view requests """
+    if not index.isValid():
+      return None
+    row, col = int(self.order[index.row()]), index.column()
+    if role==Qt.ItemDataRole.DisplayRole:
+      return self.text(row, col)
+    if col==0:
+      if role==Qt.ItemDataRole.CheckStateRole and self.checkable:
+        return Qt.CheckState.Checked if self.checked[row] else Qt.CheckState.Unchecked
+      if role==Qt.ItemDataRole.AccessibleTextRole:
+        return self.ids[row]
+    return None
+
+
+  def setData(self, index:ModelIndex, value:Any, role:int=Qt.ItemDataRole.EditRole) -> bool:
+    """ Only the check state can be changed """
+    if not index.isValid() or index.column()!=0 or role!=Qt.ItemDataRole.CheckStateRole or not self.checkable:
+      return False
+    self.setChecked(index.row(), Qt.CheckState(value)==Qt.CheckState.Checked)
+    return True
+
+
+  def sort(self, column:int, order:Qt.SortOrder=Qt.SortOrder.AscendingOrder) -> None:
+    """ Sort the rows by the values of one column """
+    if column<0 or column>=len(self.header):
+      return
+    self.layoutAboutToBeChanged.emit()
+    oldIndexes = self.persistentIndexList()
+    oldRows    = [int(self.order[i.row()]) for i in oldIndexes]
+    values     = pd.Series(self.columns[column]).astype(str).replace({'None':'','nan':''})
+    newOrder   = values.sort_values(kind='stable', ascending=order==Qt.SortOrder.AscendingOrder).index.to_numpy()
+    self.order = newOrder
+    position   = np.empty_like(newOrder)
+    position[newOrder] = np.arange(len(newOrder))
+    self.changePersistentIndexList(oldIndexes, [self.index(int(position[row]), i.column())
+                                                for row, i in zip(oldRows, oldIndexes)])
+    self.layoutChanged.emit()
+    return
+
+
+  def text(self, row:int, col:int) -> str:
+    """ Text of a cell as shown in the table
+
+    Args:
+      row (int): row in data
+      col (int): column
+
+    Returns:
+      str: text to show
+    """
+    text = formatCell(self.columns[col][row], col==self.tagsColumn)
+    return f'{text}  \U0001F441' if col==0 and self.hidden[row] else text
+
+
+  def docID(self, row:int) -> str:
+    """ Document id of a row
+
+    Args:
+      row (int): row in this model
+
+    Returns:
+      str: docID
+    """
+    return str(self.ids[self.order[row]])
+
+
+  def isChecked(self, row:int) -> bool:
+    """ Check state of a row
+
+    Args:
+      row (int): row in this model
+
+    Returns:
+      bool: checked
+    """
+    return bool(self.checked[self.order[row]])
+
+
+  def setChecked(self, row:int, state:bool) -> None:
+    """ Change the check state of a row
+
+    Args:
+      row (int): row in this model
+      state (bool): checked
+    """
+    self.checked[self.order[row]] = state
+    index = self.index(row, 0)
+    self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+    return
+
+
+class PagedTableModel(QAbstractTableModel):
+  """
+  Model of a table whose rows stay in the database: the backend filters and sorts them, and sends pages of rows
+  - the view asks data() only for the visible rows: missing pages are requested once, their cells are empty until
+    the page arrives
+  - at most MAX_PAGES pages are kept, the least recently used one is dropped first
+  - check states are kept as docIDs: they survive sorting and dropped pages; a change of the filters clears them,
+    since the rows that the filters hide are not seen by the user, e.g. when deleting the checked rows
+  """
+  PAGE_SIZE = 200
+  MAX_PAGES = 10
+
+  def __init__(self, header:list[str], checkable:bool, request:Callable[[dict[str,Any]],None]) -> None:
+    """
+    Args:
+      header (list): labels of the shown columns
+      checkable (bool): the first column has a checkbox
+      request (Callable): function that sends a query to the backend; its answer is given to addPage
+    """
+    super().__init__()
+    self.header    = header
+    self.checkable = checkable
+    self.request   = request
+    self.query:dict[str,Any] = {'sort':0, 'ascending':True, 'filters':[], 'generation':0}
+    self.total     = 0                                                 #number of rows that pass the filters
+    self.pages:OrderedDict[int,TableModel] = OrderedDict()              #page number: rows of page
+    self.pending:set[int] = set()                                       #requested pages of current generation
+    self.checked:dict[str,None] = {}                                    #checked docIDs, in order of checking
+
+
+  def rowCount(self, parent:ModelIndex=QModelIndex()) -> int:
+    """ Number of rows """
+    return 0 if parent.isValid() else self.total
+
+
+  def columnCount(self, parent:ModelIndex=QModelIndex()) -> int:
+    """ Number of columns """
+    return 0 if parent.isValid() else len(self.header)
+
+
+  def headerData(self, section:int, orientation:Qt.Orientation, role:int=Qt.ItemDataRole.DisplayRole) -> Any:
+    """ Labels of the columns """
+    if role==Qt.ItemDataRole.DisplayRole and orientation==Qt.Orientation.Horizontal and section<len(self.header):
+      return self.header[section]
+    return None
+
+
+  def flags(self, index:ModelIndex) -> Qt.ItemFlag:
+    """ All cells are selectable, the first one of each row might be checkable """
+    if not index.isValid():
+      return Qt.ItemFlag.NoItemFlags
+    if index.column()==0 and self.checkable:
+      return Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+    return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+
+  def data(self, index:ModelIndex, role:int=Qt.ItemDataRole.DisplayRole) -> Any:
+    """ Format the cell for the role that the view requests; request its page if it is missing """
+    if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.CheckStateRole,
+                                           Qt.ItemDataRole.AccessibleTextRole):
+      return None
+    pageIdx, row = divmod(index.row(), self.PAGE_SIZE)
+    if (page := self.pages.get(pageIdx)) is None or row >= len(page.ids):
+      self.fetch(pageIdx)
+      return None
+    self.pages.move_to_end(pageIdx)
+    if role==Qt.ItemDataRole.DisplayRole:
+      return page.text(row, index.column())
+    if index.column()==0:
+      if role==Qt.ItemDataRole.CheckStateRole and self.checkable:
+        return Qt.CheckState.Checked if page.ids[row] in self.checked else Qt.CheckState.Unchecked
+      if role==Qt.ItemDataRole.AccessibleTextRole:
+        return page.ids[row]
+    return None
+
+
+  def setData(self, index:ModelIndex, value:Any, role:int=Qt.ItemDataRole.EditRole) -> bool:
+    """ Only the check state can be changed """
+    if not index.isValid() or index.column()!=0 or role!=Qt.ItemDataRole.CheckStateRole or not self.checkable:
+      return False
+    self.setChecked(index.row(), Qt.CheckState(value)==Qt.CheckState.Checked)
+    return True
+
+
+  def sort(self, column:int, order:Qt.SortOrder=Qt.SortOrder.AscendingOrder) -> None:
+    """ Sort the rows by the values of one column: the backend sends the pages in the new order """
+    ascending = order==Qt.SortOrder.AscendingOrder
+    if 0 <= column < len(self.header) and (column, ascending) != (self.query['sort'], self.query['ascending']):
+      self.setQuery(sort=column, ascending=ascending)
+    return
+
+
+  def setQuery(self, **changes:Any) -> None:
+    """ Change sorting or filters: pages of the old query are dropped when the first page of the new one arrives
+
+    Args:
+      changes (dict): sort (column index), ascending, filters (column index, regex, inverse)
+    """
+    if changes.get('filters', self.query['filters']) != self.query['filters']:
+      self.checked.clear()
+    self.query |= changes
+    self.query['generation'] += 1
+    self.pending.clear()
+    self.fetch(0)
+    return
+
+
+  def fetch(self, pageIdx:int) -> None:
+    """ Request a page from the backend, once
+
+    Args:
+      pageIdx (int): number of page
+    """
+    if pageIdx not in self.pending:
+      self.pending.add(pageIdx)
+      self.request(self.query | {'offset':pageIdx*self.PAGE_SIZE, 'limit':self.PAGE_SIZE})
+    return
+
+
+  def addPage(self, data:pd.DataFrame, query:dict[str,Any]) -> None:
+    """ Use a page that the backend sent
+
+    Args:
+      data (pd.DataFrame): rows of page; the last two columns are 'id' and 'show'
+      query (dict): query of the page, with the number of all rows as 'total'
+    """
+    if query.get('generation') != self.query['generation']:                       #answer to an old query
+      return
+    pageIdx = query.get('offset', 0)//self.PAGE_SIZE
+    self.pending.discard(pageIdx)
+    page = TableModel(data, self.header, False)
+    if pageIdx==0 or query['total']!=self.total:                 #new query or changed data: start with this page
+      self.beginResetModel()
+      self.pages.clear()
+      self.pages[pageIdx] = page
+      self.total = query['total']
+      self.endResetModel()
+      return
+    self.pages[pageIdx] = page
+    while len(self.pages) > self.MAX_PAGES:
+      self.pages.popitem(last=False)
+    self.dataChanged.emit(self.index(pageIdx*self.PAGE_SIZE, 0),
+                          self.index(min(self.total, (pageIdx+1)*self.PAGE_SIZE)-1, len(self.header)-1))
+    return
+
+
+  def docID(self, row:int) -> str:
+    """ Document id of a row
+
+    Args:
+      row (int): row in this model
+
+    Returns:
+      str: docID; empty if its page is not loaded
+    """
+    pageIdx, row = divmod(row, self.PAGE_SIZE)
+    page = self.pages.get(pageIdx)
+    return str(page.ids[row]) if page is not None and row < len(page.ids) else ''
+
+
+  def setChecked(self, row:int, state:bool) -> None:
+    """ Change the check state of a row whose page is loaded
+
+    Args:
+      row (int): row in this model
+      state (bool): checked
+    """
+    if not (docID := self.docID(row)):
+      return
+    if state:
+      self.checked[docID] = None
+    else:
+      self.checked.pop(docID, None)
+    index = self.index(row, 0)
+    self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+    return
+
+
+  def isChecked(self, row:int) -> bool:
+    """ Check state of a row
+
+    Args:
+      row (int): row in this model
+
+    Returns:
+      bool: checked
+    """
+    return self.docID(row) in self.checked
+
+
+  def toggleChecked(self, docIDs:list[str]) -> None:
+    """ Invert the check state of documents, e.g. of all rows that pass the filters
+
+    Args:
+      docIDs (list): document ids
+    """
+    toggled = set(docIDs)
+    self.checked = {i:None for i in self.checked if i not in toggled} | \
+                   {i:None for i in docIDs if i not in self.checked}
+    if self.total:
+      self.dataChanged.emit(self.index(0, 0), self.index(self.total-1, 0), [Qt.ItemDataRole.CheckStateRole])
+    return
@@ -0,0 +1,145 @@
+""" Thumbnails of documents: decode and scale images in a pool of threads, keep the pixmaps in a LRU cache """
+from collections import OrderedDict
+from typing import Optional
+from PySide6.QtCore import QBuffer, QByteArray, QObject, QRunnable, QSize, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader, QPainter, QPixmap
+from PySide6.QtSvg import QSvgRenderer
+
+CACHE_BYTES = 128*1024*1024                                   #size of all pixmaps in cache: ~350 images of 300x300
+
+
+def decodeThumbnail(imageFormat:str, data:bytes, size:int) -> QImage:
+  """ Decode the raw bytes of an image and scale it to fit into a square
+  - QImage and QPainter on QImage can be used outside of the GUI thread, QPixmap cannot
+  - raster images: the reader scales while decoding, which is faster for large jpg
+
+  Args:
+    imageFormat (str): format (png, jpg, svg, ...)
+    data (bytes): raw bytes as in thumbnail store
+    size (int): width and height of square
+
+  Returns:
+    QImage: scaled image; null image if data cannot be decoded
+  """
+  if imageFormat == 'svg':
+    renderer = QSvgRenderer(QByteArray(data))
+    if not renderer.isValid():
+      return QImage()
+    default = renderer.defaultSize()
+    scaled = QSize(size, size) if default.isEmpty() else default.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio)
+    image = QImage(scaled, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(image)
+    renderer.render(painter)
+    painter.end()
+    return image
+  buffer = QBuffer()
+  buffer.setData(QByteArray(data))
+  reader = QImageReader(buffer, QByteArray(imageFormat.encode()))
+  if scaledByReader := reader.size().isValid():
+    reader.setScaledSize(reader.size().scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+  image = reader.read()
+  if image.isNull() or scaledByReader:
+    return image
+  return image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+
+class DecoderSignals(QObject):
+  """ Signals of the decoding tasks: they are sent from the pool threads and received in the GUI thread """
+  decoded = Signal(str, str, QImage)                                                      # docID, key, image
+
+
+class DecodeTask(QRunnable):
+  """ Decode one image in a thread of a QThreadPool """
+  def __init__(self, signals:DecoderSignals, docID:str, key:str, imageFormat:str, data:bytes, size:int):
+    """ Initialize
+
+    Args:
+      signals (DecoderSignals): signals object that lives in the GUI thread
+      docID (str): document id
+      key (str): key of image in cache
+      imageFormat (str): format (png, jpg, svg, ...)
+      data (bytes): raw bytes
+      size (int): width and height of square
+    """
+    super().__init__()
+    self.signals = signals
+    self.docID, self.key = docID, key
+    self.imageFormat, self.data, self.size = imageFormat, data, size
+
+
+  def run(self) -> None:
+    """ Decode and send the result """
+    self.signals.decoded.emit(self.docID, self.key, decodeThumbnail(self.imageFormat, self.data, self.size))
+    return
+
+
+class ThumbnailCache:
+  """ Pixmaps that are ready to be shown, least recently used ones are dropped if the cache is too large
+  - key is the shasum of the document, or its id if the image is in the main table
+  """
+  def __init__(self, maxBytes:int=CACHE_BYTES):
+    """ Initialize
+
+    Args:
+      maxBytes (int): maximum size of all pixmaps in bytes
+    """
+    self.pixmaps:OrderedDict[str,QPixmap] = OrderedDict()
+    self.maxBytes = maxBytes
+    self.bytes = 0
+
+
+  def __contains__(self, key:str) -> bool:
+    return key in self.pixmaps
+
+
+  def __len__(self) -> int:
+    return len(self.pixmaps)
+
+
+  @staticmethod
+  def pixmapBytes(pixmap:QPixmap) -> int:
+    """ Memory used by a pixmap """
+    return pixmap.width()*pixmap.height()*pixmap.depth()//8
+
+
+  def get(self, key:str) -> Optional[QPixmap]:
+    """ Get pixmap and mark it as recently used
+
+    Args:
+      key (str): key of image
+
+    Returns:
+      QPixmap: pixmap; None if not in cache
+    """
+    if key not in self.pixmaps:
+      return None
+    self.pixmaps.move_to_end(key)
+    return self.pixmaps[key]
+
+
+  def put(self, key:str, pixmap:QPixmap) -> None:
+    """ Add pixmap and drop the least recently used ones if cache is too large
+
+    Args:
+      key (str): key of image
+      pixmap (QPixmap): pixmap
+    """
+    self.remove(key)
+    self.pixmaps[key] = pixmap
+    self.bytes += self.pixmapBytes(pixmap)
+    while self.bytes > self.maxBytes and len(self.pixmaps) > 1:
+      _, oldest = self.pixmaps.popitem(last=False)
+      self.bytes -= self.pixmapBytes(oldest)
+    return
+
+
+  def remove(self, key:str) -> None:
+    """ Remove pixmap, e.g. since the image of the document changed
+
+    Args:
+      key (str): key of image
+    """
+    if (pixmap := self.pixmaps.pop(key, None)) is not None:
+      self.bytes -= self.pixmapBytes(pixmap)
+    return
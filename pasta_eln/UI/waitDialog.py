@@ -54,6 +54,8 @@ class WaitDialog(QWidget):
       self.count = int(data)
     else:
       logging.error('Unknown data %s %s', dType, data, exc_info=True)
+    if dType in ('incr', 'count') and self.progressBar.maximum()==0:             #indeterminate until first count
+      self.progressBar.setRange(0, 100)
     self.progressBar.setValue(self.count)
     if self.count > 99:
       self.buttonBox.show()
@@ -6,21 +6,78 @@ import os
 import sys
 import tempfile
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Callable, Optional, Union
+from typing import Any, Callable, Iterator, Optional, Union
 from urllib import request
 import matplotlib
 import matplotlib.axes as mpaxes
 import matplotlib.pyplot as plt
+import pandas as pd
 from PIL import Image
 from ..textTools.handleDictionaries import diffDicts, fillDocBeforeCreate
 from ..textTools.stringChanges import camelCase, createDirName, outputString
-from .hashTools import generic_hash
+from .checkReport import CheckReport
+from .extractorPool import ExtractorPool, runExtractor
+from .hashTools import generic_hash, hash_files
+from . import sqlQueries as sq
 from .mixin_cli import CLI_Mixin
-from .sqlite import SqlLiteDB
+from .sqlite import MAIN_ORDER, SqlLiteDB
 
 matplotlib.use('Agg')
+EXTRACTOR_POOL_MIN = 8                       #minimum number of files that justifies starting the extractor pool
+
+
+def indexPaths(inDB:list[dict[str,Any]]) -> tuple[dict[str,dict[str,Any]], set[str], dict[str,dict[str,Any]]]:
+  """ Index the items of viewPaths by their path: first item is used if a path occurs multiple times
+
+  Args:
+    inDB (list): items of viewHierarchy/viewPaths
+
+  Returns:
+    dict, set, dict: path to item, paths of structure elements (folders), path to item of other documents
+  """
+  itemsByPath:dict[str,dict[str,Any]] = {}
+  for item in inDB:
+    itemsByPath.setdefault(item['key'], item)
+  pathsX = {k for k,v in itemsByPath.items() if v['value'][1][0][0]=='x'}
+  pathsData = {k:v for k,v in itemsByPath.items() if v['value'][1][0][0]!='x'}
+  return itemsByPath, pathsX, pathsData
+
+
+def walkProject(projPath:Path, basePath:Path) -> tuple[list[tuple[str,bool,Optional[dict[str,Any]]]], int]:
+  """ Walk the directory tree of a project for checkDB: files and folders that the scan considers
+  - runs in a thread: only reads the file system
+
+  Args:
+    projPath (Path): absolute path of project
+    basePath (Path): root of all projects
+
+  Returns:
+    list, int: path relative to basePath, is folder, content of .id_pastaELN.json of folder (None if it does not
+      exist); number of trash_files and trash_folders
+  """
+  items:list[tuple[str,bool,Optional[dict[str,Any]]]] = []
+  numTrash = 0
+  for root, dirs, files in os.walk(projPath):
+    numTrash += len([i for i in dirs + files if i.startswith('trash_')])
+    if Path(root).name[0]=='.' or Path(root).name.startswith('trash_'):
+      continue
+    for fileName in files:
+      if fileName.startswith('.') or fileName.startswith('trash_') or '_PastaExport' in fileName:
+        continue
+      items.append(((Path(root).relative_to(basePath) /fileName).as_posix(), False, None))
+    dirs[:] = [i for i in dirs if not i.startswith(('.','trash_')) and i != '__pycache__'
+              and not (Path(root)/i/'pyvenv.cfg').is_file()]
+    for dirName in dirs:
+      content = None
+      if (Path(root)/dirName/'.id_pastaELN.json').is_file():
+        with open(Path(root)/dirName/'.id_pastaELN.json',encoding='utf-8') as fIn:
+          content = json.loads(fIn.read())
+      items.append(((Path(root).relative_to(basePath) /dirName).as_posix(), True, content))
+  return items, numTrash
 
 
 class Backend(CLI_Mixin):
@@ -62,6 +119,8 @@ class Backend(CLI_Mixin):
     sys.path.insert(0, str(self.addOnPath))                                                     #allow add-ons
     # decipher miscellaneous configuration and store
     self.userID   = self.configuration['userID']
+    self.hashThreads = int(self.configuration.get('GUI',{}).get('hashThreads', 4))
+    self.extractorPool = ExtractorPool(self.addOnPath, int(self.configuration.get('GUI',{}).get('extractorProcesses', 4)))
     # start database
     self.db = SqlLiteDB(basePath=self.basePath)
     # internal hierarchy structure
@@ -73,10 +132,21 @@ class Backend(CLI_Mixin):
     """
     Shutting down things
     """
+    self.extractorPool.shutdown()
     self.db.exit()
     return
 
 
+  def bulk(self) -> AbstractContextManager[None]:
+    """
+    Bulk mode of database for many changes: commit once at the end, see SqlLiteDB.bulk
+
+    Returns:
+      context manager: use as 'with backend.bulk():'
+    """
+    return self.db.bulk()
+
+
   ######################################################
   ### Change in database
   ######################################################
@@ -104,7 +174,7 @@ class Backend(CLI_Mixin):
 
 
   def addData(self, docType:str, doc:dict[str,Any], hierStack:list[str]=[], localCopy:bool=False,
-              forceNewImage:bool=False) -> dict[str,Any]:
+              forceNewImage:bool=False, shasum:str='', extractorContent:Optional[dict[str,Any]]=None) -> dict[str,Any]:
     """
     Save doc to database, also after edit
 
@@ -114,6 +184,8 @@ class Backend(CLI_Mixin):
         hierStack (list): hierStack from external functions
         localCopy (bool): copy a remote file to local version
         forceNewImage (bool): create new image in any case
+        shasum (str): shasum of file, if already known; else it is calculated
+        extractorContent (dict): content of extractor, if it was already run; else it is run
 
     Returns:
         str: docID, empty string if failure
@@ -145,14 +217,7 @@ class Backend(CLI_Mixin):
     # collect structure-doc and prepare
     if doc['type'][0] and doc['type'][0][0]=='x' and doc['type'][0]!='x0' and childNum is None:
       #should not have childnumber in other cases
-      thisStack = '/'.join(hierStack)+'/'
-      view = self.db.getView('viewHierarchy/viewHierarchy', startKey=thisStack)#not faster with cT.getChildren
-      childNum = 0
-      for item in view:
-        if item['value'][1][0][0]!='x':
-          continue
-        if thisStack == '/'.join(item['key'].split('/')[:-1])+'/':               #remove last item from string
-          childNum += 1
+      childNum = self.db.nextChildNum(hierStack)
 
     # find path name on local file system; name can be anything
     if self.cwd is not None and 'name' in doc:
@@ -168,7 +233,6 @@ class Backend(CLI_Mixin):
         path = parentDirectory/createDirName(doc, childNum, self.cwd)#update,or create (if new doc, update ignored anyhow)
       else:
         #measurement, sample, procedure
-        shasum = ''
         if '://' in doc['name']:                                                                 #make up name
           if localCopy:
             baseName  = Path(doc['name']).stem
@@ -205,7 +269,7 @@ class Backend(CLI_Mixin):
             shasum = generic_hash(path, forceFile=True)
           view = self.db.getView('viewIdentify/viewSHAsum',shasum)
           if len(view)==0 or forceNewImage:                           #measurement not in database: create doc
-            self.useExtractors(path,shasum,doc)                                          #create image/content
+            self.useExtractors(path,shasum,doc,extractorContent)                         #create image/content
             # All files should appear in database
             # if not 'image' in doc and not 'content' in doc and not 'otherELNName' in doc:  #did not get valuable data: extractor does not exit
             #   return ''
@@ -252,6 +316,44 @@ class Backend(CLI_Mixin):
     return doc
 
 
+  def addDataFrame(self, docType:str, table:pd.DataFrame, hierStack:list[str],
+                   progressBar:Callable[...,None]|None=None) -> str:
+    """
+    Add many documents of one docType at once: one row of the table is one document, e.g. an inventory of samples
+    - columns are validated once against the data schema
+    - child numbers of new folders are counted once for the parent
+    - all documents are added in one transaction
+
+    Args:
+      docType (str): docType of all documents, subtypes are / separated
+      table (pd.DataFrame): documents; columns are names in data schema, e.g. name, comment, .chemistry
+      hierStack (list): stack of the parent, e.g. [projID, folderID]
+      progressBar (func): progress bar, receives percentage
+
+    Returns:
+      str: report, starts with ERROR if documents were not added
+    """
+    if docType not in self.db.dataHierarchy('', ''):
+      return f'ERROR: docType {docType} does not exist in data schema'
+    columns = {f'{i["class"]}.{i["name"]}' for i in self.db.dataHierarchy(docType, 'meta')}
+    columns = {i[1:] if i[1:] in MAIN_ORDER+['tags','qrCodes'] else i for i in columns} | {'type'}
+    if 'name' not in table.columns:
+      return 'ERROR: column "name" is required'
+    if offending := set(table.columns).difference(columns):
+      return f'ERROR: all columns must exist in the data schema. Offending: {", ".join(sorted(offending))}'
+    docs = table.drop(columns=['type'], errors='ignore').to_dict(orient='records')
+    self.cwd = self.basePath/self.db.getDoc(hierStack[-1])['branch'][0]['path'] if hierStack else self.basePath
+    childNum = self.db.nextChildNum(hierStack) if docType[0]=='x' and docType!='x0' else None
+    with self.bulk():
+      for idx, doc in enumerate(docs):
+        if childNum is not None:
+          doc['childNum'] = childNum+idx
+        self.addData(docType, doc, list(hierStack))
+        if progressBar is not None and (idx+1)%max(len(docs)//100, 1)==0:
+          progressBar(int(100*(idx+1)/len(docs)))
+    return f'Success: added {len(docs)} documents of type {docType}'
+
+
   ######################################################
   ### Disk directory/folder methods
   ######################################################
@@ -311,9 +413,52 @@ class Backend(CLI_Mixin):
       self.cwd = self.basePath/projPath
     #prepare lists and start iterating
     inDB_all = self.db.getView('viewHierarchy/viewPathsAll', startKey=projPath.as_posix())
-    pathsInDB_x    = [i['key'] for i in inDB_all if i['value'][1][0][0]=='x'] #all structure elements: folders
-    pathsInDB_data = [i['key'] for i in inDB_all if i['value'][1][0][0]!='x']
-    filesCountSum = sum(len(files) for (_, _, files) in os.walk(self.cwd))
+    inDB_byPath, pathsInDB_x, pathsInDB_data = indexPaths(inDB_all)       #structure elements: set of paths
+    fileStates = self.db.getFileStates(projPath.as_posix())             #state of files during last scan
+    fileStatesNew:list[tuple[str,int,int,int,str]] = []
+    toHash:dict[str,tuple[list[str],Optional[dict[str,Any]],tuple[int,int,int]]] = {}   #path: info for handleFile
+    toAdd:dict[str,tuple[str,list[str]]] = {}                                    #shasum: path, hierStack
+    toLink:list[tuple[str,str,list[str]]] = []                                     #path, shasum, hierStack
+
+    def handleFile(path:str, shasum:str, hierStack:list[str], itemDB:Optional[dict[str,Any]],
+                   fileState:tuple[int,int,int]) -> str:
+      """ Add file with known shasum to database; or update its document if it is in the database
+
+      Args:
+        path (str): path relative to basePath
+        shasum (str): shasum of file
+        hierStack (list): stack of parent folder
+        itemDB (dict): item of this path in database, if it exists
+        fileState (tuple): size, mtimeNs, inode of file
+
+      Returns:
+        str: statement if a link to an existing item was created
+      """
+      if not shasum:
+        raise NameError(f'Filepath does not exist {self.basePath/path}')
+      fileStatesNew.append((path, *fileState, shasum))
+      if itemDB is not None:
+        if shasum == itemDB['value'][3]:                                            #only touched, not changed
+          return ''
+        logging.info('Scan: content of file changed: %s',path)
+        doc = self.db.getDoc(itemDB['id'])
+        if len(doc['branch'])==1:                                    #only copy of document: update content
+          self.useExtractors(self.basePath/path, shasum, doc)
+          del doc['branch']
+          self.db.updateDoc(doc, itemDB['id'])
+          return ''
+        self.db.updateBranch(itemDB['id'], -2, 9999, [], path)    #other copies keep content: separate this one
+      if shasum in toAdd:                                             #same content as other new file: link
+        toLink.append((path, shasum, hierStack))
+        return ''
+      view = self.db.getView('viewIdentify/viewSHAsum',shasum)
+      if len(view)==0:                                 #not in database: create doc after extractors are run
+        toAdd[shasum] = (path, hierStack)
+        return ''
+      self.db.updateBranch(view[0]['id'], -1, 9999, hierStack, path)
+      return 'Create a link to existing entry instead of new entry.'
+
+    filesCountSum = 0 if progressBar is None else sum(len(files) for (_, _, files) in os.walk(self.cwd))
     filesCount = 0
     for root, dirs, files in os.walk(self.cwd, topdown=True):
       #find parent-document
@@ -322,19 +467,17 @@ class Backend(CLI_Mixin):
         del dirs
         del files
         continue
-      parentIDs = [i for i in inDB_all if i['key']==self.cwd.as_posix()]                #parent of this folder
-      if not parentIDs:                             #skip newly moved folder, will be scanned upon re-scanning
+      parentItem = inDB_byPath.get(self.cwd.as_posix())                                  #parent of this folder
+      if parentItem is None:                        #skip newly moved folder, will be scanned upon re-scanning
         continue
-      parentID = parentIDs[0]['id']
-      parentDoc = self.db.getDoc(parentID)
-      hierStack = parentDoc['branch'][0]['stack']+[parentID]
+      hierStack = parentItem['value'][0].split('/')                   #stack of this branch, incl. parent's id
       # handle directories
-      dirs[:] = [i for i in dirs if not i.startswith(('.','trash_')) and i not in ('__pycache__')
+      dirs[:] = [i for i in dirs if not i.startswith(('.','trash_')) and i != '__pycache__'
                  and not (Path(root)/i/'pyvenv.cfg').is_file()]
       for dirName in dirs[::-1]:                                                     # sorted forward in Linux
         path = (Path(root)/dirName).relative_to(self.basePath).as_posix()
         if path in pathsInDB_x:                                                     # path already in database
-          pathsInDB_x.remove(path)
+          pathsInDB_x.discard(path)
           continue
         if (self.basePath/path/'.id_pastaELN.json').is_file():                 # update branch: path and stack
           with open(self.basePath/path/'.id_pastaELN.json', encoding='utf-8') as fIn:
@@ -350,15 +493,7 @@ class Backend(CLI_Mixin):
             childNum = doc['branch'][0]['child']
             newPath = path
           else:
-            #determine childNumber
-            thisStack = '/'.join(hierStack)
-            view = self.db.getView('viewHierarchy/viewHierarchy', startKey=thisStack)
-            childNum = 0
-            for item in view:
-              if item['value'][1][0]=='x0' or item['value'][1][0][0]!='x':
-                continue
-              if thisStack == ' '.join(item['key'].split(' ')[:-1]):            # remove last item from string
-                childNum += 1
+            childNum = self.db.nextChildNum(hierStack)                                  #determine childNumber
             parentPath = Path(path).parent
             newPath = str(parentPath/createDirName(doc, childNum, parentPath))#update,or create (if new doc, update ignored anyhow)
             if (self.basePath/newPath).exists():                             # can be either file or directory
@@ -373,44 +508,68 @@ class Backend(CLI_Mixin):
           newDir.rmdir()                                                                  #remove created path
           (self.basePath/root/dirName).rename(newDir)                                    #move old to new path
         rerunScanTree = True
-      # handle files
+      # handle files: those that are unchanged are handled directly, the others are hashed afterwards
       for fileName in files:
         filesCount += 1
         if progressBar is not None:
-          progressBar(int(100*filesCount/filesCountSum))
+          progressBar(int(100*(filesCount-len(toHash))/filesCountSum))
         if fileName.startswith(('.', 'trash_')) or '_PastaExport' in fileName:                   #ignore files
           continue
         path = (Path(root).relative_to(self.basePath) /fileName).as_posix()
-        if path in pathsInDB_data:
-          logging.info('Scan: file already in DB: %s',path)
-          pathsInDB_data.remove(path)
+        try:
+          stat = (self.basePath/path).stat()
+        except OSError:                                        #e.g. broken symlink: keep document, if it exists
+          logging.warning('Scan: cannot read state of file, skip it: %s', path)
+          pathsInDB_data.pop(path, None)
+          continue
+        fileState = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        fileStateOld = fileStates.pop(path, None)
+        unchanged = fileStateOld is not None and fileStateOld[:3]==fileState
+        itemDB = pathsInDB_data.pop(path, None)
+        if itemDB is not None:
+          if unchanged or (fileStateOld is None and itemDB['value'][3]):     #first scan: trust database
+            logging.info('Scan: file already in DB: %s',path)
+            fileStatesNew.append((path, *fileState, fileStateOld[3] if fileStateOld else itemDB['value'][3]))
+            continue
+          toHash[path] = (hierStack, itemDB, fileState)
+          continue
+        logging.info('Scan: add file to DB: %s',path)
+        shasum = fileStateOld[3] if unchanged and fileStateOld is not None else self.db.shasumFromFileState(*fileState)
+        if shasum:
+          reply = handleFile(path, shasum, hierStack, None, fileState) or reply
         else:
-          logging.info('Scan: add file to DB: %s',path)
-          shasum = generic_hash(self.basePath/path, forceFile=True)
-          if not shasum:
-            raise NameError(f'Filepath does not exist {self.basePath/path}')
-          view = self.db.getView('viewIdentify/viewSHAsum',shasum)
-          if len(view)==0:                                                        #not in database: create doc
-            self.addData('', {'name':path}, hierStack)
-          else:
-            self.db.updateBranch(view[0]['id'], -1, 9999, hierStack, path)
-            reply = 'Create a link to existing entry instead of new entry.'
-    #finish method
-    self.cwd = self.basePath/projPath
-    orphans = [
-        i for i in pathsInDB_data
-        if i.startswith(f'{self.cwd.relative_to(self.basePath).as_posix()}/')
-    ]
-    logging.info('Scan: these files are on DB but not hard disk\n%s','\n  '.join(orphans))
-    orphanDirs = [
-        i for i in pathsInDB_x
-        if i.startswith(f'{self.cwd.relative_to(self.basePath).as_posix()}/')
-        and i != projPath
-    ]
-    logging.info('Scan: these directories are on DB but not hard disk\n%s','\n  '.join(orphanDirs))
-    for orphan in orphans+orphanDirs:
-      docID = [i for i in inDB_all if i['key']==orphan][0]['id']
-      self.db.updateBranch(docID, -2, 9999, [], orphan)
+          toHash[path] = (hierStack, None, fileState)
+    # hash remaining files in parallel and handle them as they complete
+    def progressHash(bytesDone:int, bytesTotal:int) -> None:
+      if progressBar is not None and bytesTotal>0:
+        progressBar(int(100*(filesCount-len(toHash)*(1-bytesDone/bytesTotal))/filesCountSum))
+    with self.db.bulk():                                           #many new documents: commit once
+      for absPath, shasum in hash_files([self.basePath/i for i in toHash], self.hashThreads, progressHash):
+        path = absPath.relative_to(self.basePath).as_posix()
+        reply = handleFile(path, shasum, *toHash[path]) or reply
+      # run extractors of new files in parallel and add them as they complete
+      newFiles = list(toAdd.items())
+      for idx, content in self.runExtractors([(self.basePath/i[1][0], '') for i in newFiles]):
+        shasum, (path, hierStack) = newFiles[idx]
+        self.addData('', {'name':path}, hierStack, shasum=shasum, extractorContent=content)
+      for path, shasum, hierStack in toLink:
+        view = self.db.getView('viewIdentify/viewSHAsum',shasum)
+        if len(view)==0:
+          self.addData('', {'name':path}, hierStack, shasum=shasum)
+        else:
+          self.db.updateBranch(view[0]['id'], -1, 9999, hierStack, path)
+          reply = 'Create a link to existing entry instead of new entry.'
+      #finish method
+      self.cwd = self.basePath/projPath
+      prefix = f'{projPath.as_posix()}/'
+      orphans = [i for i in pathsInDB_data if i.startswith(prefix)]
+      logging.info('Scan: these files are on DB but not hard disk\n%s','\n  '.join(orphans))
+      orphanDirs = sorted(i for i in pathsInDB_x if i.startswith(prefix))
+      logging.info('Scan: these directories are on DB but not hard disk\n%s','\n  '.join(orphanDirs))
+      for orphan in orphans+orphanDirs:
+        self.db.updateBranch(inDB_byPath[orphan]['id'], -2, 9999, [], orphan)
+      # files of moved folders are only visited during rerun: keep their states to identify them
+      self.db.setFileStates(fileStatesNew, [] if rerunScanTree else list(fileStates))
     #reset to initial values
     self.hierStack = []
     self.cwd = Path(self.basePath)
@@ -419,7 +578,63 @@ class Backend(CLI_Mixin):
     return reply
 
 
-  def useExtractors(self, filePath:Path, shasum:str, doc:dict[str,Any]) -> None:
+  def scanPaths(self, paths:list[str]) -> str:
+    """ Scan only the folders, in which files changed on disk: e.g. as reported by the FileWatcher
+    - each path is traced up to the closest folder in the database: new folders are added by the scan of it
+    - per project, the common folder of these folders is scanned by scanProject, like Task.SCAN scans a project
+
+    Args:
+      paths (list): posix paths of folders relative to basePath; '.' for all projects
+
+    Returns:
+      str: statement of scanProject if links to existing items were created
+    """
+    folders:dict[str,set[str]] = {}                                                #projID: paths of folders
+    for path in paths:
+      if path == '.':                                                            #all, e.g. events were lost
+        for projID in self.db.getView('viewDocType/x0')['id'].values:
+          folders.setdefault(projID, set()).add(self.db.getDoc(projID)['branch'][0]['path'])
+        continue
+      if any(i.startswith(('.','trash_')) for i in Path(path).parts):                       #ignored by scan
+        continue
+      folder = Path(path)
+      while folder.parts:
+        if stack := self.db.folderStack(folder.as_posix()):
+          folders.setdefault(stack[0], set()).add(folder.as_posix())
+          break
+        folder = folder.parent
+    reply = ''
+    for projID, projPaths in folders.items():
+      common = Path(os.path.commonpath(sorted(projPaths)))
+      logging.info('Scan: changed folders %s in %s', ', '.join(sorted(projPaths)), common.as_posix())
+      for _ in range(2):                                                         #scan twice: convert, extract
+        reply += self.scanProject(None, projID, common)
+    return reply
+
+
+  def runExtractors(self, items:list[tuple[Path,str]]) -> Iterator[tuple[int,Optional[dict[str,Any]]]]:
+    """
+    Run extractors of many local files in the pool of processes, if there are enough of them
+    - the content is handed to useExtractors / addData, which add it to the document
+    - content is None, if the extractor should be run by useExtractors: e.g. remote files, few files
+
+    Args:
+      items (list): list of (absolute path, / separated document type)
+
+    Yields:
+      tuple: index in items, content of extractor or None
+    """
+    inPool = [idx for idx, (path, _) in enumerate(items) if not path.as_posix().startswith('http') and
+              (self.addOnPath/f'extractor_{path.suffix[1:].lower()}.py').is_file()]
+    if self.extractorPool.processes<2 or len(inPool)<EXTRACTOR_POOL_MIN:
+      inPool = []
+    for idx in sorted(set(range(len(items))).difference(inPool)):
+      yield idx, None
+    for idxPool, content in self.extractorPool.run([items[i] for i in inPool]):
+      yield inPool[idxPool], content
+
+
+  def useExtractors(self, filePath:Path, shasum:str, doc:dict[str,Any], content:Optional[dict[str,Any]]=None) -> None:
     """
     get measurements from datafile: central distribution point
     - max image size defined here
@@ -428,6 +643,7 @@ class Backend(CLI_Mixin):
         filePath (Path): path to file
         shasum (string): shasum (git-style hash) to store in database (not used here)
         doc (dict): pass known data/measurement type, can be used to create image; This doc is altered
+        content (dict): content of extractor, if it was already run, e.g. in extractor pool
     """
     extension = filePath.suffix[1:]                                                 #cut off initial . of .jpg
     if str(filePath).startswith('http'):
@@ -451,13 +667,12 @@ class Backend(CLI_Mixin):
     pyFile = f'extractor_{extension.lower()}.py'
     pyPath = self.addOnPath/pyFile
     if pyPath.is_file():
-      plt.clf()
+      if content is None:
+        content = runExtractor(absFilePath, '/'.join(doc['type']))
       try:
-        module  = importlib.import_module(pyFile[:-3])
-        content = module.use(absFilePath, {'main':'/'.join(doc['type'])} )
-        general = content.get('general',[])
-        for key in [i for i in content if i not in ['metaVendor','metaUser','image','content','style']]:#only allow accepted keys
-          del content[key]
+        if 'error' in content:
+          raise ValueError(content['error'])
+        general = content.pop('general',[])
         doc |= content
         for item in general:
           doc[item[0]] = item[1]
@@ -493,7 +708,6 @@ class Backend(CLI_Mixin):
           'filesize':absFilePath.stat().st_size,
           'created at':datetime.fromtimestamp(absFilePath.stat().st_ctime, tz=timezone.utc).isoformat(),
           'modified at':datetime.fromtimestamp(absFilePath.stat().st_mtime, tz=timezone.utc).isoformat()}
-      plt.close('all')
     #combine into document
     doc['shasum']=shasum                                       #essential for logic, always save, unlike image
     return
@@ -633,113 +847,109 @@ class Backend(CLI_Mixin):
   ### Wrapper for database functions
   ######################################################
   def checkDB(self, outputStyle:str='text', repair:Union[None,Callable[[str],bool]]=None,
-              minimal:bool=False) -> str:
+              minimal:bool=False, report:Optional[CheckReport]=None) -> str:
     """
     Wrapper of check database for consistencies by iterating through all documents
+    - projects are walked in parallel; their findings are added in the order of the projects
 
     Args:
         outputStyle (str): output using a given style: see outputString
         repair (function): repair errors automatically; function that has user interaction
         minimal (bool): true=only show warnings and errors; else=also show information
+        report (CheckReport): report to add the findings to, e.g. to stream them and to get the time per check
 
     Returns:
         string: output incl. \n
     """
+    report = CheckReport(outputStyle) if report is None else report
     # check database itself for consistency
-    output = self.db.checkDB(outputStyle=outputStyle, minimal=minimal, repair=repair)
+    self.db.checkDB(outputStyle=outputStyle, minimal=minimal, repair=repair, report=report)
     # compare with file system
     if not minimal:
-      output += outputString(outputStyle,'h2','File status')
+      report.add('h2','File status')
     viewProjects   = self.db.getView('viewDocType/x0All')
     inDB_all = self.db.getView('viewHierarchy/viewPathsAll')
-    pathsInDB_data = [i['key'] for i in inDB_all if i['value'][1][0][0]!='x']
-    pathsInDB_folder = [i['key'] for i in inDB_all if i['value'][1][0][0]=='x']
-    count = 0
+    pathsInDB_data   = {i['key'] for i in inDB_all if i['value'][1][0][0]!='x'}
+    pathsInDB_folder = {i['key'] for i in inDB_all if i['value'][1][0][0]=='x'}
+    idsByPath:dict[str,list[str]] = {}
+    for item in inDB_all:
+      idsByPath.setdefault(item['key'], []).append(item['id'])
+    count, numTrash = 0, 0
+    projPaths = []
     for projI in viewProjects['id']:
       projDoc = self.db.getDoc(projI)
       if len(projDoc['branch'])==0:
-        output += outputString(outputStyle,'error','project view got screwed up')
+        report.add('error','project view got screwed up')
         continue
-      for root, dirs, files in os.walk(self.basePath/projDoc['branch'][0]['path']):
-        if Path(root).name[0]=='.' or Path(root).name.startswith('trash_'):
-          del dirs
-          continue
-        for fileName in files:
-          if fileName.startswith('.') or fileName.startswith('trash_') or '_PastaExport' in fileName:
-            continue
-          path = (Path(root).relative_to(self.basePath) /fileName).as_posix()
-          if path not in pathsInDB_data:
-            output += outputString(outputStyle, 'error', f'File   on disk but not DB (2): {path}')
-            count += 1
-          else:
-            pathsInDB_data.remove(path)
-        dirs[:] = [i for i in dirs if not i.startswith(('.','trash_')) and i not in ('__pycache__')
-                  and not (Path(root)/i/'pyvenv.cfg').is_file()]
-        for dirName in dirs:
-          path = (Path(root).relative_to(self.basePath) /dirName).as_posix()
-          if path not in pathsInDB_folder:
-            output += outputString(outputStyle, 'error', f'Folder on disk but not DB    : {path}')
-            count += 1
-          else:
-            pathsInDB_folder.remove(path)
-            listDocs = self.db.getView('viewHierarchy/viewPathsAll', preciseKey=path)
-            if len(listDocs)!=1:
-              output += outputString(outputStyle, 'error', f'Path of folder is non-unique (1): {path} in '\
-                                      f'{" ".join([i["id"] for i in listDocs])}')
-            docDB   = self.db.getDoc(listDocs[0]['id'])
-            if (self.basePath/root/dirName/'.id_pastaELN.json').is_file():
-              with open(self.basePath/root/dirName/'.id_pastaELN.json',encoding='utf-8') as fIn:
-                docDisk = json.loads(fIn.read())
-                difference = diffDicts(docDisk,docDB)
-                if len(difference)>1:
-                  errorStr = outputString(outputStyle,'error',f'disk(1) and db(2) content do not match*: {docDB["id"]}\n{difference}')
-                  if repair is None:
-                    output += errorStr
-                  elif repair(errorStr):
-                    with open(self.basePath/root/dirName/'.id_pastaELN.json','w',encoding='utf-8') as fOut:
-                      json.dump(docDB, fOut)
-                  #use only for resetting the content in the .id_pastaELN.json
-            else:
+      projPaths.append(self.basePath/projDoc['branch'][0]['path'])
+    with ThreadPoolExecutor(max_workers=max(min(len(projPaths), self.hashThreads), 1)) as executor:
+      futures = [executor.submit(walkProject, i, self.basePath) for i in projPaths]
+      for future in futures:                                     #in order of projects, as soon as walked
+        with report.check('files'):
+          items, numTrashProject = future.result()
+          numTrash += numTrashProject
+          for path, isFolder, content in items:
+            if not isFolder:
+              if path not in pathsInDB_data:
+                report.add('error', f'File   on disk but not DB (2): {path}')
+                count += 1
+              else:
+                pathsInDB_data.discard(path)
+              continue
+            if path not in pathsInDB_folder:
+              report.add('error', f'Folder on disk but not DB    : {path}')
               count += 1
-              errorStr = outputString(outputStyle, 'error', f'Folder has no .id_pastaELN.json:{path}')
-              if repair is None:
-                output += errorStr
-              elif repair(errorStr):
-                with open(self.basePath/root/dirName/'.id_pastaELN.json','w',encoding='utf-8') as fOut:
-                  json.dump({'id':docDB['id']}, fOut)
-    orphans = [i for i in pathsInDB_data   if not (self.basePath/i).exists() and ':/' not in i and i!='*']#paths can be files or directories
-    orphans+= [i for i in pathsInDB_folder if not (self.basePath/i).exists() ]
-    if orphans:
-      if repair is None:
-        output += outputString(outputStyle,'error','bch01: These paths of database not on filesystem(3):\n  - '+'\n  - '.join(orphans))
-      else:
-        for orphan in sorted(orphans):
-          self.db.cursor.execute(f'SELECT main.name, main.type, branches.path, main.id, main.comment FROM main JOIN branches USING(id) WHERE branches.path == "{orphan}"')
-          res = self.db.cursor.fetchall()
-          resString = '\n  '.join(str(i) for i in res)
-          if repair(f'Path of database not on filesystem:\n  {resString}. Repair: file-remove path; folder-create folder and .id_pastaELN'):
-            if res[0][1].startswith('x'):
-              (self.basePath/orphan).mkdir(parents=True)
-              with open(self.basePath/orphan/'.id_pastaELN.json','w',encoding='utf-8') as fOut:
-                json.dump({'id':res[0][3]}, fOut)
+              continue
+            pathsInDB_folder.discard(path)
+            if len(idsByPath[path])!=1:
+              report.add('error', f'Path of folder is non-unique (1): {path} in {" ".join(idsByPath[path])}')
+            docID = idsByPath[path][0]
+            if content is not None:
+              difference = diffDicts(content, {'id':docID})                        #only the id is compared
+              if len(difference)>1 and \
+                  report.add('error', f'disk(1) and db(2) content do not match*: {docID}\n{difference}', repair):
+                with open(self.basePath/path/'.id_pastaELN.json','w',encoding='utf-8') as fOut:
+                  json.dump(self.db.getDoc(docID), fOut)
+                #use only for resetting the content in the .id_pastaELN.json
             else:
-              self.db.cursor.execute(f"UPDATE branches SET path='*' WHERE id == '{res[0][3]}' and path == '{orphan}'")
-              self.db.connection.commit()
+              count += 1
+              if report.add('error', f'Folder has no .id_pastaELN.json:{path}', repair):
+                with open(self.basePath/path/'.id_pastaELN.json','w',encoding='utf-8') as fOut:
+                  json.dump({'id':docID}, fOut)
+    with report.check('bch01'):
+      orphans = sorted(i for i in pathsInDB_data if not (self.basePath/i).exists() and ':/' not in i and i!='*')#paths can be files or directories
+      orphans+= sorted(i for i in pathsInDB_folder if not (self.basePath/i).exists())
+      if orphans:
+        if repair is None:
+          report.add('error','bch01: These paths of database not on filesystem(3):\n  - '+'\n  - '.join(orphans))
+        else:
+          for orphan in sorted(orphans):
+            self.db.cursor.execute(sq.MAIN_BY_PATH, (orphan,))
+            res = self.db.cursor.fetchall()
+            resString = '\n  '.join(str(i) for i in res)
+            if repair(f'Path of database not on filesystem:\n  {resString}. Repair: file-remove path; folder-create folder and .id_pastaELN'):
+              if res[0][1].startswith('x'):
+                (self.basePath/orphan).mkdir(parents=True)
+                with open(self.basePath/orphan/'.id_pastaELN.json','w',encoding='utf-8') as fOut:
+                  json.dump({'id':res[0][3]}, fOut)
+              else:
+                self.db.cursor.execute(sq.BRANCHES_UPDATE_PATH, ('*', res[0][3], orphan))
+                self.db.connection.commit()
     # identify trash_ files and trash_folders
-    projLevelFolders = os.listdir(self.basePath)
-    self.db.cursor.execute("SELECT branches.path FROM main JOIN branches USING(id) WHERE type=='x0'")
-    projFolders = self.db.cursor.fetchall()
-    if nonUsedFolders := set(projLevelFolders).difference([i[0] for i in projFolders]+['pastaELN.db']):
-      output += outputString(outputStyle,'warning','These files/folders in data folder are not used for projects:'+
-                            '\n  - '.join(['']+list(nonUsedFolders)) )
-    for projFolder in projFolders:
-      numTrash = sum(len([i for i in dirs + files if i.startswith('trash_')])
-                     for _, dirs, files in os.walk(self.basePath/projFolder[0]))
+    with report.check('projects'):
+      projLevelFolders = os.listdir(self.basePath)
+      self.db.cursor.execute("SELECT branches.path FROM main JOIN branches USING(id) WHERE type=='x0'")
+      projFolders = self.db.cursor.fetchall()
+      usedFolders = [i[0] for i in projFolders]+['pastaELN.db','pastaELN.db-wal','pastaELN.db-shm']#WAL journal
+      if nonUsedFolders := set(projLevelFolders).difference(usedFolders):
+        report.add('warning','These files/folders in data folder are not used for projects:'+
+                   '\n  - '.join(['']+list(nonUsedFolders)) )
     if numTrash>0:
-      output += outputString(outputStyle,'warning',f'There are {numTrash} trash_files and trash_folders')
+      report.add('warning',f'There are {numTrash} trash_files and trash_folders')
     # final summary
     if not minimal:
-      output += outputString(outputStyle,'h2','File summary')
+      report.add('h2','File summary')
     if outputStyle == 'text':
-      output += 'Success\n' if not orphans and count==0 else 'Failure (* can be auto-repaired)\n'
-    return output
+      report.addText('Success\n' if not orphans and count==0 else 'Failure (* can be auto-repaired)\n')
+    logging.info('checkDB: time per check %s', ', '.join(f'{k} {v:.2f}s' for k,v in report.timing.items()))
+    return str(report)
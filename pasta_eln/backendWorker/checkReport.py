@@ -0,0 +1,77 @@
+""" Report of the check of database and file system: findings are streamed as they are found, time per check """
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Union
+from ..textTools.stringChanges import outputString
+
+
+class CheckReport:
+  """ Collect the findings of checkDB in the order they are found
+  - each finding is handed to the stream function, e.g. to show it while the check is running
+  - time is accumulated per check, e.g. 'dch08', 'bch01'
+  """
+  def __init__(self, outputStyle:str='text', stream:Optional[Callable[[str,str],None]]=None) -> None:
+    """ Initialize empty report
+
+    Args:
+      outputStyle (str): output using a given style: see outputString
+      stream (func): called with level and message of each finding
+    """
+    self.outputStyle = outputStyle
+    self.stream      = stream
+    self.parts:list[str] = []
+    self.timing:dict[str,float] = {}
+
+
+  def add(self, level:str, message:str, repair:Union[None,Callable[[str],bool]]=None) -> bool:
+    """ Add a finding to the report; or ask if it should be repaired
+
+    Args:
+      level (str): level of outputString: h2, info, perfect, ok, unsure, warning, error
+      message (str): message
+      repair (function): if given, ask it instead of adding the finding
+
+    Returns:
+      bool: true if repair was given and it agreed to repair
+    """
+    text = outputString(self.outputStyle, level, message)
+    if repair is not None:
+      return repair(text)
+    self.parts.append(text)
+    if self.stream is not None and level[0]!='h':
+      self.stream(level, message)
+    return False
+
+
+  def addText(self, text:str) -> None:
+    """ Add formatted text, e.g. html tags around the findings
+
+    Args:
+      text (str): text to add
+    """
+    self.parts.append(text)
+
+
+  @contextmanager
+  def check(self, code:str) -> Iterator[None]:
+    """ Accumulate the time of the block for this check: use as 'with report.check(code):'
+
+    Args:
+      code (str): code of check
+    """
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.timing[code] = self.timing.get(code, 0.0) + time.perf_counter()-start
+
+
+  def addTiming(self) -> None:
+    """ Add the time per check to the report: slowest first """
+    self.add('h2', 'Time per check')
+    for code, seconds in sorted(self.timing.items(), key=lambda i: -i[1]):
+      self.add('info', f'{code}: {seconds:.2f}s')
+
+
+  def __str__(self) -> str:
+    return ''.join(self.parts)
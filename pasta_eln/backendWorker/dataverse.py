@@ -2,16 +2,18 @@
 - Author: Jithu Murugan, Steffen Brinckmann
 """
 import logging
+import uuid
 from datetime import datetime
+from functools import partial
 from json import dumps
-from os.path import basename
-from typing import Any
+from os.path import basename, getsize
+from typing import Any, Optional
 from xml.etree.ElementTree import ElementTree, fromstring
 # Dataverse: remember to always publish everything before using it!!
 import requests
 from requests.auth import HTTPBasicAuth
 from .dataverseDefaultDict import DATAVERSE_METADATA
-from .repository import RepositoryClient
+from .repository import RepositoryClient, UploadBody, fileMD5
 
 
 class DataverseClient(RepositoryClient):
@@ -253,6 +255,9 @@ class DataverseClient(RepositoryClient):
   def uploadFile(self, ds_pid: str, df_file_path: str, df_description: str, df_categories: list[str]) -> dict[Any, Any] | Any:
     """
     Uploads a file to a dataset
+    - direct upload into the storage of the server, in parts if the server requests it, if the server supports it
+    - otherwise streamed from disk via the API
+    - requests are retried with backoff; finished parts are remembered in the resume token next to the file
     Args:
       ds_pid (str): The identifier of the dataset
       df_file_path (str): The absolute path to the file to be uploaded
@@ -264,36 +269,128 @@ class DataverseClient(RepositoryClient):
           'dataset_publish_result': dataset_publish_response
       } for successful request, otherwise the error message is returned
     """
-    filename = basename(df_file_path)
-    metadata = dumps({'description': df_description, 'categories': df_categories})
-    data:Any = {}
-    with open(df_file_path, 'rb') as file_stream:
-      data['file'] = (filename, file_stream, 'multipart/form-data')
-      data['jsonData'] = (None, metadata, 'application/json')
-      # Request to add the file to dataset
-      resp = requests.post(
-        f"{self.server_url}/api/datasets/:persistentId/add",
-        params={'persistentId': ds_pid},
-        headers={'X-Dataverse-key': self.api_token},
-        files=data,
-        timeout=5)
-      if resp.status_code == 200:
-        # Request to publish the dataset
-        pub_resp = requests.post(
-          f"{self.server_url}/api/datasets/:persistentId/actions/:publish",
-          params={'persistentId': ds_pid, 'type': 'major'}, timeout=10,
-          headers={'Content-Type': 'application/json', 'X-Dataverse-key': self.api_token})
-        if pub_resp.status_code == 200:
-          return {'file_upload_result': resp.json().get('data'),
-                  'dataset_publish_result': pub_resp.json().get('data')}
-        return f"Error publishing dataset: {ds_pid} as part of file ({df_file_path}) upload on server: "\
-               f"{self.server_url}, Info: {pub_resp.json()}"
-      return f"Error uploading file: {df_file_path} to dataset: {ds_pid} Info: {resp.json()}"
+    state = self.loadResume(df_file_path)
+    if state.get('pid') != ds_pid:
+      state = {'pid': ds_pid}
+    metadata = {'description': df_description, 'categories': df_categories}
+    if 'added' not in state:
+      try:
+        resp = self.uploadDirect(state, df_file_path, metadata)
+        if resp is None:
+          resp = self.uploadStream(ds_pid, df_file_path, metadata)
+      except OSError as e:
+        return f"Error uploading file: {df_file_path} to dataset: {ds_pid} Info: {e}"
+      if resp.status_code != 200:
+        return f"Error uploading file: {df_file_path} to dataset: {ds_pid} Info: {resp.text}"
+      state['added'] = resp.json().get('data')
+      self.saveResume(df_file_path, state)
+    # Request to publish the dataset
+    pub_resp = self.request('POST', f"{self.server_url}/api/datasets/:persistentId/actions/:publish", retry=False,
+      params={'persistentId': ds_pid, 'type': 'major'},
+      headers={'Content-Type': 'application/json', 'X-Dataverse-key': self.api_token})
+    if pub_resp.status_code == 200:
+      self.clearResume(df_file_path)
+      return {'file_upload_result': state['added'],
+              'dataset_publish_result': pub_resp.json().get('data')}
+    return f"Error publishing dataset: {ds_pid} as part of file ({df_file_path}) upload on server: "\
+           f"{self.server_url}, Info: {pub_resp.text}"
+
+
+  def uploadDirect(self, state:dict[str,Any], df_file_path:str, metadata:dict[str,Any]) -> Optional[requests.Response]:
+    """
+    Upload a file directly into the storage of the server: single or multipart upload to pre-signed urls
+
+    Args:
+      state (dict): state of upload, which is saved after each part
+      df_file_path (str): The absolute path to the file to be uploaded
+      metadata (dict): description and categories of the file
+
+    Returns:
+      Response: of adding the file to the dataset; None if server does not support direct uploads
+    """
+    size = getsize(df_file_path)
+    if 'direct' not in state:
+      resp = self.request('GET', f"{self.server_url}/api/datasets/:persistentId/uploadurls",
+                          params={'persistentId': state['pid'], 'size': size}, headers=self.headers)
+      if resp.status_code != 200:                                            #direct upload not enabled on server
+        return None
+      state['direct'] = resp.json().get('data') | {'etags': {}}
+      self.saveResume(df_file_path, state)
+    direct = state['direct']
+    if 'url' in direct:                                                                     #single upload
+      resp = self.request('PUT', direct['url'], body=lambda: UploadBody(df_file_path),
+                          headers={'x-amz-tagging': 'dv-state=temp'})
+      if resp.status_code != 200:
+        return self.failDirect(state, df_file_path, resp)
+    else:                                                                                  #multipart upload
+      partSize = int(direct['partSize'])
+      for part, url in sorted(direct['urls'].items(), key=lambda x: int(x[0])):
+        if part in direct['etags']:
+          continue
+        offset = (int(part)-1)*partSize
+        resp = self.request('PUT', url, body=partial(UploadBody, df_file_path, offset, min(partSize, size-offset)))
+        if resp.status_code != 200:
+          return self.failDirect(state, df_file_path, resp)
+        direct['etags'][part] = resp.headers.get('ETag', '').strip('"')
+        self.saveResume(df_file_path, state)
+      resp = self.request('PUT', f"{self.server_url}{direct['complete']}", json=direct['etags'], headers=self.headers)
+      if resp.status_code != 200:
+        return self.failDirect(state, df_file_path, resp)
+    jsonData = metadata | {'storageIdentifier': direct['storageIdentifier'], 'fileName': basename(df_file_path),
+                           'mimeType': 'application/zip', 'checksum': {'@type': 'MD5', '@value': fileMD5(df_file_path)}}
+    return self.request('POST', f"{self.server_url}/api/datasets/:persistentId/add", retry=False,
+                        params={'persistentId': state['pid']}, headers={'X-Dataverse-key': self.api_token},
+                        files={'jsonData': (None, dumps(jsonData), 'application/json')})
+
+
+  def failDirect(self, state:dict[str,Any], df_file_path:str, resp:requests.Response) -> requests.Response:
+    """
+    Failed direct upload: keep the finished parts for the next attempt
+    - except if the urls expired or the upload is unknown: forget them, such that the next attempt requests new ones
+
+    Args:
+      state (dict): state of upload
+      df_file_path (str): The absolute path to the file to be uploaded
+      resp (Response): failed response
+
+    Returns:
+      Response: failed response
+    """
+    logging.error('Direct upload to storage failed: %s %s', resp.status_code, resp.text)
+    if resp.status_code in (403, 404):
+      del state['direct']
+      self.saveResume(df_file_path, state)
+    return resp
+
+
+  def uploadStream(self, ds_pid:str, df_file_path:str, metadata:dict[str,Any]) -> requests.Response:
+    """
+    Upload a file via the API: multipart/form-data that is streamed from disk
+
+    Args:
+      ds_pid (str): The identifier of the dataset
+      df_file_path (str): The absolute path to the file to be uploaded
+      metadata (dict): description and categories of the file
+
+    Returns:
+      Response: of adding the file to the dataset
+    """
+    boundary = uuid.uuid4().hex
+    prefix = (f'--{boundary}\r\nContent-Disposition: form-data; name="jsonData"\r\n'
+              f'Content-Type: application/json\r\n\r\n{dumps(metadata)}\r\n'
+              f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{basename(df_file_path)}"\r\n'
+              'Content-Type: application/octet-stream\r\n\r\n').encode()
+    suffix = f'\r\n--{boundary}--\r\n'.encode()
+    return self.request('POST', f"{self.server_url}/api/datasets/:persistentId/add", params={'persistentId': ds_pid},
+                        retry=False, body=lambda: UploadBody(df_file_path, prefix=prefix, suffix=suffix),
+                        headers={'X-Dataverse-key': self.api_token,
+                                 'Content-Type': f'multipart/form-data; boundary={boundary}'})
 
 
   def uploadRepository(self, metadata:dict[str,Any], file_path:str) -> tuple[bool, str]:
     """
     Uploads a file and metadata to become a dataset
+    - if a previous upload of this file was interrupted, its dataset is continued
 
     Args:
       metadata (dict): metadata to this file according to dataverse standard
@@ -302,14 +399,20 @@ class DataverseClient(RepositoryClient):
     Returns:
       tuple: success of function, message
     """
-    res= self.createDataset(metadata)
-    if isinstance(res, str):
-      return False, f'Error publishing the dataset: {res}'
-    doi = f"{res['protocol']}:{res['authority']}/{res['identifier']}"
+    state = self.loadResume(file_path)
+    if 'pid' in state:
+      doi, url = state['pid'], state['url']
+    else:
+      res= self.createDataset(metadata)
+      if isinstance(res, str):
+        return False, f'Error publishing the dataset: {res}'
+      doi, url = f"{res['protocol']}:{res['authority']}/{res['identifier']}", res['persistentUrl']
+      self.saveResume(file_path, {'pid': doi, 'url': url})
     reply = self.uploadFile(doi, file_path, '.eln file', ['file'])
     if isinstance(reply, str):
+      logging.error(reply)
       return False, 'Error publishing the file'
-    return True, f'Published: {doi}, {res["persistentUrl"]}'
+    return True, f'Published: {doi}, {url}'
 
 
   def getDatasetInfo(self, ds_persistent_id: str, version: str = ':latest-published') -> dict[Any, Any] | Any:
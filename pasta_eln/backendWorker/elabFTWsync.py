@@ -3,16 +3,19 @@ import copy
 import json
 import logging
 import re
+import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 from anytree import Node, PreOrderIter
 from ..miscTools import flatten
 from ..textTools.handleDictionaries import squashTupleIntoValue
 from ..textTools.html2markdown import html2markdown
 from ..textTools.markdown2html import markdown2html  # type: ignore[attr-defined]
+from . import sqlQueries as sq
 from .backend import Backend
-from .elabFTWapi import ElabFTWApi
+from .elabFTWapi import POOL_SIZE, ElabFTWApi
 
 # - consider hiding metadata.json (requires hiding the upload (state=2) and ability to read (it is even hidden in the API-read))
 #   - hide an upload  api.upLoadUpdate('experiments', 66, 596, {'action':'update', 'state':'2'})
@@ -83,12 +86,16 @@ class Pasta2Elab:
     self.docID2elabID:dict[str,tuple[int,bool]] = {}      # e.g. x-15343154th54325243, (4, bool if experiment)
     self.readWriteAccess:dict[str,str] = {}
     self.verbose         = False
+    self.timing:dict[str,float] = {}                                    # seconds per phase of the last sync
     return
 
 
   def sync(self, mode:str='', callback:Callable[[ElabFTWApi,str,int],str]=cliCallback,
            progressCallback:Callable[...,None]|None=None) -> list[tuple[str,int]]:
     """ Main function
+    - documents are synced in phases: pull all from server, merge locally, push all to server
+    - pull and push run concurrently in a pool of threads; the database is only used in the merge phase
+    - time of each phase is saved in self.timing
 
     Args:
       mode (str): sync mode g=get, gA=get-all, s=send, sA=send-all
@@ -98,40 +105,106 @@ class Pasta2Elab:
     Returns:
       list: list of merge cases
     """
-    def updateEntryLocal(i:Node, mode:str, callback:Callable[[ElabFTWApi,str,int],str]=cliCallback,
-                         idx:int=-1, count:int=-1) -> tuple[str,int]:
-      """Intermediate function used in list comprehension"""
-      res = self.updateEntry(i, mode, callback)
-      if progressCallback is not None:
-        progressCallback('count', str(int(idx/count*100)))
-      return res
-
     if hasattr(self,'api') and self.api.url:                               #only when you are connected to web
       report = []
+      self.timing = {'setup':0.0, 'pull':0.0, 'merge':0.0, 'push':0.0, 'missing':0.0}
+      start = time.perf_counter()
       if progressCallback is not None:
         progressCallback('text', '### Start syncing with elabFTW server\n#### Set up sync\nStart...')
       self.syncDocTypes()                                                              # sync categories ~1sec
       self.createIdDict()
+      self.timing['setup'] = time.perf_counter()-start
       if progressCallback is not None:
         progressCallback('append', 'Done\n#### Sync each document\nStart...')
       for projID in self.backend.db.getView('viewDocType/x0')['id'].values:
         projHierarchy, _ = self.backend.db.getHierarchy(projID)
-        count = len(list(PreOrderIter(projHierarchy)))
-        report += [updateEntryLocal(i, mode, callback, idx, count) for idx, i in enumerate(PreOrderIter(projHierarchy))]
+        nodes = list(PreOrderIter(projHierarchy))
+        docs  = self.backend.db.getDocs([i.id for i in nodes])                   #all documents of project at once
+        report += self.syncNodes(nodes, docs, mode, callback, progressCallback)
       if progressCallback is not None:
         progressCallback('append', 'Done\n#### Sync missing entries\nStart...')
+      start = time.perf_counter()
       report += self.syncMissingEntries(mode, callback, progressCallback)
+      self.timing['missing'] = time.perf_counter()-start
     else:
       logging.error('Not connected to elab server!', exc_info=True)
       return []
+    timingText = ', '.join(f'{k} {v:.1f}s' for k,v in self.timing.items())
+    logging.info('elabFTW sync of %s documents: %s', len(report), timingText)
     if progressCallback is not None:
       reportSum = Counter([i[1] for i in report])
       reportText = '\n  - '.join(['']+[f'{v:>4}:{MERGE_LABELS[k][2:]}' for k,v in reportSum.items()])
       progressCallback('count', '100')
-      progressCallback('append', f'Done\n#### Summary\nSend all data to server: success\n{reportText}')
+      progressCallback('append', f'Done\n#### Summary\nSend all data to server: success\n{reportText}\n'
+                                 f'Time per phase: {timingText}')
     return report
 
 
+  def syncNodes(self, nodes:list[Node], docs:dict[str,dict[str,Any]], mode:str,
+                callback:Callable[[ElabFTWApi,str,int],str]=cliCallback,
+                progressCallback:Callable[...,None]|None=None) -> list[tuple[str,int]]:
+    """ Sync the documents of a project: pull and push concurrently, merge in this thread
+    - push is done level by level of the hierarchy: parents are on the server before the links to their children
+
+    Args:
+      nodes (list): nodes of hierarchy in pre-order
+      docs (dict): documents of nodes by docID
+      mode (str): sync mode g=get, gA=get-all, s=send, sA=send-all
+      callback (func): callback function if non-all mode is given
+      progressCallback (func): callback function to implement progress-bar
+
+    Returns:
+      list: list of merge cases
+    """
+    done = [0]
+    def progress() -> None:
+      done[0] += 1
+      if progressCallback is not None and done[0]%10==0:
+        progressCallback('count', str(int(done[0]/3/len(nodes)*100)))
+    def pull(node:Node) -> Optional[tuple[str, int, dict[str,Any], list[Any], dict[str,Any]]]:
+      try:
+        return self.pullEntry(node)
+      except Exception:
+        logging.error('Could not pull from server %s', node.id, exc_info=True)
+        return None
+    def push(node:Node, job:dict[str,Any]) -> bool:
+      try:
+        return self.pushEntry(job)
+      except Exception:
+        logging.error('Could not push to server %s', node.id, exc_info=True)
+        return False
+
+    report:dict[str,int] = {}
+    with ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='elab') as pool:
+      start = time.perf_counter()
+      pulled = []
+      for node, server in zip(nodes, pool.map(pull, nodes)):
+        pulled.append(server)
+        progress()
+      self.timing['pull'] += time.perf_counter()-start
+      start = time.perf_counter()
+      jobs:dict[str,dict[str,Any]] = {}
+      with self.backend.db.bulk():                                                            #commit once
+        for node, server in zip(nodes, pulled):
+          if server is None:
+            report[node.id] = -1
+          else:
+            report[node.id], job = self.mergeEntry(node, mode, server, docs.get(node.id))
+            if job is not None:
+              jobs[node.id] = job
+          progress()
+      self.timing['merge'] += time.perf_counter()-start
+      start = time.perf_counter()
+      for depth in sorted({i.depth for i in nodes}):
+        level = [i for i in nodes if i.depth==depth and i.id in jobs]
+        for node, success in zip(level, pool.map(lambda i: push(i, jobs[i.id]), level)):
+          if not success:
+            report[node.id] = -1
+          progress()
+      self.timing['push'] += time.perf_counter()-start
+    return [(i.id, report[i.id]) for i in nodes]
+
+
   def syncDocTypes(self) -> None:
     """ Synchronize document types between client and server
     - save datahierarchy to server
@@ -169,8 +242,11 @@ class Pasta2Elab:
       self.api.createLink(urlSuffix, elabID, 'items', self.elabProjGroupID)
       return elabID
     self.backend.db.cursor.execute('SELECT id, type, externalId FROM main')
-    self.docID2elabID = {i[0]:((i[2],i[1].split('/')[0]=='measurement') if i[2] else (getNewEntry(elabTypes[i[1].split('/')[0]]),i[1].split('/')[0]=='measurement'))
-                    for i in self.backend.db.cursor.fetchall()}
+    rows = self.backend.db.cursor.fetchall()
+    newDocs = [i for i in rows if not i[2]]                                  #create entries on server concurrently
+    with ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='elab') as pool:
+      newIDs = dict(zip([i[0] for i in newDocs], pool.map(getNewEntry, [elabTypes[i[1].split('/')[0]] for i in newDocs])))
+    self.docID2elabID = {i[0]:(i[2] or newIDs[i[0]], i[1].split('/')[0]=='measurement') for i in rows}
     if self.verbose:
       print('List of docIDs and corresponding elabIDs (flag if experiment)')
       print('\n'.join([f'{k} : {v}' for k,v in self.docID2elabID.items()]))
@@ -180,40 +256,73 @@ class Pasta2Elab:
     return
 
 
-  def updateEntry(self, node:Node, mode:str, callback:Callable[[ElabFTWApi,str,int],str]=cliCallback) -> tuple[str,int]:
-    """ update an entry in elabFTW: all the logic goes here
-        - myDesktop: sends content and the date when upload is made; if there is a change in modified time; the change is for real
-        - server: gets document; if there is a difference between metadata.json and content: it was changed for real
-        - other desktops changes: as before; my desktop **cannot differentiate myChanges vs other desktop changes**
-          -> have to save also upload time locally, save in extra column
+  def updateEntry(self, node:Node, mode:str, callback:Callable[[ElabFTWApi,str,int],str]=cliCallback,
+                  docClient:dict[str,Any]|None=None) -> tuple[str,int]:
+    """ update an entry in elabFTW: pull from server, merge, push to server
 
     Args:
       node (Node): node to process
       mode (str): sync mode g=get, gA=get-all, s=send, sA=send-all
       callback (func): callback function if non-all mode is given
+      docClient (dict): document of node, if already read from database
 
     Returns:
       tuple: node.id; merge case
     """
-    # get this content: check if it changed
-    docClient   = self.backend.db.getDoc(node.id)
+    mergeCase, job = self.mergeEntry(node, mode, self.pullEntry(node), docClient)
+    if job is not None and not self.pushEntry(job):
+      return node.id, -1
+    return node.id, mergeCase
+
+
+  def pullEntry(self, node:Node) -> tuple[str, int, dict[str,Any], list[Any], dict[str,Any]]:
+    """ Pull an entry from the server: its content and the document of the client that synced it last
+    - uses the server only, not the database: can run in a thread
+
+    Args:
+      node (Node): node to process
+
+    Returns:
+      tuple: entryType, elabID, document on server, uploads, document of other client
+    """
     elabID = self.docID2elabID[node.id][0]
-    if 'dateSync' not in docClient or not docClient['dateSync']:
-      docClient['dateSync'] = datetime.fromisoformat('2000-01-03').isoformat()+'.0000'
-    if self.verbose:
-      print(f'\n{node.id}\n>>>DOC_CLIENT sync&modified', docClient['dateSync'], docClient['dateModified'])
-    # pull from server: content and other's client content
     entryType = 'experiments' if self.docID2elabID[node.id][1] else 'items'
     docServer, uploads = self.elab2doc(self.api.readEntry(entryType, elabID)[0])
-    if self.verbose:
-      print('>>>DOC_SERVER', docServer)
     if listDoNotChange :=[i for i in uploads if i['real_name']=='do_not_change.json']:
       docOther = self.api.download(entryType, elabID, listDoNotChange[0])
     else:
       docOther = {'name':'Untitled', 'tags':[], 'comment':'', 'dateSync':datetime.fromisoformat('2000-01-02').isoformat()+'.0000',
                   'dateModified':datetime.fromisoformat('2000-01-01').isoformat()+'.0000'}
-      # return(node.id, -1)
+    return entryType, elabID, docServer, uploads, docOther
+
+
+  def mergeEntry(self, node:Node, mode:str, server:tuple[str, int, dict[str,Any], list[Any], dict[str,Any]],
+                 docClient:dict[str,Any]|None=None) -> tuple[int, Optional[dict[str,Any]]]:
+    """ merge an entry of client and server: all the logic goes here
+        - myDesktop: sends content and the date when upload is made; if there is a change in modified time; the change is for real
+        - server: gets document; if there is a difference between metadata.json and content: it was changed for real
+        - other desktops changes: as before; my desktop **cannot differentiate myChanges vs other desktop changes**
+          -> have to save also upload time locally, save in extra column
+        - updates the client in the database; the changes of the server are returned for pushEntry
+
+    Args:
+      node (Node): node to process
+      mode (str): sync mode g=get, gA=get-all, s=send, sA=send-all
+      server (tuple): result of pullEntry
+      docClient (dict): document of node, if already read from database
+
+    Returns:
+      tuple: merge case; changes for pushEntry, None if nothing is to be pushed
+    """
+    entryType, elabID, docServer, uploads, docOther = server
+    # get this content: check if it changed
+    if docClient is None:
+      docClient = self.backend.db.getDoc(node.id)
+    if 'dateSync' not in docClient or not docClient['dateSync']:
+      docClient['dateSync'] = datetime.fromisoformat('2000-01-03').isoformat()+'.0000'
     if self.verbose:
+      print(f'\n{node.id}\n>>>DOC_CLIENT sync&modified', docClient['dateSync'], docClient['dateModified'])
+      print('>>>DOC_SERVER', docServer)
       print('>>>DOC_OTHER sync&modified', docOther.get('dateSync'), docOther.get('dateModified'))
     docMerged:dict[str,Any] = {}
     flagUpdateClient, flagUpdateServer = False, False
@@ -289,7 +398,7 @@ class Pasta2Elab:
       # flagUpdateServer = False
       # flagUpdateClient = False
       # docMerged = {}
-      return node.id, mergeCase
+      return mergeCase, None
     #  - Case 5 both are updated: merge: both changed -> GUI
     if datetime.strptime(docClient['dateModified'], pattern) > datetime.strptime(docClient['dateSync'], pattern) and \
        datetime.strptime(docOther['dateModified'], pattern)  > datetime.strptime(docOther['dateSync'], pattern):
@@ -301,7 +410,7 @@ class Pasta2Elab:
       docMerged = copy.deepcopy(docClient)
     if mergeCase<=0:
       logging.error('No merge case set! %s', mode, exc_info=True)
-      return node.id, -1
+      return -1, None
 
     docMerged['dateSync'] = datetime.now().isoformat()
     if self.verbose:
@@ -316,37 +425,56 @@ class Pasta2Elab:
       squashTupleIntoValue(docUpdate)
       self.backend.db.updateDoc(docUpdate, node.id)
     else:
-      self.backend.db.cursor.execute(f"UPDATE main SET dateSync='{docMerged['dateSync']}' WHERE id = '{node.id}'")
-      self.backend.db.connection.commit()
-    # send doc (merged version) to server
+      self.backend.db.cursor.execute(sq.mainUpdate(['dateSync']), (docMerged['dateSync'], node.id))
+      self.backend.db.commit()
+    # changes for server: merged version of doc and its uploads
+    job:dict[str,Any] = {'entryType':entryType, 'elabID':elabID, 'docMerged':docMerged, 'uploads':uploads,
+                         'flagUpdateServer':flagUpdateServer}
     if flagUpdateServer:
-      content, image = self.doc2elab(copy.deepcopy(docMerged))
-      success = self.api.updateEntry(entryType, elabID, content|self.readWriteAccess)
+      content, job['image'] = self.doc2elab(copy.deepcopy(docMerged))
+      job['content'] = content|self.readWriteAccess
+      job['links']   = [('experiments' if self.docID2elabID[i.id][1] else 'items', self.docID2elabID[i.id][0])
+                        for i in node.children]
+      path = docMerged['branch'][0]['path']
+      if path is not None and docMerged['type'][0][0]!='x' and not path.startswith('http'):
+        job['fileName'] = self.backend.basePath/path
+    return mergeCase, job
+
+
+  def pushEntry(self, job:dict[str,Any]) -> bool:
+    """ push the changes of mergeEntry to the server: content, links to children, uploads
+    - uses the server only, not the database: can run in a thread
+
+    Args:
+      job (dict): changes returned by mergeEntry
+
+    Returns:
+      bool: success
+    """
+    entryType, elabID = job['entryType'], job['elabID']
+    if job['flagUpdateServer']:
+      success = self.api.updateEntry(entryType, elabID, job['content'])
       if not success:
-        logging.error('Could not sync data %s, %s  %s',entryType, elabID, json.dumps(content|self.readWriteAccess,
-                                                                                     indent=2), exc_info=True)
-        return node.id, -1
+        logging.error('Could not sync data %s, %s  %s',entryType, elabID, json.dumps(job['content'], indent=2),
+                      exc_info=True)
+        return False
       # create links
-      _ = [self.api.createLink(entryType, elabID,
-                               'experiments' if self.docID2elabID[i.id][1] else 'items', self.docID2elabID[i.id][0])
-                               for i in node.children]
+      _ = [self.api.createLink(entryType, elabID, targetType, linkTarget) for targetType, linkTarget in job['links']]
     # uploads| clean first, then upload: PASTAs document, thumbnail, data-file
-    existingUploads = self.api.readEntry(entryType, elabID)[0]['uploads']
+    existingUploads = job['uploads']                                         #as pulled: content does not change them
     uploadsToDelete = {'do_not_change.json', 'metadata.json'}
-    if flagUpdateServer:
+    if job['flagUpdateServer']:
       uploadsToDelete |= {'thumbnail.svg', 'thumbnail.png', 'thumbnail.jpg'}
     for upload in existingUploads:
       if upload['real_name'] in uploadsToDelete:
         self.api.uploadDelete(entryType, elabID, upload['id'])
-    self.api.upload(entryType, elabID, jsonContent=json.dumps(docMerged))
-    if flagUpdateServer:
-      if image:
-        self.api.upload(entryType, elabID, image)
-      if docMerged['branch'][0]['path'] is not None and docMerged['type'][0][0]!='x' \
-            and not docMerged['branch'][0]['path'].startswith('http') and \
-            (self.backend.basePath/docMerged['branch'][0]['path']).name not in {i['real_name'] for i in existingUploads}:
-        self.api.upload(entryType, elabID, fileName=self.backend.basePath/docMerged['branch'][0]['path'], comment='raw data')
-    return node.id, mergeCase
+    self.api.upload(entryType, elabID, jsonContent=json.dumps(job['docMerged']))
+    if job['flagUpdateServer']:
+      if job['image']:
+        self.api.upload(entryType, elabID, job['image'])
+      if 'fileName' in job and job['fileName'].name not in {i['real_name'] for i in existingUploads}:
+        self.api.upload(entryType, elabID, fileName=job['fileName'], comment='raw data')
+    return True
 
 
   def syncMissingEntries(self, mode:str='', callback:Callable[[ElabFTWApi,str,int],str]=cliCallback,
@@ -454,7 +582,7 @@ class Pasta2Elab:
     """
     if not doc:
       raise ValueError('Cannot convert / process empty document')
-    image     = doc.pop('image') if 'image' in doc else ''
+    image     = self.backend.db.getImage(doc.pop('image'), doc['id']) if 'image' in doc else ''
     title     = doc.pop('name')
     bodyMD    = ''
     if 'content' in doc:
@@ -0,0 +1,241 @@
+""" Write the members of a zip file (.eln) in a pool of threads
+- each data file is read once: sha256, crc and compression are computed while reading
+- members are deflated in parallel, one compressor per member, and appended to the zip file in order
+- zlib and hashlib release the GIL for large buffers, hence the threads use all cores
+- already compressed formats (images, archives) are stored and not compressed again
+- RAM is bounded: compressed members are spooled to disk if they are large, only a few members are in flight
+"""
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Optional
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+CHUNK_SIZE     = 1024*1024                                       # 1MiB per read: zlib and hashlib release the GIL
+SPOOL_SIZE     = 16*1024*1024                       # compressed members larger than this are spooled to disk
+STORED_SUFFIXES = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.tif', '.tiff', '.mp4', '.avi', '.mkv', '.mov',
+                   '.mp3', '.zip', '.eln', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst', '.docx', '.xlsx',
+                   '.pptx', '.odt', '.ods', '.odp', '.pdf'}                        #already compressed formats
+
+
+def appendsRaw(zipFile:ZipFile) -> bool:
+  """ Can deflated data be appended directly: zipfile has no public method for it, hence appendDeflated uses the
+  attributes that ZipFile.open(zinfo, 'w') uses; those were checked for python 3.9-3.14
+
+  Args:
+    zipFile (ZipFile): zip file open for writing
+
+  Returns:
+    bool: if False, members are compressed again while writing them through ZipFile.open
+  """
+  if not (3, 9) <= sys.version_info[:2] <= (3, 14) or zipFile.fp is None or not zipFile.fp.seekable():
+    return False
+  return not getattr(zipFile, '_writing', True) and all(hasattr(zipFile, i) for i in ('start_dir', 'NameToInfo'))
+
+
+def deflateFile(path:Path) -> tuple[str, int, int, IO[bytes]]:
+  """ Read a file once: hash, crc and raw deflate stream as zip files use it; executed in a thread of the pool
+
+  Args:
+    path (Path): path of file
+
+  Returns:
+    tuple: sha256, crc32, size of file, compressed data (file object at its end)
+  """
+  hasher     = hashlib.sha256()
+  compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+  crc, size  = 0, 0
+  spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)                    # pylint: disable=consider-using-with
+  try:
+    with open(path, 'rb') as fIn:
+      while data := fIn.read(CHUNK_SIZE):
+        hasher.update(data)
+        crc   = zlib.crc32(data, crc)
+        size += len(data)
+        spool.write(compressor.compress(data))
+    spool.write(compressor.flush())
+  except Exception:
+    spool.close()
+    raise
+  return hasher.hexdigest(), crc, size, spool
+
+
+class ZipMemberWriter:
+  """ Add files and directories to a zip file that is open for writing
+  - files are read and compressed in a thread pool; the calling thread appends them in the order they were added
+  - the node of each file receives 'contentSize' and 'sha256' once the file is written
+  - all members are written when leaving the with-statement or calling close
+
+  Example:
+      with ZipFile(fileName, 'w') as zipFile:
+        with ZipMemberWriter(zipFile) as writer:
+          writer.addFile(Path('data.csv'), 'folder/data.csv', node)
+        print(node['sha256'])
+  """
+  def __init__(self, zipFile:ZipFile, workers:int=0):
+    """ Initialize
+
+    Args:
+      zipFile (ZipFile): zip file open for writing
+      workers (int): number of threads; 0 = number of cores
+    """
+    self.zipFile = zipFile
+    self.workers = workers or os.cpu_count() or 1
+    self.pool    = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='eln')
+    self.pending:deque[tuple[str, Optional[Path], dict[str,Any], Optional[Future[Any]]]] = deque()
+                                                               # name, path (None for directories), node, future
+
+
+  def __enter__(self) -> 'ZipMemberWriter':
+    return self
+
+
+  def __exit__(self, excType:Optional[type[BaseException]], excValue:Optional[BaseException],
+               traceback:Optional[TracebackType]) -> None:
+    if excType is None:
+      self.close()
+    else:                                                              #error: drop members that are not written
+      for _, _, _, future in self.pending:
+        if future is not None and not future.cancel() and future.exception() is None:
+          future.result()[3].close()
+      self.pending.clear()
+      self.pool.shutdown()
+    return
+
+
+  def addFile(self, path:Path, name:str, node:dict[str,Any]) -> None:
+    """ Add a file: it is compressed in the pool and written later
+
+    Args:
+      path (Path): path of file on disk
+      name (str): name of member in zip file
+      node (dict): node of ro-crate that receives contentSize and sha256
+    """
+    future = None if path.suffix.lower() in STORED_SUFFIXES else self.pool.submit(deflateFile, path)
+    self.pending.append((name, path, node, future))
+    while len(self.pending) > 2*self.workers:                                 #bounded number of members in flight
+      self.writeNext()
+    return
+
+
+  def mkdir(self, name:str) -> None:
+    """ Add a directory, in order with the files
+
+    Args:
+      name (str): name of directory in zip file
+    """
+    self.pending.append((name, None, {}, None))
+    if len(self.pending) > 2*self.workers:
+      self.writeNext()
+    return
+
+
+  def close(self) -> None:
+    """ Write all pending members and stop the pool """
+    while self.pending:
+      self.writeNext()
+    self.pool.shutdown()
+    return
+
+
+  def writeNext(self) -> None:
+    """ Write the oldest pending member; waits for its compression if needed """
+    name, path, node, future = self.pending.popleft()
+    if name in self.zipFile.NameToInfo:
+      logging.warning('Member already in eln file, skip second one %s', name)
+      if future is not None and future.exception() is None:
+        future.result()[3].close()
+      return
+    if path is None:
+      self.writeDirectory(name)
+      return
+    try:
+      if future is not None:
+        shasum, crc, size, spool = future.result()
+        with spool:
+          if appendsRaw(self.zipFile):
+            self.appendDeflated(name, path, crc, size, spool)
+          else:
+            self.writeFile(name, path, ZIP_DEFLATED)
+      else:
+        shasum, size = self.writeFile(name, path, ZIP_STORED)
+    except OSError:
+      logging.error('Could not add file to eln %s', path, exc_info=True)
+      return
+    node['contentSize'] = str(size)
+    node['sha256']      = shasum
+    return
+
+
+  def writeDirectory(self, name:str) -> None:
+    """ Write directory entry
+
+    Args:
+      name (str): name of directory
+    """
+    if sys.version_info >= (3, 11):
+      self.zipFile.mkdir(name)
+    else:
+      dirInfo = ZipInfo(name if name.endswith('/') else f'{name}/')
+      dirInfo.date_time = time.localtime(time.time())[:6]
+      dirInfo.external_attr = 0o40775 << 16                                                     # drwxrwxr-x
+      self.zipFile.writestr(dirInfo, '')
+    return
+
+
+  def writeFile(self, name:str, path:Path, compressType:int) -> tuple[str,int]:
+    """ Write file through ZipFile.open, in this thread: hash while writing
+
+    Args:
+      name (str): name of member
+      path (Path): path of file on disk
+      compressType (int): ZIP_STORED for compressed formats, ZIP_DEFLATED if appendsRaw is not possible
+
+    Returns:
+      tuple: sha256, size of file
+    """
+    zinfo = ZipInfo.from_file(path, name)
+    zinfo.compress_type = compressType
+    hasher, size = hashlib.sha256(), 0
+    with open(path, 'rb') as fIn, self.zipFile.open(zinfo, 'w') as fOut:
+      while data := fIn.read(CHUNK_SIZE):
+        hasher.update(data)
+        fOut.write(data)
+        size += len(data)
+    return hasher.hexdigest(), size
+
+
+  def appendDeflated(self, name:str, path:Path, crc:int, size:int, spool:IO[bytes]) -> None:
+    """ Append a member whose data is deflated already
+    - same as ZipFile.open(zinfo, 'w').write(), except that compressing is done: header is written with final sizes
+    - uses the internals of ZipFile: only called if appendsRaw
+
+    Args:
+      name (str): name of member
+      path (Path): path of file on disk: date and permissions
+      crc (int): crc32 of data
+      size (int): size of data
+      spool (file): compressed data, file object at its end
+    """
+    zinfo = ZipInfo.from_file(path, name)
+    zinfo.compress_type = ZIP_DEFLATED
+    zinfo.CRC, zinfo.file_size, zinfo.compress_size = crc, size, spool.tell()
+    zipFile = self.zipFile
+    zipFile.fp.seek(zipFile.start_dir)                                          # type: ignore[union-attr]
+    zinfo.header_offset = zipFile.fp.tell()                                     # type: ignore[union-attr]
+    zipFile.fp.write(zinfo.FileHeader())                        # type: ignore[union-attr]  #zip64 if sizes need it
+    spool.seek(0)
+    while data := spool.read(CHUNK_SIZE):
+      zipFile.fp.write(data)                                                    # type: ignore[union-attr]
+    zipFile.start_dir = zipFile.fp.tell()                                       # type: ignore[union-attr]
+    zipFile.filelist.append(zinfo)
+    zipFile.NameToInfo[zinfo.filename] = zinfo
+    return
@@ -0,0 +1,130 @@
+""" Run extractors in a pool of processes
+- each process has its own matplotlib state, hence extractors can run concurrently
+- each process imports all extractors of the add-on directory once, at start
+- results are the filtered content of the extractor: image, metaVendor, metaUser, content, style, general
+"""
+import importlib
+import logging
+import multiprocessing
+import sys
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Iterator, Optional
+import matplotlib
+import matplotlib.pyplot as plt
+
+EXTRACTOR_KEYS = ('metaVendor','metaUser','image','content','style','general')   #only allow accepted keys
+
+
+def runExtractor(absFilePath:Path, docType:str) -> dict[str,Any]:
+  """ Run the extractor of a file: in this process or in a process of the pool
+
+  Args:
+    absFilePath (Path): absolute path of file
+    docType (str): / separated document type that is handed as style to the extractor
+
+  Returns:
+    dict: content of extractor; {'error': traceback} if the extractor failed
+  """
+  plt.clf()
+  try:
+    module  = importlib.import_module(f'extractor_{absFilePath.suffix[1:].lower()}')
+    content = module.use(absFilePath, {'main':docType})
+    return {k:v for k,v in content.items() if k in EXTRACTOR_KEYS}
+  except Exception:
+    return {'error': traceback.format_exc()}
+  finally:
+    plt.close('all')
+
+
+def initProcess(addOnPath:str) -> None:
+  """ Initialize a process of the pool: add-on path and import of all extractors
+
+  Args:
+    addOnPath (str): directory of add-ons
+  """
+  matplotlib.use('Agg')
+  sys.path.insert(0, addOnPath)
+  for pyPath in Path(addOnPath).glob('extractor_*.py'):
+    try:
+      importlib.import_module(pyPath.stem)
+    except Exception:
+      logging.warning('Could not import extractor %s', pyPath.name)
+  return
+
+
+class ExtractorPool:
+  """ Pool of processes that run extractors; started when needed and restarted when extractors change """
+  def __init__(self, addOnPath:Path, processes:int=4):
+    """
+    Args:
+      addOnPath (Path): directory of add-ons
+      processes (int): number of processes
+    """
+    self.addOnPath = addOnPath
+    self.processes = max(1, processes)
+    self.executor:Optional[ProcessPoolExecutor] = None
+    self.signature:list[tuple[str,int]] = []
+
+
+  def extractorSignature(self) -> list[tuple[str,int]]:
+    """ Names and modification times of all extractors: if they change, processes have to import them again
+
+    Returns:
+      list: list of (name, mtime)
+    """
+    return sorted((i.name, i.stat().st_mtime_ns) for i in self.addOnPath.glob('extractor_*.py'))
+
+
+  def run(self, items:list[tuple[Path,str]]) -> Iterator[tuple[int,Optional[dict[str,Any]]]]:
+    """ Run extractors of many files and yield results as they complete
+    - at most 2*processes files are queued, such that results can be used while others are extracted
+    - if the pool fails, e.g. a process crashed or the content cannot be transferred, the content is None and
+      the extractor should be run in this process
+
+    Args:
+      items (list): list of (absolute path, / separated document type)
+
+    Yields:
+      tuple: index in items, content of extractor ({'error': traceback} if extractor failed; None if pool failed)
+    """
+    signature = self.extractorSignature()
+    if self.executor is None or signature != self.signature:
+      self.shutdown()
+      self.executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'),
+                                          initializer=initProcess, initargs=(str(self.addOnPath),))
+      self.signature = signature
+    todo = iter(enumerate(items))
+    running:dict[Future[dict[str,Any]],int] = {}
+    while True:
+      for idx, (path, docType) in todo:
+        try:
+          running[self.executor.submit(runExtractor, path, docType)] = idx
+        except BrokenProcessPool:
+          self.signature = []                                                          #restart at next run
+          yield idx, None
+        if len(running) >= 2*self.processes:
+          break
+      if not running:
+        break
+      finished, _ = wait(running, return_when=FIRST_COMPLETED)
+      for future in finished:
+        idx = running.pop(future)
+        content:Optional[dict[str,Any]] = None
+        try:
+          content = future.result()
+        except Exception as exc:                     #process broke or content could not be transferred
+          logging.warning('Extractor pool failed for %s: %s', items[idx][0], exc)
+          if isinstance(exc, BrokenProcessPool):
+            self.signature = []                                                        #restart at next run
+        yield idx, content
+
+
+  def shutdown(self) -> None:
+    """ Stop all processes """
+    if self.executor is not None:
+      self.executor.shutdown(cancel_futures=True)
+      self.executor = None
+    return
@@ -1,12 +1,21 @@
 """ All hash tools for pasta-eln backend worker """
 import logging
+import mmap
 import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from hashlib import sha1
 from io import BufferedReader
+from itertools import islice
 from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
 from urllib import request
 
+HASH_BUFFER_SIZE = 1024*1024             # 1MiB per read: hashlib releases the GIL for updates larger than 2KiB
+HASH_MMAP_SIZE   = 64*1024*1024          # memory-map files larger than this instead of reading them
 
-def generic_hash(path:Path, forceFile:bool=False) -> str:
+
+def generic_hash(path:Path, forceFile:bool=False, progress:Optional[Callable[[int],None]]=None) -> str:
   """
   Hash an object based on its mode
 
@@ -20,6 +29,7 @@ def generic_hash(path:Path, forceFile:bool=False) -> str:
   Args:
     path (Path): path
     forceFile (bool): force to get shasum of file and not of link (False for gitshasum)
+    progress (func): called with the number of bytes hashed since the last call
 
   Returns:
     string: shasum
@@ -33,7 +43,7 @@ def generic_hash(path:Path, forceFile:bool=False) -> str:
       with request.urlopen(req, timeout=60) as site:
         meta = site.headers
         size = int(meta.get_all('Content-Length')[0])
-        return blob_hash(site, size)
+        return blob_hash(site, size, progress)
     except Exception:
       logging.error('Could not download content / hashing issue %s',path.as_posix().replace(':/','://'), exc_info=True)
       return ''
@@ -45,8 +55,13 @@ def generic_hash(path:Path, forceFile:bool=False) -> str:
   if path.is_symlink():                                                                #if link, hash the link
     shasum = symlink_hash(path)
   elif path.is_file():                                                                             #Local file
+    size = path.stat().st_size
     with open(path, 'rb') as stream:
-      shasum = blob_hash(stream, path.stat().st_size)
+      if size > HASH_MMAP_SIZE:
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+          shasum = buffer_hash(mapped, size, progress)
+      else:
+        shasum = blob_hash(stream, size, progress)
   return shasum
 
 
@@ -62,7 +77,6 @@ def symlink_hash(path:Path) -> str:
   Returns:
     string: shasum of link, aka short string
   """
-  from hashlib import sha1
   hasher = sha1()
   data = os.readlink(path).encode('utf8', 'surrogateescape')
   hasher.update(b'blob {len(data)}\0')
@@ -70,7 +84,7 @@ def symlink_hash(path:Path) -> str:
   return hasher.hexdigest()
 
 
-def blob_hash(stream:BufferedReader, size:int) -> str:
+def blob_hash(stream:BufferedReader, size:int, progress:Optional[Callable[[int],None]]=None) -> str:
   """
   Return (as hash instance) the hash of a blob,
   as read from the given stream
@@ -78,6 +92,7 @@ def blob_hash(stream:BufferedReader, size:int) -> str:
   Args:
     stream (string): content to be hashed
     size (int): size of the content
+    progress (func): called with the number of bytes hashed since the last call
 
   Returns:
     string: shasum
@@ -85,16 +100,95 @@ def blob_hash(stream:BufferedReader, size:int) -> str:
   Raises:
     ValueError: size given is not the size of the stream
   """
-  from hashlib import sha1
   hasher = sha1()
   hasher.update(f'blob {size}\0'.encode('ascii'))
   nRead = 0
   while True:
-    data = stream.read(65536)                                    # read 64K at a time for storage requirements
+    data = stream.read(HASH_BUFFER_SIZE)
     if data == b'':
       break
     nRead += len(data)
     hasher.update(data)
+    if progress is not None:
+      progress(len(data))
   if nRead != size:
     raise ValueError(f'{stream.name}: expected {size} bytes, found {nRead} bytes')
   return hasher.hexdigest()
+
+
+def buffer_hash(buffer:mmap.mmap, size:int, progress:Optional[Callable[[int],None]]=None) -> str:
+  """
+  Return the hash of a blob in memory, e.g. a memory-mapped file; identical to blob_hash
+
+  Args:
+    buffer (mmap): content to be hashed
+    size (int): size of the content
+    progress (func): called with the number of bytes hashed since the last call
+
+  Returns:
+    string: shasum
+  """
+  hasher = sha1()
+  hasher.update(f'blob {size}\0'.encode('ascii'))
+  with memoryview(buffer) as view:
+    for start in range(0, size, 16*HASH_BUFFER_SIZE):
+      hasher.update(view[start:start+16*HASH_BUFFER_SIZE])
+      if progress is not None:
+        progress(min(16*HASH_BUFFER_SIZE, size-start))
+  return hasher.hexdigest()
+
+
+def hash_files(paths:list[Path], workers:int=4, progress:Optional[Callable[[int,int],None]]=None) \
+    -> Iterator[tuple[Path,str]]:
+  """
+  Hash local files in a bounded thread pool and yield the results as they complete
+  - threads hash in parallel since hashlib releases the GIL for large buffers
+  - at most 2*workers files are queued, such that results can be used while others are hashed
+  - the progress callback is called from the calling thread, not the pool
+
+  Example:
+      for path, shasum in hash_files(paths, 8):
+        print(path, shasum)
+
+  Args:
+    paths (list): paths of files
+    workers (int): number of threads
+    progress (func): called with number of bytes hashed and total number of bytes
+
+  Yields:
+    tuple: path, shasum; shasum is empty string if hashing failed
+  """
+  workers = max(1, workers)
+  bytesTotal = 0
+  for path in paths:
+    try:
+      bytesTotal += path.stat().st_size
+    except OSError:
+      pass
+  bytesDone = [0]
+  lock = threading.Lock()
+  def addBytes(nBytes:int) -> None:
+    with lock:
+      bytesDone[0] += nBytes
+  def hashOne(path:Path) -> str:
+    return generic_hash(path, forceFile=True, progress=addBytes)
+
+  todo = iter(paths)
+  running:dict[Future[Any],Path] = {}
+  with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hash') as pool:
+    while True:
+      for path in islice(todo, 2*workers-len(running)):                    #bound is checked before submit
+        running[pool.submit(hashOne, path)] = path
+      if not running:
+        break
+      finished, _ = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+      if progress is not None:
+        progress(bytesDone[0], bytesTotal)
+      for future in finished:
+        path = running.pop(future)
+        try:
+          shasum = future.result()
+        except Exception:
+          logging.error('Hashing issue %s', path.as_posix(), exc_info=True)
+          shasum = ''
+        yield path, shasum
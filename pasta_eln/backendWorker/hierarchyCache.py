@@ -0,0 +1,276 @@
+""" Materialized hierarchies of projects: the database applies deltas after writes, getHierarchy builds the tree
+without querying and sorting all branches of the project again
+"""
+import logging
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Optional
+from anytree import Node
+
+# row of branch: stack (incl. own id), child number, type, name, gui, path, show; as in sq.HIERARCHY_BY_...
+HierarchyRow = tuple[str, int, str, str, str, str, str]
+
+
+class ProjectHierarchy:
+  """
+  Hierarchy of one project as adjacency lists
+  - keys are the stacks of the branches, including the docID: 'x-proj/x-folder/m-measurement'
+  - children of each key are kept sorted by childNum (primary) and docID (secondary), as getHierarchy sorts them
+  - the anytree is kept until the next change: its users only read it
+  """
+  def __init__(self, projID:str) -> None:
+    self.projID = projID
+    self.rows:dict[str,tuple[int,list[str],str,list[bool],str,bool]] = {}  #key: childNum,type,name,gui,path,visible
+    self.children:dict[str,list[tuple[int,str,str]]] = {}                  #key of parent: childNum, docID, key
+    self.keys:dict[str,set[str]]                     = {}                  #docID: keys of its branches in project
+    self.trees:dict[bool,tuple[Optional[Node],bool]] = {}                  #allItems: anytree, error
+
+
+  def add(self, row:HierarchyRow) -> None:
+    """ Add or replace a branch
+
+    Args:
+      row (tuple): row of branch
+    """
+    key, childNum, docType, name, gui, path, show = row
+    parentKey, _, docID = key.rpartition('/')
+    self.trees.clear()
+    if key in self.rows:
+      self.discardKey(key, False)
+    self.rows[key] = (int(childNum), docType.split('/'), name, [i=='T' for i in gui], path, 'F' not in show)
+    self.keys.setdefault(docID, set()).add(key)
+    if parentKey:
+      insort(self.children.setdefault(parentKey, []), (int(childNum), docID, key))
+    return
+
+
+  def discard(self, docID:str, subtree:bool) -> None:
+    """ Remove all branches of a document
+
+    Args:
+      docID (str): document id
+      subtree (bool): remove the branches below, too
+    """
+    for key in list(self.keys.get(docID, ())):
+      self.discardKey(key, subtree)
+    return
+
+
+  def discardKey(self, key:str, subtree:bool) -> None:
+    """ Remove one branch
+
+    Args:
+      key (str): stack of branch, including the docID
+      subtree (bool): remove the branches below, too
+    """
+    parentKey, _, docID = key.rpartition('/')
+    self.trees.clear()
+    row = self.rows.pop(key, None)
+    if row is not None:
+      self.keys[docID].discard(key)
+      if not self.keys[docID]:
+        del self.keys[docID]
+      siblings = self.children.get(parentKey, [])
+      idx = bisect_left(siblings, (row[0], docID, key))
+      if idx < len(siblings) and siblings[idx][2] == key:
+        del siblings[idx]
+    if subtree:
+      for _, _, childKey in self.children.pop(key, []):
+        self.discardKey(childKey, True)
+    return
+
+
+  def tree(self, allItems:bool) -> tuple[Optional[Node],bool]:
+    """ Create the anytree of this hierarchy
+
+    Args:
+      allItems (bool):  true=show all items, false=only non-hidden
+
+    Returns:
+      Node: hierarchy in an anytree
+      bool: error occurred
+    """
+    if allItems in self.trees:
+      return self.trees[allItems]
+    if self.projID not in self.rows or not (allItems or self.rows[self.projID][5]):
+      return None, False
+    childNum, docType, name, gui, _, _ = self.rows[self.projID]
+    dataTree = Node(id=self.projID, docType=docType, name=name, gui=gui, childNum=childNum)
+    error = False
+    todo = [(self.projID, dataTree)]
+    for parentKey, children in self.children.items():       #orphans: parent is missing, add them to the project
+      if parentKey not in self.rows and children:
+        logging.error('Error in the hierarchy tree with parent %s missing', parentKey.split('/')[-1])
+        todo.append((parentKey, dataTree))
+        error = True
+    while todo:
+      parentKey, parentNode = todo.pop()
+      for _, docID, key in self.children.get(parentKey, []):
+        childNum, docType, name, gui, path, visible = self.rows[key]
+        if allItems or visible:
+          node = Node(id=docID, parent=parentNode, docType=docType, name=name, gui=gui, childNum=childNum,
+                      fPath=path)
+          todo.append((key, node))
+    self.trees[allItems] = (dataTree, error)
+    return dataTree, error
+
+
+class HierarchyCache:
+  """
+  Hierarchies of all projects that were requested
+  - shared by the database of the backend worker and its read-only connections in other threads
+  - the writing database applies deltas after each commit, see SqlLiteDB.syncHierarchy
+  """
+  def __init__(self) -> None:
+    self.lock     = threading.Lock()
+    self.projects:dict[str,ProjectHierarchy] = {}
+    self.version  = 0                        #increased by each change: loads that overlapped one are not kept
+
+
+  def tree(self, projID:str, allItems:bool) -> Optional[tuple[Optional[Node],bool]]:
+    """ Create the anytree of a project from the cache
+
+    Args:
+      projID (str): project id
+      allItems (bool):  true=show all items, false=only non-hidden
+
+    Returns:
+      tuple: Node, error; None if project is not in cache
+    """
+    with self.lock:
+      if projID not in self.projects:
+        return None
+      return self.projects[projID].tree(allItems)
+
+
+  def load(self, projID:str, rows:list[Any], version:int, allItems:bool) -> tuple[Optional[Node],bool]:
+    """ Load the hierarchy of a project from the rows of its branches and create its anytree
+
+    Args:
+      projID (str): project id
+      rows (list): rows of all branches in project
+      version (int): version of cache before the rows were read
+      allItems (bool):  true=show all items, false=only non-hidden
+
+    Returns:
+      tuple: Node, error
+    """
+    project = ProjectHierarchy(projID)
+    for row in rows:
+      project.add(row)
+    result = project.tree(allItems)
+    with self.lock:
+      if version == self.version and '/' not in projID:              #only projects; deltas are sorted by them
+        self.projects[projID] = project
+    return result
+
+
+  def update(self, docID:str, rows:list[Any], subtree:bool) -> None:
+    """ Replace all branches of a document by the current rows in the database
+
+    Args:
+      docID (str): document id
+      rows (list): rows of branches of the document; if subtree, also the rows of the branches below
+      subtree (bool): replace the branches below, too
+    """
+    with self.lock:
+      self.version += 1
+      for project in self.projects.values():
+        project.discard(docID, subtree)
+      for row in rows:
+        if (target := self.projects.get(row[0].split('/')[0])) is not None:
+          target.add(row)
+    return
+
+
+  def clear(self) -> None:
+    """ Remove all hierarchies, e.g. after changes that are not tracked """
+    with self.lock:
+      self.version += 1
+      self.projects.clear()
+    return
+
+
+def nodeKeys(root:Node) -> dict[str,Node]:
+  """ All nodes of an anytree by their key: stack of docIDs, including the own
+
+  Args:
+    root (Node): root of tree
+
+  Returns:
+    dict: key -> node
+  """
+  keys:dict[str,Node] = {}
+  todo = [(root.id, root)]
+  while todo:
+    key, node = todo.pop()
+    keys[key] = node
+    todo.extend((f'{key}/{child.id}', child) for child in node.children)
+  return keys
+
+
+def hierarchyDelta(old:Node, new:Node) -> Optional[list[tuple[Any, ...]]]:
+  """ Operations that change the tree of a project, as the GUI shows it, into the current tree
+  - nodes are identified by their key; operations refer to the keys as they are after the previous operations
+  - ('remove', key): remove node and its subtree
+  - ('move', key, newKey): move node and its subtree to the end of the children of its new parent
+  - ('insert', newKey, node): append node and its subtree, as in the current tree
+  - ('update', key, attributes): name, docType, gui, childNum, fPath changed
+  - ('order', key, docIDs): order of the children changed
+  - all cost O(nodes in project) here, but applying them costs only O(changed nodes)
+
+  Args:
+    old (Node): tree that the GUI shows
+    new (Node): current tree
+
+  Returns:
+    list: operations; None if trees are of different projects
+  """
+  if old.id != new.id:
+    return None
+  oldKeys, newKeys = nodeKeys(old), nodeKeys(new)
+  added = {key:None for key in sorted(newKeys, key=lambda i:i.count('/')) if key not in oldKeys}
+  current = {key:key for key in oldKeys if key in newKeys}                   #old key -> key after operations
+  gone:set[str] = set()
+  simChildren = {key:[i.id for i in node.children] for key, node in oldKeys.items()}   #children after operations
+  operations:list[tuple[Any, ...]] = []
+  for key in sorted((i for i in oldKeys if i not in newKeys), key=lambda i:i.count('/')):
+    parentKey, _, docID = key.rpartition('/')
+    if parentKey in gone:
+      gone.add(key)
+      continue
+    currentKey = f'{current.get(parentKey, parentKey)}/{docID}'
+    if currentKey in added:                                                     #carried along by moved parent
+      current[key] = currentKey
+      del added[currentKey]
+      continue
+    reverse = {value:old for old, value in current.items()}
+    newKey = next((i for i in added if i.rpartition('/')[2]==docID and i.rpartition('/')[0] in reverse), None)
+    simChildren[parentKey].remove(docID)
+    if newKey is None:
+      operations.append(('remove', currentKey))
+      gone.add(key)
+    else:
+      operations.append(('move', currentKey, newKey))
+      simChildren[reverse[newKey.rpartition('/')[0]]].append(docID)
+      current[key] = newKey
+      del added[newKey]
+  reverse = {value:old for old, value in current.items()}
+  inserted:set[str] = set()
+  for key in added:
+    parentKey = key.rpartition('/')[0]
+    if parentKey in inserted:
+      inserted.add(key)
+    elif parentKey in reverse:
+      operations.append(('insert', key, newKeys[key]))
+      simChildren[reverse[parentKey]].append(newKeys[key].id)
+      inserted.add(key)
+  orders = []
+  for oldKey, key in current.items():
+    nodeOld, nodeNew = oldKeys[oldKey], newKeys[key]
+    attributes = {i:getattr(nodeNew, i, None) for i in ('name', 'docType', 'gui', 'childNum', 'fPath')}
+    if attributes != {i:getattr(nodeOld, i, None) for i in attributes}:
+      operations.append(('update', key, attributes))
+    if simChildren[oldKey] != (children := [i.id for i in nodeNew.children]):
+      orders.append(('order', key, children))
+  return operations+orders
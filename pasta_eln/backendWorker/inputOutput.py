@@ -1,24 +1,25 @@
 """Input and output functions towards the .eln file-format"""
 import copy
 import hashlib
+import io
 import json
 import logging
 import shutil
-import sys
-import time
 import uuid
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
-from typing import Any
-from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+from typing import Any, TextIO
+from zipfile import ZIP_DEFLATED, ZipFile
 import requests
-from anytree import Node
+from anytree import Node, PreOrderIter
 from pasta_eln import __version__, minisign
 from ..fixedStringsJson import CONF_FILE_NAME
 from ..miscTools import flatten, isDocID
 from ..textTools.html2markdown import html2markdown
 from ..textTools.stringChanges import camelCase
 from .backend import Backend
+from .elnZip import CHUNK_SIZE, ZipMemberWriter
 from .htmlString import htmlEnd, htmlStart, importantKeys
 
 # .eln file: common between all ELNs
@@ -62,6 +63,53 @@ METADATA_FILE = 'ro-crate-metadata.json'
 ###               IMPORT               ###
 ##########################################
 
+def indexGraph(graph:list[dict[str,Any]]) -> tuple[dict[str,dict[str,Any]], set[str]]:
+  """ Index of the nodes of a ro-crate graph by their @id: first node is used if an id occurs multiple times
+
+  Args:
+    graph (list): nodes of ro-crate
+
+  Returns:
+    dict, set: @id to node, ids that occur multiple times
+  """
+  nodesByID:dict[str,dict[str,Any]] = {}
+  duplicates = set()
+  for node in graph:
+    if '@id' not in node:
+      continue
+    if node['@id'] in nodesByID:
+      duplicates.add(node['@id'])
+    else:
+      nodesByID[node['@id']] = node
+  return nodesByID, duplicates
+
+
+def resolveEntities(node:dict[str,Any], nodesByID:dict[str,dict[str,Any]]) -> dict[str,Any]:
+  """ Pull all sub-entries (variableMeasured, comments, ...) into this node: do not pull hasPart-entries in
+  - a key keeps its references if one of them is not in the graph, e.g. a link to an external IRI (http...)
+    or the graph is not fully flattened: @id is in a leaf of a node but not a separate node
+
+  Args:
+    node (dict): node of ro-crate, changed in place
+    nodesByID (dict): index of graph
+
+  Returns:
+    dict: node
+  """
+  for key, value in node.items():
+    if key=='hasPart' or not (isinstance(value,dict) or (isinstance(value,list) and value and isinstance(value[0],dict))):
+      continue
+    if isinstance(value, list):
+      items:list[Any] = [i.get('@id') if isinstance(i, dict) else None for i in value]
+    else:
+      items = [value.get('@id')]
+    if all(i in nodesByID for i in items):
+      node[key] = [nodesByID[i] for i in items]
+    else:
+      logging.warning('Could not replace %s-entries using ids: %s', key, items)
+  return node
+
+
 def importELN(backend:Backend, elnFileName:str, projID:str) -> tuple[str,dict[str,Any]]:
   '''
   import .eln file from other ELN or from PASTA
@@ -77,40 +125,37 @@ def importELN(backend:Backend, elnFileName:str, projID:str) -> tuple[str,dict[st
   elnName = ''
   statistics:dict[str,Any] = {}
   with ZipFile(elnFileName, 'r', compression=ZIP_DEFLATED) as elnFile:
-    files = elnFile.namelist()
+    members = {i.filename:i for i in elnFile.infolist()}                                 #zip index: name to info
+    files = list(members)
     baseFolderSet = {Path(i).parts[0] for i in files}
     if len(baseFolderSet) != 1:
       logging.error('eln file has multiple top-level directories: %s. Cannot process',str(baseFolderSet))
       return f'ERROR: eln file has multiple top-level directories: {baseFolderSet}. Cannot process',{}
     dirName=Path(files[0]).parts[0]
     statistics['num. files'] = len([i for i in files if Path(i).parent!=Path(dirName)])
-    if f'{dirName}/ro-crate-metadata.json' not in files:
+    if f'{dirName}/ro-crate-metadata.json' not in members:
       logging.error('ro-crate does not exist in folder. EXIT')
       return 'ERROR: ro-crate does not exist in folder. EXIT',{}
     graph = json.loads(elnFile.read(f'{dirName}/ro-crate-metadata.json'))['@graph']
-    listAllTypes = [i['@type'] for i in graph if isinstance(i['@type'],str)]
-    statistics['types'] = {i:listAllTypes.count(i) for i in listAllTypes}
+    nodesByID, duplicates = indexGraph(graph)                                #resolve all entities by their @id
+    statistics['types'] = dict(Counter(i['@type'] for i in graph if isinstance(i['@type'],str)))
 
     #find information from master node
     rocrateNode = [i for i in graph if i['@id'].endswith('ro-crate-metadata.json')][0]
     if 'sdPublisher' in rocrateNode:
       publisherNode = rocrateNode['sdPublisher']
       if 'name' not in publisherNode:
-        publisherNode = [i for i in graph if i['@id']==rocrateNode['sdPublisher']['@id']][0]
+        publisherNode = nodesByID[rocrateNode['sdPublisher']['@id']]
       elnName = publisherNode['name']
     logging.info('Import %s', elnName)
     if not projID:
       return 'FAILURE: YOU CANNOT IMPORT AS PROJECT IF NON PASTA-ELN FILE',{}
     backend.changeHierarchy(projID)
     childrenStack = [0]
-    mainNode    = [i for i in graph if i['@id']=='./'][0]
+    mainNode    = nodesByID['./']
     # clean subchildren from mainNode: see https://github.com/TheELNConsortium/TheELNFileFormat/issues/98
-    parentNodes = {i['@id'] for i in mainNode['hasPart']}
-    for nodeAny in graph:
-      if nodeAny['@id']=='./':
-        continue
-      children = {i['@id'] for i in nodeAny.get('hasPart',[])}
-      parentNodes = parentNodes.difference(children)
+    allChildren = {i['@id'] for nodeAny in graph if nodeAny['@id']!='./' for i in nodeAny.get('hasPart',[])}
+    parentNodes = {i['@id'] for i in mainNode['hasPart']} - allChildren
     mainNode['hasPart'] = [{'@id':i} for i in parentNodes]
 
     ################
@@ -214,38 +259,20 @@ def importELN(backend:Backend, elnFileName:str, projID:str) -> tuple[str,dict[st
         return 0
       # print('\nProcess: '+part['@id'])
       # find next node to process
-      docS = [i for i in graph if '@id' in i and i['@id']==part['@id']]
-      if len(docS)!=1 or backend.cwd is None:
-        logging.error('zero or multiple nodes with same id %s or cwd is None in %s', docS, part['@id'], exc_info=True)
+      if part['@id'] not in nodesByID or part['@id'] in duplicates or backend.cwd is None:
+        logging.error('zero or multiple nodes with same id or cwd is None in %s', part['@id'], exc_info=True)
         return -1
-      # pull all subentries (variableMeasured, comments, ...) into this dict: do not pull hasPart-entries in
-      keys = [k for k,v in docS[0].items() if k!='hasPart' and (isinstance(v,dict) or (isinstance(v,list) and len(v)>0 and isinstance(v[0], dict)))]
-      for key in keys:
-        value = docS[0].get(key, [])
-        if isinstance(value, list):
-          items = [i['@id'] for i in value]
-        else:
-          items = [value['@id']]
-        # print(f'Replace {key} -entries using ids: {items}')
-        try:
-          docS[0][key] = [ [j for j in graph if j['@id']==i][0] for i in items]
-        except Exception:
-          # Causes for exception
-          # - @id is a link to external IRI (http...). Hence it is not in the file
-          # - the graph is not fully flattened: @id is in a leaf of a node but not a separate note
-          docS[0][key] = value
-          logging.warning('Could not replace %s-entries using ids: %s', key, items)
       # convert to Pasta's style
-      doc, elnID, children, dataType = json2pastaFunction(docS[0])
+      doc, elnID, children, dataType = json2pastaFunction(resolveEntities(nodesByID[part['@id']], nodesByID))
       if elnName == 'PASTA ELN' and elnID.startswith('http') and ':/' in elnID:
         fullPath = None
       else:
         fullPath = backend.basePath/backend.cwd/elnID.split('/')[-1]
       # Copy file onto hard disk
-      if fullPath is not None and f'{dirName}/{elnID}' in elnFile.namelist() and \
-          not [i for i in elnFile.infolist() if f'{dirName}/{elnID}'==i.filename][0].is_dir():#prevent folders
+      member = members.get(f'{dirName}/{elnID}')
+      if fullPath is not None and member is not None and not member.is_dir():                   #prevent folders
         target = open(fullPath, 'wb')
-        source = elnFile.open(f'{dirName}/{elnID}')
+        source = elnFile.open(member)
         with source, target:                                          #extract one file to its target directly
           shutil.copyfileobj(source, target)
       # FOR ALL ELNs
@@ -290,11 +317,12 @@ def importELN(backend:Backend, elnFileName:str, projID:str) -> tuple[str,dict[st
     #main function
     #iteratively go through list
     addedDocuments = 0
-    for part in mainNode['hasPart']:
-      try:
-        addedDocuments += processPart(part)
-      except Exception:
-        logging.error('Cannot process main part %s', json.dumps(part,indent=2), exc_info=True)
+    with backend.bulk():                                                  #many new documents: commit once
+      for part in mainNode['hasPart']:
+        try:
+          addedDocuments += processPart(part)
+        except Exception:
+          logging.error('Cannot process main part %s', json.dumps(part,indent=2), exc_info=True)
   #return to home stack and path
   backend.cwd = Path(backend.basePath)
   backend.hierStack = []
@@ -327,6 +355,8 @@ def exportELN(backend:Backend, projectIDs:list[str], fileName:str, dTypes:list[s
   dirNameGlobal = fileName.split('/')[-1][:-4]
   with ZipFile(fileName, 'w', compression=ZIP_DEFLATED) as elnFile:
     graph: list[dict[str,Any]] = []
+    docsProject: dict[str,dict[str,Any]] = {}
+    writer = ZipMemberWriter(elnFile)                               #data files: compressed in parallel, in order
 
     def mkDirectory(path:str) -> None:
       """ create directory in zip file
@@ -335,16 +365,9 @@ def exportELN(backend:Backend, projectIDs:list[str], fileName:str, dTypes:list[s
         path (str): path to create
       """
       if path.startswith('./'):
-        fullPath = f'{dirNameGlobal}/{path[2:]}'
-      else:
-        fullPath = f'{dirNameGlobal}/{path}'
-      if sys.version_info >= (3, 11):
-        elnFile.mkdir(fullPath)
+        writer.mkdir(f'{dirNameGlobal}/{path[2:]}')
       else:
-        dirInfo = ZipInfo(fullPath if fullPath.endswith('/') else f'{fullPath}/')
-        dirInfo.date_time = time.localtime(time.time())[:6]
-        dirInfo.external_attr = 0o40775 << 16                                                     # drwxrwxr-x
-        elnFile.writestr(dirInfo, '')
+        writer.mkdir(f'{dirNameGlobal}/{path}')
 
     def processNode(node:Node) -> str:
       """
@@ -358,7 +381,7 @@ def exportELN(backend:Backend, projectIDs:list[str], fileName:str, dTypes:list[s
         str: tree node id
       """
       # create node properties
-      docDB = backend.db.getDoc(node.id)
+      docDB = docsProject[node.id] if node.id in docsProject else backend.db.getDoc(node.id)
       docELN:dict[str,Any] = {'encodingFormat': 'text/markdown'}
       docSupp = {}
       for key, value in docDB.items():
@@ -403,23 +426,23 @@ def exportELN(backend:Backend, projectIDs:list[str], fileName:str, dTypes:list[s
       # include content size, etc
       fullPath = backend.basePath/path
       if path is not None and fullPath.exists() and fullPath.is_file():
-        with open(fullPath, 'rb') as fIn:
-          fileContent = fIn.read()
-          docELN['contentSize'] = str(len(fileContent))
-          docELN['sha256']      = hashlib.sha256(fileContent).hexdigest()
-        # copy data-files
-        elnFile.write(str(fullPath), f'{dirNameGlobal}/{path}')
+        # copy data-files: contentSize and sha256 are added while writing
+        writer.addFile(fullPath, f'{dirNameGlobal}/{path}', docELN)
         docELN['@type'] = 'File'
       elif path is not None and fullPath.exists() and fullPath.is_dir():
         mkDirectory(docELN['@id'][:-1])
         docELN['@type'] = 'Dataset'
       elif path.startswith('http'):
-        response = requests.get(path, timeout=10)
-        if response.ok:
-          docELN['contentSize'] = str(response.headers['content-length'])
-          docELN['sha256']      = hashlib.sha256(response.content).hexdigest()
-        else:
-          print(f"Info: could not get file {path}")
+        with requests.get(path, timeout=10, stream=True) as response:
+          if response.ok:
+            hasher, size = hashlib.sha256(), 0
+            for data in response.iter_content(CHUNK_SIZE):
+              hasher.update(data)
+              size += len(data)
+            docELN['contentSize'] = str(size)
+            docELN['sha256']      = hasher.hexdigest()
+          else:
+            print(f"Info: could not get file {path}")
         docELN['@type'] = 'File'
       elif '@type' not in docELN:                                                        #samples will be here
         docELN['@type'] = 'Dataset'
@@ -488,50 +511,49 @@ def exportELN(backend:Backend, projectIDs:list[str], fileName:str, dTypes:list[s
       return output
 
 
-    def createHTML(graph:list[dict[str,Any]]) -> str:
-      """ create HTML representation of the graph
+    def writeHTML(graph:list[dict[str,Any]], fOut:TextIO) -> None:
+      """ write HTML representation of the graph, node by node
       Args:
         graph (list): list of nodes
-
-      Returns:
-        str: HTML representation
+        fOut (TextIO): member of zip file
       """
-      output = createNodeHTML([i for i in graph if i['@id']=='./'][0])
+      fOut.write(htmlStart)
+      fOut.write(createNodeHTML([i for i in graph if i['@id']=='./'][0]))
       for node in graph:
         if node['@id']=='./' or node['@id'].endswith('ro-crate-metadata.json'):
           continue
-        output += createNodeHTML(node)
-      return htmlStart + output + htmlEnd.replace('___VERSION___', __version__).replace('___DATE___', str(datetime.now()))
+        fOut.write(createNodeHTML(node))
+      fOut.write(htmlEnd.replace('___VERSION___', __version__).replace('___DATE___', str(datetime.now())))
 
 
     # for each project, append to graph
-    masterParts = []
-    for projectID in projectIDs:
-      docProject = backend.db.getDoc(projectID)
-      dirNameProject = docProject['branch'][0]['path']
-      listHier, _ = backend.db.getHierarchy(projectID, allItems=False)#error not handled since should not occur during export
-      processNode(listHier)
-      masterParts.append(f'./{dirNameProject}/')
-
-    # all items have to appear in hasPart of ./ -> masterParts are changed
+    projectParts = []
+    with writer:                                                              #all data files are written at the end
+      for projectID in projectIDs:
+        docProject = backend.db.getDoc(projectID)
+        dirNameProject = docProject['branch'][0]['path']
+        listHier, _ = backend.db.getHierarchy(projectID, allItems=False)#error not handled since should not occur during export
+        docsProject = backend.db.getDocs([i.id for i in PreOrderIter(listHier)])     #all documents of project at once
+        processNode(listHier)
+        projectParts.append(f'./{dirNameProject}/')
+
+    # all items have to appear in hasPart of ./ -> masterParts are all nodes below the projects, in pre-order
     # https://github.com/TheELNConsortium/TheELNFileFormat/issues/98
-    somethingChanged = True                                                                #starting condition
+    nodesByID:dict[str,list[dict[str,Any]]] = {}
+    for node in graph:
+      nodesByID.setdefault(node['@id'], []).append(node)
+    masterParts:list[str] = []
     nodesProcessed = set()
-    while somethingChanged:
-      somethingChanged = False
-      for node in copy.deepcopy(masterParts):
-        if node in nodesProcessed:
-          continue
-        nodesProcessed.add(node)
-        possNodes = [i for i in graph if i['@id']==node]
-        if len(possNodes)==1:
-          idx = masterParts.index(node)
-          variables:list[str] = []
-          # variables = [i['@id'] for i in possNodes[0].get('variableMeasured',[])] #variables go not into ./
-          children            = [i['@id'] for i in possNodes[0].get('hasPart',[])]
-          masterParts = masterParts[:idx+1] + variables + children + masterParts[idx+1:]
-          if variables or children:
-            somethingChanged = True
+    def addParts(nodeID:str) -> None:
+      masterParts.append(nodeID)
+      if nodeID in nodesProcessed:
+        return
+      nodesProcessed.add(nodeID)
+      if len(nodesByID.get(nodeID, []))==1:                             #variables go not into ./, only children
+        for child in nodesByID[nodeID][0].get('hasPart',[]):
+          addParts(child['@id'])
+    for projectPart in projectParts:
+      addParts(projectPart)
 
     # FOR ALL PROJECTS
     # ------------------- create ro-crate-metadata.json header -----------------------
@@ -577,8 +599,11 @@ def exportELN(backend:Backend, projectIDs:list[str], fileName:str, dTypes:list[s
 
     #finalize file
     index['@graph'] = graphMaster+graph+graphMisc
-    elnFile.writestr(f'{dirNameGlobal}/ro-crate-metadata.json', json.dumps(index, indent=2))
-    elnFile.writestr(f'{dirNameGlobal}/ro-crate-preview.html',  createHTML(index['@graph']))
+    metadata = json.dumps(index).encode()                                #compact: this is also the signed content
+    elnFile.writestr(f'{dirNameGlobal}/ro-crate-metadata.json', metadata)
+    with elnFile.open(f'{dirNameGlobal}/ro-crate-preview.html', 'w') as fPreview:
+      with io.TextIOWrapper(fPreview, encoding='utf-8') as fHTML:
+        writeHTML(index['@graph'], fHTML)
     # find nodes that could be defined
     possDefined = [(i['@id'], i['@type'],i.get('identifier','')) for i in index['@graph'] if not isDocID(i.get('identifier',''))]
     definedStr = '  -'+'\n  -'.join([str(i) for i in possDefined if i[2]!=''])
@@ -602,7 +627,7 @@ def exportELN(backend:Backend, projectIDs:list[str], fileName:str, dTypes:list[s
                  'name': f"{backend.configuration['authors'][0]['title']} {backend.configuration['authors'][0]['first']} {backend.configuration['authors'][0]['last']}",
                  'email': backend.configuration['authors'][0]['email'],
                  'orcid': backend.configuration['authors'][0]['orcid']}
-    signature = secretKey.sign(json.dumps(index).encode(), trusted_comment=json.dumps(comment))
+    signature = secretKey.sign(metadata, trusted_comment=json.dumps(comment))
     elnFile.writestr(f'{dirNameGlobal}/ro-crate-metadata.json.minisig', bytes(signature).decode())
     elnFile.writestr(f'{dirNameGlobal}/ro-crate.pubkey', keyPair['public'])
   # end writing zip file
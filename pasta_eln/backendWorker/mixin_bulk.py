@@ -0,0 +1,118 @@
+""" PYTHON MIXIN FOR SQLITE DATABASE containing the bulk mode: many changes are collected and committed once """
+import logging
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Sequence
+from . import sqlQueries as sq
+from .hierarchyCache import HierarchyCache
+
+BULK_SIZE      = 1000                               #bulk mode: write collected rows after this number of documents
+
+
+class Bulk_Mixin:
+  """ Python Mixin for the sqlite database containing the bulk mode and the cursors that write the collected rows """
+  connection: sqlite3.Connection
+  cursorBase: sqlite3.Cursor
+  cursorRowBase: sqlite3.Cursor
+  bulkDepth: int
+  bulkRows: dict[str,list[Any]]
+  definitionsBulk: dict[str,tuple[str,str]]
+  syncSearch: Callable[[], None]
+  hierarchy: HierarchyCache
+  hierarchyPending: dict[str,bool]
+  hierarchyChanges: int
+
+
+  @property
+  def cursor(self) -> sqlite3.Cursor:
+    """ Cursor that returns tuples; rows that are collected in bulk mode are written before its use """
+    if self.bulkRows:
+      self.writeBulkRows()
+    return self.cursorBase
+
+
+  @property
+  def cursorRow(self) -> sqlite3.Cursor:
+    """ Cursor that returns dict-like rows; rows that are collected in bulk mode are written before its use """
+    if self.bulkRows:
+      self.writeBulkRows()
+    return self.cursorRowBase
+
+
+  @contextmanager
+  def bulk(self) -> Iterator[None]:
+    """
+    Bulk mode for many changes, e.g. during import or scan
+    - commit once at the end instead of after each change
+    - synchronous=NORMAL: the WAL journal is synced to disk only at checkpoints
+    - rows of new documents are collected per table and written by one executemany per table; they are
+      written before any other use of the database, hence all queries see them
+    - definitions are written only once per key and content
+    - can be nested: only the outermost bulk mode commits
+    - the hierarchy cache is cleared after the commit: readers might have loaded it from the state before
+
+    Example:
+      with db.bulk():
+        for doc in docs:
+          db.saveDoc(doc)
+    """
+    if self.bulkDepth == 0:
+      self.connection.commit()
+      changes = self.connection.total_changes
+      synchronous = self.cursorBase.execute('PRAGMA synchronous').fetchone()[0]
+      self.cursorBase.execute('PRAGMA synchronous=NORMAL')
+    self.bulkDepth += 1
+    try:
+      yield
+    finally:
+      self.bulkDepth -= 1
+      if self.bulkDepth == 0:
+        try:
+          self.writeBulkRows()
+          self.connection.commit()
+          if self.hierarchyPending or self.connection.total_changes != changes:
+            self.hierarchyPending.clear()
+            self.hierarchy.clear()                               #increases version: loads during bulk are not kept
+          self.hierarchyChanges = self.connection.total_changes
+        finally:
+          self.definitionsBulk = {}
+          self.cursorBase.execute(f'PRAGMA synchronous={int(synchronous)}')
+
+
+  def insertRows(self, statement:str, rows:Iterable[Sequence[Any]]) -> None:
+    """ Insert rows into a table; in bulk mode, they are collected and written later by writeBulkRows
+
+    Args:
+      statement (str): insert statement of sqlQueries
+      rows (iterable): rows of values
+    """
+    if self.bulkDepth == 0:
+      self.cursorBase.executemany(statement, rows)
+      return
+    self.bulkRows.setdefault(statement, []).extend(rows)
+    if len(self.bulkRows.get(sq.MAIN_INSERT, [])) >= BULK_SIZE:
+      self.writeBulkRows()
+    return
+
+
+  def writeBulkRows(self) -> None:
+    """ Write rows that were collected in bulk mode: one executemany per table
+    - if a row fails, the rows of this table are written one by one and the failed rows are reported
+    """
+    bulkRows, self.bulkRows = self.bulkRows, {}
+    if not self.connection.in_transaction:                 #else the release of the savepoint would commit
+      self.cursorBase.execute('BEGIN')
+    for statement, rows in bulkRows.items():
+      self.cursorBase.execute('SAVEPOINT bulkRows')
+      try:
+        self.cursorBase.executemany(statement, rows)
+      except sqlite3.Error:
+        self.cursorBase.execute('ROLLBACK TO bulkRows')
+        for row in rows:
+          try:
+            self.cursorBase.execute(statement, row)
+          except sqlite3.Error:
+            logging.error('SQL command %s did not succeed %s', statement, row, exc_info=True)
+      self.cursorBase.execute('RELEASE bulkRows')
+    self.syncSearch()                                         #the documents of the rows are added to the index
+    return
@@ -0,0 +1,61 @@
+""" PYTHON MIXIN FOR SQLITE DATABASE containing the states of files on disk: only changed files are hashed again """
+import sqlite3
+from typing import TYPE_CHECKING, Callable
+from . import sqlQueries as sq
+
+
+class FileStates_Mixin:
+  """ Python Mixin for the sqlite database containing the states of files, as saved during the last scan """
+  commit: Callable[[], None]
+  if TYPE_CHECKING:
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+      """ Cursor of the database, see Bulk_Mixin """
+
+
+  def getFileStates(self, startPath:str) -> dict[str,tuple[int,int,int,str]]:
+    """
+    Get the states of all files below a path, as saved during the last scan
+
+    Args:
+      startPath (str): path relative to basePath, e.g. that of a project
+
+    Returns:
+      dict: path -> (size, mtimeNs, inode, shasum)
+    """
+    prefix = f"{startPath.removesuffix('/')}/"
+    self.cursor.execute(sq.FILESTATES_BY_PREFIX, (prefix, f'{prefix[:-1]}0'))       #range on primary key: '0'='/'+1
+    return {i[0]:tuple(i[1:]) for i in self.cursor.fetchall()}
+
+
+  def shasumFromFileState(self, size:int, mtimeNs:int, inode:int) -> str:
+    """
+    Get shasum of a file with the same state at any path: file was moved or renamed
+
+    Args:
+      size (int): size of file
+      mtimeNs (int): modification time in ns
+      inode (int): inode of file; 0 if file system does not support inodes
+
+    Returns:
+      str: shasum; empty string if not found
+    """
+    if inode==0:
+      return ''
+    self.cursor.execute(sq.FILESTATES_BY_STAT, (inode, size, mtimeNs))
+    res = self.cursor.fetchone()
+    return '' if res is None else res[0]
+
+
+  def setFileStates(self, states:list[tuple[str,int,int,int,str]], removePaths:list[str]) -> None:
+    """
+    Save the states of files after scanning
+
+    Args:
+      states (list): list of (path, size, mtimeNs, inode, shasum)
+      removePaths (list): paths of files that do not exist anymore
+    """
+    self.cursor.executemany(sq.FILESTATES_REPLACE, states)
+    self.cursor.executemany(sq.FILESTATES_DELETE, [(i,) for i in removePaths])
+    self.commit()
+    return
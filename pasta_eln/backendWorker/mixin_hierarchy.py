@@ -0,0 +1,127 @@
+""" PYTHON MIXIN FOR SQLITE DATABASE containing the hierarchy of projects: siblings, folders and the hierarchy cache """
+import sqlite3
+from typing import TYPE_CHECKING
+from anytree import Node
+from . import sqlQueries as sq
+from .hierarchyCache import HierarchyCache
+
+
+class Hierarchy_Mixin:
+  """ Python Mixin for the sqlite database containing the hierarchy of projects and the cache of their trees """
+  connection: sqlite3.Connection
+  bulkDepth: int
+  hierarchy: HierarchyCache
+  hierarchyPending: dict[str,bool]
+  hierarchyChanges: int
+  if TYPE_CHECKING:
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+      """ Cursor of the database, see Bulk_Mixin """
+
+
+  def changeHierarchy(self, docID:str, subtree:bool=False) -> None:
+    """
+    Register that a change of a document changes the hierarchy: call before the changes, the delta of the hierarchy
+    cache is applied at the next commit
+
+    Args:
+      docID (str): document id
+      subtree (bool): the branches below the document change, too, e.g. their stack
+    """
+    if not self.hierarchyPending and self.connection.total_changes != self.hierarchyChanges:
+      self.syncHierarchy()                                                          #changes before are not tracked
+    self.hierarchyPending[docID] = self.hierarchyPending.get(docID, False) or subtree
+    return
+
+
+  def syncHierarchy(self) -> None:
+    """
+    Apply the registered changes to the hierarchy cache
+    - writes that were not registered by changeHierarchy, e.g. SQL commands of the GUI, clear the cache
+    - in bulk mode, the cache is cleared since reading the current rows would write the collected rows
+    """
+    changes = self.connection.total_changes
+    if self.hierarchyPending and not self.bulkDepth and self.hierarchy.projects:
+      for docID, subtree in self.hierarchyPending.items():
+        self.cursor.execute(sq.HIERARCHY_BY_ID, (docID,))
+        rows = self.cursor.fetchall()
+        for key in [i[0] for i in rows] if subtree else []:
+          self.cursor.execute(sq.HIERARCHY_BY_STACK, (f'{key}/%',))
+          rows += self.cursor.fetchall()
+        self.hierarchy.update(docID, rows, subtree)
+    elif self.hierarchyPending or changes != self.hierarchyChanges:
+      self.hierarchy.clear()
+    self.hierarchyPending.clear()
+    self.hierarchyChanges = changes
+    return
+
+
+  def getHierarchy(self, start:str, allItems:bool=False) -> tuple[Node,bool]:
+    """
+    get hierarchy tree for projects, ..
+
+    Args:
+      start (str): start of the hierarchy (most parent)
+      allItems (bool):  true=show all items, false=only non-hidden
+
+    Returns:
+      Node: hierarchy in an anytree; children sorted by childNum (primary) and docID (secondary)
+      bool: error occurred
+    """
+    self.syncHierarchy()
+    if (result := self.hierarchy.tree(start, allItems)) is None:
+      version = self.hierarchy.version
+      self.cursor.execute(sq.HIERARCHY_BY_STACK, (f'{start}%',))
+      result = self.hierarchy.load(start, self.cursor.fetchall(), version, allItems)
+    # for debugging / checking
+    # from anytree import RenderTree
+    # for pre, _, node in RenderTree(result[0], maxlevel=2):
+    #   print(f'{pre}{node.childNum:03d} {node.name} {node.id}')
+    return result
+
+
+  def nextChildNum(self, stack:list[str]) -> int:
+    """
+    Child number of the next folder below a parent: one after the last folder; hidden folders are counted, too
+    - lookup in the index of siblings, independent of the size of the subtree
+
+    Args:
+      stack (list): stack of the parent, e.g. [projID, folderID]
+
+    Returns:
+      int: child number
+    """
+    self.cursor.execute(sq.BRANCHES_LAST_FOLDER, ('/'.join(stack),))
+    last = self.cursor.fetchone()[0]
+    return 0 if last is None else last+1
+
+
+  def folderStack(self, path:str) -> list[str]:
+    """
+    Stack of the folder at this path, including its own id: e.g. to find the project of a path on disk
+
+    Args:
+      path (str): path of folder relative to basePath
+
+    Returns:
+      list: stack; empty if no folder has this path
+    """
+    self.cursor.execute(sq.BRANCHES_FOLDER_STACK, (path,))
+    row = self.cursor.fetchone()
+    return [] if row is None else row[0].split('/')
+
+
+  def getSiblings(self, stack:list[str], allItems:bool=False) -> list[tuple[str,int,int]]:
+    """
+    Children of a parent, ordered as in the project view: by child number, then by docID
+
+    Args:
+      stack (list): stack of the parent, e.g. [projID, folderID]
+      allItems (bool): true=all children, false=only non-hidden
+
+    Returns:
+      list: docID, child number, index of branch
+    """
+    cmd = sq.BRANCHES_SIBLINGS + ('' if allItems else sq.FILTER_VISIBLE) + sq.BRANCHES_SIBLINGS_ORDER
+    self.cursor.execute(cmd, ('/'.join(stack),))
+    return self.cursor.fetchall()
@@ -0,0 +1,138 @@
+""" PYTHON MIXIN FOR SQLITE DATABASE containing the thumbnail store: images of documents as raw bytes """
+import base64
+import sqlite3
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional, Sequence
+from . import sqlQueries as sq
+
+THUMBNAIL_REF  = 'thumbnail:'                        #main.image of documents whose image is in thumbnails table
+
+
+def imageToBlob(image:str) -> Optional[tuple[str,bytes]]:
+  """ Convert image of extractor into raw bytes for the thumbnail store
+
+  Args:
+    image (str): base64 data-URI, e.g. 'data:image/png;base64,...', or svg-text
+
+  Returns:
+    tuple: format (png, jpg, svg, ...), raw bytes; None if image cannot be converted
+  """
+  if image.startswith('data:image/') and ';base64,' in image:
+    header, data = image.split(',', 1)
+    try:
+      return header[11:].split(';')[0], base64.b64decode(data)
+    except ValueError:
+      return None
+  if image.startswith(('<?xml', '<svg')):
+    return 'svg', image.encode('utf-8')
+  return None
+
+
+def blobToImage(imageFormat:str, data:bytes) -> str:
+  """ Convert raw bytes of thumbnail store back into image as extractors create it
+
+  Args:
+    imageFormat (str): format (png, jpg, svg, ...)
+    data (bytes): raw bytes
+
+  Returns:
+    str: base64 data-URI or svg-text
+  """
+  if imageFormat == 'svg':
+    return data.decode('utf-8')
+  return f'data:image/{imageFormat};base64,{base64.b64encode(data).decode()}'
+
+
+def moveImagesToThumbnails(cursor:sqlite3.Cursor) -> None:
+  """ Migration: thumbnails by document, such that documents with the same file keep their own image
+  - images of documents with shasum are moved from main table into thumbnails table
+  - thumbnails that were shared by the documents with the same shasum are copied for each document
+
+  Args:
+    cursor (sqlite3.Cursor): cursor of database
+  """
+  cursor.execute('CREATE TABLE thumbnailsByDoc (id TEXT, shasum TEXT, format TEXT, data BLOB, PRIMARY KEY (id))')
+  cursor.execute('INSERT INTO thumbnailsByDoc SELECT main.id, thumbnails.shasum, thumbnails.format, thumbnails.data '
+                 'FROM main JOIN thumbnails ON main.image == ? || thumbnails.shasum', (THUMBNAIL_REF,))
+  cursor.execute('DROP TABLE thumbnails')
+  cursor.execute('ALTER TABLE thumbnailsByDoc RENAME TO thumbnails')
+  cursor.execute("SELECT id, shasum, image FROM main WHERE shasum != '' AND length(image) > 0 AND "
+                 'substr(image, 1, 10) != ?', (THUMBNAIL_REF,))
+  for docID, shasum, image in cursor.fetchall():
+    if (blob := imageToBlob(image)) is not None:
+      cursor.execute(sq.THUMBNAILS_REPLACE, (docID, shasum, *blob))
+      cursor.execute(sq.MAIN_UPDATE_IMAGE, (f'{THUMBNAIL_REF}{shasum}', docID))
+  return
+
+
+class Thumbnails_Mixin:
+  """ Python Mixin for the sqlite database containing the thumbnail store """
+  insertRows: Callable[[str, Iterable[Sequence[Any]]], None]
+  if TYPE_CHECKING:
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+      """ Cursor of the database, see Bulk_Mixin """
+
+
+  def storeImage(self, image:str, shasum:str, docID:str) -> str:
+    """
+    Store image of a document in the thumbnail store, keyed by the document; the shasum of the document is the
+    version of the image
+    - raw bytes instead of base64: smaller database; main table and its queries stay small
+    - documents without shasum keep their image in the main table
+    - documents with the same file have their own image, e.g. if they use different extractors
+
+    Args:
+      image (str): image as base64 data-URI or svg-text; or reference to thumbnail store
+      shasum (str): shasum of document
+      docID (str): document id
+
+    Returns:
+      str: value for main.image: reference to thumbnail store or image itself
+    """
+    if not shasum or not image or image.startswith(THUMBNAIL_REF) or (blob := imageToBlob(image)) is None:
+      return image
+    self.insertRows(sq.THUMBNAILS_REPLACE, [(docID, shasum, *blob)])
+    return f'{THUMBNAIL_REF}{shasum}'
+
+
+  def getImage(self, image:str, docID:str) -> str:
+    """
+    Get image of a document: load it from the thumbnail store, if main.image is a reference
+    - only call when image is shown, e.g. in details, gallery, project view
+
+    Args:
+      image (str): main.image of document
+      docID (str): document id
+
+    Returns:
+      str: image as base64 data-URI or svg-text; empty string if not found
+    """
+    if not image.startswith(THUMBNAIL_REF):
+      return image
+    self.cursor.execute(sq.THUMBNAILS_BY_ID, (docID, image[len(THUMBNAIL_REF):]))
+    row = self.cursor.fetchone()
+    return '' if row is None else blobToImage(*row)
+
+
+  def getThumbnails(self, docIDs:list[str]) -> list[tuple[str,str,str,bytes]]:
+    """
+    Get the images of many documents as raw bytes, e.g. for the gallery
+    - only id and image are read; images are not converted to base64 and back
+
+    Args:
+      docIDs (list): document ids
+
+    Returns:
+      list: docID, key of image (docID/shasum in thumbnail store or docID), format, raw bytes; docs without image
+        are missing
+    """
+    thumbnails = []
+    for start in range(0, len(docIDs), sq.CHUNK_SIZE):
+      chunk = docIDs[start:start+sq.CHUNK_SIZE]
+      self.cursor.execute(sq.inList(sq.THUMBNAILS_BY_IDS, len(chunk)), chunk)
+      for docID, image, imageFormat, data in self.cursor.fetchall():
+        if data is not None:
+          thumbnails.append((docID, f'{docID}/{image[len(THUMBNAIL_REF):]}', imageFormat, data))
+        elif image and not image.startswith(THUMBNAIL_REF) and (blob := imageToBlob(image)) is not None:
+          thumbnails.append((docID, docID, *blob))                            #image in main table: docs without shasum
+    return thumbnails
@@ -0,0 +1,169 @@
+""" PYTHON MIXIN FOR SQLITE DATABASE containing the tables of docTypes and the full-text search """
+import re
+import sqlite3
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence
+import pandas as pd
+from . import sqlQueries as sq
+from .sqlQueries import MAIN_ORDER
+
+
+@lru_cache(maxsize=64)
+def compileRegex(pattern:str) -> Optional[re.Pattern[str]]:
+  """ Compile the regular expression of a filter once; None if it is invalid, e.g. while the user types it """
+  try:
+    return re.compile(pattern, re.IGNORECASE)
+  except re.error:
+    return None
+
+
+def regexp(pattern:str, value:Any) -> bool:
+  """ REGEXP function of the connections: 'value REGEXP pattern' is true if the pattern is found in the value
+
+  Args:
+    pattern (str): regular expression, case-insensitive
+    value (Any): value of the column
+
+  Returns:
+    bool: pattern found; an invalid pattern is found nowhere
+  """
+  regex = compileRegex(pattern)
+  return value is not None and regex is not None and regex.search(str(value)) is not None
+
+
+def createSearchIndex(cursor:sqlite3.Cursor) -> None:
+  """ Migration: create the full-text search index and add all documents to it
+
+  Args:
+    cursor (sqlite3.Cursor): cursor of database
+  """
+  cursor.execute(sq.SEARCH_CREATE_IDS)
+  cursor.execute(sq.SEARCH_CREATE)
+  cursor.execute(sq.SEARCH_INSERT_ALL_IDS)
+  cursor.execute(sq.SEARCH_INSERT_ALL)
+  return
+
+
+def searchQuery(text:str) -> str:
+  """ Convert the text of the user into a query of the full-text search: all words have to be found, as prefixes
+  - the words are quoted, hence characters that have a meaning in FTS5 queries, e.g. '-', ':', '*', are searched for
+
+  Args:
+    text (str): text of user, e.g. 'simple csv'
+
+  Returns:
+    str: FTS5 query, e.g. '"simple"* "csv"*'
+  """
+  words = [word.replace('"', '""') for word in text.split()]
+  return ' '.join(f'"{word}"*' for word in words)
+
+
+class Views_Mixin:
+  """ Python Mixin for the sqlite database containing the tables of docTypes, their pages and the full-text search """
+  connection: sqlite3.Connection
+  bulkRows: dict[str,list[Any]]
+  viewOrder: tuple[tuple[Any,...],list[str]]
+  dataHierarchy: Callable[[str, str], list[Any]]
+  writeBulkRows: Callable[[], None]
+  if TYPE_CHECKING:
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+      """ Cursor of the database, see Bulk_Mixin """
+
+
+  def viewDocType(self, docType:str, allFlag:bool=False, startKey:Optional[str]=None) -> tuple[list[str],sqlite3.Cursor]:
+    """
+    Table of a docType, computed by one statement; iterate the cursor to stream the rows
+
+    Args:
+        docType (str): docType, e.g. 'measurement'; also includes its sub-types
+        allFlag (bool): include hidden items
+        startKey (str): if given, only include items whose stack starts with this key
+
+    Returns:
+        list, Cursor: human-readable column names, cursor with rows as tuples of strings
+    """
+    viewColumns = self.viewColumns(docType)
+    cmd, params = sq.viewDocType(viewColumns, MAIN_ORDER, docType, allFlag, startKey)
+    if self.bulkRows:
+      self.writeBulkRows()
+    cursor = self.connection.cursor()                    #own cursor: other queries can run while rows are streamed
+    cursor.execute(cmd, params)
+    return [i[1:] if i.startswith('.') else i for i in viewColumns]+['show'], cursor
+
+
+  def viewDocTypePage(self, docType:str, allFlag:bool=False, startKey:Optional[str]=None, offset:int=0,
+                      limit:int=-1, sortColumn:int=0, ascending:bool=True,
+                      filters:Sequence[tuple[int,str,bool]]=()) -> tuple[pd.DataFrame,int]:
+    """
+    Window of the table of a docType: SQLite filters and sorts the rows, only the rows of the window are sent
+    - the sorted ids of the last query are kept until the query or the database changes: scrolling through pages
+      only reads the rows of each page
+
+    Args:
+        docType (str): docType, e.g. 'measurement'; also includes its sub-types
+        allFlag (bool): include hidden items
+        startKey (str): if given, only include items whose stack starts with this key
+        offset (int): index of first row of window
+        limit (int): number of rows of window; -1 for all rows
+        sortColumn (int): index of the column to sort by
+        ascending (bool): sort ascending
+        filters (list): column index, case-insensitive regular expression, inverse; rows have to pass all filters
+
+    Returns:
+        DataFrame, int: rows of window with human-readable column names, number of rows that pass the filters
+    """
+    viewColumns = self.viewColumns(docType)
+    columns = [i[1:] if i.startswith('.') else i for i in viewColumns]+['show']
+    if self.bulkRows:
+      self.writeBulkRows()
+    cursor = self.connection.cursor()
+    version = cursor.execute('PRAGMA data_version').fetchone()[0], self.connection.total_changes #commits of all
+    query = (docType, allFlag, startKey, sortColumn, ascending, tuple(tuple(i) for i in filters), version, viewColumns)
+    if self.viewOrder[0] != query:
+      cmd, params = sq.viewDocType(viewColumns, MAIN_ORDER, docType, allFlag, startKey)
+      cmdPage, paramsPage = sq.viewPage(cmd, len(viewColumns), filters, sortColumn, ascending)
+      self.viewOrder = query, [i[0] for i in cursor.execute(cmdPage, params+paramsPage)]
+    docIDs = self.viewOrder[1][offset:] if limit < 0 else self.viewOrder[1][offset:offset+limit]
+    rows:dict[str,tuple[Any,...]] = {}
+    for idx in range(0, len(docIDs), sq.CHUNK_SIZE):
+      cmd, params = sq.viewDocType(viewColumns, MAIN_ORDER, docType, allFlag, startKey,
+                                   docIDs[idx:idx+sq.CHUNK_SIZE])
+      rows |= {i[-2]:i for i in cursor.execute(cmd, params)}
+    cursor.close()
+    return pd.DataFrame([rows[i] for i in docIDs if i in rows], columns=columns), len(self.viewOrder[1])
+
+
+  def search(self, query:str, docTypes:Sequence[str]=(), projID:str='', limit:int=100) -> list[dict[str,Any]]:
+    """
+    Full-text search in names, comments, content, tags and values of properties of all documents
+
+    Args:
+        query (str): words to search for; each word is a prefix and all words have to be found
+        docTypes (list): only include these docTypes, including their sub-types; default: all
+        projID (str): only include documents in this project
+        limit (int): maximal number of results
+
+    Returns:
+        list: results ordered by relevance: id, name, type, snippet (with found words in []), rank (lower=better)
+    """
+    if not (ftsQuery := searchQuery(query)):
+      return []
+    params = [ftsQuery, *[f'{i}%' for i in docTypes]] + ([f'{projID}%'] if projID else []) + [limit]
+    self.cursor.execute(sq.search(len(docTypes), bool(projID)), params)
+    return [{'id':i[0], 'name':i[1], 'type':i[2].split('/'), 'snippet':i[3], 'rank':i[4]}
+            for i in self.cursor.fetchall()]
+
+
+  def viewColumns(self, docType:str) -> list[str]:
+    """
+    Columns of the table of a docType, as defined in the data hierarchy
+
+    Args:
+        docType (str): docType, e.g. 'measurement'
+
+    Returns:
+        list: columns, the last one is 'id'
+    """
+    viewColumns = self.dataHierarchy(docType, 'view')
+    return viewColumns+['id'] if viewColumns and viewColumns != [''] else ['name','tags','comment','id']
@@ -1,5 +1,91 @@
-"""Parent class to repository classes"""
-from typing import Any
+"""Parent class to repository classes
+- uploads of large files: streamed from disk, retried with backoff, resumable by a token next to the file
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+CHUNK_SIZE = 1024*1024                                                   # bytes per read of files during upload
+RETRIES    = 5                                                                      # attempts of each request
+BACKOFF    = 1.0                                               # seconds before the first retry, doubled each time
+TIMEOUT    = (10, 300)                      # seconds: connect, read; read timeout is per response, not per upload
+IDEMPOTENT = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}          # methods whose repetition does not change more
+
+
+class UploadBody:
+  """ Part of a file as body of a request: read in chunks, such that memory does not depend on the file size
+  - has a length: requests sends Content-Length instead of chunked transfer encoding
+  - prefix and suffix are sent before and after the part, e.g. multipart/form-data boundaries
+  """
+  def __init__(self, path:str, offset:int=0, length:int=-1, prefix:bytes=b'', suffix:bytes=b''):
+    """ Initialize
+
+    Args:
+      path (str): path of file
+      offset (int): start of part in file
+      length (int): length of part; -1 = till the end of the file
+      prefix (bytes): bytes sent before the part
+      suffix (bytes): bytes sent after the part
+    """
+    self.path, self.offset = path, offset
+    self.length = os.path.getsize(path)-offset if length<0 else length
+    self.prefix, self.suffix = prefix, suffix
+    self.position = 0
+    self.file:Optional[Any] = None
+
+
+  def __len__(self) -> int:
+    return len(self.prefix)+self.length+len(self.suffix)
+
+
+  def read(self, size:int=-1) -> bytes:
+    """ Read next bytes of body
+
+    Args:
+      size (int): maximum number of bytes; -1 = CHUNK_SIZE
+
+    Returns:
+      bytes: data; empty at the end
+    """
+    size = CHUNK_SIZE if size is None or size<0 else size
+    if self.position < len(self.prefix):
+      data = self.prefix[self.position:self.position+size]
+    elif self.position < len(self.prefix)+self.length:
+      if self.file is None:
+        self.file = open(self.path, 'rb')                                     # pylint: disable=consider-using-with
+        self.file.seek(self.offset)
+      data = self.file.read(min(size, len(self.prefix)+self.length-self.position))
+      if not data:
+        raise OSError(f'File shorter than expected: {self.path}')
+    else:
+      data = self.suffix[self.position-len(self.prefix)-self.length:][:size]
+      if self.file is not None:
+        self.file.close()
+        self.file = None
+    self.position += len(data)
+    return data
+
+
+def fileMD5(path:str) -> str:
+  """ MD5 checksum of a file, as repositories use it to verify uploads
+
+  Args:
+    path (str): path of file
+
+  Returns:
+    str: hex digest
+  """
+  hasher = hashlib.md5()
+  with open(path, 'rb') as fIn:
+    while data := fIn.read(CHUNK_SIZE):
+      hasher.update(data)
+  return hasher.hexdigest()
 
 
 class RepositoryClient:
@@ -14,6 +100,122 @@ class RepositoryClient:
     """
     self.api_token = api_token
     self.server_url = server_url
+    self.session = requests.Session()                                  #keep-alive: one connection for all requests
+    self.session.mount('http://',  HTTPAdapter(pool_maxsize=4))
+    self.session.mount('https://', HTTPAdapter(pool_maxsize=4))
+    self.backoff = BACKOFF
+    self.export:dict[str,Any] = {}             #what the uploaded file contains: a token of another one is stale
+
+
+  def request(self, method:str, url:str, body:Optional[Callable[[],Any]]=None, retry:Optional[bool]=None,
+              **kwargs:Any) -> requests.Response:
+    """
+    Request with retries: connection errors, timeouts and server errors (5xx, 429) are retried with exponential backoff
+    - only idempotent requests are retried: a repeated POST might create or publish twice, if the server received
+      the first one and only its response was lost
+
+    Args:
+      method (str): GET, POST, PUT, ...
+      url (str): url
+      body (func): creates the data of the request for each attempt, e.g. UploadBody
+      retry (bool): retry the request; default: if the method is idempotent
+      kwargs (dict): arguments of requests, e.g. headers, params, json
+
+    Returns:
+      Response: response of the last attempt
+
+    Raises:
+      requests.RequestException: if the last attempt failed to connect
+    """
+    kwargs.setdefault('timeout', TIMEOUT)
+    attempts = RETRIES if (method.upper() in IDEMPOTENT if retry is None else retry) else 1
+    for attempt in range(attempts):
+      if body is not None:
+        kwargs['data'] = body()
+      try:
+        response = self.session.request(method, url, **kwargs)
+        if (response.status_code < 500 and response.status_code != 429) or attempt == attempts-1:
+          return response
+        logging.warning('Repository %s %s: status %s, attempt %s', method, url, response.status_code, attempt+1)
+      except (requests.ConnectionError, requests.Timeout, OSError):
+        logging.warning('Repository %s %s: connection failed, attempt %s', method, url, attempt+1)
+        if attempt == attempts-1:
+          raise
+      time.sleep(self.backoff*2**attempt)
+    return response
+
+
+  def loadResume(self, file_path:str) -> dict[str,Any]:
+    """
+    State of a previous, interrupted upload of this file to this server
+
+    Args:
+      file_path (str): path of uploaded file
+
+    Returns:
+      dict: state; empty if none or if file or its export changed since
+    """
+    tokenPath = Path(f'{file_path}.upload.json')
+    if not tokenPath.exists():
+      return {}
+    try:
+      state:dict[str,Any] = json.loads(tokenPath.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+      return {}
+    stat = os.stat(file_path)
+    if state.get('server')!=self.server_url or state.get('size')!=stat.st_size or state.get('mtime')!=stat.st_mtime \
+       or state.get('export', {})!=self.export:
+      return {}
+    logging.info('Resume upload of %s to %s', file_path, self.server_url)
+    return state
+
+
+  def saveResume(self, file_path:str, state:dict[str,Any]) -> None:
+    """
+    Save state of upload next to the file, such that an interrupted upload can be resumed
+
+    Args:
+      file_path (str): path of uploaded file
+      state (dict): state of upload, e.g. ids on server and uploaded parts
+    """
+    stat = os.stat(file_path)
+    state |= {'server':self.server_url, 'size':stat.st_size, 'mtime':stat.st_mtime, 'export':self.export}
+    Path(f'{file_path}.upload.json').write_text(json.dumps(state), encoding='utf-8')
+    return
+
+
+  def clearResume(self, file_path:str) -> None:
+    """
+    Remove state of upload, after success
+
+    Args:
+      file_path (str): path of uploaded file
+    """
+    Path(f'{file_path}.upload.json').unlink(missing_ok=True)
+    return
+
+
+  @staticmethod
+  def resumable(file_path:str, export:dict[str,Any]) -> bool:
+    """
+    Can an interrupted upload of an exported file be resumed: the file exists and its resume token belongs to the
+    same export; a stale token, e.g. of an export of an older state of the data, is removed
+
+    Args:
+      file_path (str): path of exported file
+      export (dict): what the file would contain now, e.g. project, docTypes and state of its documents
+
+    Returns:
+      bool: resume the upload of the existing file; else export again
+    """
+    tokenPath = Path(f'{file_path}.upload.json')
+    try:
+      if Path(file_path).exists() and json.loads(tokenPath.read_text(encoding='utf-8')).get('export') == export:
+        return True
+    except (OSError, ValueError):
+      pass
+    tokenPath.unlink(missing_ok=True)
+    return False
 
 
   def checkServer(self) -> tuple[bool, str]:
@@ -0,0 +1,277 @@
+""" Registry of parameterized SQL statements used by the sqlite database
+- every statement is a constant text with ? placeholders: the text is identical for each call, such that sqlite3's
+  statement cache can reuse the compiled statement and no quoting of values is necessary
+- statements for many ids use 'inList' with chunks of CHUNK_SIZE ids: all full chunks share one statement text
+- statements that differ only in optional filters are assembled by 'viewFilter' from constant fragments
+"""
+from typing import Any, Optional, Sequence
+
+CHUNK_SIZE             = 500                   #ids per IN (...) statement; below the old SQLite limit of 999 variables
+
+def inList(statement:str, number:int) -> str:
+  """ Fill the IN (...) list of a statement with placeholders
+
+  Args:
+    statement (str): statement with '{}' as content of the IN list
+    number (int): number of placeholders
+
+  Returns:
+    str: statement
+  """
+  return statement.format(', '.join(['?']*number))
+
+# main table
+MAIN_ORDER             = ['id'  ,'name','user','type','dateCreated','dateModified','gui',      'client','shasum','image','content','comment','externalId','dateSync']
+MAIN_TYPE              = ['TEXT','TEXT','TEXT','TEXT','TEXT',       'TEXT',        'varchar(2)','TEXT',  'TEXT',  'TEXT', 'TEXT',   'TEXT',   'TEXT',     'TEXT']
+MAIN_BY_ID             = 'SELECT * FROM main WHERE id == ?'
+MAIN_BY_IDS            = 'SELECT * FROM main WHERE id IN ({})'
+MAIN_INSERT            = 'INSERT INTO main VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+MAIN_TYPE_NAME_BY_ID   = 'SELECT type, name FROM main WHERE id == ?'
+MAIN_UPDATE_TYPE_IMAGE = 'UPDATE main SET type=?, image=? WHERE id == ?'
+MAIN_UPDATE_IMAGE      = 'UPDATE main SET image=? WHERE id == ?'
+MAIN_SHASUM_BY_ID      = 'SELECT shasum FROM main WHERE id == ?'
+MAIN_UPDATE_GUI        = 'UPDATE main SET gui=? WHERE id == ?'
+MAIN_BY_PATH           = 'SELECT main.name, main.type, branches.path, main.id, main.comment FROM main JOIN branches '\
+                         'USING(id) WHERE branches.path == ?'
+MAIN_DELETE            = 'DELETE FROM main WHERE id == ?'
+MAIN_STATE_BY_STACK    = 'SELECT COUNT(*), MAX(main.dateModified) FROM main JOIN branches USING(id) '\
+                         'WHERE branches.stack LIKE ?'                  #changes of documents below, e.g. a project
+MAIN_UPDATE_COLUMNS    = ('name','user','type','dateModified','dateSync','client','shasum','image','content','comment')
+
+def mainUpdate(columns:list[str]) -> str:
+  """ Statement to update the given columns of the main table; only known columns are allowed
+
+  Args:
+    columns (list): columns to update, in order of the parameters
+
+  Returns:
+    str: statement with the docID as last parameter
+  """
+  if not set(columns).issubset(MAIN_UPDATE_COLUMNS):
+    raise ValueError(f'Cannot update these columns of main: {columns}')
+  return f"UPDATE main SET {', '.join(f'{i}=?' for i in columns)} WHERE id == ?"
+
+# tags and qrCodes
+TAGS_BY_ID             = 'SELECT tag FROM tags WHERE id == ?'
+TAGS_BY_IDS            = 'SELECT id, tag FROM tags WHERE id IN ({})'
+TAGS_INSERT            = 'INSERT INTO tags VALUES (?, ?)'
+TAGS_DELETE_ONE        = 'DELETE FROM tags WHERE id == ? and tag == ?'
+TAGS_DELETE            = 'DELETE FROM tags WHERE id == ?'
+QRCODES_BY_ID          = 'SELECT qrCode FROM qrCodes WHERE id == ?'
+QRCODES_BY_IDS         = 'SELECT id, qrCode FROM qrCodes WHERE id IN ({})'
+QRCODES_INSERT         = 'INSERT INTO qrCodes VALUES (?, ?)'
+QRCODES_DELETE_ONE     = 'DELETE FROM qrCodes WHERE id == ? and qrCode == ?'
+QRCODES_DELETE         = 'DELETE FROM qrCodes WHERE id == ?'
+
+# branches
+BRANCHES_BY_ID         = 'SELECT * FROM branches WHERE id == ?'
+BRANCHES_BY_IDS        = 'SELECT * FROM branches WHERE id IN ({}) ORDER BY id, idx'
+BRANCHES_INFO_BY_ID    = 'SELECT stack, child, path, show FROM branches WHERE id == ?'
+BRANCHES_IDS_BY_ID     = 'SELECT id FROM branches WHERE id == ?'
+BRANCHES_IDX_BY_ID     = 'SELECT idx FROM branches WHERE id == ?'
+BRANCHES_SHOW_BY_ID    = 'SELECT show FROM branches WHERE id == ?'
+BRANCHES_BY_PATH       = 'SELECT path, stack, show FROM branches WHERE path == ?'
+BRANCHES_BY_STACK      = 'SELECT path, stack, show FROM branches WHERE stack == ?'
+BRANCHES_BY_ID_IDX     = 'SELECT path, stack, show FROM branches WHERE id == ? and idx == ?'
+BRANCHES_CHILDREN      = 'SELECT path, stack, show, id, idx FROM branches WHERE stack LIKE ?'
+BRANCHES_CONTAIN       = 'SELECT id, idx, stack, show FROM branches WHERE stack LIKE ?'
+BRANCHES_INSERT        = 'INSERT INTO branches VALUES (?, ?, ?, ?, ?, ?)'
+BRANCHES_UPDATE_BY_IDX = 'UPDATE branches SET stack=?, path=?, child=?, show=? WHERE id == ? and idx == ?'
+BRANCHES_UPDATE_BY_PATH= 'UPDATE branches SET stack=?, child=?, path=?, show=? WHERE path == ? and stack == ?'
+BRANCHES_UPDATE_CHILD  = 'UPDATE branches SET path=?, stack=?, show=? WHERE id == ? and idx == ?'
+BRANCHES_UPDATE_SHOW   = 'UPDATE branches SET show=? WHERE id == ? and idx == ?'
+BRANCHES_UPDATE_STACK  = 'UPDATE branches SET path=?, stack=? WHERE id == ? and stack == ?'
+BRANCHES_UPDATE_PATH   = 'UPDATE branches SET path=? WHERE id == ? and path == ?'
+BRANCHES_UPDATE_PATH0  = 'UPDATE branches SET path=? WHERE id == ? and idx == 0'
+BRANCHES_DELETE        = 'DELETE FROM branches WHERE id == ?'
+BRANCHES_DELETE_PATH   = 'DELETE FROM branches WHERE id == ? and path == ?'
+BRANCHES_DELETE_STACK  = 'DELETE FROM branches WHERE id == ? and stack LIKE ?'
+BRANCHES_DELETE_BRANCH = 'DELETE FROM branches WHERE stack == ?'
+# siblings: children of one parent; the stack of a branch ends with its id, the rest is the stack of the parent
+# - the expression is indexed together with child (idxBranchesParent): queries have to use it verbatim
+BRANCHES_PARENT        = 'substr(stack, 1, length(stack)-length(id)-1)'
+BRANCHES_SIBLINGS      = f'SELECT id, child, idx FROM branches WHERE {BRANCHES_PARENT} == ?'
+BRANCHES_SIBLINGS_ORDER= ' ORDER BY child, id'
+BRANCHES_LAST_FOLDER   = f"SELECT MAX(child) FROM branches WHERE {BRANCHES_PARENT} == ? and id LIKE 'x-%' and child < 9999"
+BRANCHES_FOLDER_STACK  = "SELECT stack FROM branches WHERE path == ? and id LIKE 'x-%'"
+# rows of hierarchy cache: stack, child, type, name, gui, path, show
+HIERARCHY_BY_ID        = 'SELECT branches.stack, branches.child, main.type, main.name, main.gui, branches.path, '\
+                         'branches.show FROM branches INNER JOIN main USING(id) WHERE branches.id == ?'
+HIERARCHY_BY_STACK     = 'SELECT branches.stack, branches.child, main.type, main.name, main.gui, branches.path, '\
+                         'branches.show FROM branches INNER JOIN main USING(id) WHERE branches.stack LIKE ?'
+
+# properties, attachments and changes
+PROPERTIES_BY_ID       = 'SELECT properties.key, properties.value, properties.unit, definitions.long, definitions.PURL, '\
+                         'docTypeSchema.unit FROM properties LEFT JOIN definitions USING(key) '\
+                         "LEFT JOIN docTypeSchema ON properties.key = (docTypeSchema.class || '.' || docTypeSchema.name) "\
+                         'WHERE properties.id == ?'
+PROPERTIES_BY_IDS      = 'SELECT properties.id, properties.key, properties.value, properties.unit, definitions.long, '\
+                         'definitions.PURL, docTypeSchema.unit FROM properties LEFT JOIN definitions USING(key) '\
+                         "LEFT JOIN docTypeSchema ON properties.key = (docTypeSchema.class || '.' || docTypeSchema.name) "\
+                         'WHERE properties.id IN ({})'
+PROPERTIES_KEY_VALUE   = 'SELECT key, value FROM properties WHERE id == ?'
+PROPERTIES_INSERT      = 'INSERT INTO properties VALUES (?, ?, ?, ?)'
+PROPERTIES_REPLACE     = 'INSERT OR REPLACE INTO properties VALUES (?, ?, ?, ?)'
+PROPERTIES_UPDATE      = 'UPDATE properties SET value=? WHERE id == ? and key == ?'
+PROPERTIES_DELETE_ONE  = 'DELETE FROM properties WHERE id == ? and key == ?'
+PROPERTIES_DELETE      = 'DELETE FROM properties WHERE id == ?'
+DEFINITIONS_REPLACE    = 'INSERT OR REPLACE INTO definitions VALUES (?, ?, ?)'
+ATTACHMENTS_DELETE     = 'DELETE FROM attachments WHERE id == ?'
+CHANGES_INSERT         = 'INSERT INTO changes VALUES (?, ?, ?)'
+
+# thumbnails: raw bytes of the image of each document and the shasum of the content that it shows
+THUMBNAILS_BY_ID       = 'SELECT format, data FROM thumbnails WHERE id == ? and shasum == ?'
+THUMBNAILS_REPLACE     = 'INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)'
+THUMBNAILS_DELETE      = 'DELETE FROM thumbnails WHERE id == ?'
+# images of many documents: main.image is 'thumbnail:<shasum>' (shasum starts at 11) or the image itself
+THUMBNAILS_BY_IDS      = 'SELECT main.id, main.image, thumbnails.format, thumbnails.data FROM main LEFT JOIN '\
+                         'thumbnails ON thumbnails.id == main.id and thumbnails.shasum == substr(main.image, 11) '\
+                         'WHERE main.id IN ({})'
+
+# full-text search: searchIds gives each document a stable row number, which is the rowid of its row in search
+SEARCH_CREATE_IDS      = 'CREATE TABLE IF NOT EXISTS searchIds (row INTEGER PRIMARY KEY, id TEXT UNIQUE)'
+SEARCH_CREATE          = "CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(name, comment, content, tags, metadata, "\
+                         "tokenize='unicode61 remove_diacritics 2')"
+SEARCH_DELETE          = 'DELETE FROM search WHERE rowid IN (SELECT row FROM searchIds WHERE id IN ({}))'
+SEARCH_DELETE_IDS      = 'DELETE FROM searchIds WHERE id IN ({})'
+SEARCH_INSERT_IDS      = 'INSERT INTO searchIds (id) SELECT id FROM main WHERE id IN ({})'
+SEARCH_INSERT          = "INSERT INTO search (rowid, name, comment, content, tags, metadata) SELECT searchIds.row, "\
+                         "main.name, main.comment, main.content, (SELECT GROUP_CONCAT(tag, ' ') FROM tags WHERE "\
+                         "tags.id == main.id), (SELECT GROUP_CONCAT(value, ' ') FROM properties WHERE properties.id"\
+                         " == main.id) FROM main INNER JOIN searchIds USING(id) WHERE main.id IN ({})"
+SEARCH_INSERT_ALL_IDS  = 'INSERT OR IGNORE INTO searchIds (id) SELECT id FROM main'
+SEARCH_INSERT_ALL      = SEARCH_INSERT.removesuffix(' WHERE main.id IN ({})')
+SEARCH_MATCH           = "SELECT main.id, main.name, main.type, snippet(search, -1, '[', ']', '...', 10), "\
+                         "bm25(search, 10.0, 2.0, 1.0, 5.0, 1.0) AS rank FROM search INNER JOIN searchIds ON "\
+                         "searchIds.row == search.rowid INNER JOIN main USING(id) WHERE search MATCH ?"
+SEARCH_FILTER_STACK    = ' and EXISTS (SELECT 1 FROM branches WHERE branches.id == main.id and branches.stack LIKE ?)'
+SEARCH_ORDER           = ' ORDER BY rank LIMIT ?'
+
+# states of files on disk
+FILESTATES_BY_PREFIX   = 'SELECT path, size, mtimeNs, inode, shasum FROM fileStates WHERE path >= ? AND path < ?'
+FILESTATES_BY_STAT     = 'SELECT shasum FROM fileStates WHERE inode == ? and size == ? and mtimeNs == ?'
+FILESTATES_REPLACE     = 'INSERT OR REPLACE INTO fileStates VALUES (?, ?, ?, ?, ?)'
+FILESTATES_DELETE      = 'DELETE FROM fileStates WHERE path == ?'
+
+# data hierarchy
+DOCTYPES_UPDATE_VIEW   = 'UPDATE docTypes SET view=? WHERE docType == ?'
+SCHEMA_BY_DOCTYPE      = 'SELECT * FROM docTypeSchema WHERE docType == ?'
+SCHEMA_BY_DOCTYPE_CLASS= 'SELECT * FROM docTypeSchema WHERE docType == ? and class == ?'
+SCHEMA_CLASSES         = 'SELECT DISTINCT class FROM docTypeSchema WHERE docType == ?'
+
+# view fragments
+FILTER_VISIBLE         = " and NOT branches.show LIKE '%F%'"
+FILTER_STACK           = ' and branches.stack LIKE ?'
+
+
+def viewFilter(cmd:str, params:list[Any], allFlag:bool, startKey:Optional[str]) -> tuple[str, list[Any]]:
+  """ Append the common filters of views: hidden items and stack-prefix
+
+  Args:
+    cmd (str): statement that ends with a WHERE clause
+    params (list): parameters of the statement so far
+    allFlag (bool): include hidden items
+    startKey (str): if given, only include items whose stack starts with this key
+
+  Returns:
+    str, list: statement and parameters
+  """
+  if not allFlag:
+    cmd += FILTER_VISIBLE
+  if startKey:
+    cmd += FILTER_STACK
+    params = params+[f'{startKey}%']
+  return cmd, params
+
+
+def viewDocType(columns:list[str], mainColumns:list[str], docType:str, allFlag:bool,
+                startKey:Optional[str], docIDs:Sequence[str]=()) -> tuple[str, list[Any]]:
+  """ Statement for the table of a docType: one row per document with all columns, as text
+  - documents with multiple branches: the first branch that passes the filters gives 'show'
+  - tags and qrCodes: concatenated by sub-query of their primary key
+  - properties: pivoted by conditional aggregation over the rows of the requested keys
+  - missing tags, qrCodes, properties are 'nan', as the pandas-join gave them before
+
+  Args:
+    columns (list): columns of the table; 'id' has to be included
+    mainColumns (list): columns of the main table
+    docType (str): docType, e.g. 'measurement'; also includes its sub-types
+    allFlag (bool): include hidden items
+    startKey (str): if given, only include items whose stack starts with this key
+    docIDs (list): if given, only include these documents, e.g. the rows of one page
+
+  Returns:
+    str, list: statement and parameters; the result columns are in the order of columns, followed by 'show'
+  """
+  innerSelect, outerSelect, keys = ['main.id'], [], []
+  for column in columns:
+    name = column[1:] if column.startswith('.') and column[1:] in mainColumns else column
+    if name == 'image':                                         #only if document has image, not the image itself
+      innerSelect.append("CASE WHEN length(main.image) > 1 THEN 'Y' ELSE 'N' END")
+    elif name in mainColumns:
+      innerSelect.append(f"COALESCE(main.{name}, '')")
+    elif name in ('tags', 'qrCodes'):
+      table, value = ('tags','tag') if name=='tags' else ('qrCodes','qrCode')
+      outerSelect.append(f"COALESCE((SELECT GROUP_CONCAT({value}, ', ') FROM {table} WHERE {table}.id == docs.id), "
+                         "'nan')")
+      continue
+    else:
+      outerSelect.append("COALESCE(MAX(CASE WHEN properties.key == ? THEN properties.value END), 'nan')")
+      keys.append(column)
+      continue
+    outerSelect.append(f'docs.c{len(innerSelect)-1}')
+    innerSelect[-1] += f' AS c{len(innerSelect)-1}'
+  inner, params = viewFilter('SELECT '+', '.join(innerSelect)+', branches.show, MIN(branches.idx) FROM main INNER '
+                             'JOIN branches USING(id) WHERE main.type LIKE ?'+
+                             (inList(' AND main.id IN ({})', len(docIDs)) if docIDs else ''),
+                             [f'{docType}%', *docIDs], allFlag, startKey)
+  cmd = f"SELECT {', '.join(outerSelect)}, docs.show FROM ({inner} GROUP BY main.id) AS docs"
+  if keys:
+    cmd += f" LEFT JOIN properties ON properties.id == docs.id AND properties.key IN ({', '.join(['?']*len(keys))})"\
+           ' GROUP BY docs.id'
+  return cmd, keys+params+keys
+
+
+def viewPage(view:str, nColumns:int, filters:Sequence[tuple[int,str,bool]], sortColumn:int,
+             ascending:bool) -> tuple[str, list[Any]]:
+  """ Statement for the ids of the rows of a view, filtered and sorted by SQLite; a page is a slice of these ids
+  - the view is a common table expression with the columns c0, c1, ..., show
+  - filters use the REGEXP function of the connection on the text of a column, see SqlLiteDB.__init__
+  - rows with equal values in the sort column are sorted by id: the order and hence the pages are stable
+
+  Args:
+    view (str): statement of the view, e.g. of viewDocType; the last of its nColumns columns is the id
+    nColumns (int): number of columns of the view, without 'show'
+    filters (list): column index, regular expression, inverse; only rows that pass all filters are returned
+    sortColumn (int): index of the column to sort by
+    ascending (bool): sort ascending
+
+  Returns:
+    str, list: statement and parameters of the filters; parameters of the view have to precede them
+  """
+  names = ', '.join(f'c{i}' for i in range(nColumns))
+  cmd, params = f'WITH docView({names}, show) AS ({view}) SELECT c{nColumns-1} FROM docView WHERE 1', []
+  for column, regex, inverse in filters:
+    if 0 <= column < nColumns:
+      cmd += f" AND {'NOT ' if inverse else ''}c{column} REGEXP ?"
+      params.append(regex)
+  sortColumn = sortColumn if 0 <= sortColumn < nColumns else 0
+  return f"{cmd} ORDER BY c{sortColumn} {'ASC' if ascending else 'DESC'}, c{nColumns-1}", params
+
+
+def search(nDocTypes:int, projFlag:bool) -> str:
+  """ Statement of the full-text search, ranked by bm25: matches in names weigh most, then tags, comments
+
+  Args:
+    nDocTypes (int): number of docTypes to restrict to, each with 'main.type LIKE ?'; 0 for all
+    projFlag (bool): restrict to documents with a branch in a project, with stack LIKE ?
+
+  Returns:
+    str: statement; parameters are the query, docTypes, project and limit
+  """
+  cmd = SEARCH_MATCH
+  if nDocTypes:
+    cmd += f" and ({' or '.join(['main.type LIKE ?']*nDocTypes)})"
+  if projFlag:
+    cmd += SEARCH_FILTER_STACK
+  return cmd + SEARCH_ORDER
@@ -12,34 +12,130 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Callable, Optional, Union
 import pandas as pd
-from anytree import Node
 from PIL import Image
 from ..fixedStringsJson import SQLiteTranslation, defaultDefinitions, defaultDocTypes, defaultSchema
 from ..miscTools import hierarchy
-from ..textTools.stringChanges import camelCase, createDirName, outputString, tracebackString
+from ..textTools.stringChanges import camelCase, createDirName, tracebackString
+from . import sqlQueries as sq
+from .checkReport import CheckReport
+from .hierarchyCache import HierarchyCache
+from .mixin_bulk import Bulk_Mixin
+from .mixin_fileStates import FileStates_Mixin
+from .mixin_hierarchy import Hierarchy_Mixin
+from .mixin_thumbnails import THUMBNAIL_REF, Thumbnails_Mixin, moveImagesToThumbnails
+from .mixin_views import Views_Mixin, createSearchIndex, regexp
+from .sqlQueries import MAIN_ORDER, MAIN_TYPE
 
-MAIN_ORDER     =['id'  ,'name','user','type','dateCreated','dateModified','gui',      'client','shasum','image','content','comment','externalId','dateSync']
-MAIN_TYPE      =['TEXT','TEXT','TEXT','TEXT','TEXT',       'TEXT',        'varchar(2)','TEXT',  'TEXT',  'TEXT', 'TEXT',   'TEXT',   'TEXT',     'TEXT']
 DOC_TYPES      =['docType', 'PURL','title','icon','shortcut','view']
 DOC_TYPE_SCHEMA=['docType', 'class', 'idx', 'name', 'unit', 'mandatory', 'list']
 
 
-class SqlLiteDB:
+# Schema migrations: list of (version, SQL commands or functions of cursor); the version of a database is stored
+#   in 'PRAGMA user_version'
+# - append new migrations at the end; never change existing ones since databases in the wild already ran them
+# - LIKE 'prefix%' queries can only use an index if it is COLLATE NOCASE (default case_sensitive_like=OFF)
+SCHEMA_MIGRATIONS:list[tuple[int,list[Union[str,Callable[[sqlite3.Cursor],None]]]]] = [
+  (1, ['CREATE INDEX IF NOT EXISTS idxBranchesStack      ON branches(stack COLLATE NOCASE)',
+       'CREATE INDEX IF NOT EXISTS idxBranchesPath       ON branches(path)',
+       'CREATE INDEX IF NOT EXISTS idxBranchesPathNoCase ON branches(path COLLATE NOCASE)',
+       'CREATE INDEX IF NOT EXISTS idxMainShasum         ON main(shasum)',
+       'CREATE INDEX IF NOT EXISTS idxMainType           ON main(type COLLATE NOCASE)',
+       'CREATE INDEX IF NOT EXISTS idxPropertiesKey      ON properties(key)',
+       'CREATE INDEX IF NOT EXISTS idxTagsTag            ON tags(tag)',
+       'CREATE INDEX IF NOT EXISTS idxQrCodesQrCode      ON qrCodes(qrCode)']),
+  (2, ['CREATE INDEX IF NOT EXISTS idxFileStatesInode    ON fileStates(inode, size, mtimeNs)']),
+  (3, ['CREATE TABLE IF NOT EXISTS thumbnails (shasum TEXT, format TEXT, data BLOB, PRIMARY KEY (shasum))']),#images: 6
+  (4, [createSearchIndex]),
+  (5, [f'CREATE INDEX IF NOT EXISTS idxBranchesParent     ON branches({sq.BRANCHES_PARENT}, child)']),
+  (6, [moveImagesToThumbnails]),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def assembleDoc(doc:dict[str,Any], tags:list[str], qrCodes:list[str], branches:list[Any], properties:list[Any]) \
+    -> dict[str,Any]:
+  """ Assemble the json representation of a document from the rows of the tables
+
+  Args:
+    doc (dict): row of main table
+    tags (list): tags of document
+    qrCodes (list): qrCodes of document
+    branches (list): rows of branches table: 'id', 'idx', 'stack', 'child', 'path', 'show'
+    properties (list): rows of properties query: key, value, unit, long, PURL, schema-unit
+
+  Returns:
+    dict: json representation of document
+  """
+  doc['tags'] = tags
+  doc['qrCodes'] = qrCodes
+  for key in ['image', 'content', 'shasum', 'client', 'qrCodes']:
+    if len(doc[key])==0 or doc[key]==['']:
+      del doc[key]
+  doc['type']= doc['type'].split('/')
+  doc['gui'] = [i=='T' for i in doc['gui']]
+  doc['branch'] = []
+  # data ends with 'id' 'stack', 'child', 'path', 'show', 'dateModified'
+  for dataI in branches:
+    doc['branch'].append({'stack': dataI[2].split('/')[:-1],
+                          'child': dataI[3],
+                          'path':  None if dataI[4] == '*' else dataI[4],
+                          'show':   [i=='T' for i in dataI[5]]})
+  metadataFlat:dict[str, tuple[str,str,str,str]]  = {i[0]:(    i[1],                                    #value
+              ('' if i[2] is None else i[2]) or ('' if i[5] is None else i[5]),  #unit(priority:property.unit)
+              ('' if i[3] is None else i[3]),                                                            #long
+              ('' if i[4] is None else i[4])                                                             #PURL
+              ) for i in properties}
+  doc |= hierarchy(metadataFlat)
+  return doc
+
+
+class SqlLiteDB(Bulk_Mixin, FileStates_Mixin, Hierarchy_Mixin, Thumbnails_Mixin, Views_Mixin):
   """
   Class for interaction with sqlite
   """
 
 
-  def __init__(self, resetDataHierarchy:bool=False, basePath:Path=Path()):
+  def __init__(self, resetDataHierarchy:bool=False, basePath:Path=Path(), readOnly:bool=False,
+               hierarchyCache:Optional[HierarchyCache]=None):
     """
+    Connections to the database
+    - one writer: the instance of the backend, which is used only by the thread of the backend worker; hence all
+      writes are serialized
+    - any number of readers (readOnly=True), each used by one other thread: since the database uses a WAL journal,
+      readers see the last commit and are not blocked by the writer, e.g. during long scans
+
     Args:
-      configuration (dict): configuration of GUI elements
       resetDataHierarchy (bool): reset dataHierarchy
       basePath (Path): path of project group
+      readOnly (bool): open a reader to an existing database; it does not create or change tables
+      hierarchyCache (HierarchyCache): cache of hierarchies shared with the writer; default: new cache
     """
-    self.connection = sqlite3.connect(basePath/'pastaELN.db', check_same_thread=False)
+    if readOnly:
+      self.connection = sqlite3.connect(f"{(basePath/'pastaELN.db').as_uri()}?mode=ro", uri=True,
+                                        check_same_thread=False, cached_statements=256,
+                                        isolation_level=None)     #autocommit: no transaction keeps an old snapshot
+    else:
+      self.connection = sqlite3.connect(basePath/'pastaELN.db', check_same_thread=False, cached_statements=256)
+    self.connection.create_function('REGEXP', 2, regexp, deterministic=True)          #used by filters of tables
     self.basePath   = basePath
-    self.cursor     = self.connection.cursor()
+    self.readOnly   = readOnly
+    self.cursorBase    = self.connection.cursor()                   #use cursor and cursorRow: they write bulk rows
+    self.cursorRowBase = self.connection.cursor()                               #cursor that returns dict-like rows
+    self.cursorRowBase.row_factory = sqlite3.Row
+    self.bulkDepth  = 0                                              #>0: in bulk mode, commit at its end
+    self.bulkRows:dict[str,list[Any]] = {}                       #statement: rows that are not yet written
+    self.definitionsBulk:dict[str,tuple[str,str]] = {}               #definitions written during bulk mode
+    self.hierarchy = hierarchyCache or HierarchyCache()                    #materialized hierarchies of projects
+    self.hierarchyPending:dict[str,bool] = {}                #docID: subtree; changed hierarchy, delta at commit
+    self.hierarchyChanges = 0                                   #total_changes of connection that cache reflects
+    self.searchPending:set[str] = set()                 #docIDs whose row in the search index is written at commit
+    self.viewOrder:tuple[tuple[Any,...],list[str]] = ((), [])        #query and version: sorted ids of its rows
+    if readOnly:
+      return
+    try:                                                      #readers do not block the writer and vice versa
+      self.cursorBase.execute('PRAGMA journal_mode=WAL')
+    except sqlite3.OperationalError:
+      logging.warning('Could not change journal of database to WAL: other connection is open')
     self.dataHierarchyInit(resetDataHierarchy)
     # main table
     self.createSQLTable('main',            MAIN_ORDER,                                  'id', MAIN_TYPE)
@@ -58,6 +154,42 @@ class SqlLiteDB:
     self.createSQLTable('attachments',     ['id','location','date','guest','remark','user'], 'id, location, date')
     # list of changes to all documents: gives history
     self.createSQLTable('changes',         ['id','date','change'],                     'id, date')
+    # state of files on disk when they were last scanned: only files whose state changed are hashed again
+    self.createSQLTable('fileStates',      ['path','size','mtimeNs','inode','shasum'], 'path',
+                        ['TEXT','INTEGER','INTEGER','INTEGER','TEXT'])
+    # indexes and other changes of the schema
+    # - thumbnails of documents with shasum as raw bytes: main.image only contains a reference, see storeImage
+    self.migrateSchema()
+    return
+
+
+  def migrateSchema(self) -> None:
+    """
+    Bring the database schema to the current version by running all migrations that are newer than the
+    version stored in the database
+    """
+    self.cursor.execute('PRAGMA user_version')
+    version = self.cursor.fetchone()[0]
+    if version > SCHEMA_VERSION:
+      logging.warning('Database schema version %i is newer than this software %i', version, SCHEMA_VERSION)
+      return
+    for versionI, commands in SCHEMA_MIGRATIONS:
+      if versionI <= version:
+        continue
+      logging.info('Migrate database schema from version %i to %i', version, versionI)
+      try:
+        for command in commands:
+          if callable(command):
+            command(self.cursor)
+          else:
+            self.cursor.execute(command)
+        self.cursor.execute(f'PRAGMA user_version = {versionI}')
+        self.commit()
+      except sqlite3.Error:
+        self.connection.rollback()
+        logging.error('Migration of database schema to version %i failed', versionI, exc_info=True)
+        return
+      version = versionI
     return
 
 
@@ -70,7 +202,7 @@ class SqlLiteDB:
     """
     self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
     tables = [i[0] for i in self.cursor.fetchall()]                                               # all tables
-    self.connection.commit()
+    self.commit()
     # check if default documents exist and create
     if 'docTypes' not in tables or resetDataHierarchy:
       if 'docTypes' in tables:
@@ -91,7 +223,7 @@ class SqlLiteDB:
       self.createSQLTable('definitions',     ['key','long','PURL'],                       'key')
       command =  'INSERT OR REPLACE INTO definitions VALUES (?, ?, ?);'
       self.cursor.executemany(command, defaultDefinitions)
-      self.connection.commit()
+      self.commit()
     return
 
 
@@ -102,8 +234,8 @@ class SqlLiteDB:
       docType (str): docType
       columns (list): list of columns
     """
-    self.cursor.execute(f"UPDATE docTypes SET view='{','.join(columns)}' WHERE docType = '{docType}'")
-    self.connection.commit()
+    self.cursor.execute(sq.DOCTYPES_UPDATE_VIEW, (','.join(columns), docType))
+    self.commit()
     return
 
 
@@ -150,18 +282,16 @@ class SqlLiteDB:
       return [i[0] for i in results] if column=='' else results
     ### if metadata = docTypeSchema of data
     if column == 'meta':
-      self.connection.row_factory = sqlite3.Row                                                  #default None
-      cursor = self.connection.cursor()
       if group:
-        cursor.execute(f"SELECT * FROM docTypeSchema WHERE docType == '{docType}' and class == '{group}'")
+        self.cursorRow.execute(sq.SCHEMA_BY_DOCTYPE_CLASS, (docType, group))
       else:
-        cursor.execute(f"SELECT * FROM docTypeSchema WHERE docType == '{docType}'")
-      return [dict(i) for i in cursor.fetchall()]
+        self.cursorRow.execute(sq.SCHEMA_BY_DOCTYPE, (docType,))
+      return [dict(i) for i in self.cursorRow.fetchall()]
     if column == 'metaColumns':
-      self.cursor.execute(f"SELECT DISTINCT class FROM docTypeSchema WHERE docType == '{docType}'")
+      self.cursor.execute(sq.SCHEMA_CLASSES, (docType,))
       return [i[0] for i in self.cursor.fetchall()]
     # if specific docType
-    self.cursor.execute(f"SELECT {column} FROM docTypes WHERE docType == '{docType}'")
+    self.cursor.execute(f'SELECT {column} FROM docTypes WHERE docType == ?', (docType,))
     result = self.cursor.fetchone()
     if result is None:
       return []
@@ -172,67 +302,126 @@ class SqlLiteDB:
     return result
 
 
+  def reader(self) -> 'SqlLiteDB':
+    """ Open a read-only connection to this database, for use in another thread
+
+    Returns:
+      SqlLiteDB: reader
+    """
+    return SqlLiteDB(basePath=self.basePath, readOnly=True, hierarchyCache=self.hierarchy)
+
+
   def exit(self) -> None:
     """
     Shutting down things
     """
-    self.cursor.close()
-    del self.cursor
+    if not self.readOnly:
+      self.cursor.execute('PRAGMA optimize')                            #update statistics of the query planner
+      self.connection.commit()
+    self.cursorBase.close()
+    del self.cursorBase
+    self.cursorRowBase.close()
+    del self.cursorRowBase
     self.connection.close()
     del self.connection
     return
 
 
-  def getDoc(self, docID:str, noError:bool=False) -> dict[str,Any]:
+  def commit(self) -> None:
+    """ Commit changes to database; in bulk mode, the commit happens at its end """
+    if self.bulkDepth == 0:
+      self.syncSearch()
+      self.connection.commit()
+    self.syncHierarchy()
+    return
+
+
+  def syncSearch(self) -> None:
+    """
+    Write the rows of the changed documents into the full-text search index: delete their old rows, insert the
+    current content of the documents that still exist
+    """
+    docIDs, self.searchPending = list(self.searchPending), set()
+    for idx in range(0, len(docIDs), sq.CHUNK_SIZE):
+      chunk = docIDs[idx:idx+sq.CHUNK_SIZE]
+      for statement in (sq.SEARCH_DELETE, sq.SEARCH_DELETE_IDS, sq.SEARCH_INSERT_IDS, sq.SEARCH_INSERT):
+        self.cursorBase.execute(sq.inList(statement, len(chunk)), chunk)
+    return
+
+
+  def getDoc(self, docID:str, noError:bool=False, image:bool=False) -> dict[str,Any]:
     """
     Wrapper for get from database function
 
     Args:
         docID (dict): document id
         noError (bool): False=report errors as they occur; True=do not report on errors
+        image (bool): load image from thumbnail store; otherwise image is only a reference
 
     Returns:
         dict: json representation of document
     """
-    self.connection.row_factory = sqlite3.Row                                                    #default None
-    cursor = self.connection.cursor()
-    cursor.execute(f"SELECT * FROM main WHERE id == '{docID}'")
-    res = cursor.fetchone()
+    self.cursorRow.execute(sq.MAIN_BY_ID, (docID,))
+    res = self.cursorRow.fetchone()
     if res is None:
       if not noError:
         logging.error('sqlite: could not get docID: %s | %s', docID, tracebackString(False, docID))
       return {}
-    doc = dict(res)
-    self.cursor.execute(f"SELECT tag FROM tags WHERE id == '{docID}'")
-    doc['tags'] = [i[0] for i in self.cursor.fetchall()]
-    self.cursor.execute(f"SELECT qrCode FROM qrCodes WHERE id == '{docID}'")
-    doc['qrCodes'] = [i[0] for i in self.cursor.fetchall()]
-    for key in ['image', 'content', 'shasum', 'client', 'qrCodes']:
-      if len(doc[key])==0 or doc[key]==['']:
-        del doc[key]
-    doc['type']= doc['type'].split('/')
-    doc['gui'] = [i=='T' for i in doc['gui']]
-    doc['branch'] = []
-    # data ends with 'id' 'stack', 'child', 'path', 'show', 'dateModified'
-    self.cursor.execute(f"SELECT * FROM branches WHERE id == '{docID}'")
-    for dataI in self.cursor.fetchall():
-      doc['branch'].append({'stack': dataI[2].split('/')[:-1],
-                            'child': dataI[3],
-                            'path':  None if dataI[4] == '*' else dataI[4],
-                            'show':   [i=='T' for i in dataI[5]]})
-    cmd = 'SELECT properties.key, properties.value, properties.unit, definitions.long, definitions.PURL, ' \
-          'docTypeSchema.unit FROM properties LEFT JOIN definitions USING(key) '\
-          "LEFT JOIN docTypeSchema ON properties.key = (docTypeSchema.class || '.' || docTypeSchema.name) "\
-          f"WHERE properties.id == '{docID}'"
-    self.cursor.execute(cmd)
-    res = self.cursor.fetchall()
-    metadataFlat:dict[str, tuple[str,str,str,str]]  = {i[0]:(    i[1],                                  #value
-                ('' if i[2] is None else i[2]) or ('' if i[5] is None else i[5]),#unit(priority:property.unit)
-                ('' if i[3] is None else i[3]),                                                          #long
-                ('' if i[4] is None else i[4])                                                           #PURL
-                ) for i in res}
-    doc |= hierarchy(metadataFlat)
-    return doc
+    self.cursor.execute(sq.TAGS_BY_ID, (docID,))
+    tags = [i[0] for i in self.cursor.fetchall()]
+    self.cursor.execute(sq.QRCODES_BY_ID, (docID,))
+    qrCodes = [i[0] for i in self.cursor.fetchall()]
+    self.cursor.execute(sq.BRANCHES_BY_ID, (docID,))
+    branches = self.cursor.fetchall()
+    self.cursor.execute(sq.PROPERTIES_BY_ID, (docID,))
+    main = dict(res)
+    if image and main['image']:
+      main['image'] = self.getImage(main['image'], docID)
+    return assembleDoc(main, tags, qrCodes, branches, self.cursor.fetchall())
+
+
+  def getDocs(self, docIDs:list[str], noError:bool=False, image:bool=False) -> dict[str,dict[str,Any]]:
+    """
+    Get many documents from database with a constant number of queries per chunk of ids
+    - use instead of looping over getDoc
+
+    Args:
+        docIDs (list): document ids; duplicates are ignored
+        noError (bool): False=report errors as they occur; True=do not report on errors
+        image (bool): load images from thumbnail store; otherwise images are only references
+
+    Returns:
+        dict: docID -> json representation of document; ids that are not found are missing
+    """
+    docIDs = list(dict.fromkeys(docIDs))
+    docs:dict[str,dict[str,Any]] = {}
+    for start in range(0, len(docIDs), sq.CHUNK_SIZE):
+      chunk = docIDs[start:start+sq.CHUNK_SIZE]
+      self.cursorRow.execute(sq.inList(sq.MAIN_BY_IDS, len(chunk)), chunk)
+      mains = {i['id']:dict(i) for i in self.cursorRow.fetchall()}
+      if image:
+        for main in mains.values():
+          main['image'] = self.getImage(main['image'] or '', main['id'])
+      tags:dict[str,list[str]]       = {i:[] for i in chunk}
+      qrCodes:dict[str,list[str]]    = {i:[] for i in chunk}
+      branches:dict[str,list[Any]]   = {i:[] for i in chunk}
+      properties:dict[str,list[Any]] = {i:[] for i in chunk}
+      for statement, target in ((sq.TAGS_BY_IDS, tags), (sq.QRCODES_BY_IDS, qrCodes)):
+        self.cursor.execute(sq.inList(statement, len(chunk)), chunk)
+        for docID, value in self.cursor.fetchall():
+          target[docID].append(value)
+      self.cursor.execute(sq.inList(sq.BRANCHES_BY_IDS, len(chunk)), chunk)
+      for row in self.cursor.fetchall():
+        branches[row[0]].append(row)
+      self.cursor.execute(sq.inList(sq.PROPERTIES_BY_IDS, len(chunk)), chunk)
+      for row in self.cursor.fetchall():
+        properties[row[0]].append(row[1:])                                                    #remove id column
+      for docID in chunk:
+        if docID in mains:
+          docs[docID] = assembleDoc(mains[docID], tags[docID], qrCodes[docID], branches[docID], properties[docID])
+        elif not noError:
+          logging.error('sqlite: could not get docID: %s | %s', docID, tracebackString(False, docID))
+    return docs
 
 
   def saveDoc(self, doc:dict[str,Any]) -> dict[str,Any]:
@@ -290,35 +479,37 @@ class SqlLiteDB:
     #     print('ERROR',k,v)
     # end initial testing
     docOrg = copy.deepcopy(doc)
+    self.changeHierarchy(doc['id'])
     # save into branch table
-    self.cursor.execute(f"INSERT INTO branches VALUES ({', '.join(['?']*6)})",
-                        [doc['id'],
+    self.insertRows(sq.BRANCHES_INSERT,
+                        [[doc['id'],
                          0,
                          '/'.join(doc['branch']['stack']+[doc['id']]),
                          str(doc['branch']['child']),
                          '*' if doc['branch']['path'] is None else doc['branch']['path'],
-                         ''.join(['T' if j else 'F' for j in doc['branch']['show']])])
+                         ''.join(['T' if j else 'F' for j in doc['branch']['show']])]])
     del doc['branch']
     # save into tags table
-    self.cursor.executemany('INSERT INTO tags VALUES (?, ?);', zip([doc['id']]*len(doc['tags']), doc['tags']))
+    self.insertRows(sq.TAGS_INSERT, [(doc['id'], i) for i in doc['tags']])
     del doc['tags']
     if 'qrCodes' in doc:
-      cmd = 'INSERT INTO qrCodes VALUES (?, ?);'
-      self.cursor.executemany(cmd, zip([doc['id']]*len(doc['qrCodes']), doc['qrCodes']))
+      self.insertRows(sq.QRCODES_INSERT, [(doc['id'], i) for i in doc['qrCodes']])
       del doc['qrCodes']
     if 'content' in doc and len(doc['content'])>200:
       doc['content'] = doc['content'][:200]
     doc['type'] = '/'.join(doc['type'])
     doc['gui']  = ''.join(['T' if i else 'F' for i in doc['gui']])
     doc['client'] = tracebackString(False, 'save:'+doc['id'])
+    if doc.get('image'):
+      doc['image'] = self.storeImage(doc['image'], doc.get('shasum',''), doc['id'])
     docList = [doc[x] if x in doc else doc.get(f'.{x}','') for x in MAIN_ORDER]
-    self.cursor.execute(f"INSERT INTO main VALUES ({', '.join(['?']*len(docList))})", docList)
+    self.insertRows(sq.MAIN_INSERT, [docList])
     doc = {k:v for k,v in doc.items() if (k not in MAIN_ORDER and k[1:] not in MAIN_ORDER) or k == 'id'}
 
+    properties:list[list[Any]] = []                                                 #id, key, value, unit
+    definitions:dict[str,tuple[str,str]] = {}                                               #key: long, PURL
     def insertMetadata(data:dict[str,Any], parentKeys:str) -> None:
       parentKeys = f'{parentKeys}.' if parentKeys else ''
-      cmd    = 'INSERT OR REPLACE INTO properties VALUES (?, ?, ?, ?);'
-      cmdDef = 'INSERT OR REPLACE INTO definitions VALUES (?, ?, ?);'
       for key,value in data.items():
         key = str(key) if isinstance(key, int) else key
         if not value:
@@ -330,30 +521,39 @@ class SqlLiteDB:
           label  = key[:-len(unit)-2].strip()
           key    = camelCase(label)
           key    = key[0].lower()+key[1:]
-          self.cursor.execute(cmd, [doc['id'], parentKeys+key, str(value), unit])
-          self.cursor.execute(cmdDef, [parentKeys+key, label, ''])
+          properties.append([doc['id'], parentKeys+key, str(value), unit])
+          definitions[parentKeys+key] = (label, '')
         elif isinstance(value, list) and isinstance(value[0], dict) and value[0].keys() >= {'key', 'value', 'unit'}:
-          self.cursor.executemany(cmd, zip([doc['id']]*len(value),      [parentKeys+key+'.'+i['key'] for i in value],
-                                            [i['value'] for i in value], [i['unit'] for i in value]  ))
-          self.cursor.executemany(cmdDef, zip([parentKeys+key+'.'+i['key'] for i in value],
-                                            [i['label'] for i in value], [i['PURL'] for i in value]  ))
+          for item in value:
+            properties.append([doc['id'], f"{parentKeys}{key}.{item['key']}", item['value'], item['unit']])
+            definitions[f"{parentKeys}{key}.{item['key']}"] = (item['label'], item['PURL'])
         elif isinstance(value, tuple) and len(value)==4:
-          self.cursor.execute(cmd,    [doc['id'], parentKeys+key, value[0], value[1]])
-          self.cursor.execute(cmdDef, [parentKeys+key, value[2], value[3]])
+          properties.append([doc['id'], parentKeys+key, value[0], value[1]])
+          definitions[parentKeys+key] = (value[2], value[3])
         elif str(value)!='':
-          try:
-            self.cursor.execute(cmd, [doc['id'], parentKeys+key, str(value), ''])
-            self.cursor.execute(cmdDef, [parentKeys+key, '', ''])
-          except Exception:
-            logging.error('SQL command %s did not succeed %s', cmd, [doc['id'], parentKeys+key, str(value), ''],
-                          exc_info=True)
-      self.connection.commit()
+          properties.append([doc['id'], parentKeys+key, str(value), ''])
+          definitions[parentKeys+key] = ('', '')
       return
     # properties
     metaDoc = {k:v for k,v in doc.items() if k not in MAIN_ORDER}
     insertMetadata(metaDoc, '')
+    if self.bulkDepth > 0:                                    #in bulk mode: only write changed definitions
+      definitions = {k:v for k,v in definitions.items() if self.definitionsBulk.get(k)!=v}
+      self.definitionsBulk |= definitions
+      self.insertRows(sq.PROPERTIES_REPLACE, properties)
+    else:
+      try:
+        self.cursor.executemany(sq.PROPERTIES_REPLACE, properties)
+      except sqlite3.Error:                                           #find and report the offending property
+        for row in properties:
+          try:
+            self.cursor.execute(sq.PROPERTIES_REPLACE, row)
+          except sqlite3.Error:
+            logging.error('SQL command %s did not succeed %s', sq.PROPERTIES_REPLACE, row, exc_info=True)
+    self.insertRows(sq.DEFINITIONS_REPLACE, [(k, *v) for k,v in definitions.items()])
+    self.searchPending.add(docOrg['id'])                        #after all writes: rows of index are complete
     # save changes
-    self.connection.commit()
+    self.commit()
     branch = copy.deepcopy(docOrg['branch'])
     del branch['op']
     docOrg['branch'] = [branch]
@@ -378,46 +578,45 @@ class SqlLiteDB:
     Returns:
         dict: json representation of updated document
     """
+    self.changeHierarchy(docID, 'branch' in dataNew)
     if set(dataNew.keys()) == {'type','image'}:        #if only type and image in update = change of extractor
-      self.cursor.execute(f"UPDATE main SET type='{'/'.join(dataNew['type'])}', image='{dataNew['image']}' WHERE id = '{docID}'")
-      self.connection.commit()
+      self.cursor.execute(sq.MAIN_SHASUM_BY_ID, (docID,))
+      image = self.storeImage(dataNew['image'], self.cursor.fetchone()[0], docID)
+      self.cursor.execute(sq.MAIN_UPDATE_TYPE_IMAGE, ('/'.join(dataNew['type']), image, docID))
+      self.commit()
       return {'id':docID}
     dataNew['client'] = tracebackString(False, f'updateDoc:{docID}')
     if 'edit' in dataNew:                                                                           #if delete
       dataNew = {'id':dataNew['id'], 'branch':dataNew['branch'], 'user':dataNew['user'], 'externalId':dataNew['externalId'], 'name':''}
     changesDict:dict[str,Any]         = {}
-    self.connection.row_factory = sqlite3.Row                                                    #default None
-    cursor = self.connection.cursor()
 
     # tags and qrCodes
     tagsNew= set(dataNew.pop('tags'))
-    self.cursor.execute(f"SELECT tag FROM tags WHERE id == '{docID}'")
+    self.cursor.execute(sq.TAGS_BY_ID, (docID,))
     tagsOld= {i[0] for i in self.cursor.fetchall()}
     if tagsOld.difference(tagsNew):
-      cmd = f"DELETE FROM tags WHERE id == '{docID}' and tag == ?"
-      self.cursor.executemany(cmd, [(i,) for i in tagsOld.difference(tagsNew)])
+      self.cursor.executemany(sq.TAGS_DELETE_ONE, [(docID, i) for i in tagsOld.difference(tagsNew)])
       changesDict['tags'] = ','.join(tagsOld)
     if tagsNew.difference(tagsOld):
       change = tagsNew.difference(tagsOld)
-      self.cursor.executemany('INSERT INTO tags VALUES (?, ?);', zip([docID]*len(change), change))
+      self.cursor.executemany(sq.TAGS_INSERT, zip([docID]*len(change), change))
       changesDict['tags'] = ','.join(tagsOld)
     qrCodesNew= set(dataNew.pop('qrCodes', []))
-    self.cursor.execute(f"SELECT qrCode FROM qrCodes WHERE id == '{docID}'")
+    self.cursor.execute(sq.QRCODES_BY_ID, (docID,))
     qrCodesOld= {i[0] for i in self.cursor.fetchall()}
     if qrCodesOld.difference(qrCodesNew):
-      cmd = f"DELETE FROM qrCodes WHERE id == '{docID}' and qrCode == ?"
-      self.cursor.executemany(cmd, [(i,) for i in qrCodesOld.difference(qrCodesNew)])
+      self.cursor.executemany(sq.QRCODES_DELETE_ONE, [(docID, i) for i in qrCodesOld.difference(qrCodesNew)])
       changesDict['qrCodes'] = ','.join(qrCodesOld)
     if qrCodesNew.difference(qrCodesOld):
       change = qrCodesNew.difference(qrCodesOld)
-      self.cursor.executemany('INSERT INTO qrCodes VALUES (?, ?);', zip([docID]*len(change), change))
+      self.cursor.executemany(sq.QRCODES_INSERT, zip([docID]*len(change), change))
       changesDict['qrCodes'] = ','.join(qrCodesOld)
     # separate into main and properties
     mainNew    = {key: dataNew.pop(key) for key in MAIN_ORDER if key in dataNew}
     branchNew  = dataNew.pop('branch',{})
     # read branches and identify changes
-    cursor.execute(f"SELECT stack, child, path, show FROM branches WHERE id == '{docID}'")
-    branchOld = [dict(i) for i in cursor.fetchall()]
+    self.cursorRow.execute(sq.BRANCHES_INFO_BY_ID, (docID,))
+    branchOld = [dict(i) for i in self.cursorRow.fetchall()]
     branchOld[0]['show'] = [i=='T' for i in branchOld[0]['show']]
     branchOld[0]['stack'] = branchOld[0]['stack'].split('/')[:-1]
     # print(f'do something with branch: \nnew {branchNew} \nold: {branchOld}')
@@ -436,7 +635,7 @@ class SqlLiteDB:
           if isinstance(branchNew['stack'], str):
             raise ValueError('Should be list')
           branchNew['show'] = self.createShowFromStack(branchNew['stack'])
-          self.cursor.execute(f"INSERT INTO branches VALUES ({', '.join(['?']*6)})",
+          self.cursor.execute(sq.BRANCHES_INSERT,
                         [docID,
                          len(branchOld),
                          '/'.join(branchNew['stack']+[docID]),
@@ -459,17 +658,16 @@ class SqlLiteDB:
             branchOld[idx] = branchNew                                        #change branch 0 aka the default
           if idx is None:                                          # create new branch: should not happen here
             raise ValueError(f'sqlite.2: idx unset: {mainNew["id"]} {mainNew["name"]}')
-          self.cursor.execute(f"UPDATE branches SET stack='{'/'.join(branchOld[idx]['stack']+[docID])}', "
-                              f"path='{branchOld[idx]['path']}', child='{branchOld[idx]['child']}', "
-                              f"show='{''.join(['T' if j else 'F' for j in branchOld[idx]['show']])}' "
-                              f"WHERE id = '{docID}' and idx = {idx}")
+          self.cursor.execute(sq.BRANCHES_UPDATE_BY_IDX, ('/'.join(branchOld[idx]['stack']+[docID]),
+                              branchOld[idx]['path'], str(branchOld[idx]['child']),
+                              ''.join(['T' if j else 'F' for j in branchOld[idx]['show']]), docID, idx))
         elif op=='d':                                                                                  #delete
           branchOld = [branch for branch in branchOld if branch['path']!=branchNew['path']]
         else:
           raise ValueError(f'sqlite.1: unknown branch op: {mainNew["id"]} {mainNew["name"]}: {branchNew} of doc {dataNew}')
 
     # read properties and identify changes
-    self.cursor.execute(f"SELECT key, value FROM properties WHERE id == '{docID}'")
+    self.cursor.execute(sq.PROPERTIES_KEY_VALUE, (docID,))
     dataOld = {i[0]:i[1] for i in self.cursor.fetchall()}
     for key,value in dataNew.items():
       if isinstance(value, dict):
@@ -478,51 +676,50 @@ class SqlLiteDB:
           if isinstance(subValue, tuple):
             subValue = subValue[0]
           if longKey in dataOld and subValue!=dataOld[longKey]:
-            self.cursor.execute(f"UPDATE properties SET value='{subValue}' WHERE id = '{docID}' and key = '{longKey}'")
+            self.cursor.execute(sq.PROPERTIES_UPDATE, (str(subValue), docID, longKey))
             changesDict[longKey] = dataOld[longKey]
           elif longKey not in dataOld:
-            cmd = 'INSERT INTO properties VALUES (?, ?, ?, ?);'
-            self.cursor.execute(cmd ,[docID, longKey, subValue, ''])
+            self.cursor.execute(sq.PROPERTIES_INSERT ,[docID, longKey, subValue, ''])
           if longKey in dataOld:
             del dataOld[longKey]
       elif isinstance(value, (str,int,float)) and '.' in key:
         if key in dataOld and value!=dataOld[key]:
-          self.cursor.execute(f"UPDATE properties SET value='{value}' WHERE id = '{docID}' and key = '{key}'")
+          self.cursor.execute(sq.PROPERTIES_UPDATE, (str(value), docID, key))
           changesDict[key] = dataOld[key]
         elif key not in dataOld:
-          cmd = 'INSERT OR REPLACE INTO properties VALUES (?, ?, ?, ?);'
-          self.cursor.execute(cmd ,[docID, key, value, ''])
+          self.cursor.execute(sq.PROPERTIES_REPLACE ,[docID, key, value, ''])
           changesDict[key] = value
       elif isinstance(value, tuple) and len(value)==4:
         if key in dataOld and value[0]!=dataOld[key]:
-          self.cursor.execute(f"UPDATE properties SET value='{value[0]}' WHERE id = '{docID}' and key = '{key}'")
+          self.cursor.execute(sq.PROPERTIES_UPDATE, (str(value[0]), docID, key))
           changesDict[key] = dataOld[key]
         elif key not in dataOld:
-          cmd = 'INSERT INTO properties VALUES (?, ?, ?, ?);'
-          self.cursor.execute(cmd ,[docID, key, value[0], value[1]])
+          self.cursor.execute(sq.PROPERTIES_INSERT ,[docID, key, value[0], value[1]])
       else:
         logging.error('Property is not a dict, ERROR %s %s %s',key, value, type(value), exc_info=True)
     if set(dataOld.keys()).difference(dataNew.keys()):
-      cmd = f"DELETE FROM properties WHERE id == '{docID}' and key == ?"
-      properties = [(i,) for i in set(dataOld.keys()).difference(dataNew.keys())]
-      self.cursor.executemany(cmd, properties)
+      properties = [(docID, i) for i in set(dataOld.keys()).difference(dataNew.keys())]
+      self.cursor.executemany(sq.PROPERTIES_DELETE_ONE, properties)
       changesDict |= dataOld
     # read main and identify if something changed
-    cursor.execute(f"SELECT * FROM main WHERE id == '{docID}'")
-    mainOld = dict(cursor.fetchone())
+    self.cursorRow.execute(sq.MAIN_BY_ID, (docID,))
+    mainOld = dict(self.cursorRow.fetchone())
     mainOld['type']= mainOld['type'].split('/')
+    if mainNew.get('image') is not None:
+      mainNew['image'] = self.storeImage(mainNew['image'], mainNew.get('shasum') or mainOld['shasum'], docID)
     changesDB: dict[str,dict[str,str]] = {'main': {}}
-    for key in ('name','user','type','dateModified','dateSync','client','image','content','comment'):
-      if key in mainNew and mainOld[key]!=mainNew[key]:
+    for key in ('name','user','type','dateModified','dateSync','client','shasum','image','content','comment'):
+      if key in mainNew and mainNew[key] is not None and mainOld[key]!=mainNew[key]:
         changesDB['main'][key] = '/'.join(mainNew[key]) if key=='type' else mainNew[key].translate(SQLiteTranslation)
         changesDict[key] = mainOld[key]
+    self.searchPending.add(docID)                               #after all writes: rows of index are complete
     # save change content in database: main and changes are updated
     if set(changesDict.keys()).difference(('dateModified','client','user')):
-      if changeString:= ', '.join([f"{k}='{v}'" for k,v in changesDB['main'].items()]):
-        self.cursor.execute(f"UPDATE main SET {changeString} WHERE id = '{docID}'")
+      if changesDB['main']:
+        self.cursor.execute(sq.mainUpdate(list(changesDB['main'])), list(changesDB['main'].values())+[docID])
       if 'name' not in changesDict or changesDict['name']!='new item':#don't save initial change from new item
-        self.cursor.execute('INSERT INTO changes VALUES (?,?,?)', [docID, datetime.now().isoformat(), json.dumps(changesDict)])
-      self.connection.commit()
+        self.cursor.execute(sq.CHANGES_INSERT, [docID, datetime.now().isoformat(), json.dumps(changesDict)])
+      self.commit()
     return mainOld | mainNew | {'branch':branchOld, '__version__':'short'}
 
 
@@ -544,45 +741,45 @@ class SqlLiteDB:
     """
     #convert into db style
     path = '*' if path is None else path
+    self.changeHierarchy(docID, True)
     if branch == -2:                                                                         #delete this path
-      self.cursor.execute(f"DELETE FROM branches WHERE id == '{docID}' and path == '{path}'")
-      self.connection.commit()
+      self.cursor.execute(sq.BRANCHES_DELETE_PATH, (docID, path))
+      self.commit()
       # test if there is a branch remaining, if not delete document
-      self.cursor.execute(f'SELECT id FROM branches WHERE id == "{docID}"')
+      self.cursor.execute(sq.BRANCHES_IDS_BY_ID, (docID,))
       res = self.cursor.fetchall()
       if len(res)==0:
         self.remove(docID)
       return (path, None)
 
     if branch == -1:                                                                      #append a new branch
-      self.cursor.execute(f"SELECT idx FROM branches WHERE id == '{docID}'")
+      self.cursor.execute(sq.BRANCHES_IDX_BY_ID, (docID,))
       idxOld = [i[0] for i in self.cursor.fetchall()]
       idxNew  = min(set(range(max(idxOld)+2)).difference(idxOld))
       show  = self.createShowFromStack(stack)
-      self.cursor.execute(f"INSERT INTO branches VALUES ({', '.join(['?']*6)})",
+      self.cursor.execute(sq.BRANCHES_INSERT,
                   [docID, idxNew, '/'.join(stack+[docID]), str(child), path, show])
-      self.connection.commit()
+      self.commit()
       return (None, None if path=='*' else path)
 
     # modify existing branch
+    params:tuple[Any,...] = ()
     if 'pathOld' in kwargs:
-      pathOld = kwargs['pathOld']
-      cmd = f"SELECT path, stack, show FROM branches WHERE path == '{pathOld}'"
+      cmd, params = sq.BRANCHES_BY_PATH,  (kwargs['pathOld'],)
     elif 'stackOld' in kwargs:
-      stackOld = '/'.join(kwargs['stackOld'])
-      cmd = f"SELECT path, stack, show FROM branches WHERE stack == '{stackOld}'"
+      cmd, params = sq.BRANCHES_BY_STACK, ('/'.join(kwargs['stackOld']),)
     else:
-      cmd = f"SELECT path, stack, show FROM branches WHERE id == '{docID}' and idx == {branch}"
-    self.cursor.execute(cmd)
+      cmd, params = sq.BRANCHES_BY_ID_IDX,(docID, branch)
+    self.cursor.execute(cmd, params)
     reply = self.cursor.fetchone()
     if reply is None:
-      raise ValueError(f"FAILED AT: {cmd}")
+      raise ValueError(f"FAILED AT: {cmd} {params}")
     pathOld, stackOld, showOld = reply
     stack = stack or stackOld.split('/')[:-1]                                       # stack without current id
     if pathOld=='*':
       path = '*'
     elif path=='':
-      self.cursor.execute(f"SELECT type, name FROM main WHERE id == '{docID}'")
+      self.cursor.execute(sq.MAIN_TYPE_NAME_BY_ID, (docID,))
       docType, name = self.cursor.fetchall()[0]
       parentDir = Path(pathOld).parent
       if docType.startswith('x'):
@@ -590,10 +787,8 @@ class SqlLiteDB:
         name = createDirName(docTemp, child, parentDir)
       path = (parentDir/name).as_posix()
     show  = self.createShowFromStack(stack, showOld[-1])
-    cmd = f"UPDATE branches SET stack='{'/'.join(stack+[docID])}', child={child}, path='{path}', show='{show}' "\
-          f"WHERE path = '{pathOld}' and stack = '{stackOld}'"
-    self.cursor.execute(cmd)
-    self.connection.commit()
+    self.cursor.execute(sq.BRANCHES_UPDATE_BY_PATH, ('/'.join(stack+[docID]), child, path, show, pathOld, stackOld))
+    self.commit()
     # move content: folder and data and write .json to disk
     if pathOld!='*' and ':/' not in pathOld and path!='*' and path is not None:
       if not (self.basePath/pathOld).exists() and (self.basePath/path).exists():
@@ -617,8 +812,8 @@ class SqlLiteDB:
       stackOld (str): old stack of parent
       stackNew (str): new stack of parent
     """
-    cmd = f"SELECT path, stack, show, id, idx FROM branches WHERE stack LIKE '{stackOld}/%'"
-    self.cursor.execute(cmd)
+    self.changeHierarchy((stackNew or stackOld).split('/')[-1], True)
+    self.cursor.execute(sq.BRANCHES_CHILDREN, (f'{stackOld}/%',))
     children = self.cursor.fetchall()
     updatedInfo = []
     for (pathIOld, stackIOld, showIOld, docID, idx) in children:
@@ -626,9 +821,8 @@ class SqlLiteDB:
       stackINew = stackNew+stackIOld[len(stackOld):]                           if stackNew else stackIOld
       showINew  = self.createShowFromStack(stackIOld.split('/'), showIOld[-1]) if stackNew else showIOld
       updatedInfo.append((pathINew, stackINew, showINew, docID, idx))
-    cmd = 'UPDATE branches SET path=?, stack=?, show=? WHERE id == ? and idx == ?'
-    self.cursor.executemany(cmd, updatedInfo)
-    self.connection.commit()
+    self.cursor.executemany(sq.BRANCHES_UPDATE_CHILD, updatedInfo)
+    self.commit()
     return
 
 
@@ -647,7 +841,7 @@ class SqlLiteDB:
     """
     show = len(stack)*['T'] + [currentShow]
     for idx, docID in enumerate(stack):
-      self.cursor.execute(f"SELECT show FROM branches WHERE id == '{docID}'")
+      self.cursor.execute(sq.BRANCHES_SHOW_BY_ID, (docID,))
       if self.cursor.fetchone()[0][-1] == 'F':
         show[idx] = 'F'
     return ''.join(show)
@@ -663,21 +857,20 @@ class SqlLiteDB:
     Returns:
       dict: document that was removed
     """
+    self.changeHierarchy(docID)
+    self.searchPending.add(docID)
     doc = self.getDoc(docID)
     if len(doc['branch'])>1 and stack:                                                 #only remove one branch
       stack = stack[:-1] if stack.endswith('/') else stack
-      self.cursor.execute(f"DELETE FROM branches WHERE id == '{docID}' and stack LIKE '{stack}%'")
+      self.cursor.execute(sq.BRANCHES_DELETE_STACK, (docID, f'{stack}%'))
     else:                                                                                   #remove everything
       doc.pop('image','')
       doc.pop('content','')
-      self.cursor.execute(f"DELETE FROM main WHERE id == '{docID}'")
-      self.cursor.execute(f"DELETE FROM branches WHERE id == '{docID}'")
-      self.cursor.execute(f"DELETE FROM properties WHERE id == '{docID}'")
-      self.cursor.execute(f"DELETE FROM tags WHERE id == '{docID}'")
-      self.cursor.execute(f"DELETE FROM qrCodes WHERE id == '{docID}'")
-      self.cursor.execute(f"DELETE FROM attachments WHERE id == '{docID}'")
-      self.cursor.execute('INSERT INTO changes VALUES (?,?,?)', [docID, datetime.now().isoformat(), json.dumps(doc)])
-    self.connection.commit()
+      for cmd in (sq.MAIN_DELETE, sq.BRANCHES_DELETE, sq.PROPERTIES_DELETE, sq.TAGS_DELETE, sq.QRCODES_DELETE,
+                  sq.ATTACHMENTS_DELETE, sq.THUMBNAILS_DELETE):
+        self.cursor.execute(cmd, (docID,))
+      self.cursor.execute(sq.CHANGES_INSERT, [docID, datetime.now().isoformat(), json.dumps(doc)])
+    self.commit()
     return doc
 
 
@@ -691,7 +884,7 @@ class SqlLiteDB:
     """
     cmd = 'INSERT OR REPLACE INTO attachments VALUES (?,?,?,?,?,?)'
     self.cursor.execute(cmd, [docID, name, '', docType, '', ''])
-    self.connection.commit()
+    self.commit()
     return
 
 
@@ -707,7 +900,7 @@ class SqlLiteDB:
     """
     cmd = 'INSERT INTO attachments VALUES (?,?,?,?,?,?)'
     self.cursor.execute(cmd, [docID, name, content['date'], content['docID'], content['remark'], content['user']])
-    self.connection.commit()
+    self.commit()
     return
 
 
@@ -731,87 +924,33 @@ class SqlLiteDB:
       allFlag = True
     viewType, docType = thePath.split('/', 1)
     if viewType=='viewDocType':
-      viewColumns = self.dataHierarchy(docType, 'view')
-      viewColumns = viewColumns+['id'] if viewColumns and viewColumns != [''] else ['name','tags','comment','id']
-      textSelect = ', '.join([f'main.{i}' for i in viewColumns if i in MAIN_ORDER or i[1:] in MAIN_ORDER])
-      cmd = f"SELECT {textSelect}, branches.show FROM main INNER JOIN branches USING(id) WHERE main.type LIKE '{docType}%'"
-      if not allFlag:
-        cmd += r" and NOT branches.show LIKE '%F%'"
-      if startKey:
-        cmd += f" and branches.stack LIKE '{startKey}%'"
-      df      = pd.read_sql_query(cmd, self.connection, index_col='id', ).fillna('')
-      #clean main df
-      df      = df[~df.index.duplicated(keep='first')]
-      if 'image' in viewColumns:
-        df['image'] = df['image'].apply(lambda x: 'Y' if len(str(x)) > 1 else 'N')
-      # add: tags, qrCodes, parameters
-      if 'tags' in viewColumns:
-        cmd = 'SELECT main.id, tags.tag FROM main INNER JOIN tags USING(id) INNER JOIN branches USING(id) '\
-              f"WHERE main.type LIKE '{docType}%'"
-        if not allFlag:
-          cmd += r" and NOT branches.show LIKE '%F%'"
-        if startKey:
-          cmd += f" and branches.stack LIKE '{startKey}%'"
-        dfTags = pd.read_sql_query(cmd, self.connection, index_col='id').fillna('')
-        dfTags = dfTags.groupby(['id'])['tag'].apply(lambda x: ', '.join(set(x))).reset_index().set_index('id')
-        dfTags.rename(columns={'tag':'tags'}, inplace=True)
-        df = df.join(dfTags)
-      if 'qrCodes' in viewColumns:
-        cmd = 'SELECT main.id, qrCodes.qrCode FROM main INNER JOIN qrCodes USING(id) INNER JOIN branches '\
-              f"USING(id) WHERE main.type LIKE '{docType}%'"
-        if not allFlag:
-          cmd += r" and NOT branches.show LIKE '%F%'"
-        if startKey:
-          cmd += f" and branches.stack LIKE '{startKey}%'"
-        dfQrCodes = pd.read_sql_query(cmd, self.connection, index_col='id').fillna('')
-        dfQrCodes = dfQrCodes.groupby(['id'])['qrCode'].apply(', '.join).reset_index().set_index('id')
-        dfQrCodes.rename(columns={'qrCode':'qrCodes'}, inplace=True)
-        df = df.join(dfQrCodes)
-      if metadataKeys:= [f'properties.key == "{i}"' for i in viewColumns if i not in MAIN_ORDER+['tags']]:
-        cmd = 'SELECT main.id, properties.key, properties.value FROM main INNER JOIN properties USING(id) '\
-              f"INNER JOIN branches USING(id) WHERE main.type LIKE '{docType}%' AND ({' OR '.join(metadataKeys)})"
-        if not allFlag:
-          cmd += r" and NOT branches.show LIKE '%F%'"
-        if startKey:
-          cmd += f" and branches.stack LIKE '{startKey}%'"
-        dfParams = pd.read_sql_query(cmd, self.connection).fillna('')
-        dfParams = dfParams.drop_duplicates(subset=['key', 'id'], keep='first').set_index('id')# drop duplicates if there are multiple branches
-        dfParams = dfParams.pivot(columns='key', values='value')                         # Pivot the DataFrame
-        #dfParams.columns.name = None                               # Flatten the columns; seems not necessary
-        df = df.join(dfParams)
-      # final sorting of columns
-      columnOrder = [i[1:] if i.startswith('.') and i[1:] in MAIN_ORDER else i for i in viewColumns]+['show']
-      df = df.reset_index().reindex(columnOrder, axis=1)
-      df = df.rename(columns={i:i[1:] for i in columnOrder if i.startswith('.') })
-      df = df.astype('str').fillna('')
-      return df
+      columns, rows = self.viewDocType(docType, allFlag, startKey)
+      return pd.DataFrame(rows.fetchall(), columns=columns)
     elif thePath=='viewHierarchy/viewHierarchy':
       cmd = 'SELECT branches.id, branches.stack, branches.child, main.type, main.name, main.gui, branches.idx, branches.path '\
-            f"FROM branches INNER JOIN main USING(id) WHERE branches.stack LIKE '{startKey}%'"
+            'FROM branches INNER JOIN main USING(id) WHERE branches.stack LIKE ?'
       if not allFlag:
-        cmd += r" and NOT branches.show LIKE '%F%'"
+        cmd += sq.FILTER_VISIBLE
       cmd += ' ORDER BY branches.stack'
-      self.cursor.execute(cmd)
+      self.cursor.execute(cmd, (f'{startKey}%',))
       results = self.cursor.fetchall()
       # value: [child, doc['type'], doc['name'], doc['gui'], branches.idx]
       results = [{'id':i[0], 'key':i[1],
                   'value':[i[2], i[3].split('/'), i[4], [j=='T' for j in i[5]], i[6], i[7]]} for i in results]
     elif thePath=='viewHierarchy/viewPaths':
       cmd = 'SELECT branches.id, branches.path, branches.stack, main.type, branches.child, main.shasum, branches.idx '\
-            'FROM branches INNER JOIN main USING(id)'
+            'FROM branches INNER JOIN main USING(id) WHERE 1'
+      params = []
       # JOIN and get type
       if startKey is not None:
-        if startKey.endswith('/'):
-          startKey = startKey.removesuffix('/')
-        cmd += f" WHERE branches.path LIKE '{startKey}%'"
+        cmd += ' and branches.path LIKE ?'
+        params.append(f"{startKey.removesuffix('/')}%")
       elif preciseKey is not None:
-        cmd += f" WHERE branches.path LIKE '{preciseKey}'"
+        cmd += ' and branches.path LIKE ?'
+        params.append(preciseKey)
       if not allFlag:
-        if 'WHERE' in cmd:
-          cmd += r" AND NOT branches.show LIKE '%F%'"
-        else:
-          cmd += r" WHERE NOT branches.show LIKE '%F%'"
-      self.cursor.execute(cmd)
+        cmd += sq.FILTER_VISIBLE
+      self.cursor.execute(cmd, params)
       results = self.cursor.fetchall()
       # value: [branch.stack, doc['-type'], branch.child, doc.shasum, idx]
       results = [{'id':i[0], 'key':i[1],
@@ -820,28 +959,30 @@ class SqlLiteDB:
       cmd = 'SELECT tags.tag, main.name, main.type, tags.id, branches.show, branches.stack '\
             'FROM tags INNER JOIN main USING(id) INNER JOIN branches USING(id)'
       if not allFlag:
-        cmd += r" WHERE NOT branches.show LIKE '%F%'"
+        cmd += ' WHERE 1'+sq.FILTER_VISIBLE
       return pd.read_sql_query(cmd, self.connection).fillna('')
     elif viewType=='viewIdentify':
+      params = []
       if docType=='viewQR':
         if startKey is None:
           cmd = 'SELECT qrCodes.id, qrCodes.qrCode, main.name FROM qrCodes INNER JOIN main USING(id)'
           if not allFlag:
-            cmd += r" INNER JOIN branches USING(id) WHERE NOT branches.show LIKE '%F%'"
+            cmd += ' INNER JOIN branches USING(id) WHERE 1'+sq.FILTER_VISIBLE
         else:
           raise ValueError('Not implemented sqlite l 599')
       elif docType=='viewSHAsum':
         if startKey is None:
           cmd = 'SELECT main.id, main.shasum, main.name FROM main'
           if not allFlag:
-            cmd += r" INNER JOIN branches USING(id) WHERE NOT branches.show LIKE '%F%'"
+            cmd += ' INNER JOIN branches USING(id) WHERE 1'+sq.FILTER_VISIBLE
         else:
-          cmd = f"SELECT main.id, main.shasum, main.name FROM main INNER JOIN branches USING(id) WHERE shasum='{startKey}'"
+          cmd = 'SELECT main.id, main.shasum, main.name FROM main INNER JOIN branches USING(id) WHERE shasum == ?'
+          params = [startKey]
           if not allFlag:
-            cmd += r" and NOT branches.show LIKE '%F%'"
+            cmd += sq.FILTER_VISIBLE
       else:
         raise ValueError('Invalid docType')
-      self.cursor.execute(cmd)
+      self.cursor.execute(cmd, params)
       results = self.cursor.fetchall()
       results = [{'id':i[0], 'key':i[1].replace('/',' '), 'value':i[2]} for i in results if i[1] is not None]
     else:
@@ -850,68 +991,6 @@ class SqlLiteDB:
     return results
 
 
-  def getHierarchy(self, start:str, allItems:bool=False) -> tuple[Node,bool]:
-    """
-    get hierarchy tree for projects, ..
-
-    Args:
-      start (str): start of the hierarchy (most parent)
-      allItems (bool):  true=show all items, false=only non-hidden
-
-    Returns:
-      Node: hierarchy in an anytree; children sorted by childNum (primary) and docID (secondary)
-      bool: error occurred
-    """
-    path = 'viewHierarchy/viewHierarchyAll' if allItems else 'viewHierarchy/viewHierarchy'
-    view = self.getView(path,    startKey=start)
-    # create tree of folders: these are the only ones that have children
-    dataTree = None
-    nonFolders = []
-    id2Node = {}
-    error = False
-    for item in view:
-      docType = item['value'][1]
-      if docType[0][0] != 'x':
-        nonFolders.append(item)
-        continue
-      _id     = item['id']
-      childNum, docType, name, gui, _childNum, path = item['value']
-      if dataTree is None:
-        dataTree = Node(id=_id, docType=docType, name=name, gui=gui, childNum=childNum)
-        id2Node[_id] = dataTree
-      else:
-        parent = item['key'].split('/')[-2]
-        if parent in id2Node:
-          parentNode = id2Node[parent]
-        else:
-          parentNode, error = (dataTree, True)
-          logging.error('Error in the hierarchy tree with parent %s missing', parent, exc_info=True)
-        subNode = Node(id=_id, parent=parentNode, docType=docType, name=name, gui=gui, childNum=childNum, fPath=path)
-        id2Node[_id] = subNode
-    # add non-folders into tree
-    # print(len(nonFolders),'length: crop if too long')
-    for item in nonFolders:
-      _id     = item['id']
-      childNum, docType, name, gui, _childNum, path = item['value']
-      parentId = item['key'].split('/')[-2]
-      if parentId in id2Node:
-        parentNode = id2Node[parentId]
-      else:
-        outputString('print','error',f'repair branch table as parentID {parentId} is missing')
-        parentNode, error = (dataTree,True)
-      Node(id=_id, parent=parentNode, docType=docType, name=name, gui=gui, childNum=childNum, fPath=path)
-    # sort children
-    for parentNode in id2Node.values():
-      children = parentNode.children
-      childNums= [f'{i.childNum:05d}{i.id}{idx}' for idx,i in enumerate(children)]
-      parentNode.children = [x for _, x in sorted(zip(childNums, children))]
-    # for debugging / checking
-    # from anytree import RenderTree
-    # for pre, _, node in RenderTree(dataTree, maxlevel=2):
-    #   print(f'{pre}{node.childNum:03d} {node.name} {node.id}')
-    return dataTree, error
-
-
   def hideShow(self, docID:str) -> None:
     """
     Toggle hide/show indicator of branch
@@ -933,12 +1012,11 @@ class SqlLiteDB:
       showL = list(show)
       showL[j] = 'T' if showL[j]=='F' else 'F'
       return (''.join(showL), localDocID, idx)
-    cmd = f"SELECT id, idx, stack, show FROM branches WHERE stack LIKE '%{docID}%'"
-    self.cursor.execute(cmd)
-    changed = map(adoptShow, self.cursor.fetchall())
-    cmd = 'UPDATE branches SET show=? WHERE id = ? and idx= ?'
-    self.cursor.executemany(cmd, changed)
-    self.connection.commit()
+    self.changeHierarchy(docID, True)
+    self.cursor.execute(sq.BRANCHES_CONTAIN, (f'%{docID}%',))
+    changed = list(map(adoptShow, self.cursor.fetchall()))
+    self.cursor.executemany(sq.BRANCHES_UPDATE_SHOW, changed)
+    self.commit()
     return
 
 
@@ -952,41 +1030,42 @@ class SqlLiteDB:
       docID (str): docID
       guiState (list): list of bool that show if document is shown
     """
+    self.changeHierarchy(docID)
     guiList = ''.join(['T' if i else 'F' for i in guiState])
-    cmd = f"UPDATE main SET gui='{guiList}' WHERE id = '{docID}'"
-    self.cursor.execute(cmd)
-    self.connection.commit()
+    self.cursor.execute(sq.MAIN_UPDATE_GUI, (guiList, docID))
+    self.commit()
     return
 
 
   def checkDB(self, outputStyle:str='text', minimal:bool=False,
-              repair:Union[None,Callable[[str],bool]]=None) -> str:
+              repair:Union[None,Callable[[str],bool]]=None, report:Optional[CheckReport]=None) -> str:
     """
     Check database for consistencies by iterating through all documents
     - only reporting, no repair
     - custom changes are possible with normal scan
     - no interaction with hard disk
+    - all branches are read once; each check is one pass over them, its time is recorded in the report
 
     Args:
         outputStyle (str): output using a given style: see outputString
         minimal (bool): true=only show warnings and errors; else=also show information
         repair (function): auto-repair after asking user
+        report (CheckReport): report to add the findings to; if not given, a new one
 
     Returns:
         str: output
     """
-    reply = ''
+    report = CheckReport(outputStyle) if report is None else report
     if outputStyle=='html':
-      reply += '<div align="right">'
+      report.addText('<div align="right">')
     if not minimal:
-      reply+= outputString(outputStyle,'h2','LEGEND')
-      reply+= outputString(outputStyle,'perfect','Green: perfect and as intended')
-      reply+= outputString(outputStyle,'ok',
-                               'Blue: ok, can happen: empty files for testing, strange path for measurements')
-      reply+= outputString(outputStyle,'h2','List all database entries')
+      report.add('h2','LEGEND')
+      report.add('perfect','Green: perfect and as intended')
+      report.add('ok', 'Blue: ok, can happen: empty files for testing, strange path for measurements')
+      report.add('h2','List all database entries')
     if outputStyle=='html':
-      reply += '</div>'
-      reply+= outputString(outputStyle,'h2','List all database entries')
+      report.addText('</div>')
+      report.add('h2','List all database entries')
     lostAndFoundProjId   = ''
     lostAndFoundProjPath = Path()
     if repair is not None:
@@ -997,170 +1076,163 @@ class SqlLiteDB:
       else:
         lostAndFoundProjId   = idProjects[0]
         lostAndFoundProjPath = Path('LostAndFound')                                             #by definition
-    if not lostAndFoundProjId and repair is not None:
-      errorStr = outputString(outputStyle,'error','No Lost and Found project found. Some repair impossible. '\
-                                          'Repair: exit repair mode and manually create LostAndFound project.')
-      if repair is None:
-        reply+= errorStr
-      elif repair(errorStr):
-        return 'Repair aborted: no Lost and Found project found. Exit repair mode and create it manually.'
+    if not lostAndFoundProjId and repair is not None and \
+        report.add('error', 'No Lost and Found project found. Some repair impossible. '\
+                            'Repair: exit repair mode and manually create LostAndFound project.', repair):
+      return 'Repair aborted: no Lost and Found project found. Exit repair mode and create it manually.'
     # tests
-    self.cursor.execute('SELECT main.id, main.name FROM main WHERE id NOT IN (SELECT id FROM branches)')
-    if res:= self.cursor.fetchall():
-      errorStr = outputString(outputStyle,'error', f'Items with no branch: {", ".join(str(i) for i in res)}')
-      if repair is None:
-        reply+= errorStr
-      elif repair(errorStr):
+    with report.check('branches'):
+      self.cursor.execute('SELECT main.id, main.name FROM main WHERE id NOT IN (SELECT id FROM branches)')
+      if (res:= self.cursor.fetchall()) and report.add('error', f'Items with no branch: {", ".join(str(i) for i in res)}',
+                                                       repair):
         for docID, name in res:
-          self.cursor.execute(f"INSERT INTO branches VALUES ({', '.join(['?']*6)})",
-            [docID, 0, f'{lostAndFoundProjId}/{docID}', 9999, '*', 'TT'])
-        self.connection.commit()
-
-    cmd = 'SELECT id, main.type, branches.stack, branches.path, branches.child, branches.show, main.name '\
-          'FROM branches INNER JOIN main USING(id)'
-    self.cursor.execute(cmd)
-    res = self.cursor.fetchall()
-    reply += outputString(outputStyle,'info', f'Number of documents: {len(res)}')
-    for row in res:
-      try:
-        docID, docType, stack, path, child, _, name = row[0], row[1], row[2], row[3], row[4], row[5], row[6]
-      except ValueError:
-        reply+= outputString(outputStyle,'error','dch03a: branch data has strange list')
-        continue
-      if docType.count('/')>5:
-        reply+= outputString(outputStyle,'error',f"dch04a: type has too many / {docID}")
-      if len(docType.split('/'))==0:
-        reply+= outputString(outputStyle,'unsure',f"dch04b: no type in (removed data?) {docID}")
-        continue
-      if docType.startswith('x') and not docType.startswith(('x0','x1')):
-        errorStr = outputString(outputStyle,'error',f"dch04c: bad data type*: {docID} {docType}")
-        if repair is None:
-          reply+= errorStr
-        elif repair(errorStr):
-          self.cursor.execute(f"UPDATE main SET type='x1' WHERE id = '{docID}'")
-      if not all(k.startswith('x-') for k in stack.split('/')[:-1]):
-        reply+= outputString(outputStyle,'error',f"dch03: non-text in stack in id: {docID}")
-      if any(len(i)==0 for i in stack) and not docType.startswith('x0'):                    #if no inheritance
-        if docType.startswith(('measurement','x')):
-          reply+= outputString(outputStyle,'warning',f"branch stack length = 0: no parent {docID}")
-        elif not minimal:
-          reply+= outputString(outputStyle,'ok',
-                                   f"branch stack length = 0: no parent for procedure/sample {docID}")
-      try:
+          self.cursor.execute(sq.BRANCHES_INSERT, [docID, 0, f'{lostAndFoundProjId}/{docID}', 9999, '*', 'TT'])
+        self.commit()
+      # all branches once: rows, ids of documents, paths of branches of each document
+      cmd = 'SELECT id, main.type, branches.stack, branches.path, branches.child, branches.show, main.name '\
+            'FROM branches INNER JOIN main USING(id)'
+      self.cursor.execute(cmd)
+      rows = self.cursor.fetchall()
+      self.cursor.execute('SELECT id FROM main')
+      docIDs = {i[0] for i in self.cursor.fetchall()}
+      pathsByID:dict[str,list[str]] = {}
+      for row in rows:
+        if row[3] is not None:
+          pathsByID.setdefault(row[0], []).append(row[3])
+    report.add('info', f'Number of documents: {len(rows)}')
+
+    with report.check('dch04'):
+      for docID, docType, *_ in rows:
+        if docType.count('/')>5:
+          report.add('error',f"dch04a: type has too many / {docID}")
+        if docType.startswith('x') and not docType.startswith(('x0','x1')) and \
+            report.add('error',f"dch04c: bad data type*: {docID} {docType}", repair):
+          self.cursor.execute(sq.mainUpdate(['type']), ('x1', docID))
+
+    with report.check('dch03'):
+      for docID, docType, stack, *_ in rows:
+        if not all(k.startswith('x-') for k in stack.split('/')[:-1]):
+          report.add('error',f"dch03: non-text in stack in id: {docID}")
+        if any(len(i)==0 for i in stack) and not docType.startswith('x0'):                  #if no inheritance
+          if docType.startswith(('measurement','x')):
+            report.add('warning',f"branch stack length = 0: no parent {docID}")
+          elif not minimal:
+            report.add('ok', f"branch stack length = 0: no parent for procedure/sample {docID}")
+
+    with report.check('dch05'):
+      for docID, docType, _, path, child, *_ in rows:
+        if path is None or not docType.startswith('x'):
+          continue
         dirNamePrefix = path.split(os.sep)[-1].split('_')[0]
-        if dirNamePrefix.isdigit() and child!=int(dirNamePrefix) and docType.startswith('x'):#compare child-number to start of directory name
-          reply+= outputString(outputStyle,'error',f"dch05: child-number and dirName dont match {docID}")
-      except Exception:
-        pass                                                                               #handled next lines
-      if path is None:
-        if docType.startswith('x'):
-          reply+= outputString(outputStyle,'error',f"dch06: branch path is None {docID}")
-        elif docType.startswith('measurement'):
-          if not minimal:
-            reply+= outputString(outputStyle,'ok', f'measurement branch path is None=no data {docID}')
-        elif not minimal:
-          reply+= outputString(outputStyle,'perfect',f"procedure/sample with empty path {docID}")
-      else:                                                                                  #if sensible path
-        if len(stack.split('/')) != len(path.split('/')) and path!='*' and not path.startswith('http'):
+        if dirNamePrefix.isdigit() and child!=int(dirNamePrefix):    #compare child-number to start of directory name
+          report.add('error',f"dch05: child-number and dirName dont match {docID}")
+
+    with report.check('dch06'):
+      for docID, docType, stack, path, _, _, name in rows:
+        if path is None:
+          if docType.startswith('x'):
+            report.add('error',f"dch06: branch path is None {docID}")
+          elif docType.startswith('measurement'):
+            if not minimal:
+              report.add('ok', f'measurement branch path is None=no data {docID}')
+          elif not minimal:
+            report.add('perfect',f"procedure/sample with empty path {docID}")
+        elif len(stack.split('/')) != len(path.split('/')) and path!='*' and not path.startswith('http'):
           #check if length of path and stack coincide; ignore path=None=*
           if docType.startswith('procedure'):
             if not minimal:
-              reply+= outputString(outputStyle,'perfect',
-                                       f"procedure: branch stack and path lengths not equal: {docID}: {name}")
+              report.add('perfect', f"procedure: branch stack and path lengths not equal: {docID}: {name}")
           else:
-            reply+= outputString(outputStyle,'unsure',
-              f"branch stack and path lengths not equal: {docID}: {name} {len(stack.split('/'))}"
-              f" {len(path.split(os.sep))}")
-        if path!='*' and not path.startswith('http'):
-          for parentID in stack.split('/')[:-1]:        #check if all parents in doc have a corresponding path
-            parentDoc = self.getDoc(parentID)
-            if not parentDoc:
-              errorStr= outputString(outputStyle,'error',f"branch stack parent is bad: {docID}. Repair: move to lost and found.")
-              if repair is None:
-                reply+= errorStr
-              elif repair(errorStr):
-                tempDoc = {'name':name, 'type':['x0']}
-                pathNew = (lostAndFoundProjPath/createDirName(tempDoc, 0, lostAndFoundProjPath)).as_posix() if docID.startswith('x-')\
-                          else '*'
-                stackNew = f'{lostAndFoundProjId}/{docID}'
-                self.cursor.execute(f"UPDATE branches SET path='{pathNew}', stack='{stackNew}' "\
-                                    f"WHERE id='{docID}' AND stack='{stack}'")
-                self.connection.commit()
-              continue
-            parentDocBranches = parentDoc['branch']
-            onePathFound = any(path.startswith(parentBranch['path']) for parentBranch in parentDocBranches)
-            if not onePathFound:
-              if docType.startswith('workflow'):
-                if not minimal:
-                  reply+= outputString(outputStyle,'perfect',
-                    f"dch08: workflow parent does not have corresponding path {docID} | parentID {parentID}")
-              else:
-                reply+= outputString(outputStyle,'unsure',
-                    f"dch08: parent does not have corresponding path {docID} | parentID {parentID}")
-
-    self.cursor.execute('SELECT id, idx FROM branches WHERE idx<0')
-    for docID, idx in self.cursor.fetchall():
-      reply+= outputString(outputStyle,'error',f"branch idx is bad: {docID} idx: {idx}")
-
-    self.cursor.execute("SELECT id, key FROM properties where key NOT LIKE '%.%'")
-    for docID, key in self.cursor.fetchall():
-      reply+= outputString(outputStyle,'error',f"key is bad, miss .: {docID} idx: {key}")
-    self.cursor.execute("SELECT id, key FROM properties where value LIKE ''")
-    for docID, key in self.cursor.fetchall():
-      errorStr= outputString(outputStyle,'ok',f"value of this key is missing*: {docID} idx: {key}")
-      if repair is None:
-        reply+= errorStr
-      elif repair(errorStr):
-        self.cursor.execute(f"DELETE FROM properties WHERE id='{docID}' AND key='{key}'")
-        self.connection.commit()
-
-    cmd = 'SELECT branches.id, branches.path, main.shasum FROM branches JOIN main USING(id) '\
-          "WHERE branches.path=='*' AND main.shasum!=''"
-    self.cursor.execute(cmd)
-    for line in self.cursor.fetchall():
-      errorStr= outputString(outputStyle,'error',f"shasum!='' for item with no path docID:{line[0]}. Repair: remove shasum")
-      if repair is None:
-        reply+= errorStr
-      elif repair(errorStr):
-        self.cursor.execute(f"UPDATE main SET shasum='' WHERE id = '{line[0]}'")
-        self.connection.commit()
+            report.add('unsure', f"branch stack and path lengths not equal: {docID}: {name} {len(stack.split('/'))}"
+                                 f" {len(path.split(os.sep))}")
+
+    with report.check('dch08'):
+      for docID, docType, stack, path, _, _, name in rows:
+        if path is None or path=='*' or path.startswith('http'):
+          continue
+        for parentID in stack.split('/')[:-1]:            #check if all parents in doc have a corresponding path
+          if parentID not in docIDs:
+            if report.add('error',f"branch stack parent is bad: {docID}. Repair: move to lost and found.", repair):
+              tempDoc = {'name':name, 'type':['x0']}
+              pathNew = (lostAndFoundProjPath/createDirName(tempDoc, 0, lostAndFoundProjPath)).as_posix() if docID.startswith('x-')\
+                        else '*'
+              stackNew = f'{lostAndFoundProjId}/{docID}'
+              self.cursor.execute(sq.BRANCHES_UPDATE_STACK, (pathNew, stackNew, docID, stack))
+              self.commit()
+              pathsByID[docID] = [pathNew if i==path else i for i in pathsByID.get(docID, [])]#branch changed
+            continue
+          if not any(path.startswith(i) for i in pathsByID.get(parentID, [])):
+            if docType.startswith('workflow'):
+              if not minimal:
+                report.add('perfect', f"dch08: workflow parent does not have corresponding path {docID} | parentID {parentID}")
+            else:
+              report.add('unsure', f"dch08: parent does not have corresponding path {docID} | parentID {parentID}")
+
+    with report.check('idx'):
+      self.cursor.execute('SELECT id, idx FROM branches WHERE idx<0')
+      for docID, idx in self.cursor.fetchall():
+        report.add('error',f"branch idx is bad: {docID} idx: {idx}")
+
+    with report.check('properties'):
+      self.cursor.execute("SELECT id, key FROM properties where key NOT LIKE '%.%'")
+      for docID, key in self.cursor.fetchall():
+        report.add('error',f"key is bad, miss .: {docID} idx: {key}")
+      self.cursor.execute("SELECT id, key FROM properties where value LIKE ''")
+      for docID, key in self.cursor.fetchall():
+        if report.add('ok',f"value of this key is missing*: {docID} idx: {key}", repair):
+          self.cursor.execute(sq.PROPERTIES_DELETE_ONE, (docID, key))
+          self.commit()
+
+    with report.check('shasum'):
+      cmd = 'SELECT branches.id, branches.path, main.shasum FROM branches JOIN main USING(id) '\
+            "WHERE branches.path=='*' AND main.shasum!=''"
+      self.cursor.execute(cmd)
+      for line in self.cursor.fetchall():
+        if report.add('error',f"shasum!='' for item with no path docID:{line[0]}. Repair: remove shasum", repair):
+          self.cursor.execute(sq.mainUpdate(['shasum']), ('', line[0]))
+          self.commit()
 
     #doc-type specific tests
-    cmd = "SELECT qrCodes.id, qrCodes.qrCode FROM qrCodes JOIN main USING(id) WHERE  main.type LIKE 'sample%'"
-    self.cursor.execute(cmd)
-    if res:= [i[0] for i in self.cursor.fetchall() if i[1] is None]:
-      reply+= outputString(outputStyle,'warning',f"dch09: qrCode not in samples {res}")
-    self.cursor.execute("SELECT id, shasum, image, comment FROM main WHERE  type LIKE 'measurement%'")
-    for row in self.cursor.fetchall():
-      docID, shasum, image, _ = row
-      if shasum is None:
-        reply+= outputString(outputStyle,'warning',f"dch10: shasum not in measurement {docID}")
-      if image.startswith('data:image'):                                                      #for jpg and png
-        try:
-          imgData = base64.b64decode(image[22:])
-          Image.open(io.BytesIO(imgData))                    #can convert, that is all that needs to be tested
-        except Exception:
-          reply+= outputString(outputStyle,'error',f"dch12: jpg-image not valid {docID}")
-      elif image.startswith('<?xml'):
-        #from https://stackoverflow.com/questions/63419010/check-if-an-image-file-is-a-valid-svg-file-in-python
-        SVG_R = r'(?:<\?xml\b[^>]*>[^<]*)?(?:<!--.*?-->[^<]*)*(?:<svg|<!DOCTYPE svg)\b'
-        SVG_RE = re.compile(SVG_R, re.DOTALL)
-        if SVG_RE.match(image) is None:
-          reply+= outputString(outputStyle,'error',f"dch13: svg-image not valid {docID}")
-      # elif image in ('', None):
-        # No more warnings if images are not present: happens often in propriatary binary files,... users see it
-        # comment = comment.replace('\n','..')
-        # reply+=outputString(outputStyle,'unsure',f"image does not exist {docID} image:{image} comment:{comment}")
-      elif not image:
-        reply+= outputString(outputStyle,'info',f"dch14: empty image {docID}")
-      else:
-        reply+= outputString(outputStyle,'error',f"dch14: image not valid {docID} |{image}|")
+    with report.check('dch09'):
+      cmd = "SELECT qrCodes.id, qrCodes.qrCode FROM qrCodes JOIN main USING(id) WHERE  main.type LIKE 'sample%'"
+      self.cursor.execute(cmd)
+      if res:= [i[0] for i in self.cursor.fetchall() if i[1] is None]:
+        report.add('warning',f"dch09: qrCode not in samples {res}")
+    with report.check('dch10'):
+      self.cursor.execute("SELECT id, shasum, image, comment FROM main WHERE  type LIKE 'measurement%'")
+      for row in self.cursor.fetchall():
+        docID, shasum, image, _ = row
+        if shasum is None:
+          report.add('warning',f"dch10: shasum not in measurement {docID}")
+        if image.startswith(THUMBNAIL_REF) and not (image := self.getImage(image, docID)):
+          report.add('error',f"dch16: image not in thumbnail store {docID}")
+        elif image.startswith('data:image'):                                                      #for jpg and png
+          try:
+            imgData = base64.b64decode(image[22:])
+            Image.open(io.BytesIO(imgData))                    #can convert, that is all that needs to be tested
+          except Exception:
+            report.add('error',f"dch12: jpg-image not valid {docID}")
+        elif image.startswith('<?xml'):
+          #from https://stackoverflow.com/questions/63419010/check-if-an-image-file-is-a-valid-svg-file-in-python
+          SVG_R = r'(?:<\?xml\b[^>]*>[^<]*)?(?:<!--.*?-->[^<]*)*(?:<svg|<!DOCTYPE svg)\b'
+          SVG_RE = re.compile(SVG_R, re.DOTALL)
+          if SVG_RE.match(image) is None:
+            report.add('error',f"dch13: svg-image not valid {docID}")
+        # elif image in ('', None):
+          # No more warnings if images are not present: happens often in propriatary binary files,... users see it
+          # comment = comment.replace('\n','..')
+          # reply+=outputString(outputStyle,'unsure',f"image does not exist {docID} image:{image} comment:{comment}")
+        elif not image:
+          report.add('info',f"dch14: empty image {docID}")
+        else:
+          report.add('error',f"dch14: image not valid {docID} |{image}|")
 
     #test hierarchy
-    for projID in self.getView('viewDocType/x0')['id'].values:
-      _, error = self.getHierarchy(projID, True)
-      if error:
-        reply+= outputString(outputStyle,'error',f"dch15: project hierarchy invalid in project {projID}")
+    with report.check('dch15'):
+      for projID in self.getView('viewDocType/x0')['id'].values:
+        _, error = self.getHierarchy(projID, True)
+        if error:
+          report.add('error',f"dch15: project hierarchy invalid in project {projID}")
     if repair is not None:
-      self.connection.commit()
-    return reply
+      self.commit()
+    return str(report)
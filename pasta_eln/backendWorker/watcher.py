@@ -0,0 +1,247 @@
+""" Watch the directory tree of a project group and report the folders, in which files changed
+- inotify on Linux; polling of the directory tree as fallback on other systems
+- events are debounced: folders are reported once no event happened for some time, e.g. after an instrument
+  finished writing its files
+- the folders are reported relative to the base path, the backend scans them: see Backend.scanPaths
+- changes by the scan itself, e.g. renamed folders, are reported, too: their rescan finds no change and ends
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+DEBOUNCE      = 2.0                             # seconds without event, after which the folders are reported
+POLL_INTERVAL = 5.0                             # seconds between two scans of the directory tree, if polling
+IGNORE_DIRS   = ('__pycache__',)
+# constants of inotify, see 'man inotify'
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x8, 0x40, 0x80, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR  = 0x400, 0x800, 0x4000, 0x8000, 0x1000000
+IN_ISDIR = 0x40000000
+IN_MASK  = IN_CLOSE_WRITE|IN_MOVED_FROM|IN_MOVED_TO|IN_CREATE|IN_DELETE|IN_DELETE_SELF|IN_MOVE_SELF|IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')                                                    # wd, mask, cookie, len
+
+
+def ignoreName(name:str) -> bool:
+  """ Files and folders that the scan ignores: changes to them are not reported
+
+  Args:
+    name (str): name of file or folder
+
+  Returns:
+    bool: true if ignored
+  """
+  return name.startswith(('.', 'trash_')) or name in IGNORE_DIRS or '_PastaExport' in name
+
+
+class FileWatcher:
+  """ Watch the directory tree below a base path in a thread; report the folders with changes to a callback
+  - callback is called from the thread of the watcher with the sorted list of posix paths relative to the base
+    path: '.' stands for 'all', e.g. after inotify lost events
+  - changes directly in the base path are not reported: database and folders of projects
+  """
+  def __init__(self, basePath:Path, callback:Callable[[list[str]],None], debounce:float=DEBOUNCE,
+               polling:bool=False, interval:float=POLL_INTERVAL) -> None:
+    """ Initialize the watcher: it does not watch before start
+
+    Args:
+      basePath (Path): root of the directory tree
+      callback (func): called with the folders, in which files changed
+      debounce (float): seconds without event, after which the folders are reported
+      polling (bool): poll even if inotify exists
+      interval (float): seconds between two scans of the directory tree, if polling
+    """
+    self.basePath = basePath
+    self.callback = callback
+    self.debounce = debounce
+    self.interval = interval
+    self.libc:Optional[ctypes.CDLL] = None
+    if not polling and sys.platform.startswith('linux'):
+      try:
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+      except (OSError, AttributeError):
+        logging.warning('Watcher: inotify is not available, poll instead')
+        self.libc = None
+    self.method   = 'polling' if self.libc is None else 'inotify'
+    self.pending:set[str] = set()                                              # folders with changes: absolute
+    self.lastEvent = 0.0
+    self.stopEvent = threading.Event()
+    self.thread:Optional[threading.Thread] = None
+    self.fd = -1
+    self.watches:dict[int,str] = {}                                             # inotify: watch descriptor: folder
+    self.snapshot:dict[str,dict[str,tuple[int,int,int]]] = {}          # polling: folder: name: isDir,size,mtimeNs
+
+
+  def start(self) -> None:
+    """ Start watching: the whole tree is registered / read before this returns """
+    if self.libc is not None:
+      self.fd = self.libc.inotify_init1(os.O_NONBLOCK|os.O_CLOEXEC)
+      if self.fd < 0:
+        logging.warning('Watcher: inotify failed with errno %s, poll instead', ctypes.get_errno())
+        self.libc, self.method = None, 'polling'
+    if self.libc is None:
+      self.snapshot = self.readTree(str(self.basePath))
+    else:
+      self.addWatches(str(self.basePath))
+    logging.info('Watcher: started %s of %s', self.method, self.basePath)
+    self.stopEvent.clear()
+    self.thread = threading.Thread(target=self.run, name='FileWatcher', daemon=True)
+    self.thread.start()
+
+
+  def stop(self) -> None:
+    """ Stop watching; pending changes are dropped """
+    self.stopEvent.set()
+    if self.thread is not None:
+      self.thread.join()
+      self.thread = None
+    if self.fd >= 0:
+      os.close(self.fd)
+      self.fd = -1
+    self.watches = {}
+    logging.info('Watcher: stopped')
+
+
+  def run(self) -> None:
+    """ Loop of the thread: collect events and report them after the debounce time """
+    nextPoll = time.monotonic()+self.interval
+    while not self.stopEvent.is_set():
+      timeout = self.debounce/4 if self.pending else 1.0
+      if self.libc is None:
+        if time.monotonic() >= nextPoll:
+          self.poll()
+          nextPoll = time.monotonic()+self.interval
+        self.stopEvent.wait(min(timeout, max(nextPoll-time.monotonic(), 0)))
+      else:
+        if select.select([self.fd], [], [], timeout)[0]:
+          self.readEvents()
+      if self.pending and time.monotonic()-self.lastEvent >= self.debounce:
+        folders = sorted(Path(i).relative_to(self.basePath).as_posix() for i in self.pending)
+        self.pending = set()
+        try:
+          self.callback(folders)
+        except Exception:
+          logging.error('Watcher: callback failed for %s', folders, exc_info=True)
+
+
+  def touch(self, folder:str) -> None:
+    """ Note a change in this folder
+
+    Args:
+      folder (str): absolute path of folder
+    """
+    self.pending.add(folder)
+    self.lastEvent = time.monotonic()
+
+
+  ### inotify
+  def addWatches(self, folder:str) -> None:
+    """ Watch this folder and all its sub-folders, except for the ignored ones
+
+    Args:
+      folder (str): absolute path of folder
+    """
+    assert self.libc is not None
+    for root, dirs, _ in os.walk(folder):
+      dirs[:] = [i for i in dirs if not ignoreName(i)]
+      wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), IN_MASK)
+      if wd < 0:                                                  # e.g. limit of watches reached: see errno
+        logging.warning('Watcher: cannot watch %s, errno %s', root, ctypes.get_errno())
+        continue
+      self.watches[wd] = root
+
+
+  def removeWatches(self, folder:str) -> None:
+    """ Stop watching this folder and all its sub-folders
+
+    Args:
+      folder (str): absolute path of folder
+    """
+    assert self.libc is not None
+    for wd, path in list(self.watches.items()):
+      if path==folder or path.startswith(f'{folder}{os.sep}'):
+        self.libc.inotify_rm_watch(self.fd, wd)
+        del self.watches[wd]
+
+
+  def readEvents(self) -> None:
+    """ Read all available events of inotify and note their folders """
+    try:
+      buffer = os.read(self.fd, 64*1024)
+    except BlockingIOError:
+      return
+    offset = 0
+    while offset < len(buffer):
+      wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+      name = os.fsdecode(buffer[offset+EVENT_HEADER.size:offset+EVENT_HEADER.size+length].rstrip(b'\0'))
+      offset += EVENT_HEADER.size+length
+      if mask & IN_Q_OVERFLOW:                                       # events were lost: everything has to be scanned
+        logging.warning('Watcher: queue of inotify overflowed, report all')
+        self.touch(str(self.basePath))
+        continue
+      folder = self.watches.get(wd)
+      if folder is None:
+        continue
+      if mask & IN_IGNORED:                                              # folder was deleted or moved: watch is gone
+        del self.watches[wd]
+        continue
+      if mask & (IN_DELETE_SELF|IN_MOVE_SELF) or ignoreName(name):
+        continue                                                                  # parent folder receives event
+      if mask & IN_ISDIR and mask & IN_MOVED_FROM:                  # moved folder is watched again, if it stays
+        self.removeWatches(os.path.join(folder, name))
+      if mask & IN_ISDIR and mask & (IN_CREATE|IN_MOVED_TO):
+        self.addWatches(os.path.join(folder, name))       # watch new folder; files in it are found by the scan
+      if folder != str(self.basePath):                          # base path: database and folders of projects
+        self.touch(folder)
+
+
+  ### polling
+  def readTree(self, folder:str) -> dict[str,dict[str,tuple[int,int,int]]]:
+    """ State of all files and folders in this folder and its sub-folders, except for the ignored ones
+
+    Args:
+      folder (str): absolute path of folder
+
+    Returns:
+      dict: folder: name: isDir, size, mtimeNs
+    """
+    tree:dict[str,dict[str,tuple[int,int,int]]] = {}
+    folders = [folder]
+    while folders:
+      current = folders.pop()
+      entries:dict[str,tuple[int,int,int]] = {}
+      try:
+        with os.scandir(current) as iterator:
+          for entry in iterator:
+            if ignoreName(entry.name):
+              continue
+            try:
+              isDir = entry.is_dir(follow_symlinks=False)
+              stat = entry.stat(follow_symlinks=False)
+            except OSError:
+              continue
+            entries[entry.name] = (isDir, 0 if isDir else stat.st_size, 0 if isDir else stat.st_mtime_ns)
+            if isDir:
+              folders.append(entry.path)
+      except OSError:                                                       # deleted while reading the tree
+        continue
+      tree[current] = entries
+    return tree
+
+
+  def poll(self) -> None:
+    """ Read the tree and note the folders, whose content changed since the last poll
+    - new and deleted folders change the content of their parent
+    """
+    snapshot = self.readTree(str(self.basePath))
+    for folder, entries in snapshot.items():
+      if folder in self.snapshot and self.snapshot[folder] != entries and folder != str(self.basePath):
+        self.touch(folder)
+    self.snapshot = snapshot
@@ -6,6 +6,7 @@ import json
 import logging
 import shutil
 import tempfile
+import threading
 import time
 from collections import Counter
 from datetime import datetime
@@ -19,13 +20,20 @@ from PySide6.QtWidgets import QMessageBox
 from ..miscTools import flatten
 from ..textTools.handleDictionaries import expandDocID2tupleInDict
 from ..textTools.stringChanges import createDirName
+from . import sqlQueries as sq
 from .backend import Backend
+from .checkReport import CheckReport
 from .dataverse import DataverseClient
 from .elabFTWsync import MERGE_LABELS, Pasta2Elab
+from .hierarchyCache import hierarchyDelta
 from .inputOutput import exportELN, importELN
+from .repository import RepositoryClient
+from .sqlite import SqlLiteDB
+from .watcher import FileWatcher
 from .zenodo import ZenodoClient
 
 waitTimeBeforeSendingFirstMessage = 0.1  # ensure all UI elements are up
+WAIT_FOR_WRITES = 60                      # seconds that a reader waits at most for requested writes
 
 
 class Task(Enum):
@@ -50,6 +58,8 @@ class Task(Enum):
   CHECK_DB       = (18, 'Checking database integrity:')            #keys: style
   OPEN_EXTERNAL  = (19, '')                                        #keys: docID
   TUTORIAL       = (20, '')                                        #keys: --none-- for use only in tutorialPanel.py
+  BULK_ADD_DOCS  = (21, 'Adding documents from table:')            #keys: hierStack, docType, table
+  WATCH_SCAN     = (22, '')                                        #keys: --none-- report of scan by FileWatcher
 
   def __init__(self, num:int, msgWaitDialog:str='') -> None:
     """Initialize the task with a number and an optional message for the wait dialog
@@ -59,6 +69,48 @@ class Task(Enum):
     """
     self.msgWaitDialog = msgWaitDialog
 
+class WriteTracker:
+  """ Track the writes that the GUI requested from the backend worker, such that readers see them
+  - short writes (tasks without wait-dialog, SQL commands) are counted when the GUI requests them and when the
+    backend worker finished them; a reader waits until all writes are finished that were requested before it
+  - long tasks (with wait-dialog), e.g. scans, are not tracked: readers see the last commit and do not wait
+  """
+  def __init__(self) -> None:
+    self.condition = threading.Condition()
+    self.requested = 0
+    self.finished  = 0
+
+
+  def request(self, *_:Any) -> None:
+    """ Count a write that the GUI requested: call before the request is sent to the backend worker """
+    with self.condition:
+      self.requested += 1
+
+
+  def requestTask(self, task:Task, _:dict[str,Any]) -> None:
+    """ Count a task that the GUI requested, if it is short
+    Args:
+      task (Task): task that is requested
+    """
+    if not task.msgWaitDialog:
+      self.request()
+
+
+  def finish(self) -> None:
+    """ Count a write that the backend worker finished """
+    with self.condition:
+      self.finished = min(self.finished+1, self.requested)
+      self.condition.notify_all()
+
+
+  def wait(self) -> None:
+    """ Wait until all writes are finished that were requested until now """
+    with self.condition:
+      target = self.requested
+      if not self.condition.wait_for(lambda: self.finished >= target, timeout=WAIT_FOR_WRITES):
+        logging.warning('Reader did not wait longer for writes of backend worker')
+
+
 class BackendWorker(QObject):
   """
   Backend worker that runs in a separate thread to handle all backend operations
@@ -68,15 +120,25 @@ class BackendWorker(QObject):
   beSendDataHierarchyNode = Signal(str,list)       # Send data hierarchy nodes
   beSendDataHierarchyAll  = Signal(list)           # Send all entries for this docType
   beSendTable             = Signal(pd.DataFrame, str)   # all tables
+  beSendTablePage         = Signal(pd.DataFrame, str, dict)  # window of table, docType, query with 'total' rows
+  beSendSearch            = Signal(str, list)      # query, results of full-text search
   beSendHierarchy         = Signal(Node, dict)
+  beSendHierarchyDelta    = Signal(Node, dict, list)     # hierarchy, project doc, operations: see hierarchyDelta
   beSendDoc               = Signal(dict)
+  beSendDocs              = Signal(list)           # many docs at once: answer to returnDocs
+  beSendThumbnails        = Signal(list, list)     # requested ids, raw images: answer to returnThumbnails
   beSendTaskReport        = Signal(Task, str, str, str)       # task, report, image, path
+  beSendProgress          = Signal(str, str)       # progress of long task: "count" and percentage, see WaitDialog
   beSendSQL               = Signal(str, pd.DataFrame)
+  watcherChanges          = Signal(list)           # folders with changes: from thread of FileWatcher to this one
 
   def __init__(self) -> None:
     """ Initialize the backend worker """
     super().__init__()
     self.backend: Optional[Backend] = None
+    self.watcher: Optional[FileWatcher] = None
+    self.writes = WriteTracker()
+    self.watcherChanges.connect(self.scanWatchedPaths)
 
 
   @Slot(dict,str)
@@ -86,16 +148,25 @@ class BackendWorker(QObject):
       configuration (dict): Configuration dictionary with database and other settings
       projectGroupName (str): Name of the project group to initialize
     """
-    self.backend = Backend(configuration, projectGroupName)
-    docTypesTitlesIcons = {k:{'title':v} for k,v in self.backend.db.dataHierarchy('','title')}
-    for k,v in self.backend.db.dataHierarchy('','icon'):
-      docTypesTitlesIcons[k]['icon'] = v
-    for k,v in self.backend.db.dataHierarchy('','shortcut'):
-      docTypesTitlesIcons[k]['shortcut'] = v
-    time.sleep(waitTimeBeforeSendingFirstMessage)
-    self.beSendDocTypes.emit(docTypesTitlesIcons)
-    for docType in docTypesTitlesIcons:
-      self.beSendDataHierarchyNode.emit(docType, self.backend.db.dataHierarchy(docType, 'meta'))
+    try:
+      if self.watcher is not None:
+        self.watcher.stop()
+        self.watcher = None
+      self.backend = Backend(configuration, projectGroupName)
+      if configuration.get('GUI',{}).get('watchFiles', 'No') == 'Yes':
+        self.watcher = FileWatcher(self.backend.basePath, self.watcherChanges.emit)
+        self.watcher.start()
+      docTypesTitlesIcons = {k:{'title':v} for k,v in self.backend.db.dataHierarchy('','title')}
+      for k,v in self.backend.db.dataHierarchy('','icon'):
+        docTypesTitlesIcons[k]['icon'] = v
+      for k,v in self.backend.db.dataHierarchy('','shortcut'):
+        docTypesTitlesIcons[k]['shortcut'] = v
+      time.sleep(waitTimeBeforeSendingFirstMessage)
+      self.beSendDocTypes.emit(docTypesTitlesIcons)
+      for docType in docTypesTitlesIcons:
+        self.beSendDataHierarchyNode.emit(docType, self.backend.db.dataHierarchy(docType, 'meta'))
+    finally:
+      self.writes.finish()                            #readers answer after the GUI received the docTypes
 
 
   @Slot(str)
@@ -108,55 +179,22 @@ class BackendWorker(QObject):
       self.beSendDataHierarchyAll.emit(self.backend.db.dataHierarchy(docType, '*'))
 
 
-  @Slot(str, str, bool)
-  def returnTable(self, docType:str, projID:str, showAll:bool) -> None:
-    """ Return a view from the database
-    Args:
-      docType (str): Document type to return
-      projID (str): Project ID to get the view for
-      showAll (bool): Whether to return all items or only the non-hidden ones"""
-    if docType and self.backend is not None:
-      if docType=='_tags_':
-        path = 'viewIdentify/viewTags'
-      else:
-        path = f'viewDocType/{docType}'
-      path += 'All' if showAll else ''
-      logging.debug('returnTable %s %s %s %s', docType, projID, showAll, path)
-      data = self.backend.db.getView(path, startKey=projID)
-      self.beSendTable.emit(data, docType)
-
-
-  @Slot(str, bool)
-  def returnHierarchy(self, projID:str, showAll:bool) -> None:
-    """ Return a hierarchy
+  @Slot(Task, dict)
+  def returnTaskReport(self, task:Task, data:dict[str,Any]) -> None:
+    """ Handle a rather complicated task request from the GUI and possibly return a report
     Args:
-      projID (str): Project ID to get the hierarchy for
-      showAll (bool): Whether to return all items or only the non-hidden ones
+      task (Task): Task to perform
+      data (dict): Data required for the task
     """
-    if self.backend is not None and projID:#TODO: during test_13 for some reason the projID is empty, not sure why
-      hierarchy, error = self.backend.db.getHierarchy(projID, allItems=showAll)
-      if error:
-        hierarchy = Node('__ERROR_in_getHierarchy__')
-      projDoc = self.backend.db.getDoc(projID)
-      logging.debug('returnHierarchy %s %s %s', hierarchy, projID, showAll)
-      self.beSendHierarchy.emit(hierarchy, projDoc)
-
-
-  @Slot(str, str)
-  def returnDoc(self, docID:str) -> None:
-    """ Return a document from the database
-    Args:
-      docID (str): ID of the document to return
-      """
-    if self.backend is not None:
-      doc = self.backend.db.getDoc(docID)
-      expandDocID2tupleInDict(doc, self.backend.db)
-      self.beSendDoc.emit(doc)
+    try:
+      self.executeTask(task, data)
+    finally:
+      if not task.msgWaitDialog:
+        self.writes.finish()
 
 
-  @Slot(Task, dict)
-  def returnTaskReport(self, task:Task, data:dict[str,Any]) -> None:
-    """ Handle a rather complicated task request from the GUI and possibly return a report
+  def executeTask(self, task:Task, data:dict[str,Any]) -> None:
+    """ Execute a task of returnTaskReport
     Args:
       task (Task): Task to perform
       data (dict): Data required for the task
@@ -169,8 +207,13 @@ class BackendWorker(QObject):
       self.beSendTaskReport.emit(task, report, image, '')
 
     elif task is Task.CHECK_DB and set(data.keys())=={'style'}:
-      report = self.backend.checkDB(outputStyle=data['style'])
-      self.beSendTaskReport.emit(task, report, '', '')
+      def streamFinding(level:str, message:str) -> None:
+        if level in ('error', 'warning'):                                        #show them while checking
+          self.beSendProgress.emit('append', f'\n- {level}: {message.splitlines()[0]}')
+      checkReport = CheckReport(data['style'], streamFinding)
+      self.backend.checkDB(outputStyle=data['style'], report=checkReport)
+      checkReport.addTiming()
+      self.beSendTaskReport.emit(task, str(checkReport), '', '')
 
     elif task is Task.SCAN         and set(data.keys())=={'docID'}:
       for _ in range(2):                                                         #scan twice: convert, extract
@@ -190,6 +233,11 @@ class BackendWorker(QObject):
       if data['docType']=='x0':
         self.beSendTable.emit(self.backend.db.getView('viewDocType/x0'), 'x0')
 
+    elif task is Task.BULK_ADD_DOCS and set(data.keys())=={'hierStack','docType','table'}:
+      report = self.backend.addDataFrame(data['docType'], data['table'], data['hierStack'],
+                                         lambda percent: self.beSendProgress.emit('count', str(percent)))
+      self.beSendTaskReport.emit(task, report, '', '')
+
     elif task is Task.EDIT_DOC      and set(data.keys())=={'doc','newProjID'}:
       # update the path, if the project changed
       if data['newProjID'] and 'branch' in data['doc'] and len(data['doc']['branch'][0]['stack'])>0 and \
@@ -209,7 +257,7 @@ class BackendWorker(QObject):
       doc.update(data['doc'])
       doc = flatten(doc, True)                                                      # type: ignore[assignment]
       self.backend.editData(doc)
-      self.beSendDoc.emit(self.backend.db.getDoc(data['doc']['id']))            # send updated doc back to GUI
+      self.beSendDoc.emit(self.backend.db.getDoc(data['doc']['id'], image=True))            # send updated doc back to GUI
 
     elif task is Task.MOVE_LEAVES and set(data.keys())=={'docID','stackOld','stackNew','childOld','childNew'}:
       verbose = False                                                                 # Convenient for testing
@@ -228,55 +276,41 @@ class BackendWorker(QObject):
         pathNew = (parentDir / dirNameNew).as_posix()
       else:
         pathNew = branchOld['path']
-      siblingsNew = self.backend.db.getView('viewHierarchy/viewHierarchy', startKey='/'.join(data['stackNew']))#sorted by docID
-      siblingsNew = [i for i in siblingsNew if len(i['key'].split('/'))==len(data['stackNew'])+1]
-      childNums   = [f"{i['value'][0]:05d}{i['id']}{idx}" for idx,i in enumerate(siblingsNew)]
-      siblingsNew = [x for _, x in sorted(zip(childNums, siblingsNew))]  #sorted by childNum 1st and docID 2nd
+      siblingsNew = self.backend.db.getSiblings(data['stackNew'])             #sorted by childNum 1st and docID 2nd
       # --- CHANGE ----
       # change new siblings
       if verbose:
         print('\n=============================================\nStep 1: before new siblings')
-        print('\n'.join([f'{i["value"][0]} {i["id"]} {i["value"][2]}' for i in siblingsNew]))
-      for idx, line in reversed(list(enumerate(siblingsNew))):
+        print('\n'.join([f'{i[1]} {i[0]}' for i in siblingsNew]))
+      for idx, (docID, child, branch) in reversed(list(enumerate(siblingsNew))):
         shift = 1 if idx>=data['childNew'] else 0#shift those before the insertion point by 0 and those after by 1
-        if line['id']==data['docID'] or line['value'][0]==idx+shift:#ignore this id & those that are correct already
+        if docID==data['docID'] or child==idx+shift:             #ignore this id & those that are correct already
           continue
         if verbose:
-          print(f'  {line["id"]}: move: {idx} {shift}')
-        self.backend.db.updateBranch(docID=line['id'], branch=line['value'][4], child=idx+shift)
+          print(f'  {docID}: move: {idx} {shift}')
+        self.backend.db.updateBranch(docID=docID, branch=branch, child=idx+shift)
       if verbose:
-        siblingsNew = self.backend.db.getView('viewHierarchy/viewHierarchy', startKey='/'.join(data['stackNew']))#sorted by docID
-        siblingsNew = [i for i in siblingsNew if len(i['key'].split('/'))==len(data['stackNew'])+1]
-        childNums   = [f"{i['value'][0]:05d}{i['id']}{idx}" for idx,i in enumerate(siblingsNew)]
-        siblingsNew = [x for _, x in sorted(zip(childNums, siblingsNew))]#sorted by childNum 1st and docID 2nd
         print('Step 2: after new siblings')
-        print('\n'.join([f'{i["value"][0]} {i["id"]} {i["value"][2]}' for i in siblingsNew]))
+        print('\n'.join([f'{i[1]} {i[0]}' for i in self.backend.db.getSiblings(data['stackNew'])]))
       # change item in question
       if verbose:
         print(f'  manual move {data["childOld"]} -> {data["childNew"]}: {data["docID"]}')
       self.backend.db.updateBranch(docID=data['docID'], branch=-99, stack=data['stackNew'], path=pathNew,
                                    child=data['childNew'], stackOld=data['stackOld']+[data['docID']])
       # change old siblings
-      siblingsOld = self.backend.db.getView('viewHierarchy/viewHierarchy', startKey='/'.join(data['stackOld']))#sorted by docID
-      siblingsOld = [i for i in siblingsOld if len(i['key'].split('/'))==len(data['stackOld'])+1]
-      childNums   = [f"{i['value'][0]:05d}{i['id']}{idx}" for idx,i in enumerate(siblingsOld)]
-      siblingsOld = [x for _, x in sorted(zip(childNums, siblingsOld))]#sorted by childNum 1st and docID 2nd
+      siblingsOld = self.backend.db.getSiblings(data['stackOld'])             #sorted by childNum 1st and docID 2nd
       if verbose:
         print('Step 3: before old siblings')
-        print('\n'.join([f'{i["value"][0]} {i["id"]} {i["value"][2]}' for i in siblingsOld]))
-      for idx, line in enumerate(siblingsOld):
-        if line['value'][0]==idx:                  #ignore id in question and those that are correct already
+        print('\n'.join([f'{i[1]} {i[0]}' for i in siblingsOld]))
+      for idx, (docID, child, branch) in enumerate(siblingsOld):
+        if child==idx:                             #ignore id in question and those that are correct already
           continue
         if verbose:
-          print(f'  {line["id"]}: move: {idx}')
-        self.backend.db.updateBranch(  docID=line['id'], branch=line['value'][4], child=idx)
+          print(f'  {docID}: move: {idx}')
+        self.backend.db.updateBranch(docID=docID, branch=branch, child=idx)
       if verbose:
-        siblingsOld = self.backend.db.getView('viewHierarchy/viewHierarchy', startKey='/'.join(data['stackOld']))#sorted by docID
-        siblingsOld = [i for i in siblingsOld if len(i['key'].split('/'))==len(data['stackOld'])+1]
-        childNums   = [f"{i['value'][0]:05d}{i['id']}{idx}" for idx,i in enumerate(siblingsOld)]
-        siblingsOld = [x for _, x in sorted(zip(childNums, siblingsOld))]#sorted by childNum 1st and docID 2nd
         print('Step 4: end of function')
-        print('\n'.join([f'{i["value"][0]} {i["id"]} {i["value"][2]}' for i in siblingsOld]))
+        print('\n'.join([f'{i[1]} {i[0]}' for i in self.backend.db.getSiblings(data['stackOld'])]))
 
     elif task is Task.DROP_EXTERNAL and set(data.keys())=={'docID','items','addToExisting'}:
       doc = self.backend.db.getDoc(data['docID'])
@@ -300,7 +334,7 @@ class BackendWorker(QObject):
       if data['addToExisting']:
         docID = data['docID']
         path = targetName.relative_to(self.backend.basePath)
-        self.backend.db.cursor.execute(f"UPDATE branches SET path='{path}' WHERE id='{docID}' AND idx='0'")
+        self.backend.db.cursor.execute(sq.BRANCHES_UPDATE_PATH0, (str(path), docID))
         self.backend.db.connection.commit()
         #rerun extractors
         oldDocType = doc['type']
@@ -335,7 +369,7 @@ class BackendWorker(QObject):
         branch = doc['branch'][0]
       else:
         branch = [i for i in doc['branch'] if '/'.join(i['stack']+[data['docID']])==data['stack']][0]
-        self.backend.db.cursor.execute(f'DELETE FROM branches WHERE stack="{data["stack"]}"')
+        self.backend.db.cursor.execute(sq.BRANCHES_DELETE_BRANCH, (data['stack'],))
       # rename on disk
       if 'path' in branch:
         oldPath = self.backend.basePath/branch['path']
@@ -378,7 +412,9 @@ class BackendWorker(QObject):
             logging.debug('elabFTW sync stats: %s', stats)
             statsCount = Counter([i[1] for i in stats])
             msg = ', '.join([f'{MERGE_LABELS[k]}: {v}' for k,v in statsCount.items()])
-            self.beSendTaskReport.emit(task, f'Success: Synchronized with server. Items per action: {msg}', '', '')
+            timing = ', '.join([f'{k} {v:.1f}s' for k,v in sync.timing.items()])
+            self.beSendTaskReport.emit(task, f'Success: Synchronized with server. Items per action: {msg}. '
+                                             f'Time per phase: {timing}', '', '')
           else:                                                                                  #if not given
             self.beSendTaskReport.emit(task, 'ERROR: Please specify a server address and API-key in the Configuration', '', '')
         except ConnectionError as e:
@@ -389,47 +425,28 @@ class BackendWorker(QObject):
       self.backend.db.dataHierarchyChangeView(data['docType'], data['newList'])
 
     elif task is Task.SEND_REPOSITORY and set(data.keys())=={'projID','docTypes','repositories','metadata','uploadZenodo'}:
-      tempELN = str(Path(tempfile.gettempdir())/'export.eln')
-      res0 = exportELN(self.backend, [data['projID']], tempELN, data['docTypes'])
-      print('Export eln',res0)
-      repositories = data['repositories']
-      if data['uploadZenodo']:                                                                       #Zenodo
-        clientZ = ZenodoClient(repositories['zenodo']['url'], repositories['zenodo']['key'])
-        metadataZ = clientZ.prepareMetadata(data['metadata'])
-        res = clientZ.uploadRepository(metadataZ, tempELN)
-      else:                                                                                       #Dataverse
-        clientD = DataverseClient(repositories['dataverse']['url'], repositories['dataverse']['key'],
-                                repositories['dataverse']['dataverse'])
-        metadataD = clientD.prepareMetadata(data['metadata'])
-        res = clientD.uploadRepository(metadataD, tempELN)
-      msg = 'Successful upload to repository\n'
-      # update project with upload details
-      if res[0]:
-        docProject = self.backend.db.getDoc(data['projID'])
-        docProject['.repository_upload'] = f'{datetime.now().strftime("%Y-%m-%d")} {res[1]}'
-        docProject['branch'] = docProject['branch'][0] | {'op':'u'}
-        self.backend.db.updateDoc(docProject, data['projID'])
-        msg += 'Saved information to project'
-      else:
-        msg += 'Error while writing project information to database'
-      self.beSendTaskReport.emit(task, msg, '', '')
+      self.beSendTaskReport.emit(task, self.sendRepository(data), '', '')
 
     elif task is Task.EXTRACTOR_RERUN and set(data.keys())=={'docIDs','recipe'}:
-      for docID in data['docIDs']:
-        doc = self.backend.db.getDoc(docID)
-        #any path is good since the file is the same everywhere; data-changed by reference
-        if doc['branch'][0]['path'] is not None:
-          if data['recipe']:
-            doc['type'] = data['recipe'].split('/')
+      docs = self.backend.db.getDocs(data['docIDs'])
+      items:list[tuple[Path,dict[str,Any]]] = []                                             #path, doc
+      #any path is good since the file is the same everywhere; data-changed by reference
+      for doc in [docs[i] for i in data['docIDs'] if i in docs and docs[i]['branch'][0]['path'] is not None]:
+        if data['recipe']:
+          doc['type'] = data['recipe'].split('/')
+        if doc['branch'][0]['path'].startswith('http'):
+          items.append((Path(doc['branch'][0]['path']), doc))
+        else:
+          items.append((self.backend.basePath/doc['branch'][0]['path'], doc))
+      with self.backend.bulk():                   #results of extractors are written in batches, commit once
+        for idx, content in self.backend.runExtractors([(path, '/'.join(doc['type'])) for path, doc in items]):
+          path, doc = items[idx]
+          docID = doc['id']
           oldDocType = doc['type']
           # doc['type'] = [''] TODO WHY IS THIS HERE???
-          if doc['branch'][0]['path'].startswith('http'):
-            path = Path(doc['branch'][0]['path'])
-          else:
-            path = self.backend.basePath/doc['branch'][0]['path']
-          self.backend.useExtractors(path, doc.get('shasum',''), doc)
+          self.backend.useExtractors(path, doc.get('shasum',''), doc, content)
           if doc['type'][0] == oldDocType[0]:
-            del doc['branch']                                                                  #don't update
+            del doc['branch']                                                                #don't update
             self.backend.db.updateDoc(doc, docID)
           else:
             self.backend.db.remove( docID )
@@ -456,6 +473,61 @@ class BackendWorker(QObject):
       logging.error('Got task, which I do not understand %s %s', task, data.keys(), exc_info=True)
 
 
+  def sendRepository(self, data:dict[str,Any]) -> str:
+    """ Export a project and upload it to a repository; an interrupted upload of the same export is resumed
+    Args:
+      data (dict): projID, docTypes, repositories, metadata, uploadZenodo
+
+    Returns:
+      str: message
+    """
+    if self.backend is None:
+      return ''
+    tempELN = str(Path(tempfile.gettempdir())/f'export_{data["projID"]}.eln')
+    state = self.backend.db.cursor.execute(sq.MAIN_STATE_BY_STACK, (f'{data["projID"]}%',)).fetchone()
+    export = {'projID':data['projID'], 'docTypes':data['docTypes'], 'state':list(state)}
+    if RepositoryClient.resumable(tempELN, export):
+      logging.info('Resume upload of previous export %s', tempELN)              #export of interrupted upload
+    else:
+      res0 = exportELN(self.backend, [data['projID']], tempELN, data['docTypes'])
+      print('Export eln',res0)
+    repositories = data['repositories']
+    if data['uploadZenodo']:                                                                       #Zenodo
+      clientZ = ZenodoClient(repositories['zenodo']['url'], repositories['zenodo']['key'])
+      clientZ.export = export
+      metadataZ = clientZ.prepareMetadata(data['metadata'])
+      res = clientZ.uploadRepository(metadataZ, tempELN)
+    else:                                                                                       #Dataverse
+      clientD = DataverseClient(repositories['dataverse']['url'], repositories['dataverse']['key'],
+                              repositories['dataverse']['dataverse'])
+      clientD.export = export
+      metadataD = clientD.prepareMetadata(data['metadata'])
+      res = clientD.uploadRepository(metadataD, tempELN)
+    msg = 'Successful upload to repository\n'
+    # update project with upload details
+    if res[0]:
+      docProject = self.backend.db.getDoc(data['projID'])
+      docProject['.repository_upload'] = f'{datetime.now().strftime("%Y-%m-%d")} {res[1]}'
+      docProject['branch'] = docProject['branch'][0] | {'op':'u'}
+      self.backend.db.updateDoc(docProject, data['projID'])
+      msg += 'Saved information to project'
+      Path(tempELN).unlink(missing_ok=True)
+    else:
+      msg += 'Error while writing project information to database'
+    return msg
+
+
+  @Slot(list)
+  def scanWatchedPaths(self, paths:list[str]) -> None:
+    """ Scan the folders, in which the FileWatcher found changes, and report it to the GUI
+    Args:
+      paths (list): posix paths of folders relative to basePath
+    """
+    if self.backend is not None:
+      report = self.backend.scanPaths(paths)
+      self.beSendTaskReport.emit(Task.WATCH_SCAN, report, '', '')
+
+
   @Slot(list)
   def executeSQL(self, tasks:list[dict[str,Any]]) -> None:
     """ Execute SQL commands in the backend database: fast change
@@ -465,6 +537,17 @@ class BackendWorker(QObject):
                     - cmd: SQL command to execute
                     - list: List of parameters for the command (optional)
     """
+    try:
+      self.executeSQLTasks(tasks)
+    finally:
+      self.writes.finish()
+
+
+  def executeSQLTasks(self, tasks:list[dict[str,Any]]) -> None:
+    """ Execute SQL commands of executeSQL
+    Args:
+      tasks (list): List of tasks to execute
+    """
     if self.backend is None:
       return
     for task in tasks:
@@ -482,16 +565,177 @@ class BackendWorker(QObject):
         print('**ERROR unknown task command', task)
       if  task['type']=='one' and 'UPDATE properties' in task['cmd'] and 'id' in task['cmd']:#send from form during key-change
         docID = task['cmd'].split("id='")[1].split("'")[0]
-        self.beSendDoc.emit(self.backend.db.getDoc(docID))                      # send updated doc back to GUI
-    self.backend.db.connection.commit()
+        self.beSendDoc.emit(self.backend.db.getDoc(docID, image=True))                      # send updated doc back to GUI
+    self.backend.db.commit()
 
 
   def exit(self) -> None:
     """ Exit the worker thread """
+    if self.watcher is not None:
+      self.watcher.stop()
+      self.watcher = None
     if self.backend is not None:
       self.deleteLater()
 
 
+class ReaderWorker(QObject):
+  """
+  Worker that answers read requests of the GUI in its own thread with a read-only connection to the database:
+  browsing stays responsive while the backend worker writes, e.g. during long scans
+  - answers are sent through the signals of the backend worker, to which the GUI is connected
+  """
+  def __init__(self, writer:BackendWorker) -> None:
+    """ Initialize the reader worker
+    Args:
+      writer (BackendWorker): backend worker that writes into the database
+    """
+    super().__init__()
+    self.writer = writer
+    self.db: Optional[SqlLiteDB] = None
+
+
+  def database(self) -> Optional[SqlLiteDB]:
+    """ Reader of the database of the backend worker, after the writes requested before are finished
+    Returns:
+      SqlLiteDB: reader; None if backend is not initialized
+    """
+    self.writer.writes.wait()
+    backend = self.writer.backend
+    if backend is None:
+      return None
+    if self.db is None or self.db.hierarchy is not backend.db.hierarchy:            #new or changed project group
+      self.exit()
+      self.db = backend.db.reader()
+    return self.db
+
+
+  @Slot(str, str, bool)
+  def returnTable(self, docType:str, projID:str, showAll:bool) -> None:
+    """ Return a view from the database
+    Args:
+      docType (str): Document type to return
+      projID (str): Project ID to get the view for
+      showAll (bool): Whether to return all items or only the non-hidden ones"""
+    if docType and (db := self.database()) is not None:
+      if docType=='_tags_':
+        path = 'viewIdentify/viewTags'
+      else:
+        path = f'viewDocType/{docType}'
+      path += 'All' if showAll else ''
+      logging.debug('returnTable %s %s %s %s', docType, projID, showAll, path)
+      data = db.getView(path, startKey=projID)
+      self.writer.beSendTable.emit(data, docType)
+
+
+  @Slot(str, str, bool, dict)
+  def returnTablePage(self, docType:str, projID:str, showAll:bool, query:dict[str,Any]) -> None:
+    """ Return a window of the table of a docType: the database filters and sorts, only the window is sent
+    Args:
+      docType (str): Document type to return
+      projID (str): Project ID to get the view for
+      showAll (bool): Whether to return all items or only the non-hidden ones
+      query (dict): offset, limit (-1: all rows), sort (column index), ascending, filters (column index, regex,
+        inverse), idsOnly (only send the id column); it is returned with the number of rows as 'total'
+    """
+    if not docType:
+      return
+    if (db := self.database()) is None:                        #no backend: empty page, the GUI does not wait for it
+      data, total = pd.DataFrame(columns=['id','show']), 0
+    else:
+      data, total = db.viewDocTypePage(docType, showAll, projID, query.get('offset', 0), query.get('limit', -1),
+                                       query.get('sort', 0), query.get('ascending', True), query.get('filters', []))
+    logging.debug('returnTablePage %s %s %s %s %s', docType, projID, showAll, query, total)
+    self.writer.beSendTablePage.emit(data[['id']] if query.get('idsOnly') else data, docType, query|{'total':total})
+
+
+  @Slot(str, list, str)
+  def returnSearch(self, query:str, docTypes:list[str], projID:str) -> None:
+    """ Return the results of a full-text search, ordered by relevance
+    Args:
+      query (str): words to search for in names, comments, content, tags and metadata
+      docTypes (list): only include these docTypes; empty list for all
+      projID (str): only include documents in this project; empty for all
+    """
+    results = [] if (db := self.database()) is None else db.search(query, docTypes, projID)  #no backend: no results
+    logging.debug('returnSearch %s %s %s %s', query, docTypes, projID, len(results))
+    self.writer.beSendSearch.emit(query, results)
+
+
+  @Slot(str, bool)
+  def returnHierarchy(self, projID:str, showAll:bool) -> None:
+    """ Return a hierarchy
+    Args:
+      projID (str): Project ID to get the hierarchy for
+      showAll (bool): Whether to return all items or only the non-hidden ones
+    """
+    if projID and (db := self.database()) is not None:#TODO: during test_13 for some reason the projID is empty, not sure why
+      hierarchy, error = db.getHierarchy(projID, allItems=showAll)
+      if error:
+        hierarchy = Node('__ERROR_in_getHierarchy__')
+      projDoc = db.getDoc(projID)
+      logging.debug('returnHierarchy %s %s %s', hierarchy, projID, showAll)
+      self.writer.beSendHierarchy.emit(hierarchy, projDoc)
+
+
+  @Slot(str, bool, object)
+  def returnHierarchyDelta(self, projID:str, showAll:bool, shown:Node) -> None:
+    """ Return a hierarchy and the operations that change the shown hierarchy into it
+    Args:
+      projID (str): Project ID to get the hierarchy for
+      showAll (bool): Whether to return all items or only the non-hidden ones
+      shown (Node): hierarchy that the GUI shows
+    """
+    if (db := self.database()) is not None:
+      hierarchy, error = db.getHierarchy(projID, allItems=showAll)
+      if error or hierarchy is None or (operations := hierarchyDelta(shown, hierarchy)) is None:
+        self.returnHierarchy(projID, showAll)
+        return
+      logging.debug('returnHierarchyDelta %s %s %s', projID, showAll, operations)
+      self.writer.beSendHierarchyDelta.emit(hierarchy, db.getDoc(projID), operations)
+
+
+  @Slot(str, str)
+  def returnDoc(self, docID:str) -> None:
+    """ Return a document from the database
+    Args:
+      docID (str): ID of the document to return
+      """
+    if (db := self.database()) is not None:
+      doc = db.getDoc(docID, image=True)
+      expandDocID2tupleInDict(doc, db)
+      self.writer.beSendDoc.emit(doc)
+
+
+  @Slot(list)
+  def returnDocs(self, docIDs:list[str]) -> None:
+    """ Return many documents from the database in one answer
+    Args:
+      docIDs (list): IDs of the documents to return
+      """
+    if (db := self.database()) is not None:
+      docs = list(db.getDocs(docIDs, image=True).values())
+      for doc in docs:
+        expandDocID2tupleInDict(doc, db)
+      self.writer.beSendDocs.emit(docs)
+
+
+  @Slot(list)
+  def returnThumbnails(self, docIDs:list[str]) -> None:
+    """ Return the raw images of many documents, without the rest of the documents
+    Args:
+      docIDs (list): IDs of the documents
+      """
+    if (db := self.database()) is not None:
+      self.writer.beSendThumbnails.emit(docIDs, db.getThumbnails(docIDs))
+
+
+  def exit(self) -> None:
+    """ Close the connection to the database """
+    if self.db is not None:
+      self.db.exit()
+      self.db = None
+
+
 class BackendThread(QThread):
   """
   Thread that manages the backend worker
@@ -505,9 +749,16 @@ class BackendThread(QThread):
     self.worker = BackendWorker()
     self.worker.moveToThread(self)
     self.finished.connect(self.worker.exit)
+    self.readerThread = QThread(self)
+    self.reader = ReaderWorker(self.worker)
+    self.reader.moveToThread(self.readerThread)
+    self.readerThread.finished.connect(self.reader.exit)
 
   def run(self) -> None:
     """
-    Run the thread event loop
+    Run the thread event loop; the reader thread runs as long as this thread
     """
+    self.readerThread.start()
     self.exec()
+    self.readerThread.quit()
+    self.readerThread.wait()
@@ -1,9 +1,10 @@
 """ Interactions with Zenodo repository """
 import logging
 from datetime import datetime
+from os.path import basename
 from typing import Any
 import requests
-from .repository import RepositoryClient
+from .repository import RepositoryClient, UploadBody, fileMD5
 
 
 class ZenodoClient(RepositoryClient):
@@ -59,6 +60,8 @@ class ZenodoClient(RepositoryClient):
   def uploadRepository(self, metadata:dict[str,Any], file_path:str) -> tuple[bool, str]:
     """
     Uploads a file and metadata to become a dataset
+    - file is streamed from disk into the bucket of the deposition; retried with backoff if connection fails
+    - if interrupted, the next call continues with the same deposition: resume token next to the file
 
     Args:
       metadata (dict): metadata to this file according to Zenodo standard
@@ -68,34 +71,38 @@ class ZenodoClient(RepositoryClient):
       tuple: success of function, message
     """
     server_url = f"{self.server_url}/api/deposit/depositions"
-    # Define the API URLs and headers based on the repository kind
+    state = self.loadResume(file_path)
     # Step 1: Create the deposition with metadata
-    resp = requests.post(server_url, json=metadata, headers=self.headers1, timeout=10)
-    if resp.status_code != 201:
-      logging.error('Creating deposition/dataset: %s %s %s', resp.json(), resp.status_code, resp.text, exc_info=True)
-      return False, 'Error creating the dataset'
-    deposition = resp.json()
-    persistentID = deposition['id']
-    # print(f"Deposition created: {persistentID}")
-
-    # Define the API URLs and headers based on the repository kind
-    with open(file_path, 'rb') as f:
-      files = {'file': f}
-      file_upload_url = f"{server_url}/{persistentID}/files"
-      publish_url = f"{server_url}/{persistentID}/actions/publish"
-
-      # Step 2: Upload a file
-      resp = requests.post(file_upload_url, files=files, headers=self.headers2, timeout=10)
-    if resp.status_code != 201:
-      logging.error('Uploading file: %s', resp.json(), exc_info=True)
-      return False, 'Error uploading the file'
-    # print("File uploaded successfully:")
-
+    if 'id' not in state:
+      resp = self.session.post(server_url, json=metadata, headers=self.headers1, timeout=10)   #not repeated: new deposition
+      if resp.status_code != 201:
+        logging.error('Creating deposition/dataset: %s %s', resp.status_code, resp.text)
+        return False, 'Error creating the dataset'
+      deposition = resp.json()
+      state = {'id':deposition['id'], 'bucket':deposition['links']['bucket']}
+      self.saveResume(file_path, state)
+    # Step 2: Upload the file into the bucket: one streamed PUT, zenodo has no partial uploads
+    if not state.get('uploaded'):
+      try:
+        resp = self.request('PUT', f"{state['bucket']}/{basename(file_path)}", body=lambda: UploadBody(file_path),
+                            headers=self.headers2 | {'Content-Type': 'application/octet-stream'})
+      except OSError:
+        logging.error('Uploading file: connection failed', exc_info=True)
+        return False, 'Error uploading the file'
+      if resp.status_code not in (200, 201):
+        logging.error('Uploading file: %s %s', resp.status_code, resp.text)
+        return False, 'Error uploading the file'
+      if resp.json().get('checksum', '') != f'md5:{fileMD5(file_path)}':
+        logging.error('Uploading file: checksum differs %s', resp.json().get('checksum'))
+        return False, 'Error uploading the file'
+      state['uploaded'] = True
+      self.saveResume(file_path, state)
     # Step 3: Publish the deposition
-    resp = requests.post(publish_url, headers=self.headers1, timeout=10)
+    resp = self.request('POST', f"{server_url}/{state['id']}/actions/publish", retry=False, headers=self.headers1)
     if resp.status_code != 202:
-      logging.error('Publishing: %s', resp.json(), exc_info=True)
+      logging.error('Publishing: %s %s', resp.status_code, resp.text)
       return False, 'Error publishing the dataset'
+    self.clearResume(file_path)
     return True, f'Published: {resp.json()["doi"]}, {resp.json()["doi_url"]}'
 
 
@@ -115,7 +115,10 @@ configurationGUI: dict[str, Any] = {
     'loggingLevel': ['Logging level (more->less)', 'INFO', ['DEBUG', 'INFO', 'WARNING', 'ERROR']],
     'autosave': ['Autosave entries in form', 'No', ['Yes', 'No']],
     'showHidden': ['Show hidden items by default', 'Yes', ['Yes','No']],
-    'checkForUpdates': ['Check for updates on startup', 'Yes', ['Yes', 'No']]
+    'checkForUpdates': ['Check for updates on startup', 'Yes', ['Yes', 'No']],
+    'hashThreads': ['Number of threads to hash files', 4, [1, 2, 4, 8, 16]],
+    'extractorProcesses': ['Number of processes to run extractors', 4, [1, 2, 4, 8, 16]],
+    'watchFiles': ['Watch project folders and scan new data automatically', 'No', ['Yes', 'No']]
   },
   'appearance': {
     'theme': ['Color style', 'none', ['amber', 'blue', 'cyan', 'pink', 'purple', 'teal', 'yellow', 'none']],
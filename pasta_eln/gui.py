@@ -1,5 +1,6 @@
 """ Main methods that start the gui """
 import logging
+import multiprocessing
 import sys
 import traceback
 from pathlib import Path
@@ -60,6 +61,7 @@ def startMain(projectGroup:str='') -> None:
   Args:
     projectGroup (str): project group to load
   """
+  multiprocessing.freeze_support()                         #processes of extractor pool in frozen executables
   try:
     app, window = mainGUI(projectGroup=projectGroup)
     window.show()
@@ -416,12 +416,12 @@ class Tools:
     if self.backend is None:
       return
     key = input('Which key to repair, e.g. "chemistry" will become .chemistry? ')
-    self.backend.db.cursor.execute(f"SELECT id FROM properties where key == '{key}'")
+    self.backend.db.cursor.execute('SELECT id FROM properties WHERE key == ?', (key,))
     res = self.backend.db.cursor.fetchall()
     for idx, docID in enumerate(res):
       docID = docID[0]
       try:
-        self.backend.db.cursor.execute(f"UPDATE properties SET key='.{key}' WHERE id == '{docID}' and  key=='{key}'")
+        self.backend.db.cursor.execute('UPDATE properties SET key=? WHERE id == ? and key == ?', (f'.{key}', docID, key))
       except Exception:
         print(f"Error, could not change {docID} and {key}. Likely that combination exists already in properties. Repair manually")
         if idx==0:
@@ -3,7 +3,7 @@
 import logging, warnings, random
 from pathlib import Path
 from anytree import PreOrderIter
-from PySide6.QtCore import QModelIndex, QEventLoop                         # pylint: disable=no-name-in-module
+from PySide6.QtCore import QModelIndex, QEventLoop, QTimer                 # pylint: disable=no-name-in-module
 from pasta_eln.UI.project import Project
 from pasta_eln.UI.guiCommunicate import Communicate
 from pasta_eln.backendWorker.worker import Task
@@ -87,13 +87,13 @@ def verify(comm, projID, epoch): # Output hierarchy and verify DB
     print(f'{"*"*40}\nHierarchy after drag-drop {epoch}\n{"*"*40}')
     print(''.join('  '*node.depth + node.name + ' | ' + '/'.join(node.docType) + (f' | {node.id}') +'\n'
                    for node in PreOrderIter(hierarchy)))
-    loop.quit()
+    QTimer.singleShot(0, loop, loop.quit)             #callback runs in backend thread: quit after exec
   def checkDBCallback(_, output):
     print(f'{"*"*40}\nCheckDB after drag-drop {epoch}\n{"*"*40}')
     print(output)
     output = '\n'.join(output.split('\n')[8:])
     assert '**ERROR' not in output, 'Error in checkDB'
-    loop.quit()
+    QTimer.singleShot(0, loop, loop.quit)             #callback runs in backend thread: quit after exec
   comm.backendThread.worker.beSendHierarchy.connect(hierarchyCallback)
   comm.backendThread.worker.beSendTaskReport.connect(checkDBCallback)
   comm.uiRequestHierarchy.emit(projID, True)
@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+"""TEST the sqlite database layer: schema, indexes and queries """
+import logging
+import sqlite3
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from anytree import PreOrderIter
+from pasta_eln.backendWorker import sqlQueries as sq
+from pasta_eln.backendWorker.backend import Backend
+from pasta_eln.backendWorker.sqlite import SCHEMA_VERSION, THUMBNAIL_REF, SqlLiteDB
+from pasta_eln.miscTools import getConfiguration
+from pasta_eln.textTools.handleDictionaries import fillDocBeforeCreate
+
+class TestStringMethods(unittest.TestCase):
+  """
+  derived class for this test
+  """
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.be = None
+
+  def test_main(self):
+    """
+    main function
+    """
+    warnings.filterwarnings('ignore', message='numpy.ufunc size changed')
+    warnings.filterwarnings('ignore', category=ResourceWarning, module='PIL')
+    logPath = Path.home()/'pastaELN.log'
+    logging.basicConfig(filename=logPath, level=logging.INFO, format='%(asctime)s|%(levelname)s:%(message)s',
+                        datefmt='%m-%d %H:%M:%S')   #This logging is always info, since for installation only
+    logging.info('Start 04 test')
+    configuration, _ = getConfiguration('research')
+    self.be = Backend(configuration, 'research')
+    db = self.be.db
+
+    # schema version and indexes
+    db.cursor.execute('PRAGMA user_version')
+    self.assertEqual(db.cursor.fetchone()[0], SCHEMA_VERSION)
+    db.cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'idx%'")
+    indexes = {i[0] for i in db.cursor.fetchall()}
+    for index in ('idxBranchesStack', 'idxBranchesPath', 'idxMainShasum', 'idxMainType', 'idxPropertiesKey',
+                  'idxTagsTag', 'idxBranchesParent'):
+      self.assertIn(index, indexes)
+    db.migrateSchema()                                                             #rerun should not change anything
+    db.cursor.execute('PRAGMA user_version')
+    self.assertEqual(db.cursor.fetchone()[0], SCHEMA_VERSION)
+
+    # siblings by index are the children of the hierarchy; next folder after the last one
+    tree, _ = db.getHierarchy(db.getView('viewDocType/x0')['id'].values[0], True)
+    for parent in [tree]+[i for i in tree.children if i.id[0]=='x']:
+      stack = [i.id for i in parent.path]
+      self.assertEqual([(i[0], i[1]) for i in db.getSiblings(stack, allItems=True)],
+                       [(i.id, i.childNum) for i in parent.children])
+      folders = [i.childNum for i in parent.children if i.id[0]=='x']
+      self.assertEqual(db.nextChildNum(stack), max(folders)+1 if folders else 0)
+
+    # batched getDocs is identical to getDoc
+    db.cursor.execute('SELECT id FROM main')
+    docIDs = [i[0] for i in db.cursor.fetchall()]
+    docs = db.getDocs(docIDs+docIDs[:3]+['x-00000000000000000000000000000000'], noError=True)
+    self.assertEqual(set(docs), set(docIDs))
+    for docID in docIDs:
+      self.assertEqual(docs[docID], db.getDoc(docID))
+
+    # table of a docType: one row per document with the content of the document
+    for docType in ('x0', 'x1', 'measurement', 'sample'):
+      df = db.getView(f'viewDocType/{docType}All')
+      self.assertEqual(len(df), len(set(df['id'])))
+      self.assertEqual(set(df['id']), {i for i in docIDs if docs[i]['type'][0]==docType})
+      for row in df.to_dict('records'):
+        doc = docs[row['id']]
+        self.assertEqual(row['name'], doc['name'])
+        self.assertEqual(set() if row['tags']=='nan' else set(row['tags'].split(', ')), set(doc['tags']))
+        self.assertIn(row['show'], [''.join('T' if j else 'F' for j in i['show']) for i in doc['branch']])
+        if 'type' in row:
+          self.assertEqual(row['type'], '/'.join(doc['type']))
+        if 'image' in row:
+          self.assertEqual(row['image'], 'Y' if len(doc['image'])>1 else 'N')
+        if 'qrCodes' in row:
+          self.assertEqual(set(row['qrCodes'].split(', ')), set(doc['qrCodes']))
+    # pages of the table: slices of the whole table, sorted by the column and then id; filtered by SQLite
+    df = db.getView('viewDocType/measurementAll').sort_values(['name','id'], ascending=False).reset_index(drop=True)
+    page, total = db.viewDocTypePage('measurement', True, None, 1, 2, 0, False)
+    self.assertEqual(total, len(df))
+    self.assertTrue(page.equals(df.iloc[1:3].reset_index(drop=True)))
+    page, total = db.viewDocTypePage('measurement', True, None, 0, -1, 0, True, [(0, r'\.(PNG|TIF)$', False),
+                                                                                (0, 'example', True)])
+    self.assertEqual(total, len(page))
+    self.assertEqual(list(page['name']), sorted(i for i in df['name'] if i.endswith(('.png','.tif')) and
+                                                'example' not in i))
+
+    # hierarchy cache: deltas of changes result in the same tree as a rebuild; untracked changes clear the cache
+    def render(allItems):
+      tree, _ = db.getHierarchy(projID, allItems)
+      return [(node.id, node.childNum, node.name, node.docType, node.gui, getattr(node, 'fPath', ''), node.depth)
+              for node in PreOrderIter(tree)]
+    for projID in db.getView('viewDocType/x0')['id'].values:                         #project with leaf in folder
+      tree, _ = db.getHierarchy(projID, True)
+      if leaves := [i for i in tree.descendants if i.docType[0][0]!='x' and i.depth>1]:
+        break
+    leaf = leaves[0]
+    folder = leaf.parent
+    idx = db.cursor.execute('SELECT idx FROM branches WHERE id == ? and stack == ?',
+                            (leaf.id, '/'.join(i.id for i in leaf.path))).fetchone()[0]       #branch of leaf in tree
+    for change in (lambda: db.setGUI(folder.id, [True, False]), lambda: db.hideShow(folder.id),
+                   lambda: db.hideShow(folder.id), lambda: db.updateBranch(leaf.id, idx, 99),
+                   lambda: db.updateBranch(leaf.id, idx, 0, [i.id for i in leaf.path[:-2]]),
+                   lambda: db.updateBranch(leaf.id, idx, leaf.childNum, [i.id for i in leaf.path[:-1]])):
+      change()
+      self.assertIn(projID, db.hierarchy.projects)
+      cached = [render(True), render(False)]
+      db.hierarchy.clear()
+      self.assertEqual(cached, [render(True), render(False)])
+    db.cursor.execute(sq.MAIN_UPDATE_GUI, ('TT', folder.id))
+    db.commit()
+    self.assertNotIn(projID, db.hierarchy.projects)
+
+    # bulk mode: rows are collected, all queries see them, single commit at the end of the outermost bulk
+    # reader: read-only connection that sees the last commit
+    self.assertEqual(db.cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+    synchronous = db.cursor.execute('PRAGMA synchronous').fetchone()[0]
+    reader = db.reader()                                                       #read-only connection of GUI
+    self.assertEqual(len(reader.getView('viewDocType/x0')), len(db.getView('viewDocType/x0')))
+    with self.assertRaises(sqlite3.OperationalError):
+      reader.cursor.execute('DELETE FROM main')
+    with self.be.bulk():
+      with db.bulk():
+        doc = db.saveDoc(fillDocBeforeCreate({'name':'bulk.csv', 'metaUser':{'Maximum [m]':1.0}, 'branch':
+                         {'stack':[], 'child':9999, 'path':None, 'show':[True], 'op':'c'}}, ['measurement','csv']))
+        self.assertIn(sq.MAIN_INSERT, db.bulkRows)
+      self.assertEqual(db.getDoc(doc['id'])['name'], 'bulk.csv')
+      self.assertEqual(db.bulkRows, {})
+      self.assertEqual(reader.getDocs([doc['id']]), {})                                    #not yet committed
+    self.assertEqual(reader.getDoc(doc['id'])['name'], 'bulk.csv')
+    # full-text search: the index follows saveDoc, updateDoc, remove
+    self.assertEqual([i['id'] for i in reader.search('BULK.c', ['measurement'])], [doc['id']])
+    self.assertEqual(reader.search('bulk', ['x0']), [])
+    db.updateDoc({'comment':'Zebra crossing', 'tags':['zebra']}, doc['id'])
+    self.assertEqual(reader.search('bulk.csv')[0]['name'], 'bulk.csv')
+    self.assertEqual([i['id'] for i in reader.search('zebr cross')], [doc['id']])
+    # hierarchy cache: loads of the reader during bulk mode see the last commit, the new child only after it
+    childIDs = lambda: [i.id for i in reader.getHierarchy(projID, True)[0].children]
+    before = childIDs()
+    self.assertIn(projID, db.hierarchy.projects)
+    with db.bulk():
+      child = db.saveDoc(fillDocBeforeCreate({'name':'bulk child', 'branch':
+                         {'stack':[projID], 'child':9999, 'path':None, 'show':[True,True], 'op':'c'}}, ['x1']))
+      db.commit()
+      self.assertEqual(childIDs(), before)
+    self.assertEqual(childIDs(), before+[child['id']])
+    self.assertEqual([i.id for i in db.getHierarchy(projID, True)[0].children], before+[child['id']])
+    db.remove(child['id'])
+    self.assertEqual(childIDs(), before)
+    reader.exit()
+    self.assertEqual(db.cursor.execute('PRAGMA synchronous').fetchone()[0], synchronous)
+    db.remove(doc['id'])
+    self.assertEqual(db.search('zebra'), [])
+
+    # incremental scan: file states are saved, changed content is detected
+    projID = self.be.db.getView('viewDocType/x0')['id'].values[0]
+    projPath = db.getDoc(projID)['branch'][0]['path']
+    path = f'{projPath}/test04_scan.csv'
+    with open(self.be.basePath/path, 'w', encoding='utf-8') as fOut:
+      fOut.write('x,y\n1,2\n')
+    (self.be.basePath/projPath/'test04_broken.csv').symlink_to(self.be.basePath/projPath/'doesNotExist.csv')
+    self.be.scanProject(None, projID)                                         #broken symlink does not abort scan
+    fileStates = db.getFileStates(projPath)
+    self.assertIn(path, fileStates)
+    docID = db.getView('viewIdentify/viewSHAsum', fileStates[path][3])[0]['id']
+    with open(self.be.basePath/path, 'a', encoding='utf-8') as fOut:
+      fOut.write('3,4\n')
+    self.be.scanProject(None, projID)
+    shasum = db.getFileStates(projPath)[path][3]
+    self.assertNotEqual(shasum, fileStates[path][3])
+    self.assertEqual(db.getDoc(docID)['shasum'], shasum)
+    # thumbnail store: main table only has reference, image is loaded on request; image of old content is replaced
+    self.assertEqual(db.getDoc(docID)['image'], f'{THUMBNAIL_REF}{shasum}')
+    image = db.getDoc(docID, image=True)['image']
+    self.assertTrue(image.startswith(('<?xml', 'data:image/')))
+    self.assertEqual(db.cursor.execute('SELECT shasum FROM thumbnails WHERE id == ?', (docID,)).fetchall(), [(shasum,)])
+    # document with the same file has its own image: changing it, e.g. by another extractor, keeps the other
+    svg = '<svg xmlns="http://www.w3.org/2000/svg"><rect width="1" height="1"/></svg>'
+    copy = db.saveDoc(fillDocBeforeCreate({'name':'test04_copy.csv', 'shasum':shasum, 'image':svg, 'branch':
+                      {'stack':[], 'child':9999, 'path':None, 'show':[True], 'op':'c'}}, ['measurement','csv']))
+    self.assertEqual(db.getDoc(copy['id'], image=True)['image'], svg)
+    db.updateDoc({'type':['measurement','csv','other'], 'image':svg.replace('"1"', '"2"')}, copy['id'])
+    self.assertEqual(db.getDoc(copy['id'], image=True)['image'], svg.replace('"1"', '"2"'))
+    self.assertEqual(db.getDoc(docID, image=True)['image'], image)
+    self.assertEqual({i[0]:i[1] for i in db.getThumbnails([docID, copy['id']])},
+                     {docID:f'{docID}/{shasum}', copy['id']:f"{copy['id']}/{shasum}"})
+    db.remove(copy['id'])
+    self.assertEqual(db.getDoc(docID, image=True)['image'], image)
+    # legacy database: images in main table are moved into the thumbnail store of each document
+    with tempfile.TemporaryDirectory() as tempDir:
+      legacy = SqlLiteDB(basePath=Path(tempDir))
+      legacyIDs = [legacy.saveDoc(fillDocBeforeCreate({'name':f'legacy{i}.csv', 'shasum':shasum, 'image':'',
+                   'branch':{'stack':[], 'child':9999, 'path':None, 'show':[True], 'op':'c'}},
+                   ['measurement','csv']))['id'] for i in range(2)]
+      for idx, docIDLegacy in enumerate(legacyIDs):
+        legacy.cursor.execute(sq.MAIN_UPDATE_IMAGE, (svg.replace('"1"', f'"{idx}"'), docIDLegacy))
+      for command in ('DROP TABLE thumbnails', 'DROP TABLE search', 'DROP TABLE searchIds', 'PRAGMA user_version = 2'):
+        legacy.cursor.execute(command)
+      legacy.commit()
+      legacy.exit()
+      legacy = SqlLiteDB(basePath=Path(tempDir))                                              #migrations run
+      self.assertEqual(legacy.cursor.execute('PRAGMA user_version').fetchone()[0], SCHEMA_VERSION)
+      for idx, docIDLegacy in enumerate(legacyIDs):
+        self.assertEqual(legacy.getDoc(docIDLegacy)['image'], f'{THUMBNAIL_REF}{shasum}')
+        self.assertEqual(legacy.getDoc(docIDLegacy, image=True)['image'], svg.replace('"1"', f'"{idx}"'))
+      legacy.exit()
+    # clean up: later tests should see the example project unchanged
+    (self.be.basePath/path).unlink()
+    (self.be.basePath/projPath/'test04_broken.csv').unlink()
+    db.remove(docID)
+    db.setFileStates([], [path])
+    self.assertEqual(db.getImage(f'{THUMBNAIL_REF}{shasum}', docID), '')
+    return
+
+
+  def tearDown(self):
+    if self.be is not None:
+      self.be.exit()
+    logging.info('End 04 test')
+    return
+
+if __name__ == '__main__':
+  unittest.main()
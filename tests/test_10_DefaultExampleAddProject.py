@@ -2,7 +2,7 @@
 """TEST the form """
 import logging, warnings, shutil
 from pathlib import Path
-from PySide6.QtCore import QEventLoop, Slot
+from PySide6.QtCore import QEventLoop, QTimer, Slot
 from pasta_eln.backendWorker.backend import Backend
 from pasta_eln.backendWorker.worker import Task
 from pasta_eln.installationTools import exampleData
@@ -57,13 +57,13 @@ def test_simple(qtbot, caplog):
   def getDoc(doc):
     dirName = comm.basePath/doc['branch'][0]['path']
     shutil.copy(Path(__file__).parent.parent/'pasta_eln'/'Resources'/'Icons'/'pasta512.png', dirName)
-    loop.quit()
+    QTimer.singleShot(0, loop, loop.quit)             #callback runs in backend thread: quit after exec
   comm.backendThread.worker.beSendDoc.connect(getDoc)
   comm.uiRequestDoc.emit(projID)
   loop.exec()
   @Slot(str)
   def didScan(_):
-    loop.quit()
+    QTimer.singleShot(0, loop, loop.quit)             #callback runs in backend thread: quit after exec
   comm.backendThread.worker.beSendTaskReport.connect(didScan)
   comm.uiRequestTask.emit(Task.SCAN, {'docID':projID})
   loop.exec()
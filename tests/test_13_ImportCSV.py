@@ -24,7 +24,9 @@ def test_simple(qtbot, caplog):
   # main part
   df = getTable(qtbot, comm, 'x0')
   projID = df[df['name']=='PASTAs Example Project']['id'].values[0]
-  main(comm, projID, window, {'fileNames':['tests/inputSamples.csv']})
+  with qtbot.waitSignal(comm.backendThread.worker.beSendTaskReport, timeout=60000) as report:
+    main(comm, projID, window, {'fileNames':['tests/inputSamples.csv']})
+  assert report.args[1] == 'Success: added 3 documents of type sample'
 
   df2 = getTable(qtbot, comm, 'sample')
   assert 'sample A' in df2['name'].tolist(), 'Sample A incorrect'
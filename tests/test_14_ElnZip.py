@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+"""TEST the members of .eln files that are written in a pool of threads """
+import hashlib
+import os
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+import pytest
+from pasta_eln.backendWorker import elnZip
+from pasta_eln.backendWorker.elnZip import ZipMemberWriter
+
+
+@pytest.mark.parametrize('appendsRaw', [True, False])
+def test_simple(tmp_path, monkeypatch, appendsRaw):
+  """
+  main function
+  """
+  if not appendsRaw:                                         #zipfile of a future python: compress while writing
+    monkeypatch.setattr(elnZip, 'appendsRaw', lambda _: False)
+  contents = {'data.csv':b'0.000,1.000\n'*50000, 'image.png':os.urandom(5000), 'empty.txt':b'',
+              'random.dat':os.urandom(300000)}
+  for name, content in contents.items():
+    (tmp_path/name).write_bytes(content)
+  nodes:dict[str,dict[str,str]] = {name:{} for name in contents}
+  with ZipFile(tmp_path/'test.eln', 'w', compression=ZIP_DEFLATED) as zipFile:
+    with ZipMemberWriter(zipFile, workers=2) as writer:
+      writer.mkdir('test/folder')
+      for name in contents:
+        writer.addFile(tmp_path/name, f'test/folder/{name}', nodes[name])
+      writer.addFile(tmp_path/'data.csv', 'test/folder/data.csv', {})                          #second one is skipped
+    zipFile.writestr('test/ro-crate-metadata.json', '{}')                   #other members are appended after those
+  # hashes and sizes of nodes, content and compression of members
+  for name, content in contents.items():
+    assert nodes[name] == {'contentSize':str(len(content)), 'sha256':hashlib.sha256(content).hexdigest()}
+  with ZipFile(tmp_path/'test.eln') as zipFile:
+    assert zipFile.testzip() is None
+    assert zipFile.namelist() == ['test/folder/']+[f'test/folder/{i}' for i in contents]+['test/ro-crate-metadata.json']
+    for name, content in contents.items():
+      assert zipFile.read(f'test/folder/{name}') == content
+      assert zipFile.getinfo(f'test/folder/{name}').compress_type == (ZIP_STORED if name=='image.png' else ZIP_DEFLATED)
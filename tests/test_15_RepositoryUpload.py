@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""TEST streamed, retried and resumed uploads to repositories against a local stand-in server """
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+from pasta_eln.backendWorker.dataverse import DataverseClient
+from pasta_eln.backendWorker.repository import RETRIES, RepositoryClient
+from pasta_eln.backendWorker.zenodo import ZenodoClient
+
+PART_SIZE = 1024*1024
+
+
+class StandIn(BaseHTTPRequestHandler):
+  """ Endpoints of Zenodo and Dataverse that are used for uploads; failures are injected by the test """
+  server:'StandInServer'
+
+  def log_message(self, *args):                                                     # pylint: disable=arguments-differ
+    return
+
+  def reply(self, status:int, content:dict, headers:dict|None=None):
+    """ Send json reply """
+    body = json.dumps(content).encode()
+    self.send_response(status)
+    for key, value in (headers or {}).items():
+      self.send_header(key, value)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):                                                                       # pylint: disable=invalid-name
+    self.route('GET')
+
+  def do_POST(self):                                                                      # pylint: disable=invalid-name
+    self.route('POST')
+
+  def do_PUT(self):                                                                       # pylint: disable=invalid-name
+    self.route('PUT')
+
+  def route(self, method:str):
+    """ Dispatch request: record it, then fail or answer it """
+    path = urlparse(self.path).path
+    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+    server = self.server
+    server.log.append((method, path, len(body)))
+    if server.failures.get(path, 0) > 0:
+      server.failures[path] -= 1
+      self.reply(server.failStatus, {})
+      return
+    base = f'http://127.0.0.1:{server.server_port}'
+    if method=='POST' and path=='/api/deposit/depositions':                                            # zenodo
+      self.reply(201, {'id':7, 'links':{'bucket':f'{base}/bucket/7'}})
+    elif method=='PUT' and path.startswith('/bucket/'):
+      server.stored[path] = body
+      self.reply(201, {'checksum':f'md5:{hashlib.md5(body).hexdigest()}'})
+    elif path=='/api/deposit/depositions/7/actions/publish':
+      self.reply(202, {'doi':'10.5281/7', 'doi_url':'https://doi.org/10.5281/7'})
+    elif path=='/api/datasets/:persistentId/uploadurls':                                            # dataverse
+      if not server.direct:
+        self.reply(404, {'status':'ERROR'})
+        return
+      size = int(urlparse(self.path).query.split('size=')[1].split('&')[0])
+      urls = {str(i+1):f'{base}/s3/{i+1}' for i in range((size+PART_SIZE-1)//PART_SIZE)}
+      self.reply(200, {'data':{'urls':urls, 'partSize':PART_SIZE, 'storageIdentifier':'s3://bucket:17',
+                               'complete':'/api/datasets/mpupload?uploadid=1', 'abort':'/api/datasets/mpupload'}})
+    elif method=='PUT' and path.startswith('/s3/'):
+      server.stored[path] = body
+      self.reply(200, {}, {'ETag':f'"{hashlib.md5(body).hexdigest()}"'})
+    elif method=='PUT' and path=='/api/datasets/mpupload':
+      etags = json.loads(body)
+      parts = [server.stored[f'/s3/{i}'] for i in sorted(etags, key=int)]
+      assert [hashlib.md5(i).hexdigest() for i in parts] == [etags[i] for i in sorted(etags, key=int)]
+      server.stored['s3://bucket:17'] = b''.join(parts)
+      self.reply(200, {})
+    elif path=='/api/datasets/:persistentId/add':
+      server.stored['add'] = body
+      self.reply(200, {'data':{'files':[{'label':'export.eln'}]}})
+    elif path=='/api/datasets/:persistentId/actions/:publish':
+      self.reply(200, {'data':{'versionNumber':1}})
+    else:
+      self.reply(400, {'path':path})
+
+
+class StandInServer(ThreadingHTTPServer):
+  """ Server with state of the stand-in """
+  def __init__(self):
+    super().__init__(('127.0.0.1', 0), StandIn)
+    self.log:list[tuple[str,str,int]] = []
+    self.failures:dict[str,int] = {}                                           # path: number of requests that fail
+    self.failStatus = 503
+    self.stored:dict[str,bytes] = {}
+    self.direct = True
+
+
+def test_simple(tmp_path):
+  """
+  main function
+  """
+  server = StandInServer()
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  url = f'http://127.0.0.1:{server.server_port}'
+  fileName = tmp_path/'export.eln'
+  content = os.urandom(3*PART_SIZE+1000)
+  fileName.write_bytes(content)
+  token = Path(f'{fileName}.upload.json')
+
+  # zenodo: bucket request fails once and is retried; publishing is not retried, the next call resumes
+  client = ZenodoClient(url, 'key')
+  client.backoff = 0.01
+  server.failures = {'/bucket/7/export.eln':1}
+  assert client.uploadRepository({'metadata':{}}, str(fileName)) == (True, 'Published: 10.5281/7, https://doi.org/10.5281/7')
+  assert server.stored['/bucket/7/export.eln'] == content and not token.exists()
+  server.log.clear()
+  server.failures = {'/api/deposit/depositions/7/actions/publish':1}
+  assert client.uploadRepository({'metadata':{}}, str(fileName))[0] is False
+  assert [i[1] for i in server.log].count('/api/deposit/depositions/7/actions/publish') == 1
+  assert json.loads(token.read_text())['uploaded']
+  server.log.clear()
+  assert client.uploadRepository({'metadata':{}}, str(fileName))[0]
+  assert [i[1] for i in server.log] == ['/api/deposit/depositions/7/actions/publish']   #neither created nor sent
+  assert not token.exists()
+
+  # dataverse direct upload: third part fails persistently; next call sends only the remaining parts
+  client2 = DataverseClient(url, 'key', 'pasta')
+  client2.backoff = 0.01
+  server.log.clear()
+  server.failures = {'/s3/3':RETRIES}
+  assert isinstance(client2.uploadFile('doi:10.5072/X', str(fileName), '.eln file', ['file']), str)
+  assert list(json.loads(token.read_text())['direct']['etags']) == ['1', '2']
+  server.log.clear()
+  server.failures = {}
+  reply = client2.uploadFile('doi:10.5072/X', str(fileName), '.eln file', ['file'])
+  assert reply['file_upload_result'] == {'files':[{'label':'export.eln'}]}
+  assert [i[1] for i in server.log] == ['/s3/3', '/s3/4', '/api/datasets/mpupload', '/api/datasets/:persistentId/add',
+                                        '/api/datasets/:persistentId/actions/:publish']
+  assert server.stored['s3://bucket:17'] == content and not token.exists()
+  assert hashlib.md5(content).hexdigest().encode() in server.stored['add']
+
+  # dataverse without direct upload: file is streamed as multipart/form-data; adding is not retried
+  server.direct = False
+  server.failures = {'/api/datasets/:persistentId/add':1}
+  assert isinstance(client2.uploadFile('doi:10.5072/X', str(fileName), '.eln file', ['file']), str)
+  reply = client2.uploadFile('doi:10.5072/X', str(fileName), '.eln file', ['file'])
+  assert isinstance(reply, dict)
+  assert content in server.stored['add'] and b'name="jsonData"' in server.stored['add']
+  assert not token.exists()
+
+  # resume token of an older export: not resumed, removed
+  export = {'projID':'x-1', 'docTypes':['measurement'], 'state':[5, '2025-01-01T00:00:00']}
+  client.export = export
+  server.failures = {'/api/deposit/depositions/7/actions/publish':1}
+  assert client.uploadRepository({'metadata':{}}, str(fileName))[0] is False
+  assert RepositoryClient.resumable(str(fileName), export)
+  client.export = export | {'state':[6, '2025-01-02T00:00:00']}
+  assert client.loadResume(str(fileName)) == {}
+  assert not RepositoryClient.resumable(str(fileName), client.export) and not token.exists()
+  server.shutdown()
@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+"""TEST watcher of file system with inotify and polling: debounced folders are scanned like a scan of the project """
+import shutil
+import threading
+from pathlib import Path
+from pasta_eln.backendWorker.backend import Backend
+from pasta_eln.backendWorker.watcher import FileWatcher
+
+DEBOUNCE = 0.3
+
+
+class Collector:
+  """ Callback of the watcher: collect the reported folders """
+  def __init__(self) -> None:
+    self.calls:list[list[str]] = []
+    self.event = threading.Event()
+
+  def __call__(self, folders:list[str]) -> None:
+    self.calls.append(folders)
+    self.event.set()
+
+  def wait(self) -> list[str]:
+    """ Wait for next report """
+    assert self.event.wait(20), 'watcher did not report'
+    self.event.clear()
+    return self.calls[-1]
+
+
+def state(backend:Backend) -> list[tuple[str,str,int]]:
+  """ Paths, types and child numbers in database """
+  return sorted((i['key'], '/'.join(i['value'][1]), i['value'][2])
+                for i in backend.db.getView('viewHierarchy/viewPathsAll'))
+
+
+def test_simple(tmp_path):
+  """
+  main function
+  """
+  (tmp_path/'addons').mkdir()
+  (tmp_path/'data').mkdir()
+  configuration = {'userID':'tester', 'GUI':{}, 'projectGroups':{'watch':{'local':{'path':str(tmp_path/'data')},
+                                                                         'addOnDir':str(tmp_path/'addons')}}}
+  backend = Backend(configuration, 'watch')
+  backend.addData('x0', {'name':'Project'}, [])
+  projID = backend.db.getView('viewDocType/x0')['id'].values[0]
+  backend.cwd = backend.basePath/'Project'
+  backend.addData('x1', {'name':'Instrument'}, [projID])
+  backend.addData('x1', {'name':'Other'}, [projID])
+  instrument = backend.basePath/'Project'/'000_Instrument'
+  for polling in (False, True):
+    collector = Collector()
+    watcher = FileWatcher(backend.basePath, collector, debounce=DEBOUNCE, polling=polling, interval=0.1)
+    assert watcher.method == ('polling' if polling else 'inotify')
+    watcher.start()
+    # instrument writes many files: one report of that folder
+    for i in range(20):
+      (instrument/f'data{polling}_{i}.csv').write_text(f'{polling},{i}\n')
+    (instrument/'.hidden').write_text('ignored')
+    assert collector.wait() == ['Project/000_Instrument']
+    assert backend.scanPaths(collector.calls[-1]) == ''
+    after = state(backend)
+    assert f'Project/000_Instrument/data{polling}_19.csv' in [i[0] for i in after]
+    # new folder with files, removed file: reported parents only; new folder gets its child number
+    (backend.basePath/'Project'/f'Run{polling:d}').mkdir()
+    (backend.basePath/'Project'/f'Run{polling:d}'/'result.csv').write_text(f'{polling},result\n')
+    (instrument/f'data{polling}_0.csv').unlink()
+    assert set(collector.wait()) <= {'Project', 'Project/000_Instrument', f'Project/Run{polling:d}'}
+    backend.scanPaths(collector.calls[-1])
+    after = state(backend)
+    assert (f'Project/{2+polling:03d}_Run{polling:d}', 'x1', 2+polling) in after
+    assert f'Project/{2+polling:03d}_Run{polling:d}/result.csv' in [i[0] for i in after]
+    assert f'Project/000_Instrument/data{polling}_0.csv' not in [i[0] for i in after]
+    # full scan of project finds nothing else
+    backend.scanProject(None, projID)
+    assert state(backend) == after
+    watcher.stop()
+  # lost events: all projects; ignored and unknown paths: nothing
+  shutil.copy(instrument/'dataFalse_1.csv', backend.basePath/'Project'/'001_Other'/'copy.csv')
+  assert backend.scanPaths(['.trash/a', 'NotAProject']) == '' and state(backend) == after
+  assert backend.scanPaths(['.']).startswith('Create a link')
+  assert 'Project/001_Other/copy.csv' in [i[0] for i in state(backend)]
+  backend.exit()
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""TEST check of database and disk: findings of inconsistencies and their repair """
+from pasta_eln.backendWorker.backend import Backend
+from pasta_eln.backendWorker.checkReport import CheckReport
+
+
+def test_simple(tmp_path):
+  """
+  main function
+  """
+  (tmp_path/'addons').mkdir()
+  (tmp_path/'data').mkdir()
+  configuration = {'userID':'tester', 'GUI':{}, 'projectGroups':{'check':{'local':{'path':str(tmp_path/'data')},
+                                                                         'addOnDir':str(tmp_path/'addons')}}}
+  backend = Backend(configuration, 'check')
+  backend.addData('x0', {'name':'Project'}, [])
+  backend.addData('x0', {'name':'Lost and Found'}, [])
+  projID = backend.db.getView('viewDocType/x0').set_index('name').loc['Project','id']
+  backend.cwd = backend.basePath/'Project'
+  backend.addData('x1', {'name':'Instrument'}, [projID])
+  backend.addData('x1', {'name':"Sample's data"}, [projID])
+  instrument = backend.basePath/'Project'/'000_Instrument'
+  sample = backend.basePath/backend.db.getView('viewHierarchy/viewPathsAll', startKey="Project/001_Sample'")[0]['key']
+  assert "'" in sample.name
+  for i in range(3):
+    (instrument/f'data_{i}.csv').write_text(f'{i},{i}\n', encoding='utf-8')
+  (sample/"it's.csv").write_text('1,2\n', encoding='utf-8')
+  (instrument/'__pycache__').mkdir()
+  (instrument/'__pycache__'/'module.pyc').write_text('', encoding='utf-8')
+  backend.scanProject(None, projID)
+  paths = {i['key']:i['id'] for i in backend.db.getView('viewHierarchy/viewPathsAll')}
+  assert 'Project/000_Instrument/__pycache__/module.pyc' not in paths
+  assert 'ERROR' not in backend.checkDB(minimal=True)
+
+  # inconsistencies: files deleted and added, folder named like a part of __pycache__,
+  # folder without .id_pastaELN.json, document with missing parent
+  (instrument/'data_0.csv').unlink()
+  (sample/'unknown.csv').write_text('', encoding='utf-8')
+  (instrument/'cache').mkdir()
+  (sample/'.id_pastaELN.json').unlink()
+  removedID, movedID = paths['Project/000_Instrument/data_0.csv'], paths['Project/000_Instrument/data_1.csv']
+  backend.db.cursor.execute("UPDATE branches SET stack='x-missing/'||id WHERE id==?", (movedID,))
+  backend.db.commit()
+  output = backend.checkDB(report=CheckReport('text'), minimal=True)
+  assert f'File   on disk but not DB (2): Project/{sample.name}/unknown.csv' in output
+  assert 'Folder on disk but not DB    : Project/000_Instrument/cache' in output
+  assert f'Folder has no .id_pastaELN.json:Project/{sample.name}' in output
+  assert f'branch stack parent is bad: {movedID}. Repair: move to lost and found.' in output
+  assert 'bch01: These paths of database not on filesystem(3):\n  - Project/000_Instrument/data_0.csv' in output
+  assert output.count('**ERROR') == 5 and '__pycache__' not in output
+
+  # repair everything that can be repaired: documents without path remain, files and folders that are not in the
+  # database remain, the shasum of the removed file is removed in the next repair
+  questions:list[str] = []
+  backend.checkDB(repair=lambda text: questions.append(text) or True, minimal=True)
+  assert len(questions) == 4
+  assert (sample/'.id_pastaELN.json').is_file()
+  lostAndFoundID = backend.db.getView('viewDocType/x0').set_index('name').loc['Lost and Found','id']
+  assert backend.db.getDoc(movedID)['branch'][0]['stack'] == [lostAndFoundID]
+  paths = {i['key']:i['id'] for i in backend.db.getView('viewHierarchy/viewPathsAll')}
+  assert 'Project/000_Instrument/data_0.csv' not in paths and 'Project/000_Instrument/data_1.csv' not in paths
+  output = backend.checkDB(minimal=True)
+  assert f"shasum!='' for item with no path docID:{removedID}" in output
+  assert output.count('**ERROR') == 4 and 'data_1.csv' in output and 'unknown.csv' in output
+  assert 'Folder on disk but not DB    : Project/000_Instrument/cache' in output
+  backend.db.exit()
@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+"""TEST model of the table: cells are formatted when asked for, check states and ids follow sorting """
+import pandas as pd
+from PySide6.QtCore import QPersistentModelIndex, QSortFilterProxyModel, Qt
+from pasta_eln.UI.tableModel import TableModel
+
+NUM_ROWS = 30
+
+
+def test_simple(qtbot):
+  """
+  main function
+  """
+  data = pd.DataFrame({'name':  [f'measurement_{i}.csv' for i in range(NUM_ROWS)],
+                       'tags':  [f'_{i%6}, tag{i%7}' if i%3 else '' for i in range(NUM_ROWS)],
+                       'sample':[f's-{i:032x}' if i%2 else 'nan' for i in range(NUM_ROWS)],
+                       'flag':  ['True' if i%4 else 'None' for i in range(NUM_ROWS)],
+                       'id':    [f'm-{i:032x}' for i in range(NUM_ROWS)],
+                       'show':  ['TF' if i%10==0 else 'T' for i in range(NUM_ROWS)]})
+  model = TableModel(data, list(data.columns)[:-2], True)
+  assert (model.rowCount(), model.columnCount()) == (NUM_ROWS, 4)
+  assert model.headerData(2, Qt.Orientation.Horizontal) == 'sample'
+  # cells as shown: rating of tags, links, booleans, empty values, hidden items
+  assert [model.index(0, i).data() for i in range(4)] == ['measurement_0.csv  \U0001F441', '-', '-', '-']
+  assert [model.index(5, i).data() for i in range(4)] == ['measurement_5.csv', '\u2605'*5+' tag5', 'oo', 'Y']
+  assert model.index(3, 0).data(Qt.ItemDataRole.AccessibleTextRole) == data['id'][3]
+  assert model.flags(model.index(3, 0)) & Qt.ItemFlag.ItemIsUserCheckable
+  assert not model.flags(model.index(3, 1)) & Qt.ItemFlag.ItemIsUserCheckable
+
+  # check state and persistent indexes follow the rows when sorted
+  model.setData(model.index(3, 0), Qt.CheckState.Checked.value, Qt.ItemDataRole.CheckStateRole)
+  assert model.isChecked(3) and not model.isChecked(4)
+  assert model.index(3, 0).data(Qt.ItemDataRole.CheckStateRole) == Qt.CheckState.Checked
+  persistent = QPersistentModelIndex(model.index(3, 0))
+  model.sort(0, Qt.SortOrder.DescendingOrder)
+  docIDs = [model.docID(i) for i in range(NUM_ROWS)]
+  assert docIDs == list(data.sort_values('name', ascending=False)['id'])
+  assert model.checked.sum() == 1 and model.isChecked(docIDs.index(data['id'][3]))
+  assert persistent.row() == docIDs.index(data['id'][3])
+  assert persistent.data(Qt.ItemDataRole.AccessibleTextRole) == data['id'][3]
+  model.sort(2)                                                                       #empty values first
+  assert model.index(0, 2).data() == '-' and model.index(NUM_ROWS-1, 2).data() == 'oo'
+
+  # filtering by a proxy uses the shown text
+  proxy = QSortFilterProxyModel()
+  proxy.setSourceModel(model)
+  proxy.setFilterKeyColumn(0)
+  proxy.setFilterRegularExpression('measurement_1')
+  assert proxy.rowCount() == 11
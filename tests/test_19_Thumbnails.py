@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""TEST thumbnails of the gallery: raw images decoded in a pool of threads, least recently used pixmaps dropped """
+from PySide6.QtCore import QByteArray, Qt, QThreadPool
+from PySide6.QtGui import QImage, QPixmap
+from pasta_eln.backendWorker.backend import Backend
+from pasta_eln.miscTools import getConfiguration
+from pasta_eln.UI.thumbnails import DecoderSignals, DecodeTask, ThumbnailCache, decodeThumbnail
+
+IMG_SIZE = 300
+
+
+def test_simple(qtbot):
+  """
+  main function
+  """
+  configuration, _ = getConfiguration('research')
+  backend = Backend(configuration, 'research')
+  docIDs = list(backend.db.getView('viewDocType/measurementAll')['id'])
+  thumbnails = backend.db.getThumbnails(docIDs)
+  docs = backend.db.getDocs(docIDs, image=True)
+  assert {i[0] for i in thumbnails} == {i for i in docIDs if docs[i]['image']}
+  assert len(thumbnails) > 1
+
+  # raw images decoded in threads have the size of the images of the documents
+  images:dict[str,QImage] = {}
+  signals = DecoderSignals()
+  signals.decoded.connect(lambda docID, _, image: images.update({docID:image}), Qt.ConnectionType.DirectConnection)
+  pool = QThreadPool()
+  for docID, key, imageFormat, data in thumbnails:
+    assert key == f"{docID}/{docs[docID]['shasum']}"
+    pool.start(DecodeTask(signals, docID, key, imageFormat, data, IMG_SIZE))
+  pool.waitForDone()
+  for docID, image in images.items():
+    header, data = docs[docID]['image'].split(',', 1) if docs[docID]['image'].startswith('data:') else ('', '')
+    if header:
+      expected = QImage()
+      expected.loadFromData(QByteArray.fromBase64(data.encode()), header.split(';')[0].split('/')[-1].upper())
+      assert image.size() == expected.scaled(IMG_SIZE, IMG_SIZE, Qt.AspectRatioMode.KeepAspectRatio).size()
+    else:
+      assert not image.isNull() and max(image.width(), image.height()) == IMG_SIZE
+  svg = b'<?xml version="1.0"?><svg xmlns="http://www.w3.org/2000/svg" width="200" height="100"><rect width="200" '\
+        b'height="100" fill="red"/></svg>'
+  assert decodeThumbnail('svg', svg, IMG_SIZE).size().toTuple() == (300, 150)
+  assert decodeThumbnail('png', b'no image', IMG_SIZE).isNull()
+
+  # cache drops least recently used pixmaps
+  pixmap = QPixmap.fromImage(next(iter(images.values())))
+  cache = ThumbnailCache(maxBytes=3*ThumbnailCache.pixmapBytes(pixmap))
+  for i in range(4):
+    cache.put(str(i), pixmap)
+    cache.get('0')
+  assert '0' in cache and '1' not in cache and len(cache) == 3
+  cache.remove('0')
+  assert cache.get('0') is None and cache.bytes == 2*ThumbnailCache.pixmapBytes(pixmap)
+  backend.db.exit()
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+"""TEST import of .eln file of another ELN: flattened graph with separate nodes, resolved by an index of @id """
+import json
+import logging
+from zipfile import ZipFile
+from pasta_eln.backendWorker.backend import Backend
+from pasta_eln.backendWorker.inputOutput import importELN, indexGraph, resolveEntities
+
+NUM_FILES = 5
+
+
+def syntheticELN(fileName) -> list[dict]:
+  """ Create .eln file as other ELNs export them: flattened graph with separate PropertyValue nodes """
+  graph:list[dict] = [{'@id':'ro-crate-metadata.json', '@type':'CreativeWork', 'about':{'@id':'./'},
+                       'sdPublisher':{'@id':'#publisher'}},
+                      {'@id':'#publisher', '@type':'Organization', 'name':'Other ELN'},
+                      {'@id':'./', '@type':'Dataset', 'hasPart':[{'@id':'./folder/'}, {'@id':'./folder/file0.csv'}]},
+                      {'@id':'./folder/', '@type':'Dataset', 'name':'folder', 'hasPart':[]}]
+  with ZipFile(fileName, 'w') as elnFile:
+    for i in range(NUM_FILES):
+      elnID = f'./folder/file{i}.csv'
+      graph[3]['hasPart'].append({'@id':elnID})
+      graph.append({'@id':elnID, '@type':'File', 'name':f'file{i}.csv', 'author':{'@id':'https://orcid.org/0'},
+                    'variableMeasured':[{'@id':f'{elnID}_{j}'} for j in range(3)]})
+      graph += [{'@id':f'{elnID}_{j}', '@type':'PropertyValue', 'propertyID':f'p{j}', 'value':i*j} for j in range(3)]
+      elnFile.writestr(f'eln/folder/file{i}.csv', f'{i},1\n')
+    elnFile.writestr('eln/ro-crate-metadata.json', json.dumps({'@graph':graph}))
+  return graph
+
+
+def test_simple(tmp_path, caplog):
+  """
+  main function
+  """
+  graph = syntheticELN(tmp_path/'synthetic.eln')
+  # index of graph: first node of an id; sub-entities are pulled in, external IRIs are kept
+  nodesByID, duplicates = indexGraph(graph+[{'@id':'./folder/', '@type':'Dataset'}, {'@type':'NoID'}])
+  assert len(nodesByID) == len(graph) and duplicates == {'./folder/'} and 'hasPart' in nodesByID['./folder/']
+  node = resolveEntities(dict(nodesByID['./folder/file2.csv']), nodesByID)
+  assert node['variableMeasured'][1] == {'@id':'./folder/file2.csv_1', '@type':'PropertyValue', 'propertyID':'p1',
+                                         'value':2}
+  assert node['author'] == {'@id':'https://orcid.org/0'}
+  assert resolveEntities(dict(nodesByID['./folder/']), nodesByID)['hasPart'] == nodesByID['./folder/']['hasPart']
+
+  # import into project: folder with its files, the file in the main node is only imported once
+  (tmp_path/'addons').mkdir()
+  (tmp_path/'data').mkdir()
+  configuration = {'userID':'tester', 'GUI':{}, 'projectGroups':{'import':{'local':{'path':str(tmp_path/'data')},
+                                                                          'addOnDir':str(tmp_path/'addons')}}}
+  backend = Backend(configuration, 'import')
+  backend.addData('x0', {'name':'Project'}, [])
+  projID = backend.db.getView('viewDocType/x0')['id'].values[0]
+  message, statistics = importELN(backend, str(tmp_path/'synthetic.eln'), projID)
+  assert message.startswith(f'Success: imported {NUM_FILES+1} documents')
+  assert statistics['types']['PropertyValue'] == 3*NUM_FILES
+  folders = backend.db.getView('viewDocType/x1')
+  assert list(folders['name']) == ['folder']
+  files = {i['key']:i['id'] for i in backend.db.getView('viewHierarchy/viewPathsAll') if i['value'][1][0][0]!='x'}
+  assert len(files) == NUM_FILES
+  folderPath = backend.db.getDoc(folders['id'].values[0])['branch'][0]['path']
+  for i in range(NUM_FILES):
+    path = f'{folderPath}/file{i}.csv'
+    assert (backend.basePath/path).read_text(encoding='utf-8') == f'{i},1\n'
+    doc = backend.db.getDoc(files[path])
+    assert doc['branch'][0]['stack'] == [projID, folders['id'].values[0]]
+    assert doc['imported']['P2'][0] == str(2*i)
+  backend.db.exit()
+  errors = [record for record in caplog.records if record.levelno >= logging.ERROR]
+  assert not errors, f"Logging errors found: {[record.getMessage() for record in errors]}"
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""TEST reconciliation of scanProject with the database: moved, renamed and orphaned folders and files """
+import shutil
+from pasta_eln.backendWorker.backend import Backend
+
+
+def paths(backend:Backend) -> dict[str,str]:
+  """ Paths of documents in database: path -> docID """
+  return {i['key']:i['id'] for i in backend.db.getView('viewHierarchy/viewPathsAll')}
+
+
+def test_simple(tmp_path):
+  """
+  main function
+  """
+  (tmp_path/'addons').mkdir()
+  (tmp_path/'data').mkdir()
+  configuration = {'userID':'tester', 'GUI':{}, 'projectGroups':{'scan':{'local':{'path':str(tmp_path/'data')},
+                                                                        'addOnDir':str(tmp_path/'addons')}}}
+  backend = Backend(configuration, 'scan')
+  backend.addData('x0', {'name':'Project'}, [])
+  projID = backend.db.getView('viewDocType/x0')['id'].values[0]
+  backend.cwd = backend.basePath/'Project'
+  for name in ('Instrument', 'Sample', 'Old'):
+    backend.addData('x1', {'name':name}, [projID])
+  project = backend.basePath/'Project'
+  for i, folder in enumerate(('000_Instrument', '001_Sample', '002_Old')):
+    for j in range(2):
+      (project/folder/f'data{i}_{j}.csv').write_text(f'{i},{j}\n', encoding='utf-8')
+  (project/'Results').mkdir()
+  (project/'Results'/'new.csv').write_text('new\n', encoding='utf-8')
+  backend.scanProject(None, projID)
+  before = paths(backend)
+  assert {'Project/000_Instrument/data0_1.csv', 'Project/002_Old/data2_0.csv'} <= set(before)
+  assert 'Project/003_Results/new.csv' in before                        #new folder: created with child number
+  assert backend.scanProject(None, projID) == '' and paths(backend) == before        #nothing changed: no change
+
+  # folder moved into another one, file moved between folders, folder and file removed
+  shutil.move(project/'001_Sample', project/'000_Instrument'/'Sample')
+  shutil.move(project/'000_Instrument'/'data0_1.csv', project/'003_Results'/'data0_1.csv')
+  shutil.rmtree(project/'002_Old')
+  (project/'000_Instrument'/'data0_0.csv').unlink()
+  backend.scanProject(None, projID)
+  after = paths(backend)
+  movedFolder = [k for k,v in after.items() if v==before['Project/001_Sample']]
+  assert len(movedFolder) == 1 and movedFolder[0].startswith('Project/000_Instrument/')
+  stack = backend.db.getDoc(before['Project/001_Sample'])['branch'][0]['stack']
+  assert stack == [projID, before['Project/000_Instrument']]
+  for j in range(2):                                                      #documents of moved files are kept
+    assert after[f'{movedFolder[0]}/data1_{j}.csv'] == before[f'Project/001_Sample/data1_{j}.csv']
+  assert after['Project/003_Results/data0_1.csv'] == before['Project/000_Instrument/data0_1.csv']
+  for path in ('Project/002_Old', 'Project/002_Old/data2_0.csv', 'Project/000_Instrument/data0_0.csv',
+               'Project/001_Sample', 'Project/000_Instrument/data0_1.csv'):
+    assert path not in after
+  assert before['Project/002_Old'] not in after.values()
+  assert backend.scanProject(None, projID) == '' and paths(backend) == after
+  backend.db.exit()
@@ -1,4 +1,7 @@
+import copy
 import logging
+from anytree import Node, PreOrderIter
+from pasta_eln.backendWorker.hierarchyCache import hierarchyDelta
 from pasta_eln.UI.guiCommunicate import Communicate
 from pasta_eln.UI.project import Project
 from .test_34_GUI_Form import getTable
@@ -20,6 +23,28 @@ def test_simple(qtbot, caplog):
 
   path = qtbot.screenshot(window)
   print(path)
+
+  # changes of the hierarchy patch the tree; changed leaves are rendered again
+  while window.hierarchy is None:
+    qtbot.wait(100)
+  new = copy.deepcopy(window.hierarchy)
+  leaf = next(i for i in PreOrderIter(new) if i.docType[0][0]!='x')
+  folder = next(i for i in PreOrderIter(new) if i.docType[0][0]=='x' and i.depth==1)
+  leaf.name = 'renamed leaf'
+  Node(id='m-inserted', parent=folder, docType=['measurement'], name='inserted leaf', gui=[True,True],
+       childNum=9999, fPath='')
+  keyLeaf = '/'.join(i.id for i in leaf.path)
+  operations = hierarchyDelta(window.hierarchy, new)
+  assert [i[:2] for i in operations if i[0]!='order'] == [('insert', f'{"/".join(i.id for i in folder.path)}/m-inserted'),
+                                                          ('update', keyLeaf)]
+  for docID in (leaf.id, 'm-inserted'):
+    window.renderer.docs[docID] = {'requested':True}
+    window.renderer.rendered[docID] = {}
+  window.onGetDelta(new, {}, operations)
+  assert window.itemAt(keyLeaf).text() == 'renamed leaf'
+  assert window.itemAt(f'{"/".join(i.id for i in folder.path)}/m-inserted').text() == 'inserted leaf'
+  for docID in (leaf.id, 'm-inserted'):
+    assert docID not in window.renderer.rendered and docID not in window.renderer.docs
   comm.shutdownBackendThread()
 
   errors = [record for record in caplog.records if record.levelno >= logging.ERROR]
@@ -0,0 +1,43 @@
+import logging
+from PySide6.QtWidgets import QMessageBox
+from pasta_eln.UI.guiCommunicate import Communicate
+from pasta_eln.UI.table import Command, Table
+from pasta_eln.UI.tableFilterManager import FilterCommand
+
+def test_simple(qtbot, caplog, monkeypatch):
+
+  comm = Communicate('research')
+  while comm.backendThread.worker.backend is None:
+    qtbot.wait(100)
+  window = Table(comm)
+  window.setMinimumSize(1024,800)
+  window.show()
+  qtbot.addWidget(window)
+  window.changeTable('measurement', '')
+  while window.model.total < 2 or len(window.model.pages[0].ids) < 2:
+    qtbot.wait(100)
+
+  # checked rows are kept as docIDs: they are the selected documents
+  last = len(window.model.pages[0].ids)-1
+  checkedID, otherID = window.model.docID(0), window.model.docID(last)
+  window.model.setChecked(0, True)
+  assert window.selectedDocIDs() == [checkedID]
+
+  # filter that hides the checked row: the hidden row is not selected anymore
+  window.execute([FilterCommand.ADD_FILTER])
+  filterItem = window.filterManager.filters[max(window.filterManager.filters)]
+  filterItem.text.setText(window.model.pages[0].text(last, 0).split('  ')[0])
+  while window.model.docID(0) != otherID:
+    qtbot.wait(100)
+  assert checkedID not in [window.model.docID(i) for i in range(window.model.total)]
+  assert window.selectedDocIDs() == []
+
+  # delete: no question, hence no hidden document is deleted
+  questions = []
+  monkeypatch.setattr(QMessageBox, 'critical', lambda *args: questions.append(args) or QMessageBox.StandardButton.No)
+  window.execute([Command.DELETE])
+  assert questions == []
+  comm.shutdownBackendThread()
+
+  errors = [record for record in caplog.records if record.levelno >= logging.ERROR]
+  assert not errors, f"Logging errors found: {[record.getMessage() for record in errors]}"
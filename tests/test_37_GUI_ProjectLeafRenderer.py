@@ -0,0 +1,39 @@
+import logging
+from PySide6.QtCore import QPersistentModelIndex
+from pasta_eln.UI import projectLeafRenderer
+from pasta_eln.UI.guiCommunicate import Communicate
+from pasta_eln.UI.projectLeafRenderer import ProjectLeafRenderer
+from .test_34_GUI_Form import getTable
+
+def test_simple(qtbot, caplog, monkeypatch):
+
+  comm = Communicate('research')
+  while comm.backendThread.worker.backend is None:
+    qtbot.wait(100)
+  monkeypatch.setattr(projectLeafRenderer, 'MAX_RENDERED', 2)
+  renderer = ProjectLeafRenderer(comm)
+  renderer.leafWidth = 300
+  docIDs = list(getTable(qtbot, comm, 'measurement')['id'].values[:3])
+  assert len(docIDs) == 3
+  renderer.docs = {i:{'index':QPersistentModelIndex(), 'requested':True} for i in docIDs}
+
+  # rendered leaves are limited: the evicted one is requested again when it is painted
+  received = []
+  comm.backendThread.worker.beSendDocs.connect(received.extend)
+  comm.uiRequestDocs.emit(docIDs)
+  while not received:
+    qtbot.wait(100)
+  assert len(renderer.rendered) == 2
+  evicted = [i for i in docIDs if i not in renderer.rendered]
+  assert len(evicted) == 1
+  assert [i for i in docIDs if renderer.docs[i].get('requested')] == [i for i in docIDs if i in renderer.rendered]
+
+  # edited document: rendered again with its new content
+  doc = [i for i in received if i['id'] in renderer.rendered][0]
+  comm.backendThread.worker.beSendDoc.emit(doc | {'name':'edited.csv', 'dateModified':'2099-01-01T00:00:00'})
+  assert renderer.rendered[doc['id']]['name'] == 'edited.csv'
+  assert renderer.rendered[doc['id']]['dateModified'] == '2099-01-01T00:00:00'
+  comm.shutdownBackendThread()
+
+  errors = [record for record in caplog.records if record.levelno >= logging.ERROR]
+  assert not errors, f"Logging errors found: {[record.getMessage() for record in errors]}"
@@ -0,0 +1,69 @@
+""" Helper functions for the benchmarks: synthetic databases and timing """
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable
+from pasta_eln.backendWorker.sqlite import SqlLiteDB
+from pasta_eln.textTools.handleDictionaries import fillDocBeforeCreate
+
+
+def syntheticDoc(docType:str, name:str, stack:list[str], child:int, path:str|None) -> dict[str,Any]:
+  """ Create a document as backend.addData would hand it to the database
+
+  Args:
+    docType (str): document type, / separated
+    name (str): name of document
+    stack (list): list of parent ids
+    child (int): child number
+    path (str): path of branch
+
+  Returns:
+    dict: document
+  """
+  doc = {'name':name, 'tags':['_1', 'synthetic'], 'comment':f"Comment of '{name}' with apostrophe",
+         'user':'benchmark', 'branch':{'stack':stack, 'child':child, 'path':path, 'show':[True]*(len(stack)+1),
+         'op':'c'}}
+  if not docType.startswith('x'):
+    doc |= {'shasum':uuid.uuid4().hex, 'image':'', '.sampleFrequency':'2.5', 'metaVendor':{'fileExtension':'csv'},
+            'metaUser':{'Maximum y-data [m]':0.99, 'Number of points':1000}}
+  return fillDocBeforeCreate(doc, docType.split('/'))
+
+
+def createSyntheticDB(basePath:Path, nDocs:int, nFolders:int=10) -> tuple[SqlLiteDB, list[str], str]:
+  """ Create a database with one project, some folders and measurements
+
+  Args:
+    basePath (Path): folder of the database
+    nDocs (int): number of measurements
+    nFolders (int): number of folders in the project
+
+  Returns:
+    SqlLiteDB, list, str: database, list of measurement ids, project id
+  """
+  db = SqlLiteDB(basePath=basePath)
+  project = db.saveDoc(syntheticDoc('x0', 'Project', [], 0, 'Project'))
+  folders = [db.saveDoc(syntheticDoc('x1', f'Folder {i}', [project['id']], i, f'Project/{i:03d}_Folder{i}'))
+             for i in range(nFolders)]
+  docIDs = []
+  for i in range(nDocs):
+    folder = folders[i%nFolders]
+    doc = db.saveDoc(syntheticDoc('measurement/csv', f'file{i}.csv', [project['id'], folder['id']], 9999,
+                                  f"{folder['branch'][0]['path']}/file{i}.csv"))
+    docIDs.append(doc['id'])
+  return db, docIDs, project['id']
+
+
+def timeIt(function:Callable[[],Any], repeat:int=1) -> float:
+  """ Time a function call
+
+  Args:
+    function (Callable): function without arguments
+    repeat (int): number of calls
+
+  Returns:
+    float: time per call in seconds
+  """
+  start = time.perf_counter()
+  for _ in range(repeat):
+    function()
+  return (time.perf_counter()-start)/repeat
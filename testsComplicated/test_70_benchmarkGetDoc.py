@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+"""BENCHMARK getDoc: parameterized statements vs. f-string statements that are compiled for each call; getDocs """
+import random
+from .benchmarkTools import createSyntheticDB, timeIt
+
+NUM_DOCS  = 2000
+NUM_CALLS = 2000
+
+
+def getDocFString(db, docID):
+  """ Replica of the queries of getDoc before they were parameterized: each call creates a new statement text """
+  db.cursorRow.execute(f"SELECT * FROM main WHERE id == '{docID}'")
+  doc = dict(db.cursorRow.fetchone())
+  db.cursor.execute(f"SELECT tag FROM tags WHERE id == '{docID}'")
+  doc['tags'] = [i[0] for i in db.cursor.fetchall()]
+  db.cursor.execute(f"SELECT qrCode FROM qrCodes WHERE id == '{docID}'")
+  doc['qrCodes'] = [i[0] for i in db.cursor.fetchall()]
+  db.cursor.execute(f"SELECT * FROM branches WHERE id == '{docID}'")
+  doc['branch'] = db.cursor.fetchall()
+  db.cursor.execute('SELECT properties.key, properties.value, properties.unit, definitions.long, definitions.PURL, '
+                    'docTypeSchema.unit FROM properties LEFT JOIN definitions USING(key) '
+                    "LEFT JOIN docTypeSchema ON properties.key = (docTypeSchema.class || '.' || docTypeSchema.name) "
+                    f"WHERE properties.id == '{docID}'")
+  doc['properties'] = db.cursor.fetchall()
+  return doc
+
+
+def test_simple(tmp_path):
+  """
+  main function
+  """
+  db, docIDs, _ = createSyntheticDB(tmp_path, NUM_DOCS)
+  sample = random.choices(docIDs, k=NUM_CALLS)
+  iterBefore = iter(sample)
+  iterAfter  = iter(sample)
+  before = timeIt(lambda: getDocFString(db, next(iterBefore)), NUM_CALLS)
+  after  = timeIt(lambda: db.getDoc(next(iterAfter)),           NUM_CALLS)
+  batch  = timeIt(lambda: db.getDocs(docIDs), 1)/len(docIDs)
+  print(f'\ngetDoc per call: f-string statements {before*1e6:.1f}us | parameterized statements {after*1e6:.1f}us'
+        f' | getDocs per document {batch*1e6:.1f}us')
+  docs = db.getDocs(sample)
+  assert all(docs[i]==db.getDoc(i) for i in sample)
+  # apostrophes in values do not break the statements anymore
+  doc = db.getDoc(docIDs[0])
+  assert "'" in doc['comment']
+  db.setGUI(docIDs[0], [False, True])
+  assert db.getDoc(docIDs[0])['gui'] == [False, True]
+  db.exit()